@@ -7,8 +7,8 @@ from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import AbstractUser
 from django.core.exceptions import ValidationError
-from django.db import models
-from django.db.models.signals import post_save
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.http import JsonResponse
 from django.urls import reverse
@@ -281,3 +281,11 @@ class BlockedIP(models.Model):
 
     def __str__(self):
         return self.ip_address
+
+
+@receiver(post_save, sender=BlockedIP)
+@receiver(post_delete, sender=BlockedIP)
+def refresh_ip_blocklist(sender, instance, **kwargs):
+    from .utils_blocklist import blocked_ips
+
+    transaction.on_commit(blocked_ips.invalidate)
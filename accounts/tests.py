@@ -1,8 +1,22 @@
+import logging
+import time
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
-from django.test import TestCase
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
 
 from accounts.forms import CustomUserCreationForm
-from accounts.models import CustomUser, Follow, InvitationCode
+from accounts.models import BlockedIP, CustomUser, Follow, InvitationCode
+from accounts.utils_blocklist import REFRESH_INTERVAL, blocked_ips
+from config.access_log import AccessLogHandler
+from config.metrics import (
+    ServerTimingMiddleware,
+    TimedDjangoTemplates,
+    view_metrics,
+)
 
 
 class CustomUserCreationFormTest(TestCase):
@@ -101,3 +115,138 @@ class CustomUserModelTests(TestCase):
         ).exists()
         self.assertTrue(follower_exists, "Follower relationship should exist")
         self.assertTrue(followed_exists, "Followed relationship should exist")
+
+
+class BlockedIPMiddlewareTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        blocked_ips.invalidate()
+
+    def test_blocked_ip_is_rejected_without_queries(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            BlockedIP.objects.create(ip_address="10.0.0.1")
+        self.assertIn("10.0.0.1", blocked_ips)  # loads the list
+
+        with self.assertNumQueries(0):
+            response = self.client.get("/", REMOTE_ADDR="10.0.0.1")
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(
+            self.client.get("/robots.txt", REMOTE_ADDR="10.0.0.1").status_code, 200
+        )
+
+    def test_unblocking_takes_effect(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            blocked = BlockedIP.objects.create(ip_address="10.0.0.2")
+        self.assertIn("10.0.0.2", blocked_ips)
+        with self.captureOnCommitCallbacks(execute=True):
+            blocked.delete()
+        self.assertNotIn("10.0.0.2", blocked_ips)
+
+    def test_other_processes_reload(self):
+        self.assertNotIn("10.0.0.4", blocked_ips)  # loads the list
+        # Saved by another process: this one doesn't get the signal
+        BlockedIP.objects.create(ip_address="10.0.0.4")
+        self.assertNotIn("10.0.0.4", blocked_ips)
+        later = time.monotonic() + REFRESH_INTERVAL
+        with patch("accounts.utils_blocklist.time.monotonic", return_value=later):
+            self.assertIn("10.0.0.4", blocked_ips)
+
+    def test_deprecated_inbox_blocks_before_the_view(self):
+        response = self.client.get("/u/someone/inbox/", REMOTE_ADDR="10.0.0.3")
+        self.assertEqual(response.status_code, 410)
+        self.assertTrue(BlockedIP.objects.filter(ip_address="10.0.0.3").exists())
+
+
+class AccessLogTest(TestCase):
+    def get_record(self, path, **extra):
+        with self.assertLogs("config.access", level="INFO") as logs:
+            response = self.client.get(path, **extra)
+        self.assertEqual(len(logs.records), 1)
+        return response, logs.records[0].access
+
+    def test_structured_record(self):
+        user = CustomUser.objects.create_user(username="nia", password="pw")
+        self.client.force_login(user)
+        response, record = self.get_record(
+            "/notify/all/?page=1", REMOTE_ADDR="10.1.1.1"
+        )
+        self.assertEqual(record["v"], 1)
+        self.assertEqual(record["ip"], "10.1.1.1")
+        self.assertEqual(record["path"], "/notify/all/?page=1")
+        self.assertEqual(record["status"], 200)
+        self.assertEqual(record["size"], len(response.content))
+        self.assertEqual(record["view"], "notify:notification_list")
+        self.assertEqual(record["user_id"], user.id)
+        self.assertGreater(record["db_queries"], 0)
+        self.assertIsInstance(record["duration_ms"], float)
+
+    def test_listener_starts_with_the_first_record(self):
+        stream = StringIO()
+        handler = AccessLogHandler(stream=stream)
+        self.assertFalse(handler.started)
+        handler.handle(logging.makeLogRecord({"access": {"v": 1}}))
+        self.assertTrue(handler.started)
+        handler.stop()
+        self.assertEqual(stream.getvalue(), '{"v":1}\n')
+
+    @override_settings(ACCESS_LOG_SAMPLE_RATES={"/robots": 0.0})
+    def test_sampling(self):
+        with self.assertNoLogs("config.access", level="INFO"):
+            self.client.get("/robots.txt")
+
+
+def slow_context_processor(request):
+    time.sleep(0.05)
+    return {}
+
+
+class ServerTimingTest(TestCase):
+    def setUp(self):
+        view_metrics.clear()
+        self.staff = CustomUser.objects.create_user(
+            username="ola", password="pw", is_staff=True
+        )
+        self.user = CustomUser.objects.create_user(username="pia", password="pw")
+
+    def test_header_is_sent_to_staff_only(self):
+        self.client.force_login(self.user)
+        response = self.client.get("/notify/all/")
+        self.assertFalse(response.has_header("Server-Timing"))
+
+        self.client.force_login(self.staff)
+        response = self.client.get("/notify/all/")
+        timing = response["Server-Timing"]
+        for metric in ("db;dur=", "tpl;dur=", "cp;dur=", "total;dur="):
+            self.assertIn(metric, timing)
+
+    def test_views_are_aggregated(self):
+        self.client.force_login(self.user)
+        for _ in range(3):
+            self.client.get("/notify/all/")
+        self.assertEqual(self.client.get("/staff/performance/").status_code, 403)
+
+        self.client.force_login(self.staff)
+        response = self.client.get("/staff/performance/")
+        rows = {row["view"]: row for row in response.context["views"]}
+        self.assertEqual(rows["notify:notification_list"]["count"], 3)
+        self.assertGreater(rows["notify:notification_list"]["queries"], 0)
+
+    def test_context_processors_are_timed_apart(self):
+        backend = TimedDjangoTemplates(
+            {
+                "NAME": "timed",
+                "DIRS": [],
+                "APP_DIRS": False,
+                "OPTIONS": {
+                    "context_processors": ["accounts.tests.slow_context_processor"]
+                },
+            }
+        )
+        template = backend.from_string("{{ greeting }}")
+        middleware = ServerTimingMiddleware(
+            lambda request: HttpResponse(template.render({"greeting": "hi"}, request))
+        )
+        request = RequestFactory().get("/")
+        self.assertEqual(middleware(request).content, b"hi")
+        self.assertGreaterEqual(request.timings.context_processors_ms, 50)
+        self.assertLess(request.timings.template_ms, 50)
@@ -0,0 +1,49 @@
+import threading
+import time
+
+from .models import BlockedIP
+
+# How long a process trusts its copy before loading the list again. Changes
+# are seen at once by the process making them, by the others after this long.
+REFRESH_INTERVAL = 60
+
+
+###########
+# helpers #
+###########
+
+
+class IPBlocklist:
+    """
+    The blocked IP addresses, kept in process so checking a request costs a
+    set lookup instead of a query.
+    """
+
+    def __init__(self):
+        self.ips = None
+        self.loaded_at = 0
+        self.lock = threading.Lock()
+
+    def __contains__(self, ip_address):
+        return ip_address in self.refresh()
+
+    def is_stale(self):
+        return self.ips is None or time.monotonic() - self.loaded_at >= REFRESH_INTERVAL
+
+    def refresh(self):
+        if self.is_stale():
+            with self.lock:
+                # Another thread may have loaded it while this one waited
+                if self.is_stale():
+                    self.ips = frozenset(
+                        BlockedIP.objects.values_list("ip_address", flat=True)
+                    )
+                    self.loaded_at = time.monotonic()
+        return self.ips
+
+    def invalidate(self):
+        # Makes this process load the list again on its next lookup
+        self.loaded_at = -REFRESH_INTERVAL
+
+
+blocked_ips = IPBlocklist()
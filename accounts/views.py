@@ -17,8 +17,9 @@ from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib.auth.views import LoginView, PasswordChangeView
 from django.contrib.contenttypes.models import ContentType
 from django.core import serializers
+from django.core.paginator import Paginator
 from django.db import transaction
-from django.db.models import Count, Max, Min, OuterRef, Q, Subquery
+from django.db.models import Count, Max, Q
 from django.db.models.signals import pre_save
 from django.dispatch import receiver
 from django.http import (
@@ -33,6 +34,7 @@ from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse, reverse_lazy
 from django.utils import timezone
 from django.utils.decorators import method_decorator
+from django.utils.http import urlencode
 from django.views import View
 from django.views.decorators.csrf import csrf_exempt
 from django.views.generic import (
@@ -60,6 +62,10 @@ from webauthn.helpers.structs import (
 
 from accounts.models import BlacklistedDomain, CustomUser
 from activity_feed.models import Activity, Block, Follow
+from activity_feed.pagination import CursorPaginationMixin
+from activity_feed.utils_checkin import get_visible_latest_checkins
+from activity_feed.utils_prefetch import prefetch_activities
+from activity_feed.utils_search import SEARCH_LIMIT, in_rank_order, search
 from entity.models import Company, Creator
 from listen.models import Audiobook, ListenCheckIn, Podcast, Release, Track
 from listen.models import Work as ListenWork
@@ -201,30 +207,8 @@ class CustomPasswordChangeView(PasswordChangeView):
 
 
 def get_latest_checkins(user, request_user, checkin_model):
-    # Subquery to get the latest timestamp of visible check-ins
-    visibility_filter = (
-        Q(visibility="PU") | Q(visible_to=request_user)
-        if request_user.is_authenticated
-        else Q(visibility="PU")
-    )
-
-    latest_timestamp_subquery = (
-        checkin_model.objects.filter(
-            content_type=OuterRef("content_type"),
-            object_id=OuterRef("object_id"),
-            user=user,
-        )
-        .filter(visibility_filter)
-        .order_by("-timestamp")
-        .values("timestamp")[:1]
-    )
-
-    # Filter check-ins by the latest timestamp and visibility
-    checkins = checkin_model.objects.filter(
-        user=user, timestamp=Subquery(latest_timestamp_subquery)
-    ).filter(visibility_filter)
-
-    return checkins
+    # The latest check-in of `user` on every item, if `request_user` can see it
+    return get_visible_latest_checkins(request_user, checkin_model, checkin_user=user)
 
 
 @method_decorator(ratelimit(key="ip", rate="12/m", block=True), name="dispatch")
@@ -282,7 +266,7 @@ class AccountDetailView(DetailView):
 
         context.update(
             {
-                "recent_activities": recent_activities,
+                "recent_activities": prefetch_activities(recent_activities),
                 "recent_following": Follow.objects.filter(follower=user).order_by(
                     "-timestamp"
                 )[:6],
@@ -498,7 +482,7 @@ def home(request, *args, **kwargs):
         return redirect("login")
 
 
-class PersonalActivityFeedView(ListView):
+class PersonalActivityFeedView(CursorPaginationMixin, ListView):
     model = Activity
     template_name = "activity_feed/activity_feed.html"
     paginate_by = 20
@@ -728,45 +712,73 @@ class ManageInvitationRequestsView(UserPassesTestMixin, ListView):
 ##########
 # Search #
 ##########
-def filter_content(queryset, search_terms, content_fields):
-    for term in search_terms:
-        or_conditions = Q()
-        for field in content_fields:
-            or_conditions |= Q(**{f"{field}__icontains": term})
-        queryset = queryset.filter(or_conditions).distinct().order_by("timestamp")
-    return queryset
-
-
-def filter_self(user, search_terms):
-    return (
-        filter_content(
-            Post.objects.filter(user=user), search_terms, ["title", "content"]
-        ),
-        filter_content(Say.objects.filter(user=user), search_terms, ["content"]),
-        filter_content(
-            Pin.objects.filter(user=user), search_terms, ["title", "content", "url"]
-        ),
-        filter_content(Repost.objects.filter(user=user), search_terms, ["content"]),
-        filter_content(LuvList.objects.filter(user=user), search_terms, ["notes"]),
-        filter_content(
-            ReadCheckIn.objects.filter(user=user), search_terms, ["content"]
-        ),
-        filter_content(
-            WatchCheckIn.objects.filter(user=user), search_terms, ["content"]
-        ),
-        filter_content(
-            ListenCheckIn.objects.filter(user=user), search_terms, ["content"]
-        ),
-        filter_content(
-            PlayCheckIn.objects.filter(user=user), search_terms, ["content"]
-        ),
-        filter_content(
-            VisitCheckIn.objects.filter(user=user), search_terms, ["content"]
-        ),
-    )
+# Sections of the search results: their titles, grouped by the categories
+# of the `model` parameter
+SEARCH_SECTIONS = {
+    "user": "Users",
+    "creator": "Creators",
+    "company": "Companies",
+    "litwork": "Works",
+    "litinstance": "Instances",
+    "book": "Books",
+    "periodical": "Periodicals",
+    "book_series": "Book Series",
+    "movie": "Movies",
+    "series": "Series",
+    "musicwork": "Works",
+    "track": "Tracks",
+    "release": "Releases",
+    "podcast": "Podcasts",
+    "audiobook": "Audiobooks",
+    "gamework": "Works",
+    "game": "Games",
+    "location": "Locations",
+    "post": "Posts",
+    "say": "Says",
+    "pin": "Pins",
+    "repost": "Reposts",
+    "luvlist": "Lists",
+    "read_checkin": "Read Check-ins",
+    "watch_checkin": "Watch Check-ins",
+    "listen_checkin": "Listen Check-ins",
+    "play_checkin": "Play Check-ins",
+    "visit_checkin": "Visit Check-ins",
+}
+
+WRITE_SECTIONS = (
+    "post",
+    "say",
+    "pin",
+    "repost",
+    "luvlist",
+    "read_checkin",
+    "watch_checkin",
+    "listen_checkin",
+    "play_checkin",
+    "visit_checkin",
+)
+
+SEARCH_CATEGORIES = {
+    "user": ("user",),
+    "read": ("litwork", "litinstance", "book", "periodical", "book_series"),
+    "listen": ("musicwork", "track", "release", "podcast", "audiobook"),
+    "play": ("gamework", "game"),
+    "watch": ("movie", "series"),
+    "entity": ("creator", "company"),
+    "visit": ("location",),
+    "write": WRITE_SECTIONS,
+    "self": WRITE_SECTIONS,
+}
+
+# Hits shown per section on the first page of the results
+SEARCH_PREVIEW = 5
+
+# Hits per page of a single section, and how far it goes
+SEARCH_PAGE_SIZE = 20
+SEARCH_SECTION_LIMIT = 1000
 
 
-def filter_write(query, search_terms, request_user):
+def get_write_querysets(request_user):
     # Apply the is_public filter for non-authenticated users
 
     if request_user.is_authenticated:
@@ -827,285 +839,86 @@ def filter_write(query, search_terms, request_user):
         visit_checkin_query = VisitCheckIn.objects.filter(
             user__privacy_level="public", visibility="PU"
         )
-    return (
-        filter_content(post_query, search_terms, ["title", "content"]),
-        filter_content(say_query, search_terms, ["content"]),
-        filter_content(pin_query, search_terms, ["title", "content", "url"]),
-        filter_content(repost_query, search_terms, ["content"]),
-        filter_content(luvlist_query, search_terms, ["notes"]),
-        filter_content(read_checkin_query, search_terms, ["content"]),
-        filter_content(watch_checkin_query, search_terms, ["content"]),
-        filter_content(listen_checkin_query, search_terms, ["content"]),
-        filter_content(play_checkin_query, search_terms, ["content"]),
-        filter_content(visit_checkin_query, search_terms, ["content"]),
-    )
-
-
-def filter_users(query, search_terms):
-    results = User.objects.all()
-    for term in search_terms:
-        results = (
-            results.filter(
-                Q(username__icontains=term)
-                | Q(display_name__icontains=term)
-                | Q(bio__icontains=term)
-            )
-            .distinct()
-            .order_by("username")
-        )
-    return results
-
-
-def filter_read(query, search_terms):
-    litwork_results = ReadWork.objects.all()
-    litinstance_results = LitInstance.objects.all()
-    book_results = Book.objects.all()
-    periodical_results = Periodical.objects.all()
-    book_series = BookSeries.objects.all()
-
-    for term in search_terms:
-        litwork_results = (
-            litwork_results.filter(
-                Q(title__icontains=term)
-                | Q(subtitle__icontains=term)
-                | Q(workrole__creator__name__icontains=term)
-                | Q(workrole__creator__other_names__icontains=term)
-                | Q(workrole__alt_name__icontains=term)
-                | Q(publication_date__icontains=term)
-            )
-            .distinct()
-            .order_by("publication_date")
-        )
-        litinstance_results = (
-            litinstance_results.filter(
-                Q(title__icontains=term)
-                | Q(subtitle__icontains=term)
-                | Q(instancerole__creator__name__icontains=term)
-                | Q(instancerole__creator__other_names__icontains=term)
-                | Q(instancerole__alt_name__icontains=term)
-                | Q(publication_date__icontains=term)
-            )
-            .distinct()
-            .order_by("publication_date")
-        )
-        book_results = (
-            book_results.filter(
-                Q(title__icontains=term)
-                | Q(subtitle__icontains=term)
-                | Q(isbn_10__icontains=term)
-                | Q(isbn_13__icontains=term)
-                | Q(eisbn_13__icontains=term)
-                | Q(asin__icontains=term)
-                | Q(bookrole__creator__name__icontains=term)
-                | Q(bookrole__creator__other_names__icontains=term)
-                | Q(bookrole__alt_name__icontains=term)
-                | Q(publication_date__icontains=term)
-                | Q(publisher__name__icontains=term)
-            )
-            .distinct()
-            .order_by("publication_date")
-        )
-        periodical_results = (
-            periodical_results.filter(title__icontains=term)
-            .distinct()
-            .order_by("title")
-        )
-        book_series = (
-            book_series.filter(Q(title__icontains=term)).distinct().order_by("title")
+    # The visibility filters join the audience, hence distinct()
+    return {
+        section: queryset.distinct()
+        for section, queryset in zip(
+            WRITE_SECTIONS,
+            (
+                post_query,
+                say_query,
+                pin_query,
+                repost_query,
+                luvlist_query,
+                read_checkin_query,
+                watch_checkin_query,
+                listen_checkin_query,
+                play_checkin_query,
+                visit_checkin_query,
+            ),
         )
-
-    return (
-        litwork_results,
-        litinstance_results,
-        book_results,
-        periodical_results,
-        book_series,
-    )
+    }
 
 
-def filter_listen(query, search_terms):
-    musicwork_results = ListenWork.objects.all()
-    track_results = Track.objects.all()
-    release_results = Release.objects.all()
-    podcast_results = Podcast.objects.all()
-    audiobook_results = Audiobook.objects.all()
-
-    for term in search_terms:
-        musicwork_results = (
-            musicwork_results.filter(
-                Q(title__icontains=term)
-                | Q(other_titles__icontains=term)
-                | Q(workrole__creator__name__icontains=term)
-                | Q(workrole__creator__other_names__icontains=term)
-                | Q(workrole__alt_name__icontains=term)
-            )
-            .distinct()
-            .order_by("release_date")
-        )
-        track_results = (
-            track_results.filter(
-                Q(title__icontains=term)
-                | Q(other_titles__icontains=term)
-                | Q(trackrole__creator__name__icontains=term)
-                | Q(trackrole__creator__other_names__icontains=term)
-                | Q(trackrole__alt_name__icontains=term)
-            )
-            .distinct()
-            .order_by("release_date")
-        )
-        release_results = (
-            release_results.filter(
-                Q(title__icontains=term)
-                | Q(other_titles__icontains=term)
-                | Q(releaserole__creator__name__icontains=term)
-                | Q(releaserole__creator__other_names__icontains=term)
-                | Q(releaserole__alt_name__icontains=term)
-                | Q(catalog_number__icontains=term)
-                | Q(label__name__icontains=term)
-            )
-            .distinct()
-            .order_by("release_date")
-        )
-        podcast_results = podcast_results.filter(Q(title__icontains=term)).distinct()
-        audiobook_results = (
-            audiobook_results.filter(
-                Q(title__icontains=term)
-                | Q(audiobookrole__creator__name__icontains=term)
-                | Q(audiobookrole__creator__other_names__icontains=term)
-                | Q(release_date__icontains=term)
-                | Q(publisher__name__icontains=term)
-            )
-            .distinct()
-            .order_by("release_date")
-        )
+def get_search_querysets(model, request_user):
+    """{section: queryset of what may show up in it} for a `model` category."""
+    if model == "self":
+        if not request_user.is_authenticated:
+            return {}
+        return {
+            section: queryset.model.objects.filter(user=request_user)
+            for section, queryset in get_write_querysets(request_user).items()
+        }
 
-    return (
-        musicwork_results,
-        track_results,
-        release_results,
-        podcast_results,
-        audiobook_results,
+    querysets = {
+        "user": User.objects.all(),
+        "creator": Creator.objects.all(),
+        "company": Company.objects.all(),
+        "litwork": ReadWork.objects.all(),
+        "litinstance": LitInstance.objects.all(),
+        "book": Book.objects.all(),
+        "periodical": Periodical.objects.all(),
+        "book_series": BookSeries.objects.all(),
+        "movie": Movie.objects.all(),
+        "series": Season.objects.all(),
+        "musicwork": ListenWork.objects.all(),
+        "track": Track.objects.all(),
+        "release": Release.objects.all(),
+        "podcast": Podcast.objects.all(),
+        "audiobook": Audiobook.objects.all(),
+        "gamework": PlayWork.objects.all(),
+        "game": Game.objects.all(),
+        "location": Location.objects.all(),
+    }
+    if model in ("all", "write"):
+        querysets.update(get_write_querysets(request_user))
+    if model == "all":
+        return querysets
+    return {section: querysets[section] for section in SEARCH_CATEGORIES.get(model, ())}
+
+
+def rank_sections(search_terms, querysets, limit):
+    """
+    {section: ([pk, ...], truncated)}: the best `limit` matches of every
+    section that its queryset lets through, best first, and whether there
+    are more of them.
+    """
+    # One more than shown tells whether the section is cut off
+    ranked = search(search_terms, list(querysets.values()), limit + 1)
+    sections = {}
+    for section, queryset in querysets.items():
+        pks = ranked[queryset.model]
+        sections[section] = (pks[:limit], len(pks) > limit)
+    return sections
+
+
+def get_section_url(section, query, model):
+    return "{}?{}".format(
+        reverse("search_section", args=[section]),
+        urlencode({"q": query, "model": model}),
     )
 
 
-def filter_play(query, search_terms):
-    gamework_results = PlayWork.objects.all()
-    game_results = Game.objects.all()
-
-    for term in search_terms:
-        gamework_results = (
-            gamework_results.filter(
-                Q(title__icontains=term)
-                | Q(other_titles__icontains=term)
-                | Q(workrole__creator__name__icontains=term)
-                | Q(workrole__creator__other_names__icontains=term)
-                | Q(workrole__alt_name__icontains=term)
-                | Q(first_release_date=query)
-            )
-            .distinct()
-            .order_by("first_release_date")
-        )
-        game_results = (
-            game_results.filter(
-                Q(title__icontains=term)
-                | Q(other_titles__icontains=term)
-                | Q(developers__name__icontains=term)
-                | Q(platforms__name__icontains=term)
-                | Q(gameroles__creator__name__icontains=term)
-                | Q(gameroles__creator__other_names__icontains=term)
-                | Q(gameroles__alt_name__icontains=term)
-                | Q(gamecasts__creator__name__icontains=term)
-                | Q(gamecasts__creator__other_names__icontains=term)
-                | Q(gamecasts__character_name__icontains=term)
-            )
-            .distinct()
-            .annotate(
-                annotated_earliest_release_date=Min(
-                    "region_release_dates__release_date"
-                )
-            )
-            .order_by("annotated_earliest_release_date")
-        )
-    return gamework_results, game_results
-
-
-def filter_watch(query, search_terms):
-    movie_results = Movie.objects.all()
-    series_results = Season.objects.all()
-
-    for term in search_terms:
-        movie_results = (
-            movie_results.filter(
-                Q(title__icontains=term)
-                | Q(other_titles__icontains=term)
-                | Q(movieroles__creator__name__icontains=term)
-                | Q(movieroles__creator__other_names__icontains=term)
-                | Q(movieroles__alt_name__icontains=term)
-                | Q(moviecasts__creator__name__icontains=term)
-                | Q(moviecasts__creator__other_names__icontains=term)
-                | Q(moviecasts__character_name__icontains=term)
-            )
-            .distinct()
-            .annotate(annotated_release_date=Min("region_release_dates__release_date"))
-            .order_by("annotated_release_date")
-        )
-        series_results = (
-            series_results.filter(
-                Q(title__icontains=term)
-                | Q(other_titles__icontains=term)
-                | Q(seasonroles__creator__name__icontains=term)
-                | Q(seasonroles__creator__other_names__icontains=term)
-                | Q(seasonroles__alt_name__icontains=term)
-                | Q(episodes__episodecasts__creator__name__icontains=term)
-                | Q(episodes__episodecasts__creator__other_names__icontains=term)
-                | Q(episodes__episodecasts__character_name__icontains=term)
-            )
-            .distinct()
-            .order_by("release_date")
-        )
-
-    return movie_results, series_results
-
-
-def filter_entity(query, search_terms):
-    creator_results = Creator.objects.all()
-    company_results = Company.objects.all()
-
-    for term in search_terms:
-        creator_results = (
-            creator_results.filter(
-                Q(name__icontains=term) | Q(other_names__icontains=term)
-            )
-            .distinct()
-            .order_by("name")
-        )
-
-        company_results = (
-            company_results.filter(
-                Q(name__icontains=term) | Q(other_names__icontains=term)
-            )
-            .distinct()
-            .order_by("name")
-        )
-
-    return creator_results, company_results
-
-
-def filter_location(query, search_terms):
-    location_results = Location.objects.all()
-
-    for term in search_terms:
-        location_results = (
-            location_results.filter(
-                Q(name__icontains=term) | Q(other_names__icontains=term)
-            )
-            .distinct()
-            .order_by("name")
-        )
-
-    return location_results
-
-
 def parse_query(query):
     pattern = r"\"[^\"]+\"|\'[^\']+\'|“[^”]+”|‘[^’]+’|\S+"
     return [term.strip("\"'“”‘’") for term in re.findall(pattern, query)]
@@ -1125,152 +938,75 @@ def search_view(request):
     query = request.GET.get("q")
     model = request.GET.get("model", "all")
 
-    # Initialize all results as empty
-    user_results = []
-    # entity
-    creator_results = []
-    company_results = []
-    # write
-    post_results = []
-    say_results = []
-    pin_results = []
-    repost_results = []
-    luvlist_results = []
-    read_checkin_results = []
-    watch_checkin_results = []
-    listen_checkin_results = []
-    play_checkin_results = []
-    visit_checkin_results = []
-
-    # read
-    litwork_results = []
-    litinstance_results = []
-    book_results = []
-    periodical_results = []
-    book_series = []
-    # play
-    gamework_results = []
-    game_results = []
-    # listen
-    musicwork_results = []
-    track_results = []
-    release_results = []
-    podcast_results = []
-    audiobook_results = []
-    # watch
-    movie_results = []
-    series_results = []
-    # visit
-    location_results = []
-
-    search_terms = parse_query(query)
+    search_terms = parse_query(query or "")
 
+    # The top hits of every section, e.g. `book_results`, and their counts
+    results = {}
+    sections = {}
     if query:
-        if model in ["all", "user"]:
-            user_results = filter_users(query, search_terms)
+        querysets = get_search_querysets(model, request_user)
+        ranked = rank_sections(search_terms, querysets, SEARCH_LIMIT)
+        for section, (pks, truncated) in ranked.items():
+            if not pks:
+                continue
+            # Evaluated here, so that `execution_time` covers the queries
+            results[f"{section}_results"] = list(
+                in_rank_order(querysets[section], pks[:SEARCH_PREVIEW])
+            )
+            sections[section] = {
+                "count": f"{len(pks)}+" if truncated else len(pks),
+                "has_more": truncated or len(pks) > SEARCH_PREVIEW,
+                "url": get_section_url(section, query, model),
+            }
 
-        if model in ["all", "read"]:
-            (
-                litwork_results,
-                litinstance_results,
-                book_results,
-                periodical_results,
-                book_series,
-            ) = filter_read(query, search_terms)
-
-        if model in ["all", "listen"]:
-            (
-                musicwork_results,
-                track_results,
-                release_results,
-                podcast_results,
-                audiobook_results,
-            ) = filter_listen(query, search_terms)
+    execution_time = time.time() - start_time
 
-        if model in ["all", "play"]:
-            gamework_results, game_results = filter_play(query, search_terms)
+    return render(
+        request,
+        "accounts/search_results.html",
+        {
+            "query": query,
+            "model": model,
+            **results,
+            "sections": sections,
+            # other
+            "execution_time": execution_time,
+            "terms": search_terms,
+        },
+    )
 
-        if model in ["all", "watch"]:
-            movie_results, series_results = filter_watch(query, search_terms)
 
-        if model in ["all", "entity"]:
-            creator_results, company_results = filter_entity(query, search_terms)
+@ratelimit(key="ip", rate="20/m", block=True)
+def search_section_view(request, section):
+    """Every hit of one section of the search results, page by page."""
+    start_time = time.time()
 
-        if model in ["all", "visit"]:
-            location_results = filter_location(query, search_terms)
+    query = request.GET.get("q") or ""
+    model = request.GET.get("model", "all")
+    querysets = get_search_querysets(model, request.user)
+    if section not in querysets:
+        raise Http404("No such search section.")
 
-        if model in ["all", "write"]:
-            (
-                post_results,
-                say_results,
-                pin_results,
-                repost_results,
-                luvlist_results,
-                read_checkin_results,
-                watch_checkin_results,
-                listen_checkin_results,
-                play_checkin_results,
-                visit_checkin_results,
-            ) = filter_write(query, search_terms, request_user)
-
-        if model == "self":
-            (
-                post_results,
-                say_results,
-                pin_results,
-                repost_results,
-                luvlist_results,
-                read_checkin_results,
-                watch_checkin_results,
-                listen_checkin_results,
-                play_checkin_results,
-                visit_checkin_results,
-            ) = filter_self(request.user, search_terms)
+    search_terms = parse_query(query)
+    pks, truncated = rank_sections(
+        search_terms, {section: querysets[section]}, SEARCH_SECTION_LIMIT
+    )[section]
+    page_obj = Paginator(pks, SEARCH_PAGE_SIZE).get_page(request.GET.get("page"))
+    results = list(in_rank_order(querysets[section], list(page_obj)))
 
     execution_time = time.time() - start_time
 
     return render(
         request,
-        "accounts/search_results.html",
+        "accounts/search_section.html",
         {
             "query": query,
             "model": model,
-            "user_results": user_results,
-            # entity
-            "creator_results": creator_results,
-            "company_results": company_results,
-            # write
-            "post_results": post_results,
-            "say_results": say_results,
-            "pin_results": pin_results,
-            "repost_results": repost_results,
-            "luvlist_results": luvlist_results,
-            "read_checkin_results": read_checkin_results,
-            "watch_checkin_results": watch_checkin_results,
-            "listen_checkin_results": listen_checkin_results,
-            "play_checkin_results": play_checkin_results,
-            "visit_checkin_results": visit_checkin_results,
-            # read
-            "litwork_results": litwork_results,
-            "litinstance_results": litinstance_results,
-            "book_results": book_results,
-            "periodical_results": periodical_results,
-            "book_series": book_series,
-            # play
-            "gamework_results": gamework_results,
-            "game_results": game_results,
-            # listen
-            "musicwork_results": musicwork_results,
-            "track_results": track_results,
-            "release_results": release_results,
-            "podcast_results": podcast_results,
-            "audiobook_results": audiobook_results,
-            # watch
-            "movie_results": movie_results,
-            "series_results": series_results,
-            # location
-            "location_results": location_results,
-            # other
+            "section": section,
+            "title": SEARCH_SECTIONS[section],
+            "results": results,
+            "page_obj": page_obj,
+            "count": f"{len(pks)}+" if truncated else len(pks),
             "execution_time": execution_time,
             "terms": search_terms,
         },
@@ -4,8 +4,9 @@ import markdown
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.models import ContentType
+from django.contrib.contenttypes.prefetch import GenericPrefetch
 from django.contrib.syndication.views import Feed
-from django.db.models import Q
+from django.db.models import Q, prefetch_related_objects
 from django.http import Http404, HttpResponse
 from django.urls import reverse
 from django.utils.feedgenerator import Rss201rev2Feed
@@ -13,6 +14,7 @@ from django.utils.feedgenerator import Rss201rev2Feed
 from write.models import Say
 
 from .models import Activity
+from .utils_prefetch import get_content_querysets
 
 User = get_user_model()
 
@@ -78,6 +80,14 @@ class UserActivityFeed(Feed):
             .order_by("-timestamp")[:25]
         )
 
+        # One query per content type rather than per item
+        activities = list(activities)
+        prefetch_related_objects(
+            activities,
+            GenericPrefetch(
+                "content_object", get_content_querysets(resolve_reposts=False)
+            ),
+        )
         return activities
 
     def item_title(self, activity):
@@ -122,7 +132,7 @@ class UserActivityFeed(Feed):
         related_model = ContentType.objects.get_for_id(
             activity.content_type_id
         ).model_class()
-        related_object = related_model.objects.get(pk=activity.object_id)
+        related_object = activity.content_object
         app_label = related_model._meta.app_label
         model_name = related_model.__name__.lower()
 
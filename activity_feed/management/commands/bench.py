@@ -0,0 +1,93 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+
+from activity_feed.utils_bench import compare, get_scenarios, run_scenario
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the hot endpoints in process on a seeded database (see "
+        "generate_dataset) and print latency percentiles, query counts and "
+        "peak memory as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--iterations",
+            type=int,
+            default=20,
+            help="Timed requests per scenario.",
+        )
+        parser.add_argument(
+            "--scenario",
+            action="append",
+            dest="scenarios",
+            help="Only run this scenario (can be repeated).",
+        )
+        parser.add_argument(
+            "--output", help="Also write the results to this JSON file."
+        )
+        parser.add_argument(
+            "--baseline",
+            help="Compare with the results of an earlier run, read from this file.",
+        )
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=0.1,
+            help="Fail when a metric is worse than the baseline by more than this "
+            "share (default: 0.1).",
+        )
+
+    def handle(self, *args, **options):
+        # The test client only talks to "testserver". What the scenarios and
+        # their requests write, e.g. an app password and sessions, is rolled
+        # back at the end.
+        allowed_hosts = [*settings.ALLOWED_HOSTS, "testserver"]
+        with override_settings(ALLOWED_HOSTS=allowed_hosts), transaction.atomic():
+            results = self.run_scenarios(options)
+            transaction.set_rollback(True)
+
+        regressions = []
+        if options["baseline"]:
+            with open(options["baseline"]) as f:
+                regressions = compare(results, json.load(f), options["threshold"])
+
+        output = json.dumps(results, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(output + "\n")
+        self.stdout.write(output)
+
+        failed = [name for name, result in results.items() if result["status"] != 200]
+        if failed:
+            raise CommandError(f"Not 200: {', '.join(failed)}")
+        if regressions:
+            raise CommandError(
+                "Worse than the baseline: "
+                + ", ".join(f"{name} {metric}" for name, metric in regressions)
+            )
+
+    def run_scenarios(self, options):
+        try:
+            scenarios = get_scenarios()
+        except IndexError:
+            raise CommandError("Nothing to benchmark, run generate_dataset first.")
+        if options["scenarios"]:
+            unknown = set(options["scenarios"]) - {s.name for s in scenarios}
+            if unknown:
+                raise CommandError(f"Unknown scenario(s): {', '.join(sorted(unknown))}")
+            scenarios = [s for s in scenarios if s.name in options["scenarios"]]
+
+        results = {}
+        for scenario in scenarios:
+            results[scenario.name] = run_scenario(scenario, options["iterations"])
+            self.stderr.write(
+                f"{scenario.name}: p95 {results[scenario.name]['p95_ms']} ms, "
+                f"{results[scenario.name]['queries']} queries"
+            )
+        return results
@@ -0,0 +1,54 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from activity_feed.utils_timeline import check_timeline, rebuild_timeline
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the precomputed home timelines with the activity feed query "
+        "and report any drift."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            action="append",
+            dest="usernames",
+            help="Only check the timeline of this user (can be repeated).",
+        )
+        parser.add_argument(
+            "--fix",
+            action="store_true",
+            help="Rebuild the timelines that are out of sync.",
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by("id")
+        if options["usernames"]:
+            users = users.filter(username__in=options["usernames"])
+
+        out_of_sync = 0
+        for user in users.iterator():
+            missing, unexpected = check_timeline(user)
+            if not missing and not unexpected:
+                continue
+
+            out_of_sync += 1
+            self.stdout.write(
+                self.style.WARNING(
+                    f"{user.username}: {len(missing)} missing, "
+                    f"{len(unexpected)} unexpected"
+                )
+            )
+            if options["fix"]:
+                rebuild_timeline(user)
+
+        if not out_of_sync:
+            self.stdout.write(self.style.SUCCESS("Timelines are consistent."))
+        elif options["fix"]:
+            self.stdout.write(self.style.SUCCESS(f"{out_of_sync} timeline(s) rebuilt."))
+        else:
+            raise CommandError(f"{out_of_sync} timeline(s) out of sync.")
@@ -0,0 +1,111 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from activity_feed.models import TimelineEntry
+from activity_feed.utils_anniversary import (
+    invalidate_on_this_day,
+    rebuild_anniversaries,
+)
+from activity_feed.utils_autocomplete import (
+    invalidate_autocomplete,
+    rebuild_autocomplete_index,
+)
+from activity_feed.utils_checkin import (
+    rebuild_latest_checkins,
+    reconcile_checkin_counts,
+)
+from activity_feed.utils_dataset import DEFAULT_COUNTS, PER_USER, DatasetGenerator
+from activity_feed.utils_search import rebuild_search_index
+from activity_feed.utils_timeline import rebuild_timeline
+from notify.utils import rebuild_unread_counts
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the database with a synthetic, long-tailed dataset for "
+        "performance work. Never run this against production."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scale",
+            type=float,
+            default=1.0,
+            help="Multiply every default count by this factor.",
+        )
+        parser.add_argument(
+            "--seed", type=int, default=0, help="Seed of the random generator."
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=2000,
+            help="Rows per INSERT statement.",
+        )
+        for key, value in DEFAULT_COUNTS.items():
+            parser.add_argument(
+                f"--{key}",
+                type=int,
+                help=f"Number of {key} (default: {value} times --scale).",
+            )
+        for key, value in PER_USER.items():
+            parser.add_argument(
+                f"--{key.replace('_', '-')}-per-user",
+                dest=f"{key}_per_user",
+                type=float,
+                help=f"Mean number of {key.replace('_', ' ')} per user "
+                f"(default: {value}).",
+            )
+
+    def handle(self, *args, **options):
+        counts = {
+            key: options[key] for key in DEFAULT_COUNTS if options[key] is not None
+        }
+        per_user = {
+            key: options[f"{key}_per_user"]
+            for key in PER_USER
+            if options[f"{key}_per_user"] is not None
+        }
+        generator = DatasetGenerator(
+            counts=counts,
+            per_user=per_user,
+            scale=options["scale"],
+            seed=options["seed"],
+            batch_size=options["batch_size"],
+            log=self.stdout.write,
+        )
+
+        started = time.perf_counter()
+        with transaction.atomic():
+            created = generator.run()
+
+            # Derived tables that `save()` and its signals would have kept
+            self.stdout.write("Rebuilding derived tables...")
+            rebuild_anniversaries()
+            rebuild_unread_counts()
+            rebuild_search_index()
+            rebuild_autocomplete_index()
+            rebuild_latest_checkins()
+            reconcile_checkin_counts()
+            if settings.ACTIVITY_TIMELINE_ENABLED:
+                TimelineEntry.objects.all().delete()
+                for user in User.objects.order_by("id").iterator():
+                    rebuild_timeline(user)
+        # Drop what is cached from the rebuilt tables; new rows change no other key
+        invalidate_on_this_day()
+        invalidate_autocomplete()
+
+        for label, total in sorted(created.items()):
+            self.stdout.write(f"{label}: {total}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{sum(created.values())} rows generated in "
+                f"{time.perf_counter() - started:.0f}s."
+            )
+        )
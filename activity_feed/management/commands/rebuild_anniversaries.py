@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from activity_feed.utils_anniversary import (
+    invalidate_on_this_day,
+    rebuild_anniversaries,
+)
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the month/day index behind the "On this day" sidebar.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            total = rebuild_anniversaries()
+        invalidate_on_this_day()
+        self.stdout.write(self.style.SUCCESS(f"{total} anniversaries indexed."))
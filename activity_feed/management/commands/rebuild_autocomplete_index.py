@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from activity_feed.utils_autocomplete import (
+    invalidate_autocomplete,
+    rebuild_autocomplete_index,
+)
+
+
+class Command(BaseCommand):
+    help = "Rebuild the keys of the autocomplete views from scratch."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            total = rebuild_autocomplete_index()
+        # Drop the cached matches of the old keys
+        invalidate_autocomplete()
+        self.stdout.write(self.style.SUCCESS(f"{total} autocomplete keys indexed."))
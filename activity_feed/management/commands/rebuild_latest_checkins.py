@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from activity_feed.utils_checkin import rebuild_latest_checkins
+
+
+class Command(BaseCommand):
+    help = "Rebuild the latest check-in of every user on every item."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            total = rebuild_latest_checkins()
+        self.stdout.write(self.style.SUCCESS(f"{total} latest check-ins indexed."))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from activity_feed.utils_search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index from scratch."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            total = rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS(f"{total} search entries indexed."))
@@ -0,0 +1,36 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from activity_feed.models import TimelineEntry
+from activity_feed.utils_timeline import rebuild_timeline
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Rebuild the precomputed home timelines from the activity feed query."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            action="append",
+            dest="usernames",
+            help="Only rebuild the timeline of this user (can be repeated).",
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by("id")
+        if options["usernames"]:
+            users = users.filter(username__in=options["usernames"])
+        else:
+            TimelineEntry.objects.all().delete()
+
+        for user in users.iterator():
+            with transaction.atomic():
+                rebuild_timeline(user)
+            self.stdout.write(
+                f"{user.username}: {user.timeline_entries.count()} entries"
+            )
+
+        self.stdout.write(self.style.SUCCESS("Timelines rebuilt."))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from activity_feed.utils_checkin import reconcile_checkin_counts
+
+
+class Command(BaseCommand):
+    help = "Recount the per-item check-in counters and fix any drift."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            fixed = reconcile_checkin_counts()
+        self.stdout.write(self.style.SUCCESS(f"{fixed} check-in counters fixed."))
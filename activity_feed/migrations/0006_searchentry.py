@@ -0,0 +1,118 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:03
+
+import auto_prefetch
+import django.contrib.postgres.search
+import django.db.models.deletion
+import django.db.models.manager
+from django.db import migrations, models
+
+SQLITE_FTS = [
+    """
+    CREATE VIRTUAL TABLE activity_feed_searchentry_fts USING fts5(
+        title, body,
+        content='activity_feed_searchentry', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER activity_feed_searchentry_ai
+    AFTER INSERT ON activity_feed_searchentry BEGIN
+        INSERT INTO activity_feed_searchentry_fts(rowid, title, body)
+        VALUES (new.id, new.title, new.body);
+    END
+    """,
+    """
+    CREATE TRIGGER activity_feed_searchentry_ad
+    AFTER DELETE ON activity_feed_searchentry BEGIN
+        INSERT INTO activity_feed_searchentry_fts(
+            activity_feed_searchentry_fts, rowid, title, body
+        ) VALUES ('delete', old.id, old.title, old.body);
+    END
+    """,
+    """
+    CREATE TRIGGER activity_feed_searchentry_au
+    AFTER UPDATE ON activity_feed_searchentry BEGIN
+        INSERT INTO activity_feed_searchentry_fts(
+            activity_feed_searchentry_fts, rowid, title, body
+        ) VALUES ('delete', old.id, old.title, old.body);
+        INSERT INTO activity_feed_searchentry_fts(rowid, title, body)
+        VALUES (new.id, new.title, new.body);
+    END
+    """,
+]
+
+SQLITE_FTS_REVERSE = [
+    "DROP TRIGGER IF EXISTS activity_feed_searchentry_ai",
+    "DROP TRIGGER IF EXISTS activity_feed_searchentry_ad",
+    "DROP TRIGGER IF EXISTS activity_feed_searchentry_au",
+    "DROP TABLE IF EXISTS activity_feed_searchentry_fts",
+]
+
+
+def create_search_backend(apps, schema_editor):
+    # Note that SQLite drops the triggers whenever a later migration has to
+    # rebuild the searchentry table; recreate them after such a migration
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute(
+            "CREATE INDEX searchentry_vector_idx "
+            "ON activity_feed_searchentry USING gin (vector)"
+        )
+    elif vendor == "sqlite":
+        for statement in SQLITE_FTS:
+            schema_editor.execute(statement)
+
+
+def drop_search_backend(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute("DROP INDEX IF EXISTS searchentry_vector_idx")
+    elif vendor == "sqlite":
+        for statement in SQLITE_FTS_REVERSE:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("activity_feed", "0005_anniversary"),
+        ("contenttypes", "0002_remove_content_type_name"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SearchEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("object_id", models.PositiveIntegerField()),
+                ("title", models.TextField(blank=True)),
+                ("body", models.TextField(blank=True)),
+                ("vector", django.contrib.postgres.search.SearchVectorField(null=True)),
+                (
+                    "content_type",
+                    auto_prefetch.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="contenttypes.contenttype",
+                    ),
+                ),
+            ],
+            options={
+                "abstract": False,
+                "base_manager_name": "prefetch_manager",
+                "unique_together": {("content_type", "object_id")},
+            },
+            managers=[
+                ("objects", django.db.models.manager.Manager()),
+                ("prefetch_manager", django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.RunPython(create_search_backend, drop_search_backend),
+    ]
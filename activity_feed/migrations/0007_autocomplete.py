@@ -0,0 +1,121 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:10
+
+import auto_prefetch
+import django.db.models.deletion
+import django.db.models.manager
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+def create_autocomplete_indexes(apps, schema_editor):
+    # The (content_type, key) index can't serve LIKE 'prefix%' under a
+    # non-C collation, nor any LIKE '%substring%'
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(
+            "CREATE INDEX autocompletekey_key_like_idx "
+            "ON activity_feed_autocompletekey (content_type_id, key varchar_pattern_ops)"
+        )
+        schema_editor.execute(
+            "CREATE INDEX autocompletekey_key_trgm_idx "
+            "ON activity_feed_autocompletekey USING gin (key gin_trgm_ops)"
+        )
+
+
+def drop_autocomplete_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute("DROP INDEX IF EXISTS autocompletekey_key_like_idx")
+        schema_editor.execute("DROP INDEX IF EXISTS autocompletekey_key_trgm_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("activity_feed", "0006_searchentry"),
+        ("contenttypes", "0002_remove_content_type_name"),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.CreateModel(
+            name="AutocompleteKey",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("object_id", models.PositiveIntegerField()),
+                ("key", models.CharField(max_length=255)),
+                (
+                    "content_type",
+                    auto_prefetch.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="contenttypes.contenttype",
+                    ),
+                ),
+            ],
+            options={
+                "abstract": False,
+                "base_manager_name": "prefetch_manager",
+            },
+            managers=[
+                ("objects", django.db.models.manager.Manager()),
+                ("prefetch_manager", django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.CreateModel(
+            name="AutocompleteGram",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("gram", models.CharField(max_length=3)),
+                (
+                    "key",
+                    auto_prefetch.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="grams",
+                        to="activity_feed.autocompletekey",
+                    ),
+                ),
+            ],
+            options={
+                "abstract": False,
+                "base_manager_name": "prefetch_manager",
+            },
+            managers=[
+                ("objects", django.db.models.manager.Manager()),
+                ("prefetch_manager", django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="autocompletekey",
+            index=models.Index(
+                fields=["content_type", "key"], name="activity_fe_content_de14a5_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="autocompletekey",
+            index=models.Index(
+                fields=["content_type", "object_id"],
+                name="activity_fe_content_b98b4f_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="autocompletegram",
+            index=models.Index(
+                fields=["gram", "key"], name="activity_fe_gram_2835d1_idx"
+            ),
+        ),
+        migrations.RunPython(create_autocomplete_indexes, drop_autocomplete_indexes),
+    ]
@@ -0,0 +1,142 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:25
+
+import auto_prefetch
+import django.db.models.deletion
+import django.db.models.manager
+from django.conf import settings
+from django.db import migrations, models
+
+CHECKIN_MODELS = {
+    ("read", "ReadCheckIn"): "read",
+    ("watch", "WatchCheckIn"): "watch",
+    ("listen", "ListenCheckIn"): "listen",
+    ("play", "PlayCheckIn"): "play",
+    ("visit", "VisitCheckIn"): "visit",
+}
+
+
+def populate_latest_checkins(apps, schema_editor):
+    # Same as `utils_checkin.rebuild_latest_checkins`, on the historical models
+    LatestCheckIn = apps.get_model("activity_feed", "LatestCheckIn")
+    for (app_label, model_name), domain in CHECKIN_MODELS.items():
+        checkins = (
+            apps.get_model(app_label, model_name)
+            .objects.filter(object_id__isnull=False)
+            .order_by("user_id", "content_type_id", "object_id", "-timestamp", "-id")
+            .values(
+                "user_id",
+                "content_type_id",
+                "object_id",
+                "id",
+                "status",
+                "progress",
+                "timestamp",
+            )
+        )
+        batch = []
+        previous = None
+        for checkin in checkins.iterator(chunk_size=1000):
+            key = (checkin["user_id"], checkin["content_type_id"], checkin["object_id"])
+            if key == previous:
+                continue
+            previous = key
+            batch.append(
+                LatestCheckIn(
+                    user_id=checkin["user_id"],
+                    domain=domain,
+                    content_type_id=checkin["content_type_id"],
+                    object_id=checkin["object_id"],
+                    checkin_id=checkin["id"],
+                    status=checkin["status"],
+                    progress=(
+                        None
+                        if checkin["progress"] is None
+                        else str(checkin["progress"])
+                    ),
+                    timestamp=checkin["timestamp"],
+                )
+            )
+            if len(batch) >= 1000:
+                LatestCheckIn.objects.bulk_create(batch)
+                batch = []
+        LatestCheckIn.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("activity_feed", "0007_autocomplete"),
+        ("contenttypes", "0002_remove_content_type_name"),
+        ("listen", "0015_required_js_flags"),
+        ("play", "0014_required_js_flags"),
+        ("read", "0018_required_js_flags"),
+        ("visit", "0018_required_js_flags"),
+        ("watch", "0029_required_js_flags"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LatestCheckIn",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "domain",
+                    models.CharField(
+                        choices=[
+                            ("read", "Read"),
+                            ("watch", "Watch"),
+                            ("listen", "Listen"),
+                            ("play", "Play"),
+                            ("visit", "Visit"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                ("object_id", models.PositiveIntegerField()),
+                ("checkin_id", models.PositiveIntegerField()),
+                ("status", models.CharField(max_length=255)),
+                ("progress", models.CharField(blank=True, max_length=20, null=True)),
+                ("timestamp", models.DateTimeField()),
+                (
+                    "content_type",
+                    auto_prefetch.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="contenttypes.contenttype",
+                    ),
+                ),
+                (
+                    "user",
+                    auto_prefetch.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="latest_checkins",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "abstract": False,
+                "base_manager_name": "prefetch_manager",
+                "indexes": [
+                    models.Index(
+                        fields=["content_type", "object_id", "domain"],
+                        name="activity_fe_content_6842de_idx",
+                    )
+                ],
+                "unique_together": {("user", "domain", "content_type", "object_id")},
+            },
+            managers=[
+                ("objects", django.db.models.manager.Manager()),
+                ("prefetch_manager", django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.RunPython(populate_latest_checkins, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,105 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:30
+
+import auto_prefetch
+import django.db.models.deletion
+import django.db.models.manager
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import Count
+
+CHECKIN_MODELS = (
+    ("read", "ReadCheckIn"),
+    ("watch", "WatchCheckIn"),
+    ("listen", "ListenCheckIn"),
+    ("play", "PlayCheckIn"),
+    ("visit", "VisitCheckIn"),
+)
+
+
+def populate_checkin_counts(apps, schema_editor):
+    # Same as `utils_checkin.reconcile_checkin_counts` on an empty table
+    CheckInCount = apps.get_model("activity_feed", "CheckInCount")
+    LatestCheckIn = apps.get_model("activity_feed", "LatestCheckIn")
+    counts = defaultdict(lambda: [0, 0])
+    users = LatestCheckIn.objects.values_list(
+        "content_type_id", "object_id", "status"
+    ).annotate(total=Count("id"))
+    for content_type_id, object_id, status, total in users.order_by():
+        counts[content_type_id, object_id, status][0] = total
+    for app_label, model_name in CHECKIN_MODELS:
+        checkins = (
+            apps.get_model(app_label, model_name)
+            .objects.filter(object_id__isnull=False)
+            .values_list("content_type_id", "object_id", "status")
+            .annotate(total=Count("id"))
+        )
+        for content_type_id, object_id, status, total in checkins.order_by():
+            counts[content_type_id, object_id, status][1] = total
+    CheckInCount.objects.bulk_create(
+        [
+            CheckInCount(
+                content_type_id=content_type_id,
+                object_id=object_id,
+                status=status,
+                users=users,
+                checkins=checkins,
+            )
+            for (content_type_id, object_id, status), (
+                users,
+                checkins,
+            ) in counts.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("activity_feed", "0008_latestcheckin"),
+        ("contenttypes", "0002_remove_content_type_name"),
+        ("listen", "0015_required_js_flags"),
+        ("play", "0014_required_js_flags"),
+        ("read", "0018_required_js_flags"),
+        ("visit", "0018_required_js_flags"),
+        ("watch", "0029_required_js_flags"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CheckInCount",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("object_id", models.PositiveIntegerField()),
+                ("status", models.CharField(max_length=255)),
+                ("users", models.IntegerField(default=0)),
+                ("checkins", models.IntegerField(default=0)),
+                (
+                    "content_type",
+                    auto_prefetch.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="contenttypes.contenttype",
+                    ),
+                ),
+            ],
+            options={
+                "abstract": False,
+                "base_manager_name": "prefetch_manager",
+                "unique_together": {("content_type", "object_id", "status")},
+            },
+            managers=[
+                ("objects", django.db.models.manager.Manager()),
+                ("prefetch_manager", django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.RunPython(populate_checkin_counts, migrations.RunPython.noop),
+    ]
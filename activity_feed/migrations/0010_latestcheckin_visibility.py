@@ -0,0 +1,87 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:26
+
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+
+CHECKIN_MODELS = {
+    ("read", "ReadCheckIn"): "read",
+    ("watch", "WatchCheckIn"): "watch",
+    ("listen", "ListenCheckIn"): "listen",
+    ("play", "PlayCheckIn"): "play",
+    ("visit", "VisitCheckIn"): "visit",
+}
+
+
+def count_public_checkins(apps, schema_editor):
+    # Copy the visibility of every latest check-in, then recount as
+    # `utils_checkin.reconcile_checkin_counts` does, from public check-ins
+    CheckInCount = apps.get_model("activity_feed", "CheckInCount")
+    LatestCheckIn = apps.get_model("activity_feed", "LatestCheckIn")
+    counts = defaultdict(lambda: [0, 0])
+    for (app_label, model_name), domain in CHECKIN_MODELS.items():
+        CheckInModel = apps.get_model(app_label, model_name)
+        LatestCheckIn.objects.filter(domain=domain).update(
+            visibility=Subquery(
+                CheckInModel.objects.filter(id=OuterRef("checkin_id")).values(
+                    "visibility"
+                )[:1]
+            )
+        )
+        checkins = (
+            CheckInModel.objects.filter(object_id__isnull=False, visibility="PU")
+            .values_list("content_type_id", "object_id", "status")
+            .annotate(total=Count("id"))
+        )
+        for content_type_id, object_id, status, total in checkins.order_by():
+            counts[content_type_id, object_id, status][1] = total
+    users = (
+        LatestCheckIn.objects.filter(visibility="PU")
+        .values_list("content_type_id", "object_id", "status")
+        .annotate(total=Count("id"))
+    )
+    for content_type_id, object_id, status, total in users.order_by():
+        counts[content_type_id, object_id, status][0] = total
+    CheckInCount.objects.all().delete()
+    CheckInCount.objects.bulk_create(
+        [
+            CheckInCount(
+                content_type_id=content_type_id,
+                object_id=object_id,
+                status=status,
+                users=users,
+                checkins=checkins,
+            )
+            for (content_type_id, object_id, status), (
+                users,
+                checkins,
+            ) in counts.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("activity_feed", "0009_checkincount"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="latestcheckin",
+            name="visibility",
+            field=models.CharField(
+                choices=[
+                    ("PU", "Public"),
+                    ("ME", "Mentioned"),
+                    ("FO", "Followers"),
+                    ("PR", "Private"),
+                ],
+                default="PU",
+                max_length=2,
+            ),
+        ),
+        migrations.RunPython(count_public_checkins, migrations.RunPython.noop),
+    ]
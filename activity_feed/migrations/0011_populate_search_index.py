@@ -0,0 +1,27 @@
+from django.db import migrations
+
+from activity_feed.utils_search import rebuild_search_index
+
+
+def populate_search_index(apps, schema_editor):
+    rebuild_search_index(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0018_customuser_privacy_level"),
+        ("activity_feed", "0010_latestcheckin_visibility"),
+        ("contenttypes", "0002_remove_content_type_name"),
+        ("entity", "0013_coveralbum_coverimage"),
+        ("listen", "0015_required_js_flags"),
+        ("play", "0014_required_js_flags"),
+        ("read", "0018_required_js_flags"),
+        ("visit", "0018_required_js_flags"),
+        ("watch", "0029_required_js_flags"),
+        ("write", "0022_renderedmarkdown_per_object"),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_search_index, migrations.RunPython.noop),
+    ]
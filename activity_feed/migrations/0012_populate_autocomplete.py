@@ -0,0 +1,25 @@
+from django.db import migrations
+
+from activity_feed.utils_autocomplete import rebuild_autocomplete_index
+
+
+def populate_autocomplete(apps, schema_editor):
+    rebuild_autocomplete_index(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("activity_feed", "0011_populate_search_index"),
+        ("contenttypes", "0002_remove_content_type_name"),
+        ("entity", "0013_coveralbum_coverimage"),
+        ("listen", "0015_required_js_flags"),
+        ("play", "0014_required_js_flags"),
+        ("read", "0018_required_js_flags"),
+        ("visit", "0018_required_js_flags"),
+        ("watch", "0029_required_js_flags"),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_autocomplete, migrations.RunPython.noop),
+    ]
@@ -10,7 +10,10 @@ from cryptography.hazmat.primitives.asymmetric import padding
 from django.conf import settings
 from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelation
 from django.contrib.contenttypes.models import ContentType
-from django.db import models
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
 from django.utils.safestring import mark_safe
 
 
@@ -92,3 +95,419 @@ class Block(auto_prefetch.Model):
 
     class Meta(auto_prefetch.Model.Meta):
         unique_together = ("blocker", "blocked")
+
+
+class TimelineEntry(auto_prefetch.Model):
+    """
+    One row per (recipient, activity) pair in a user's home timeline.
+    Rows are written when an activity is created or its audience changes,
+    so the home feed can be read with a single index range scan.
+    """
+
+    recipient = auto_prefetch.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name="timeline_entries",
+        on_delete=models.CASCADE,
+    )
+    activity = auto_prefetch.ForeignKey(
+        Activity, related_name="timeline_entries", on_delete=models.CASCADE
+    )
+    timestamp = models.DateTimeField()
+
+    class Meta(auto_prefetch.Model.Meta):
+        unique_together = ("recipient", "activity")
+        indexes = [
+            models.Index(
+                fields=["recipient", "-timestamp"], name="timeline_recipient_ts_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.activity} for {self.recipient}"
+
+
+# keep the home timeline in sync with activities and relationships
+@receiver(post_save, sender=Activity)
+def fan_out_activity(sender, instance, **kwargs):
+    from .utils_timeline import sync_activity_timeline
+
+    sync_activity_timeline(instance)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def sync_timeline_on_follow(sender, instance, **kwargs):
+    from .utils_timeline import sync_timeline_pair
+
+    # Deletes may be part of a user cascade, so wait for the commit
+    transaction.on_commit(
+        lambda: sync_timeline_pair(instance.follower_id, instance.followed_id)
+    )
+
+
+@receiver(post_save, sender=Block)
+@receiver(post_delete, sender=Block)
+def sync_timeline_on_block(sender, instance, **kwargs):
+    from .utils_timeline import sync_timeline_pair
+
+    transaction.on_commit(
+        lambda: sync_timeline_pair(instance.blocker_id, instance.blocked_id)
+    )
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def backfill_new_user_timeline(sender, instance, created, **kwargs):
+    if created and not kwargs.get("raw", False):
+        from .utils_timeline import rebuild_timeline
+
+        rebuild_timeline(instance)
+
+
+class Anniversary(auto_prefetch.Model):
+    """
+    Month/day index over the free-text dates of creators, books, movies,
+    series, releases and games, backing the "On this day" sidebar.
+    """
+
+    BORN = "born"
+    DIED = "died"
+    FORMED = "formed"
+    DISSOLVED = "dissolved"
+    PUBLISHED = "published"
+    RELEASED = "released"
+
+    KIND_CHOICES = [
+        (BORN, "Born"),
+        (DIED, "Died"),
+        (FORMED, "Formed"),
+        (DISSOLVED, "Dissolved"),
+        (PUBLISHED, "Published"),
+        (RELEASED, "Released"),
+    ]
+
+    content_type = auto_prefetch.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    content_object = GenericForeignKey("content_type", "object_id")
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    date = models.CharField(max_length=255)  # the original free-text date
+    year = models.IntegerField(null=True, blank=True)
+    month = models.PositiveSmallIntegerField()
+    day = models.PositiveSmallIntegerField()
+
+    class Meta(auto_prefetch.Model.Meta):
+        unique_together = ("content_type", "object_id", "kind")
+        indexes = [
+            models.Index(fields=["month", "day"], name="anniversary_month_day_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.content_object} {self.kind} {self.date}"
+
+
+# keep the anniversary index in sync with the dated entities
+@receiver(post_save, sender="entity.Creator")
+@receiver(post_save, sender="read.Book")
+@receiver(post_save, sender="watch.Series")
+@receiver(post_save, sender="listen.Release")
+def index_entity_anniversaries(sender, instance, **kwargs):
+    if kwargs.get("raw", False):
+        return
+    from .utils_anniversary import index_anniversaries
+
+    index_anniversaries(instance)
+
+
+@receiver(post_save, sender="watch.MovieReleaseDate")
+@receiver(post_delete, sender="watch.MovieReleaseDate")
+def index_movie_anniversaries(sender, instance, **kwargs):
+    from .utils_anniversary import reindex_anniversaries
+
+    # The movie may be going away in the same cascade
+    transaction.on_commit(
+        lambda: reindex_anniversaries("watch.Movie", instance.movie_id)
+    )
+
+
+@receiver(post_save, sender="play.GameReleaseDate")
+@receiver(post_delete, sender="play.GameReleaseDate")
+def index_game_anniversaries(sender, instance, **kwargs):
+    from .utils_anniversary import reindex_anniversaries
+
+    transaction.on_commit(lambda: reindex_anniversaries("play.Game", instance.game_id))
+
+
+@receiver(post_delete, sender="entity.Creator")
+@receiver(post_delete, sender="read.Book")
+@receiver(post_delete, sender="watch.Movie")
+@receiver(post_delete, sender="watch.Series")
+@receiver(post_delete, sender="listen.Release")
+@receiver(post_delete, sender="play.Game")
+def remove_entity_anniversaries(sender, instance, **kwargs):
+    Anniversary.objects.filter(
+        content_type=ContentType.objects.get_for_model(sender),
+        object_id=instance.pk,
+    ).delete()
+
+
+class SearchEntry(auto_prefetch.Model):
+    """
+    Full-text search document of an indexed object, see `utils_search`.
+    `title` holds its names, `body` its credits, identifiers and text.
+    PostgreSQL matches `vector` (GIN-indexed); SQLite matches an FTS5 table
+    that triggers keep in sync with this one.
+    """
+
+    content_type = auto_prefetch.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    content_object = GenericForeignKey("content_type", "object_id")
+
+    title = models.TextField(blank=True)
+    body = models.TextField(blank=True)
+    vector = SearchVectorField(null=True)
+
+    class Meta(auto_prefetch.Model.Meta):
+        unique_together = ("content_type", "object_id")
+
+    def __str__(self):
+        return self.title
+
+
+# keep the search index in sync with the indexed objects and their credits
+@receiver(pre_save, sender="entity.Creator")
+def remember_creator_names(sender, instance, raw=False, **kwargs):
+    # Their credits only need reindexing when the names change
+    if not raw and instance.pk is not None:
+        instance._saved_names = (
+            sender._base_manager.filter(pk=instance.pk)
+            .values_list("name", "other_names")
+            .first()
+        )
+
+
+@receiver(post_save)
+def index_search_entry(sender, instance, **kwargs):
+    if kwargs.get("raw", False):
+        return
+    from .utils_search import (
+        CREDIT_MODELS,
+        SEARCH_FIELDS,
+        get_credited,
+        reindex,
+        reindex_credits,
+    )
+
+    label = sender._meta.label
+    if label in SEARCH_FIELDS:
+        transaction.on_commit(lambda: reindex(label, [instance.pk]))
+    if label in CREDIT_MODELS:
+        credited = get_credited(instance)
+        transaction.on_commit(lambda: reindex(*credited))
+    if label == "entity.Creator":
+        # Their names are part of every work they are credited on; a new
+        # creator isn't credited on anything yet
+        saved_names = getattr(instance, "_saved_names", None)
+        if saved_names not in (None, (instance.name, instance.other_names)):
+            transaction.on_commit(lambda: reindex_credits(instance.pk))
+
+
+@receiver(post_delete)
+def remove_search_entry(sender, instance, **kwargs):
+    from .utils_search import CREDIT_MODELS, SEARCH_FIELDS, get_credited, reindex
+
+    label = sender._meta.label
+    if label in SEARCH_FIELDS:
+        SearchEntry.objects.filter(
+            content_type=ContentType.objects.get_for_model(sender),
+            object_id=instance.pk,
+        ).delete()
+    if label in CREDIT_MODELS:
+        # The credited object may be going away in the same cascade
+        credited = get_credited(instance)
+        transaction.on_commit(lambda: reindex(*credited))
+
+
+class AutocompleteKey(auto_prefetch.Model):
+    """
+    One normalized name of an object offered by an autocomplete view, see
+    `utils_autocomplete`. Prefixes match on the (content_type, key) index;
+    substrings on a trigram GIN index on PostgreSQL, on `AutocompleteGram`
+    elsewhere.
+    """
+
+    content_type = auto_prefetch.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    content_object = GenericForeignKey("content_type", "object_id")
+
+    key = models.CharField(max_length=255)
+
+    class Meta(auto_prefetch.Model.Meta):
+        indexes = [
+            models.Index(fields=["content_type", "key"]),
+            models.Index(fields=["content_type", "object_id"]),
+        ]
+
+    def __str__(self):
+        return self.key
+
+
+class AutocompleteGram(auto_prefetch.Model):
+    """A trigram of an `AutocompleteKey`, where pg_trgm is not available."""
+
+    key = auto_prefetch.ForeignKey(
+        AutocompleteKey, on_delete=models.CASCADE, related_name="grams"
+    )
+    gram = models.CharField(max_length=3)
+
+    class Meta(auto_prefetch.Model.Meta):
+        indexes = [models.Index(fields=["gram", "key"])]
+
+    def __str__(self):
+        return self.gram
+
+
+# keep the autocomplete keys in sync with the names they are made of
+@receiver(post_save)
+def index_autocomplete_keys(sender, instance, **kwargs):
+    if kwargs.get("raw", False):
+        return
+    from .utils_autocomplete import AUTOCOMPLETE_FIELDS, reindex
+
+    label = sender._meta.label
+    if label in AUTOCOMPLETE_FIELDS:
+        transaction.on_commit(lambda: reindex(label, [instance.pk]))
+
+
+@receiver(post_delete)
+def remove_autocomplete_keys(sender, instance, **kwargs):
+    from .utils_autocomplete import AUTOCOMPLETE_FIELDS
+
+    if sender._meta.label in AUTOCOMPLETE_FIELDS:
+        AutocompleteKey.objects.filter(
+            content_type=ContentType.objects.get_for_model(sender),
+            object_id=instance.pk,
+        ).delete()
+
+
+class LatestCheckIn(auto_prefetch.Model):
+    """
+    The latest check-in of a user on an item, per domain, see
+    `utils_checkin`. Kept up to date on every check-in save and delete, so
+    "where is everyone with this book" and "where am I with everything" are
+    index lookups rather than a correlated subquery per check-in.
+    """
+
+    READ = "read"
+    WATCH = "watch"
+    LISTEN = "listen"
+    PLAY = "play"
+    VISIT = "visit"
+
+    DOMAIN_CHOICES = [
+        (READ, "Read"),
+        (WATCH, "Watch"),
+        (LISTEN, "Listen"),
+        (PLAY, "Play"),
+        (VISIT, "Visit"),
+    ]
+
+    user = auto_prefetch.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="latest_checkins",
+    )
+    domain = models.CharField(max_length=10, choices=DOMAIN_CHOICES)
+    content_type = auto_prefetch.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    content_object = GenericForeignKey("content_type", "object_id")
+
+    checkin_id = models.PositiveIntegerField()
+    status = models.CharField(max_length=255)
+    progress = models.CharField(max_length=20, null=True, blank=True)
+    timestamp = models.DateTimeField()
+    visibility = models.CharField(
+        max_length=2,
+        choices=Activity.VISIBILITY_CHOICES,
+        default=Activity.VISIBILITY_PUBLIC,
+    )
+
+    class Meta(auto_prefetch.Model.Meta):
+        unique_together = ("user", "domain", "content_type", "object_id")
+        indexes = [
+            models.Index(fields=["content_type", "object_id", "domain"]),
+        ]
+
+    def __str__(self):
+        return f"{self.user} {self.status} {self.content_object}"
+
+
+class CheckInCount(auto_prefetch.Model):
+    """
+    Check-in counters of an item for one status, see `utils_checkin`: the
+    number of users whose latest check-in has `status`, and the number of
+    check-ins that have it, public check-ins only. Adjusted on every check-in
+    write; `reconcile_checkin_counts` fixes any drift.
+    """
+
+    content_type = auto_prefetch.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    content_object = GenericForeignKey("content_type", "object_id")
+
+    status = models.CharField(max_length=255)
+    users = models.IntegerField(default=0)
+    checkins = models.IntegerField(default=0)
+
+    class Meta(auto_prefetch.Model.Meta):
+        unique_together = ("content_type", "object_id", "status")
+
+    def __str__(self):
+        return f"{self.content_object} {self.status}: {self.users}"
+
+
+# keep the latest check-ins and the counters in sync with the check-ins, in
+# the same transaction
+@receiver(pre_save, sender="read.ReadCheckIn")
+@receiver(pre_save, sender="watch.WatchCheckIn")
+@receiver(pre_save, sender="listen.ListenCheckIn")
+@receiver(pre_save, sender="play.PlayCheckIn")
+@receiver(pre_save, sender="visit.VisitCheckIn")
+def remember_checkin_status(sender, instance, raw=False, **kwargs):
+    # The counters need to know which status and visibility an edit replaces
+    if not raw and instance.pk is not None:
+        instance._saved_status = (
+            sender._base_manager.filter(pk=instance.pk)
+            .values_list("status", "visibility")
+            .first()
+        )
+
+
+@receiver(post_save, sender="read.ReadCheckIn")
+@receiver(post_save, sender="watch.WatchCheckIn")
+@receiver(post_save, sender="listen.ListenCheckIn")
+@receiver(post_save, sender="play.PlayCheckIn")
+@receiver(post_save, sender="visit.VisitCheckIn")
+def track_saved_checkin(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    from .utils_checkin import record_saved_checkin
+
+    record_saved_checkin(instance, created)
+
+
+@receiver(post_delete, sender="read.ReadCheckIn")
+@receiver(post_delete, sender="watch.WatchCheckIn")
+@receiver(post_delete, sender="listen.ListenCheckIn")
+@receiver(post_delete, sender="play.PlayCheckIn")
+@receiver(post_delete, sender="visit.VisitCheckIn")
+def track_deleted_checkin(sender, instance, **kwargs):
+    from .utils_checkin import record_deleted_checkin
+
+    record_deleted_checkin(instance)
+
+
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL)
+def remove_user_from_checkin_counts(sender, instance, **kwargs):
+    # Their latest check-ins may be deleted before their check-ins are
+    from .utils_checkin import remove_user_counts
+
+    remove_user_counts(instance)
@@ -0,0 +1,147 @@
+import base64
+from datetime import datetime
+
+from django.db.models import F, Q
+from django.http import Http404, JsonResponse
+from django.template.loader import render_to_string
+
+from .utils_prefetch import prefetch_activities
+
+OLDER = "older"
+NEWER = "newer"
+
+
+def encode_cursor(timestamp, pk):
+    value = f"{timestamp.isoformat()}|{pk}"
+    return base64.urlsafe_b64encode(value.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Return the (timestamp, pk) position of a cursor, or raise ValueError."""
+    padded = cursor + "=" * (-len(cursor) % 4)
+    timestamp, pk = base64.urlsafe_b64decode(padded).decode().split("|")
+    return datetime.fromisoformat(timestamp), int(pk)
+
+
+class CursorPage:
+    """
+    A page of a keyset-paginated queryset. Unlike Django's `Page`, it knows
+    nothing about the total number of rows, only whether there is more data
+    on either side of it.
+    """
+
+    def __init__(self, object_list, older_cursor=None, newer_cursor=None):
+        self.object_list = object_list
+        self.older_cursor = older_cursor
+        self.newer_cursor = newer_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_older(self):
+        return self.older_cursor is not None
+
+    def has_newer(self):
+        return self.newer_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_older() or self.has_newer()
+
+
+def paginate_by_cursor(
+    queryset, cursor=None, direction=OLDER, per_page=20, timestamp_field="timestamp"
+):
+    """
+    Slice `queryset` by (timestamp, id) instead of by page number, so no
+    COUNT(*) is needed and every page costs the same regardless of depth.
+    """
+    position = decode_cursor(cursor) if cursor else None
+    queryset = queryset.annotate(cursor_timestamp=F(timestamp_field))
+
+    if direction == NEWER and position:
+        timestamp, pk = position
+        queryset = queryset.filter(
+            Q(**{f"{timestamp_field}__gt": timestamp})
+            | Q(**{timestamp_field: timestamp, "id__gt": pk})
+        ).order_by(timestamp_field, "id")
+    else:
+        if position:
+            timestamp, pk = position
+            queryset = queryset.filter(
+                Q(**{f"{timestamp_field}__lt": timestamp})
+                | Q(**{timestamp_field: timestamp, "id__lt": pk})
+            )
+        queryset = queryset.order_by(f"-{timestamp_field}", "-id")
+
+    object_list = list(queryset[: per_page + 1])
+    has_more = len(object_list) > per_page
+    object_list = object_list[:per_page]
+
+    if direction == NEWER and position:
+        object_list.reverse()
+        has_older, has_newer = True, has_more
+    else:
+        has_older, has_newer = has_more, position is not None
+
+    older_cursor = newer_cursor = None
+    if object_list and has_older:
+        last = object_list[-1]
+        older_cursor = encode_cursor(last.cursor_timestamp, last.pk)
+    if object_list and has_newer:
+        first = object_list[0]
+        newer_cursor = encode_cursor(first.cursor_timestamp, first.pk)
+
+    return CursorPage(object_list, older_cursor, newer_cursor)
+
+
+class CursorPaginationMixin:
+    """
+    ListView mixin replacing page-number pagination with (timestamp, id)
+    cursors. `?format=json` returns the rendered slice for infinite scroll.
+    Content objects of each page are loaded in bulk, see `prefetch_activities`.
+    """
+
+    cursor_timestamp_field = "timestamp"
+    slice_template_name = "activity_feed/activity_items.html"
+
+    def get_cursor_timestamp_field(self):
+        return self.cursor_timestamp_field
+
+    def paginate_queryset(self, queryset, page_size):
+        try:
+            page = paginate_by_cursor(
+                queryset,
+                cursor=self.request.GET.get("cursor"),
+                direction=self.request.GET.get("direction", OLDER),
+                per_page=page_size,
+                timestamp_field=self.get_cursor_timestamp_field(),
+            )
+        except ValueError:
+            raise Http404("Invalid cursor.")
+        prefetch_activities(page.object_list)
+        return (None, page, page.object_list, page.has_other_pages())
+
+    def get(self, request, *args, **kwargs):
+        if request.GET.get("format") != "json":
+            return super().get(request, *args, **kwargs)
+
+        _, page, _, _ = self.paginate_queryset(
+            self.get_queryset(), self.get_paginate_by(None)
+        )
+        html = render_to_string(
+            self.slice_template_name, {"page_obj": page}, request=request
+        )
+        return JsonResponse(
+            {
+                "html": html,
+                "count": len(page),
+                "older_cursor": page.older_cursor,
+                "newer_cursor": page.newer_cursor,
+            }
+        )
@@ -1,3 +1,885 @@
-from django.test import TestCase
+from datetime import date, datetime, timedelta
+import json
+import tempfile
+from importlib import import_module
+from io import StringIO
+from unittest.mock import patch
 
-# Create your tests here.
+import pytz
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import AppPassword, CustomUser
+from activity_feed.models import (
+    Activity,
+    Anniversary,
+    AutocompleteKey,
+    Block,
+    CheckInCount,
+    Follow,
+    LatestCheckIn,
+    SearchEntry,
+    TimelineEntry,
+)
+from activity_feed.pagination import paginate_by_cursor
+from activity_feed.utils_anniversary import (
+    get_cached_on_this_day,
+    get_on_this_day,
+    rebuild_anniversaries,
+)
+from activity_feed.utils_autocomplete import rank, rebuild_autocomplete_index
+from activity_feed.utils_cache import (
+    get_namespace_version,
+    get_version_key,
+    invalidate_namespace,
+)
+from activity_feed.utils_checkin import (
+    get_checkin_counts,
+    get_visible_latest_checkins,
+    rebuild_latest_checkins,
+    reconcile_checkin_counts,
+)
+from activity_feed.utils_prefetch import prefetch_activities
+from activity_feed.utils_search import rebuild_search_index, search
+from activity_feed.utils_timeline import check_timeline, rebuild_timeline
+from discover.models import Vote
+from entity.models import Creator, Role
+from notify.models import Notification, NotificationCounter
+from read.models import Book, BookInstance, BookRole, Instance, ReadCheckIn
+from visit.models import Location
+from watch.models import Movie, MovieReleaseDate
+from write.models import Pin, Repost, Say
+
+
+class TimelineTest(TestCase):
+    def setUp(self):
+        self.alice = CustomUser.objects.create_user(username="alice", password="pw")
+        self.bob = CustomUser.objects.create_user(username="bob", password="pw")
+
+    def timeline_ids(self, user):
+        return set(
+            TimelineEntry.objects.filter(recipient=user).values_list(
+                "activity_id", flat=True
+            )
+        )
+
+    def test_public_say_fans_out_to_everyone(self):
+        say = Say.objects.create(user=self.alice, content="hello")
+        activity_id = say.get_activity_id()
+        self.assertIn(activity_id, self.timeline_ids(self.alice))
+        self.assertIn(activity_id, self.timeline_ids(self.bob))
+        self.assertEqual(check_timeline(self.bob), (set(), set()))
+
+    def test_followers_only_say_follows_relationship(self):
+        say = Say.objects.create(user=self.alice, content="hi", visibility="FO")
+        activity_id = say.get_activity_id()
+        self.assertNotIn(activity_id, self.timeline_ids(self.bob))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            follow = Follow.objects.create(follower=self.bob, followed=self.alice)
+        self.assertIn(activity_id, self.timeline_ids(self.bob))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            follow.delete()
+        self.assertNotIn(activity_id, self.timeline_ids(self.bob))
+        self.assertEqual(check_timeline(self.bob), (set(), set()))
+
+    def test_block_removes_and_unblock_restores(self):
+        say = Say.objects.create(user=self.alice, content="hey")
+        activity_id = say.get_activity_id()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            block = Block.objects.create(blocker=self.bob, blocked=self.alice)
+        self.assertNotIn(activity_id, self.timeline_ids(self.bob))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            block.delete()
+        self.assertIn(activity_id, self.timeline_ids(self.bob))
+
+    def test_rebuild_matches_reference_query(self):
+        Say.objects.create(user=self.alice, content="one", visibility="PR")
+        Say.objects.create(user=self.alice, content="two")
+        TimelineEntry.objects.all().delete()
+
+        rebuild_timeline(self.bob)
+        self.assertEqual(check_timeline(self.bob), (set(), set()))
+        self.assertEqual(len(self.timeline_ids(self.bob)), 1)
+
+    def test_check_command(self):
+        Say.objects.create(user=self.alice, content="one")
+        TimelineEntry.objects.filter(recipient=self.bob).delete()
+        with self.assertRaisesMessage(CommandError, "1 timeline(s) out of sync."):
+            call_command("check_timeline", stdout=StringIO())
+
+        stdout = StringIO()
+        call_command("check_timeline", fix=True, stdout=stdout)
+        self.assertIn("1 timeline(s) rebuilt.", stdout.getvalue())
+        self.assertNotIn("consistent", stdout.getvalue())
+        stdout = StringIO()
+        call_command("check_timeline", stdout=stdout)
+        self.assertIn("Timelines are consistent.", stdout.getvalue())
+
+
+class CursorPaginationTest(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="carol", password="pw")
+        for i in range(25):
+            Say.objects.create(user=self.user, content=f"say {i}")
+        self.activities = list(
+            Activity.objects.filter(user=self.user).order_by("-timestamp", "-id")
+        )
+
+    def test_older_and_newer_pages(self):
+        first = paginate_by_cursor(Activity.objects.all(), per_page=20)
+        self.assertEqual(list(first), self.activities[:20])
+        self.assertFalse(first.has_newer())
+
+        second = paginate_by_cursor(
+            Activity.objects.all(), cursor=first.older_cursor, per_page=20
+        )
+        self.assertEqual(list(second), self.activities[20:])
+        self.assertFalse(second.has_older())
+
+        back = paginate_by_cursor(
+            Activity.objects.all(),
+            cursor=second.newer_cursor,
+            direction="newer",
+            per_page=20,
+        )
+        self.assertEqual(list(back), self.activities[:20])
+
+    def test_json_slice(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("activity_feed:activity_feed"))
+        older_cursor = response.context["page_obj"].older_cursor
+
+        response = self.client.get(
+            reverse("activity_feed:activity_feed"),
+            {"format": "json", "cursor": older_cursor},
+        )
+        data = response.json()
+        self.assertEqual(data["count"], 5)
+        self.assertIsNone(data["older_cursor"])
+
+    def test_invalid_cursor_is_404(self):
+        self.client.force_login(self.user)
+        response = self.client.get(
+            reverse("activity_feed:activity_feed"), {"cursor": "garbage"}
+        )
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(ACTIVITY_TIMELINE_ENABLED=True)
+    def test_timeline_feed_pages(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("activity_feed:activity_feed"))
+        page = response.context["page_obj"]
+        self.assertEqual(list(page), self.activities[:20])
+
+        response = self.client.get(
+            reverse("activity_feed:activity_feed"), {"cursor": page.older_cursor}
+        )
+        self.assertEqual(list(response.context["page_obj"]), self.activities[20:])
+
+
+class PrefetchActivitiesTest(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="dave", password="pw")
+        self.other = CustomUser.objects.create_user(username="erin", password="pw")
+
+    def add_items(self):
+        say = Say.objects.create(user=self.other, content="hello")
+        Pin.objects.create(
+            user=self.other, title="pin", url="https://example.com", content="pin"
+        )
+        Repost.objects.create(
+            user=self.user,
+            original_activity=Activity.objects.get(id=say.get_activity_id()),
+            content_object=say,
+            content="look",
+        )
+        book = Book(title="book")
+        book.save()
+        checkin = ReadCheckIn.objects.create(
+            user=self.other,
+            content_object=book,
+            status="reading",
+            content="reading",
+            share_to_feed=True,
+        )
+        Vote.objects.create(user=self.other, content_object=book, value=Vote.UPVOTE)
+        Vote.objects.create(user=self.user, content_object=checkin, value=Vote.UPVOTE)
+
+    def count_feed_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("activity_feed:activity_feed"))
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_page(self):
+        self.client.force_login(self.user)
+        self.add_items()
+        self.count_feed_queries()  # warm the "On this day" cache
+        baseline = self.count_feed_queries()
+        for _ in range(3):
+            self.add_items()
+        self.assertEqual(self.count_feed_queries(), baseline)
+
+    def test_upvotes_are_attached(self):
+        self.add_items()
+        activities = prefetch_activities(Activity.objects.order_by("-timestamp"))
+        checkin = next(
+            a.content_object
+            for a in activities
+            if isinstance(a.content_object, ReadCheckIn)
+        )
+        with self.assertNumQueries(0):
+            self.assertTrue(checkin.has_voted)
+
+
+class OnThisDayTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.creator = Creator.objects.create(
+            name="Ada", birth_date="1950.06.10", death_date="2000-01-02"
+        )
+        self.movie = Movie(title="Film")
+        self.movie.save()
+        MovieReleaseDate.objects.create(movie=self.movie, release_date="1999-06-10")
+
+    def test_entities_are_indexed_on_save(self):
+        self.assertEqual(
+            set(
+                Anniversary.objects.filter(object_id=self.creator.id).values_list(
+                    "kind", "month", "day"
+                )
+            ),
+            {(Anniversary.BORN, 6, 10), (Anniversary.DIED, 1, 2)},
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            MovieReleaseDate.objects.create(
+                movie=self.movie, release_date="1998-03-04"
+            )
+        context = get_on_this_day(date(2024, 3, 4))
+        self.assertEqual(context["movies_released_today"], [self.movie])
+        self.assertEqual(context["movies_released_today"][0].since, 26)
+
+    def test_on_this_day(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            MovieReleaseDate.objects.create(
+                movie=self.movie, release_date="1999-06-10"
+            )
+        context = get_on_this_day(date(2024, 6, 10))
+        self.assertEqual(context["born_today"], [self.creator])
+        self.assertEqual(context["born_today"][0].since, 74)
+        self.assertEqual(context["movies_released_today"], [self.movie])
+        self.assertEqual(context["died_today"], [])
+
+    def test_rebuild_and_cache(self):
+        Anniversary.objects.all().delete()
+        self.assertEqual(rebuild_anniversaries(), 3)
+
+        now = pytz.timezone("Asia/Tokyo").localize(datetime(2024, 6, 10, 23, 0))
+        context = get_cached_on_this_day(now.date(), now)
+        self.assertEqual(context["born_today"], [self.creator])
+        with self.assertNumQueries(0):
+            get_cached_on_this_day(now.date(), now)
+
+        # The command only drops the sidebars
+        cache.set("unrelated", 1)
+        self.creator.delete()
+        call_command("rebuild_anniversaries", stdout=StringIO())
+        self.assertEqual(get_cached_on_this_day(now.date(), now)["born_today"], [])
+        self.assertEqual(cache.get("unrelated"), 1)
+
+    def test_calendar_view_uses_selected_date(self):
+        user = CustomUser.objects.create_user(username="frank", password="pw")
+        self.client.force_login(user)
+        response = self.client.get(
+            reverse("activity_feed:calendar_activity_feed", args=["2024-06-10"])
+        )
+        self.assertEqual(response.context["born_today"], [self.creator])
+        self.assertEqual(response.context["selected_date"], "2024-06-10")
+
+
+class CacheNamespaceTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def get(self):
+        return cache.get("sidebar", version=get_namespace_version("sidebars"))
+
+    def test_evicted_version_starts_over(self):
+        cache.set("sidebar", "old", version=get_namespace_version("sidebars"))
+        invalidate_namespace("sidebars")
+        self.assertIsNone(self.get())
+        cache.set("sidebar", "stale", version=get_namespace_version("sidebars"))
+
+        cache.delete(get_version_key("sidebars"))
+        self.assertIsNone(self.get())
+        cache.delete(get_version_key("sidebars"))
+        invalidate_namespace("sidebars")
+        self.assertIsNone(self.get())
+
+
+class GenerateDatasetTest(TestCase):
+    def generate(self, seed=0):
+        call_command(
+            "generate_dataset",
+            scale=0.02,
+            users=30,
+            seed=seed,
+            stdout=StringIO(),
+        )
+
+    def test_generates_consistent_data(self):
+        self.generate()
+        self.assertEqual(CustomUser.objects.count(), 30)
+        self.assertTrue(Follow.objects.exists())
+        self.assertTrue(ReadCheckIn.objects.exists())
+        self.assertTrue(Vote.objects.exists())
+        # Every shared item has its activity, as `save()` would have made
+        self.assertEqual(
+            Activity.objects.filter(activity_type="say").count(),
+            Say.objects.count(),
+        )
+        self.assertEqual(
+            Activity.objects.filter(activity_type="repost").count(),
+            Repost.objects.count(),
+        )
+        say = Say.objects.filter(visibility="PU").first()
+        self.assertIn(say.user, say.visible_to.all())
+        # Generated timestamps are kept, not replaced by the time of writing
+        self.assertLess(
+            Say.objects.order_by("timestamp").first().timestamp,
+            timezone.now() - timedelta(days=1),
+        )
+        # Every book belongs to the instance it was generated from
+        self.assertFalse(
+            BookInstance.objects.exclude(book__title=F("instance__title")).exists()
+        )
+        self.assertFalse(Instance.objects.filter(bookinstance=None).exists())
+        self.assertEqual(
+            Notification.objects.filter(notification_type="follow").count(),
+            Follow.objects.count(),
+        )
+        self.assertEqual(
+            NotificationCounter.objects.filter(unread__gt=0).count(),
+            Notification.objects.filter(read=False)
+            .values("recipient")
+            .distinct()
+            .count(),
+        )
+
+        self.client.force_login(Follow.objects.first().follower)
+        response = self.client.get(reverse("activity_feed:activity_feed"))
+        self.assertEqual(response.status_code, 200)
+
+    def test_seed_is_reproducible(self):
+        self.generate(seed=1)
+        first = list(Say.objects.order_by("id").values_list("content", flat=True))
+        Say.objects.all().delete()
+        CustomUser.objects.all().delete()
+        self.generate(seed=1)
+        second = list(Say.objects.order_by("id").values_list("content", flat=True))
+        self.assertEqual(first, second)
+
+
+class BenchTest(TestCase):
+    def setUp(self):
+        call_command(
+            "generate_dataset",
+            scale=0.01,
+            users=10,
+            checkin_items_per_user=3,
+            says_per_user=3,
+            votes_per_user=3,
+            seed=2,
+            stdout=StringIO(),
+        )
+
+    def bench(self, **options):
+        stdout = StringIO()
+        call_command(
+            "bench", iterations=2, stdout=stdout, stderr=StringIO(), **options
+        )
+        return json.loads(stdout.getvalue())
+
+    def test_scenarios_and_baseline(self):
+        allowed_hosts = list(settings.ALLOWED_HOSTS)
+        results = self.bench()
+        # Nothing is left behind
+        self.assertFalse(AppPassword.objects.exists())
+        self.assertEqual(settings.ALLOWED_HOSTS, allowed_hosts)
+        self.assertIn("feed_page_50", results)
+        self.assertIn("api_isbn", results)
+        for result in results.values():
+            self.assertEqual(result["status"], 200)
+            self.assertLessEqual(result["p50_ms"], result["p99_ms"])
+            self.assertGreater(result["queries"], 0)
+
+        with tempfile.NamedTemporaryFile("w", suffix=".json") as baseline:
+            json.dump(results, baseline)
+            baseline.flush()
+            results = self.bench(
+                scenario=["rss"], baseline=baseline.name, threshold=100
+            )
+            self.assertEqual(results["rss"]["change"]["queries"], 0)
+
+            faster = {"rss": {**results["rss"], "p50_ms": 0.001}}
+            baseline.seek(0)
+            baseline.truncate()
+            json.dump(faster, baseline)
+            baseline.flush()
+            with self.assertRaisesMessage(CommandError, "rss p50_ms"):
+                self.bench(scenario=["rss"], baseline=baseline.name)
+
+
+class SearchIndexTest(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="reader", password="pw")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.creator = Creator.objects.create(name="Ursula Le Guin")
+            self.book = self.create_book(
+                title="The Left Hand of Darkness", isbn_13="9780441478125"
+            )
+            self.role = BookRole.objects.create(book=self.book, creator=self.creator)
+            # Only matches "darkness" in its body, which ranks lower
+            self.other = self.create_book(title="Essays", asin="darkness")
+
+    def create_book(self, **fields):
+        # `Book.save()` saves twice, which `objects.create()` refuses
+        book = Book(**fields)
+        book.save()
+        return book
+
+    def search_books(self, *terms):
+        return search(terms, [Book])[Book]
+
+    def test_indexed_on_save(self):
+        self.assertEqual(self.search_books("le guin"), [self.book.id])
+        self.assertEqual(self.search_books("9780441478125"), [self.book.id])
+        self.assertEqual(self.search_books("left hand"), [self.book.id])
+        self.assertEqual(self.search_books("hand of"), [self.book.id])
+        self.assertEqual(self.search_books("dark"), [self.book.id, self.other.id])
+        self.assertEqual(self.search_books("nothing"), [])
+        self.assertEqual(self.search_books("!"), [])
+
+    def test_folded(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            creator = Creator.objects.create(name="村上春樹")
+            book = self.create_book(title="Dvořák in Łódź")
+            BookRole.objects.create(book=book, creator=creator)
+        self.assertEqual(self.search_books("dvorak", "lodz"), [book.id])
+        self.assertEqual(self.search_books("ＤＶＯŘÁＫ"), [book.id])
+        # Every CJK character is a word, so part of a name matches
+        self.assertEqual(self.search_books("春樹"), [book.id])
+        self.assertEqual(self.search_books("樹春"), [])
+
+    def test_credits_follow_creator(self):
+        # Nothing to reindex when the names didn't change
+        with patch("activity_feed.utils_search.reindex_credits") as reindex_credits:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.creator.save()
+        reindex_credits.assert_not_called()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.creator.name = "Ursula K. Le Guin"
+            self.creator.save()
+        self.assertEqual(self.search_books("ursula k"), [self.book.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.role.delete()
+        self.assertEqual(self.search_books("ursula"), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book.delete()
+        self.assertEqual(self.search_books("left"), [])
+        self.assertFalse(SearchEntry.objects.filter(object_id=self.book.id).exists())
+
+    def test_restricted_to_queryset(self):
+        # The hidden best match doesn't take the place of the visible one
+        visible = Book.objects.exclude(pk=self.book.pk)
+        self.assertEqual(search(["darkness"], [visible], 1)[Book], [self.other.id])
+        self.assertEqual(search(["le guin"], [visible])[Book], [])
+
+    def test_rebuild(self):
+        SearchEntry.objects.all().delete()
+        self.assertEqual(self.search_books("darkness"), [])
+        # The creator, the two books and the user
+        self.assertEqual(rebuild_search_index(), 4)
+        self.assertEqual(len(self.search_books("darkness")), 2)
+
+        SearchEntry.objects.all().delete()
+        stdout = StringIO()
+        call_command("rebuild_search_index", stdout=stdout)
+        self.assertIn("4 search entries indexed.", stdout.getvalue())
+
+    def test_filled_on_migrate(self):
+        SearchEntry.objects.all().delete()
+        migration = import_module("activity_feed.migrations.0011_populate_search_index")
+        state = MigrationExecutor(connection).loader.project_state(
+            ("activity_feed", "0011_populate_search_index")
+        )
+        migration.populate_search_index(state.apps, None)
+        self.assertEqual(SearchEntry.objects.count(), 4)
+        self.assertEqual(self.search_books("le guin"), [self.book.id])
+
+    def test_search_view(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("search"), {"q": "darkness"})
+        self.assertEqual(
+            list(response.context["book_results"]), [self.book, self.other]
+        )
+        self.assertFalse(response.context["sections"]["book"]["has_more"])
+
+    def test_search_sections(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for n in range(23):
+                self.create_book(title=f"Darkness {n}")
+        self.client.force_login(self.user)
+
+        # The first page only shows the top hits of every section
+        response = self.client.get(reverse("search"), {"q": "darkness"})
+        self.assertEqual(len(response.context["book_results"]), 5)
+        section = response.context["sections"]["book"]
+        self.assertEqual(section["count"], 25)
+        self.assertTrue(section["has_more"])
+        self.assertContains(response, section["url"].replace("&", "&amp;"))
+
+        response = self.client.get(section["url"])
+        self.assertEqual(response.context["count"], 25)
+        # Cut off only when there are more visible hits than shown
+        with patch("accounts.views.SEARCH_SECTION_LIMIT", 25):
+            self.assertEqual(self.client.get(section["url"]).context["count"], 25)
+        with patch("accounts.views.SEARCH_SECTION_LIMIT", 24):
+            self.assertEqual(self.client.get(section["url"]).context["count"], "24+")
+        self.assertEqual(len(response.context["results"]), 20)
+        response = self.client.get(section["url"] + "&page=2")
+        self.assertEqual(len(response.context["results"]), 5)
+        # Ranked last, as the only one that matches in its body
+        self.assertEqual(response.context["results"][-1], self.other)
+
+        url = reverse("search_section", args=["nothing"])
+        self.assertEqual(self.client.get(url, {"q": "darkness"}).status_code, 404)
+        self.client.logout()
+        url = reverse("search_section", args=["post"])
+        response = self.client.get(url, {"q": "darkness", "model": "self"})
+        self.assertEqual(response.status_code, 404)
+
+
+class AutocompleteTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(username="editor", password="pw")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.creators = {
+                name: Creator.objects.create(name=name, other_names=other_names)
+                for name, other_names in [
+                    ("Joanna Smith", None),
+                    ("Hanna", None),
+                    ("Annabel Lee", None),
+                    ("Anna", None),
+                    ("Lev Tolstoy", "Leo Tolstoy / Anna Karenina's author"),
+                ]
+            }
+            author = Role.objects.create(name="Author", domain="read")
+            self.book = Book(title="A Wizard of Earthsea", publication_date="1968")
+            self.book.save()
+            BookRole.objects.create(
+                book=self.book, creator=self.creators["Hanna"], role=author
+            )
+
+    def names(self, query):
+        ranked = rank(Creator.objects.all(), query)
+        names = dict(Creator.objects.filter(pk__in=ranked).values_list("pk", "name"))
+        return [names[pk] for pk in ranked]
+
+    def test_ranking(self):
+        # Exact, then prefix, then substring matches, shortest first
+        self.assertEqual(
+            self.names("anna"),
+            ["Anna", "Annabel Lee", "Lev Tolstoy", "Hanna", "Joanna Smith"],
+        )
+        # Too short to match inside a name
+        self.assertEqual(self.names("an"), ["Anna", "Annabel Lee", "Lev Tolstoy"])
+        self.assertEqual(self.names(" ＡＮＮＡ  "), self.names("anna"))
+        self.assertEqual(self.names("leo tol"), ["Lev Tolstoy"])
+        self.assertEqual(self.names("tolstoy's"), [])
+        self.assertEqual(self.names(""), [])
+
+    def test_folded(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Creator.objects.create(
+                name="Antonín Dvořák", other_names="Антонин Дворжак / ドヴォルザーク"
+            )
+        for query in ("dvorak", "DVOŘÁK", "антонин", "ﾄﾞｳﾞｫ", "ドヴォル"):
+            self.assertEqual(self.names(query), ["Antonín Dvořák"])
+        self.assertEqual(self.names("トヴ"), [])
+
+    def test_keys_follow_names(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            creator = self.creators["Anna"]
+            creator.name = "Anne"
+            creator.save()
+        cache.clear()
+        self.assertNotIn("Anne", self.names("anna"))
+        self.assertEqual(self.names("anne"), ["Anne"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            creator.delete()
+        self.assertFalse(AutocompleteKey.objects.filter(key="anne").exists())
+
+    def test_cached(self):
+        self.names("anna")
+        with self.assertNumQueries(0):
+            rank(Creator.objects.all(), "Anna")
+
+    def test_rebuild(self):
+        total = AutocompleteKey.objects.count()
+        AutocompleteKey.objects.all().delete()
+        cache.clear()
+        self.assertEqual(self.names("anna"), [])
+        self.assertEqual(rebuild_autocomplete_index(), total)
+
+        AutocompleteKey.objects.all().delete()
+        cache.set("unrelated", 1)
+        stdout = StringIO()
+        call_command("rebuild_autocomplete_index", stdout=stdout)
+        self.assertIn(f"{total} autocomplete keys indexed.", stdout.getvalue())
+        # The cached empty matches are dropped, and only those
+        self.assertEqual(self.names("anna")[0], "Anna")
+        self.assertEqual(cache.get("unrelated"), 1)
+
+    def test_filled_on_migrate(self):
+        total = AutocompleteKey.objects.count()
+        AutocompleteKey.objects.all().delete()
+        migration = import_module("activity_feed.migrations.0012_populate_autocomplete")
+        state = MigrationExecutor(connection).loader.project_state(
+            ("activity_feed", "0012_populate_autocomplete")
+        )
+        migration.populate_autocomplete(state.apps, None)
+        self.assertEqual(AutocompleteKey.objects.count(), total)
+        self.assertEqual(self.names("olsto"), ["Lev Tolstoy"])
+
+    def test_views(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("entity:creator-autocomplete"), {"q": "ann"})
+        self.assertEqual(
+            [result["text"] for result in response.json()["results"]][:2],
+            ["Anna (? - )", "Annabel Lee (? - )"],
+        )
+
+        # Books are offered under their authors' names too
+        for query in ("wizard", "earthsea", "hanna", "1968"):
+            response = self.client.get(reverse("read:book-autocomplete"), {"q": query})
+            self.assertEqual(
+                response.json()["results"][0]["text"],
+                "A Wizard of Earthsea (Hanna - 1968)",
+            )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Location.objects.create(
+                name="Zürich", other_names="Zurich / 苏黎世", level=Location.LEVEL1
+            )
+        for query in ("zurich", "苏黎世"):
+            response = self.client.get(
+                reverse("visit:location-autocomplete"), {"q": query}
+            )
+            self.assertEqual(len(response.json()["results"]), 1)
+
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse("read:book-autocomplete"), {"q": "hanna"})
+        with self.captureOnCommitCallbacks(execute=True):
+            for n in range(5):
+                book = Book(title=f"Hanna {n}")
+                book.save()
+                BookRole.objects.create(book=book, creator=self.creators["Hanna"])
+        cache.clear()
+        with self.assertNumQueries(len(queries)):
+            self.client.get(reverse("read:book-autocomplete"), {"q": "hanna"})
+
+
+class LatestCheckInTest(TestCase):
+    def setUp(self):
+        self.reader = CustomUser.objects.create_user(username="reader", password="pw")
+        self.viewer = CustomUser.objects.create_user(username="viewer", password="pw")
+        self.book = Book(title="Middlemarch")
+        self.book.save()
+        self.book_type = ContentType.objects.get_for_model(Book)
+
+    def check_in(self, status, user=None, **fields):
+        return ReadCheckIn.objects.create(
+            user=user or self.reader,
+            content_object=self.book,
+            status=status,
+            content=status,
+            **fields,
+        )
+
+    def latest(self):
+        return LatestCheckIn.objects.get(user=self.reader)
+
+    def test_follows_checkins(self):
+        first = self.check_in("to_read")
+        self.assertEqual(self.latest().checkin_id, first.id)
+        second = self.check_in("reading", progress="12")
+        latest = self.latest()
+        self.assertEqual(
+            (latest.domain, latest.checkin_id, latest.status, latest.progress),
+            (LatestCheckIn.READ, second.id, "reading", "12"),
+        )
+
+        second.delete()
+        self.assertEqual(self.latest().checkin_id, first.id)
+        first.delete()
+        self.assertFalse(LatestCheckIn.objects.exists())
+
+    def test_visibility(self):
+        self.check_in("to_read")
+        latest = self.check_in("reading", visibility="PR")
+        for user in (self.reader, self.viewer):
+            checkins = get_visible_latest_checkins(
+                user, ReadCheckIn, checkin_user=self.reader
+            )
+            # Hidden from others, not replaced by the older check-in
+            self.assertEqual(list(checkins), [latest] if user == self.reader else [])
+
+        self.client.force_login(self.reader)
+        response = self.client.get(reverse("read:book_detail", args=[self.book.id]))
+        self.assertEqual(response.context["reading_count"], 1)
+        self.assertEqual(response.context["to_read_count"], 0)
+
+    def test_rebuild(self):
+        self.check_in("to_read")
+        self.check_in("reading")
+        rows = list(LatestCheckIn.objects.values_list("checkin_id", "status"))
+        LatestCheckIn.objects.all().delete()
+        self.assertEqual(rebuild_latest_checkins(), 1)
+        self.assertEqual(
+            list(LatestCheckIn.objects.values_list("checkin_id", "status")), rows
+        )
+
+        stdout = StringIO()
+        call_command("rebuild_latest_checkins", stdout=stdout)
+        self.assertIn("1 latest check-ins indexed.", stdout.getvalue())
+
+    def counts(self, user=None):
+        counts = get_checkin_counts(
+            user or AnonymousUser(), ReadCheckIn, self.book_type, self.book.id
+        )
+        return (
+            {status: users for status, users in counts["users"].items() if users},
+            counts["checkins"],
+            counts["unique_users"],
+        )
+
+    def test_counts_follow_checkins(self):
+        self.check_in("to_read")
+        reading = self.check_in("reading")
+        self.assertEqual(self.counts(), ({"reading": 1}, 2, 1))
+
+        reading.status = "finished_reading"
+        reading.save()
+        self.check_in("to_read", user=self.viewer)
+        self.assertEqual(self.counts(), ({"finished_reading": 1, "to_read": 1}, 3, 2))
+        self.assertEqual(CheckInCount.objects.get(status="to_read").checkins, 2)
+
+        reading.delete()
+        self.assertEqual(self.counts(), ({"to_read": 2}, 2, 2))
+        self.viewer.delete()
+        self.assertEqual(self.counts(), ({"to_read": 1}, 1, 1))
+
+    def test_counts_hide_private_checkins(self):
+        stranger = CustomUser.objects.create_user(username="stranger", password="pw")
+        self.check_in("to_read")
+        private = self.check_in("reading", visibility="PR")
+        self.check_in("to_read", user=self.viewer, visibility="ME")
+        self.assertEqual(self.counts(), ({}, 1, 0))
+        self.assertEqual(self.counts(stranger), ({}, 1, 0))
+        self.assertEqual(self.counts(self.viewer), ({"to_read": 1}, 2, 1))
+        self.assertEqual(self.counts(self.reader), ({"reading": 1}, 2, 1))
+
+        response = self.client.get(reverse("read:book_detail", args=[self.book.id]))
+        self.assertEqual(
+            (response.context["to_read_count"], response.context["reading_count"]),
+            (0, 0),
+        )
+        self.assertEqual(reconcile_checkin_counts(), 0)
+
+        private.visibility = "PU"
+        private.save()
+        self.assertEqual(self.counts(), ({"reading": 1}, 2, 1))
+        private.delete()
+        self.assertEqual(self.counts(), ({"to_read": 1}, 1, 1))
+
+    def test_reconcile(self):
+        self.check_in("to_read")
+        self.check_in("reading")
+        expected = self.counts()
+        CheckInCount.objects.filter(status="reading").update(users=5)
+        CheckInCount.objects.filter(status="to_read").delete()
+        CheckInCount.objects.create(
+            content_type=self.book_type, object_id=self.book.id, status="abandoned"
+        )
+        self.assertEqual(reconcile_checkin_counts(), 3)
+        self.assertEqual(self.counts(), expected)
+
+        stdout = StringIO()
+        call_command("reconcile_checkin_counts", stdout=stdout)
+        self.assertIn("0 check-in counters fixed.", stdout.getvalue())
+
+    def test_user_list(self):
+        url = reverse("write:read_checkin_user_list", args=[self.reader.username])
+        self.check_in("to_read")
+        self.check_in("reading")
+        book = Book(title="Daniel Deronda")
+        book.save()
+        ReadCheckIn.objects.create(
+            user=self.reader, content_object=book, status="finished_reading", content="x"
+        )
+        ReadCheckIn.objects.filter(object_id=book.id).update(
+            timestamp=datetime(2020, 3, 1, 12, tzinfo=pytz.utc)
+        )
+        now = datetime.now(pytz.timezone("Europe/Berlin"))
+
+        response = self.client.get(url)
+        self.assertEqual(response.context["status_stats"], {"Read": 1, "Reading": 1})
+        self.assertEqual(
+            response.context["months_by_year"], {2020: [3], now.year: [now.month]}
+        )
+        self.assertEqual(response.context["years"], [2020, now.year])
+        self.assertEqual(
+            [checkin.checkin_count for checkin in response.context["checkins"]],
+            [1, 0],
+        )
+
+        # Facets keep every month, statistics follow the selected one
+        response = self.client.get(url + "?year=2020")
+        self.assertEqual(response.context["status_stats"], {"Read": 1})
+        self.assertEqual(len(response.context["months_by_year"]), 2)
+        self.assertEqual(len(response.context["checkins"]), 1)
+
+        # Enrichment runs on the page, whatever the number of check-ins
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        for n in range(30):
+            book = Book(title=f"Romola {n}")
+            book.save()
+            ReadCheckIn.objects.create(
+                user=self.reader, content_object=book, status="reading", content="x"
+            )
+        with self.assertNumQueries(len(queries)):
+            response = self.client.get(url)
+        self.assertEqual(len(response.context["checkins"]), 25)
@@ -0,0 +1,208 @@
+import re
+from datetime import datetime, time, timedelta
+
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db.models import Min
+
+from .models import Anniversary
+from .utils_cache import get_namespace_version, invalidate_namespace
+
+# Free-text dates look like "2001-05-06", "2001.05.06" or "1990?-05-06"
+MONTH_DAY_PATTERN = re.compile(r"([.-])(\d{2})\1(\d{2})")
+
+ANNIVERSARY_MODELS = (
+    "entity.Creator",
+    "read.Book",
+    "watch.Movie",
+    "watch.Series",
+    "listen.Release",
+    "play.Game",
+)
+
+BATCH_SIZE = 1000
+
+# Namespace of the cached sidebars, see `utils_cache`
+ON_THIS_DAY_CACHE = "on_this_day"
+
+
+###########
+# helpers #
+###########
+
+
+def parse_anniversary_date(date):
+    """
+    Return (year, month, day) for a free-text date, or None if it has no
+    month and day. The year is None when it is unknown, e.g. "19??".
+    """
+    if not date:
+        return None
+    match = MONTH_DAY_PATTERN.search(date)
+    if not match:
+        return None
+    month, day = int(match.group(2)), int(match.group(3))
+    if not (1 <= month <= 12 and 1 <= day <= 31):
+        return None
+    year_part = date.split("-" if "-" in date else ".")[0]
+    year = int(year_part) if year_part.isdigit() else None
+    return year, month, day
+
+
+def get_anniversary_dates(obj):
+    """The (kind, free-text date) pairs an entity is remembered for."""
+    model_label = obj._meta.label
+    if model_label == "entity.Creator":
+        if obj.creator_type == "group":
+            return [
+                (Anniversary.FORMED, obj.birth_date),
+                (Anniversary.DISSOLVED, obj.death_date),
+            ]
+        return [(Anniversary.BORN, obj.birth_date), (Anniversary.DIED, obj.death_date)]
+    if model_label == "read.Book":
+        return [(Anniversary.PUBLISHED, obj.publication_date)]
+    if model_label in ("watch.Movie", "play.Game"):
+        # Movies and games are remembered by their earliest regional release
+        earliest = getattr(obj, "earliest_release", None)
+        if earliest is None:
+            earliest = obj.region_release_dates.aggregate(Min("release_date"))[
+                "release_date__min"
+            ]
+        return [(Anniversary.RELEASED, earliest)]
+    return [(Anniversary.RELEASED, obj.release_date)]
+
+
+def build_anniversaries(obj, content_type=None):
+    content_type = content_type or ContentType.objects.get_for_model(obj)
+    anniversaries = []
+    for kind, date in get_anniversary_dates(obj):
+        parsed = parse_anniversary_date(date)
+        if parsed is None:
+            continue
+        year, month, day = parsed
+        anniversaries.append(
+            Anniversary(
+                content_type=content_type,
+                object_id=obj.pk,
+                kind=kind,
+                date=date,
+                year=year,
+                month=month,
+                day=day,
+            )
+        )
+    return anniversaries
+
+
+def index_anniversaries(obj):
+    """Rewrite the anniversary rows of a single entity."""
+    content_type = ContentType.objects.get_for_model(obj)
+    Anniversary.objects.filter(content_type=content_type, object_id=obj.pk).delete()
+    Anniversary.objects.bulk_create(build_anniversaries(obj, content_type))
+
+
+def reindex_anniversaries(model_label, pk):
+    obj = apps.get_model(model_label).objects.filter(pk=pk).first()
+    if obj is not None:
+        index_anniversaries(obj)
+
+
+def rebuild_anniversaries():
+    """Recompute the whole anniversary index. Returns the number of rows."""
+    Anniversary.objects.all().delete()
+    total = 0
+    for model_label in ANNIVERSARY_MODELS:
+        model = apps.get_model(model_label)
+        content_type = ContentType.objects.get_for_model(model)
+        queryset = model.objects.all()
+        if model_label in ("watch.Movie", "play.Game"):
+            queryset = queryset.annotate(
+                earliest_release=Min("region_release_dates__release_date")
+            )
+
+        batch = []
+        for obj in queryset.iterator(chunk_size=BATCH_SIZE):
+            batch.extend(build_anniversaries(obj, content_type))
+            if len(batch) >= BATCH_SIZE:
+                Anniversary.objects.bulk_create(batch)
+                total += len(batch)
+                batch = []
+        Anniversary.objects.bulk_create(batch)
+        total += len(batch)
+    return total
+
+
+###############
+# on this day #
+###############
+
+
+def get_on_this_day(date):
+    """
+    Context for the "On this day" sidebar: everything remembered on the
+    month and day of `date`, with `since` set to the years passed.
+    """
+    context = {
+        "born_today": [],
+        "died_today": [],
+        "formed_today": [],
+        "dissolved_today": [],
+        "books_published_today": [],
+        "movies_released_today": [],
+        "series_released_today": [],
+        "music_released_today": [],
+        "games_released_today": [],
+    }
+    released_keys = {
+        "movie": "movies_released_today",
+        "series": "series_released_today",
+        "release": "music_released_today",
+        "game": "games_released_today",
+    }
+
+    anniversaries = (
+        Anniversary.objects.filter(month=date.month, day=date.day)
+        .select_related("content_type")
+        .prefetch_related("content_object")
+        .order_by("date", "object_id")
+    )
+    for anniversary in anniversaries:
+        obj = anniversary.content_object
+        if obj is None:
+            continue
+        obj.since = "?" if anniversary.year is None else date.year - anniversary.year
+        if anniversary.kind == Anniversary.RELEASED:
+            obj.earliest_release = anniversary.date
+            key = released_keys[anniversary.content_type.model]
+        elif anniversary.kind == Anniversary.PUBLISHED:
+            key = "books_published_today"
+        else:
+            key = f"{anniversary.kind}_today"
+        context[key].append(obj)
+    return context
+
+
+def invalidate_on_this_day():
+    """Drop the cached sidebars of every date."""
+    invalidate_namespace(ON_THIS_DAY_CACHE)
+
+
+def get_cached_on_this_day(date, now):
+    """
+    `get_on_this_day` for `date`, cached until the next midnight in the
+    timezone of `now` (the viewer's local time).
+    """
+    cache_key = f"{ON_THIS_DAY_CACHE}:{date.isoformat()}"
+    version = get_namespace_version(ON_THIS_DAY_CACHE)
+    context = cache.get(cache_key, version=version)
+    if context is None:
+        context = get_on_this_day(date)
+        midnight = datetime.combine(now.date() + timedelta(days=1), time.min)
+        if hasattr(now.tzinfo, "localize"):
+            midnight = now.tzinfo.localize(midnight)
+        else:
+            midnight = midnight.replace(tzinfo=now.tzinfo)
+        timeout = max(int((midnight - now).total_seconds()), 1)
+        cache.set(cache_key, context, timeout, version=version)
+    return context
@@ -0,0 +1,257 @@
+"""
+Autocomplete index.
+
+Every name of the objects listed in `AUTOCOMPLETE_FIELDS` is stored once,
+folded (see `utils_text`), as an `AutocompleteKey`; names listed together
+get one key each. A query matches the keys it is a
+prefix of, and from `MIN_SUBSTRING` characters on, the keys it is part of:
+
+- PostgreSQL: a `varchar_pattern_ops` index for prefixes and a pg_trgm GIN
+  index for substrings.
+- Other databases: a range scan on the (content_type, key) index for
+  prefixes; for substrings, the keys that have every trigram of the query,
+  as listed in `AutocompleteGram`.
+
+Results are ranked exact, then prefix, then substring matches, shortest key
+first, and cached for a little while, since editors type the same prefixes
+over and over.
+"""
+
+import hashlib
+
+from django.apps import apps as django_apps
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Case, Count, IntegerField, Min, Q, Value, When
+from django.db.models.functions import Length
+
+from .models import AutocompleteGram, AutocompleteKey
+from .utils_cache import get_namespace_version, invalidate_namespace
+from .utils_search import in_rank_order
+from .utils_text import fold
+
+# Lookups whose values are offered per model
+AUTOCOMPLETE_FIELDS = {
+    "entity.Creator": ("name", "other_names"),
+    "entity.Company": ("name", "other_names"),
+    "entity.Role": ("name",),
+    "read.Work": ("title", "publication_date"),
+    "read.Instance": ("title", "publication_date"),
+    "read.Book": ("title", "publication_date"),
+    "listen.Work": ("title", "other_titles", "release_date"),
+    "listen.Track": ("title", "other_titles", "release_date"),
+    "listen.Release": ("title", "other_titles", "release_date"),
+    "watch.Movie": ("title", "other_titles"),
+    "watch.Series": ("title", "other_titles"),
+    "play.Work": ("title", "other_titles"),
+    "play.Game": ("title", "other_titles"),
+    "visit.Location": ("name", "other_names"),
+}
+
+# Lookups holding several names separated by slashes
+SPLIT_FIELDS = ("other_names", "other_titles")
+
+# Objects also offered under the names of their creators: (credit model,
+# lookup from the credit to the object's pk, name of the role)
+CREDITED_FIELDS = {
+    "read.Work": ("read.WorkRole", "work_id", "Author"),
+    "read.Instance": ("read.InstanceRole", "instance_id", "Author"),
+    "read.Book": ("read.BookRole", "book_id", "Author"),
+    "listen.Work": ("listen.WorkRole", "work_id", "Singer"),
+    "listen.Track": ("listen.TrackRole", "track_id", "Singer"),
+    "listen.Release": ("listen.ReleaseRole", "release_id", "Performer"),
+}
+
+# Best matches returned per query
+AUTOCOMPLETE_LIMIT = 50
+
+# Shorter queries only match prefixes, a trigram index can't help them
+MIN_SUBSTRING = 3
+
+AUTOCOMPLETE_CACHE_TIMEOUT = 60
+
+# Namespace of the cached matches, see `utils_cache`
+AUTOCOMPLETE_CACHE = "autocomplete"
+
+BATCH_SIZE = 1000
+
+EXACT, PREFIX, SUBSTRING = range(3)
+
+
+###########
+# helpers #
+###########
+
+
+def normalize(text):
+    """Folded `text`, cut to the length of a key."""
+    return fold(text)[: AutocompleteKey._meta.get_field("key").max_length]
+
+
+def get_grams(key):
+    return {key[i : i + 3] for i in range(len(key) - 2)}
+
+
+def build_keys(model, pks, apps=django_apps):
+    """Unsaved keys of the given objects, from one query per lookup."""
+    ContentType = apps.get_model("contenttypes", "ContentType")
+    AutocompleteKey = apps.get_model("activity_feed", "AutocompleteKey")
+    content_type = ContentType.objects.get_for_model(model)
+    queryset = model._base_manager.filter(pk__in=pks)
+    keys = {}
+    for field in AUTOCOMPLETE_FIELDS[model._meta.label]:
+        for pk, value in queryset.values_list("pk", field):
+            names = str(value).split("/") if field in SPLIT_FIELDS else [value]
+            for name in names:
+                key = normalize(name) if name else ""
+                if key:
+                    keys[pk, key] = AutocompleteKey(
+                        content_type=content_type, object_id=pk, key=key
+                    )
+    return list(keys.values())
+
+
+def index_objects(model, pks, apps=django_apps):
+    """
+    Rewrite the keys of the given objects of `model`. Also runs in
+    migrations, on the historical models of their `apps`.
+    """
+    ContentType = apps.get_model("contenttypes", "ContentType")
+    AutocompleteKey = apps.get_model("activity_feed", "AutocompleteKey")
+    AutocompleteGram = apps.get_model("activity_feed", "AutocompleteGram")
+    content_type = ContentType.objects.get_for_model(model)
+    AutocompleteKey.objects.filter(
+        content_type=content_type, object_id__in=pks
+    ).delete()
+    keys = AutocompleteKey.objects.bulk_create(build_keys(model, pks, apps))
+    if connection.vendor != "postgresql":
+        AutocompleteGram.objects.bulk_create(
+            [
+                AutocompleteGram(key=key, gram=gram)
+                for key in keys
+                for gram in get_grams(key.key)
+            ],
+            batch_size=BATCH_SIZE,
+        )
+
+
+def reindex(model_label, pks):
+    pks = [pk for pk in pks if pk is not None]
+    if pks:
+        index_objects(django_apps.get_model(model_label), pks)
+
+
+def rebuild_autocomplete_index(apps=django_apps):
+    """Recompute every autocomplete key. Returns the number of keys."""
+    AutocompleteKey = apps.get_model("activity_feed", "AutocompleteKey")
+    AutocompleteGram = apps.get_model("activity_feed", "AutocompleteGram")
+    AutocompleteGram.objects.all().delete()
+    AutocompleteKey.objects.all().delete()
+    for model_label in AUTOCOMPLETE_FIELDS:
+        model = apps.get_model(model_label)
+        pks = model._base_manager.order_by("pk").values_list("pk", flat=True)
+        for start in range(0, len(pks), BATCH_SIZE):
+            index_objects(model, pks[start : start + BATCH_SIZE], apps)
+    return AutocompleteKey.objects.count()
+
+
+def get_match_filter(query):
+    if connection.vendor == "postgresql":
+        # LIKE 'query%' on the varchar_pattern_ops index
+        match = Q(key__startswith=query)
+    else:
+        # Keys are normalized, so a binary range holds every prefix match
+        match = Q(key__gte=query, key__lt=query + chr(0x10FFFF))
+
+    if len(query) < MIN_SUBSTRING:
+        return match
+    if connection.vendor == "postgresql":
+        # LIKE '%query%' on the pg_trgm index
+        return match | Q(key__contains=query)
+    grams = get_grams(query)
+    candidates = (
+        AutocompleteGram.objects.filter(gram__in=grams)
+        .values("key_id")
+        .annotate(grams=Count("gram", distinct=True))
+        .filter(grams=len(grams))
+        .values("key_id")
+    )
+    return match | Q(pk__in=candidates, key__contains=query)
+
+
+def get_matches(queryset, query, limit):
+    """{pk: (rank, key length)} of the best `limit` matches in `queryset`."""
+    keys = AutocompleteKey.objects.filter(
+        content_type=ContentType.objects.get_for_model(queryset.model)
+    )
+    if queryset.query.where:
+        keys = keys.filter(object_id__in=queryset.values("pk"))
+    matches = (
+        keys.filter(get_match_filter(query))
+        .values("object_id")
+        .annotate(
+            rank=Min(
+                Case(
+                    When(key=query, then=Value(EXACT)),
+                    When(key__startswith=query, then=Value(PREFIX)),
+                    default=Value(SUBSTRING),
+                    output_field=IntegerField(),
+                )
+            ),
+            length=Min(Length("key")),
+        )
+        .order_by("rank", "length", "object_id")[:limit]
+    )
+    return {match["object_id"]: (match["rank"], match["length"]) for match in matches}
+
+
+def get_credited_matches(model_label, query, limit):
+    """{pk: (rank, key length)} of the objects credited to matching creators."""
+    credit_label, lookup, role_name = CREDITED_FIELDS[model_label]
+    creators = get_matches(
+        django_apps.get_model("entity.Creator").objects.all(), query, limit
+    )
+    matches = {}
+    credits = (
+        django_apps.get_model(credit_label)
+        .objects.filter(role__name=role_name, creator_id__in=list(creators))
+        .values_list(lookup, "creator_id")
+    )
+    for pk, creator_id in credits:
+        matches[pk] = min(matches.get(pk, creators[creator_id]), creators[creator_id])
+    return matches
+
+
+def invalidate_autocomplete():
+    """Drop the cached matches of every query."""
+    invalidate_namespace(AUTOCOMPLETE_CACHE)
+
+
+def rank(queryset, query, limit=AUTOCOMPLETE_LIMIT):
+    """Pks of the best `limit` matches of `query` in `queryset`, best first."""
+    query = normalize(query)
+    if not query:
+        return []
+    cache_key = (
+        f"{AUTOCOMPLETE_CACHE}:"
+        + hashlib.md5(f"{queryset.query}|{query}|{limit}".encode()).hexdigest()
+    )
+    version = get_namespace_version(AUTOCOMPLETE_CACHE)
+    pks = cache.get(cache_key, version=version)
+    if pks is not None:
+        return pks
+
+    matches = get_matches(queryset, query, limit)
+    model_label = queryset.model._meta.label
+    if model_label in CREDITED_FIELDS:
+        for pk, match in get_credited_matches(model_label, query, limit).items():
+            matches[pk] = min(matches.get(pk, match), match)
+    pks = sorted(matches, key=lambda pk: (*matches[pk], pk))[:limit]
+    cache.set(cache_key, pks, AUTOCOMPLETE_CACHE_TIMEOUT, version=version)
+    return pks
+
+
+def filter_autocomplete(queryset, query, limit=AUTOCOMPLETE_LIMIT):
+    """`queryset` restricted to the best matches of `query`, best first."""
+    return in_rank_order(queryset, rank(queryset, query, limit))
@@ -0,0 +1,213 @@
+"""
+In-process endpoint benchmarks.
+
+Every scenario is a URL on a seeded database (see `generate_dataset`),
+requested with the test client: no network, no web server, just the
+middleware, views, queries and templates. Results are plain dicts so they
+can be written as JSON and compared with an earlier run.
+"""
+
+import gc
+import time
+import tracemalloc
+from ipaddress import IPv4Address
+from itertools import count
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from accounts.models import AppPassword
+from config.metrics import percentile
+from read.models import Book, BookRole, ReadCheckIn
+from write.models import Tag
+
+User = get_user_model()
+
+# Pages walked through to reach the "deep" feed page
+FEED_DEEP_PAGE = 50
+
+# Metrics compared with a baseline; for all of them lower is better
+COMPARED_METRICS = ("p50_ms", "p95_ms", "p99_ms", "queries", "peak_memory_kb")
+
+
+###########
+# helpers #
+###########
+
+
+class Scenario:
+    # Every request comes from its own address, so views behind a per-IP
+    # rate limit still count the request but never refuse it
+    addresses = (str(IPv4Address("10.0.0.0") + n) for n in count(1))
+
+    def __init__(self, name, url, client, headers=None):
+        self.name = name
+        self.url = url
+        self.client = client
+        self.headers = headers or {}
+
+    def request(self):
+        return self.client.get(
+            self.url, headers=self.headers, REMOTE_ADDR=next(self.addresses)
+        )
+
+
+def reset_rate_limits(client):
+    # Search refuses a second query within two seconds of the last one
+    session = client.session
+    if session.pop("last_search_time", None) is not None:
+        session.save()
+
+
+def get_feed_cursor(client, page):
+    """The cursor of feed page `page`, or of the deepest page there is."""
+    cursor = None
+    url = reverse("activity_feed:activity_feed")
+    for _ in range(page - 1):
+        params = {"format": "json"}
+        if cursor:
+            params["cursor"] = cursor
+        older_cursor = client.get(url, params).json()["older_cursor"]
+        if older_cursor is None:
+            break
+        cursor = older_cursor
+    return cursor
+
+
+def get_scenarios():
+    """
+    Pick the busiest objects of the seeded database, so the scenarios show
+    the worst cases a real page would hit. Creates an app password for the
+    API: run it in a transaction that is rolled back.
+    """
+    viewer = User.objects.annotate(follows=Count("following")).order_by(
+        "-follows", "id"
+    )[0]
+    author = (
+        User.objects.filter(privacy_level="public")
+        .annotate(activities=Count("activity"))
+        .order_by("-activities", "id")[0]
+    )
+    book_id = (
+        ReadCheckIn.objects.filter(content_type=ContentType.objects.get_for_model(Book))
+        .values("object_id")
+        .annotate(checkins=Count("id"))
+        .order_by("-checkins", "object_id")[0]["object_id"]
+    )
+    book = Book.objects.get(id=book_id)
+    creator_id = (
+        BookRole.objects.filter(book=book).values_list("creator_id", flat=True).first()
+    )
+    tag = Tag.objects.annotate(says=Count("say")).order_by("-says", "id")[0]
+    app_password, _ = AppPassword.objects.get_or_create(user=viewer, name="bench")
+
+    client = Client()
+    client.force_login(viewer)
+    anonymous = Client()
+    feed_url = reverse("activity_feed:activity_feed")
+    deep_cursor = get_feed_cursor(client, FEED_DEEP_PAGE)
+
+    scenarios = [
+        Scenario("feed", feed_url, client),
+        Scenario(
+            f"feed_page_{FEED_DEEP_PAGE}",
+            f"{feed_url}?cursor={deep_cursor}" if deep_cursor else feed_url,
+            client,
+        ),
+        Scenario("book", reverse("read:book_detail", args=[book.id]), client),
+        Scenario("profile", reverse("accounts:detail", args=[author.username]), client),
+        Scenario("search", f"{reverse('search')}?q={tag.name}", client),
+        Scenario("tag", reverse("write:tag_list", args=[tag.name]), client),
+        Scenario("discover_trending", reverse("discover:all"), client),
+        Scenario(
+            "rss",
+            reverse("accounts:user_activity_feed", args=[author.username]),
+            anonymous,
+        ),
+    ]
+    if creator_id:
+        scenarios.insert(
+            3,
+            Scenario(
+                "creator", reverse("entity:creator_detail", args=[creator_id]), client
+            ),
+        )
+    if book.isbn_13:
+        scenarios.append(
+            Scenario(
+                "api_isbn",
+                f"/api/v1/books/isbn13/{book.isbn_13}/",
+                anonymous,
+                headers={"X-App-Password": app_password.token},
+            )
+        )
+    return scenarios
+
+
+def run_scenario(scenario, iterations=20, warmup=2):
+    """Latency percentiles, queries and peak Python memory of one scenario."""
+    for _ in range(warmup):
+        reset_rate_limits(scenario.client)
+        scenario.request()
+
+    durations = []
+    queries = []
+    status_code = None
+    for _ in range(iterations):
+        reset_rate_limits(scenario.client)
+        gc.collect()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = scenario.request()
+            durations.append((time.perf_counter() - started) * 1000)
+        queries.append(len(captured))
+        status_code = response.status_code
+
+    # Measured apart, tracing slows every allocation down
+    reset_rate_limits(scenario.client)
+    tracemalloc.start()
+    try:
+        scenario.request()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    durations.sort()
+    return {
+        "url": scenario.url,
+        "status": status_code,
+        "iterations": iterations,
+        "p50_ms": round(percentile(durations, 0.50), 2),
+        "p95_ms": round(percentile(durations, 0.95), 2),
+        "p99_ms": round(percentile(durations, 0.99), 2),
+        "queries": max(queries),
+        "peak_memory_kb": round(peak / 1024),
+    }
+
+
+def compare(results, baseline, threshold=0.1):
+    """
+    Add the change against `baseline` to every result, and return the
+    (scenario, metric) pairs that got worse by more than `threshold`.
+    """
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        changes = {}
+        for metric in COMPARED_METRICS:
+            before, after = previous.get(metric), result[metric]
+            if not before:
+                continue
+            change = (after - before) / before
+            changes[metric] = round(change, 3)
+            if change > threshold:
+                regressions.append((name, metric))
+        result["change"] = changes
+    return regressions
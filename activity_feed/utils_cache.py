@@ -0,0 +1,36 @@
+"""
+Namespaces of cache keys that can be dropped at once.
+
+The keys of a namespace are stored under its current version (the `version`
+argument of the cache API); moving on to the next version makes them all
+unreachable, leaving them to expire, without touching any other key.
+
+A version key that is missing, never set or evicted, starts over from the
+current time in nanoseconds, which no live entry can be stored under.
+"""
+
+import time
+
+from django.core.cache import cache
+
+
+def get_version_key(namespace):
+    return f"{namespace}:version"
+
+
+def get_namespace_version(namespace):
+    version_key = get_version_key(namespace)
+    version = cache.get(version_key)
+    if version is None:
+        version = time.time_ns()
+        # Another process may have started one in the meantime
+        if not cache.add(version_key, version, None):
+            version = cache.get(version_key, version)
+    return version
+
+
+def invalidate_namespace(namespace):
+    try:
+        cache.incr(get_version_key(namespace))
+    except ValueError:
+        cache.set(get_version_key(namespace), time.time_ns(), None)
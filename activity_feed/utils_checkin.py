@@ -0,0 +1,366 @@
+"""
+Latest check-ins and check-in counters.
+
+`LatestCheckIn` holds, per domain, the latest check-in of every user on
+every item they checked in to. Pages listing the current state of users or
+items look it up instead of comparing every check-in with the latest
+timestamp of its (user, item).
+
+An item whose latest check-in the viewer may not see is left out: it is
+not replaced by an older, visible check-in.
+
+`CheckInCount` holds, per item and status, how many users are at that
+status and how many check-ins have it, counting public check-ins only.
+Every check-in write adds its difference to the counters;
+`reconcile_checkin_counts` recounts them. `get_checkin_counts` adds the
+private check-ins a viewer may see.
+"""
+
+from collections import Counter, defaultdict
+
+from django.apps import apps
+from django.db.models import Count, Exists, F, OuterRef
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+from write.utils import get_visible_checkins
+
+from .models import Activity, CheckInCount, LatestCheckIn
+
+# Domain of every check-in model
+CHECKIN_MODELS = {
+    "read.ReadCheckIn": LatestCheckIn.READ,
+    "watch.WatchCheckIn": LatestCheckIn.WATCH,
+    "listen.ListenCheckIn": LatestCheckIn.LISTEN,
+    "play.PlayCheckIn": LatestCheckIn.PLAY,
+    "visit.VisitCheckIn": LatestCheckIn.VISIT,
+}
+
+BATCH_SIZE = 1000
+
+LATEST_FIELDS = ("id", "status", "progress", "timestamp", "visibility")
+
+PUBLIC = Activity.VISIBILITY_PUBLIC
+
+
+###########
+# helpers #
+###########
+
+
+def get_latest_fields(checkin):
+    """Fields of a `LatestCheckIn`, from the values of its check-in."""
+    return {
+        "checkin_id": checkin["id"],
+        "status": checkin["status"],
+        # Play and visit check-ins count progress in integers
+        "progress": None if checkin["progress"] is None else str(checkin["progress"]),
+        "timestamp": checkin["timestamp"],
+        "visibility": checkin["visibility"],
+    }
+
+
+def refresh_latest_checkin(checkin):
+    """
+    Recompute the row of the (user, item) of a saved or deleted check-in.
+    Returns the user's public status on the item before and after, None
+    where there is none or the latest check-in is not public.
+    """
+    domain = CHECKIN_MODELS[checkin._meta.label]
+    key = {
+        "user_id": checkin.user_id,
+        "content_type_id": checkin.content_type_id,
+        "object_id": checkin.object_id,
+    }
+    previous = (
+        LatestCheckIn.objects.filter(domain=domain, **key, visibility=PUBLIC)
+        .values_list("status", flat=True)
+        .first()
+    )
+    latest = (
+        type(checkin)
+        .objects.filter(**key)
+        .order_by("-timestamp", "-id")
+        .values(*LATEST_FIELDS)
+        .first()
+    )
+    if latest is None:
+        LatestCheckIn.objects.filter(domain=domain, **key).delete()
+        return previous, None
+    LatestCheckIn.objects.update_or_create(
+        domain=domain, **key, defaults=get_latest_fields(latest)
+    )
+    return previous, latest["status"] if latest["visibility"] == PUBLIC else None
+
+
+def update_counts(content_type_id, object_id, users, checkins):
+    """Add the {status: difference} of `users` and `checkins` to an item."""
+    for status in users.keys() | checkins.keys():
+        if not (users[status] or checkins[status]):
+            continue
+        counter, _ = CheckInCount.objects.get_or_create(
+            content_type_id=content_type_id, object_id=object_id, status=status
+        )
+        # In SQL, so concurrent check-ins don't overwrite each other
+        CheckInCount.objects.filter(pk=counter.pk).update(
+            users=F("users") + users[status],
+            checkins=F("checkins") + checkins[status],
+        )
+
+
+def get_moved_users(previous, current):
+    """{status: difference} of a user moving from one status to another."""
+    users = Counter()
+    if previous != current:
+        if previous is not None:
+            users[previous] -= 1
+        if current is not None:
+            users[current] += 1
+    return users
+
+
+def record_saved_checkin(checkin, created):
+    if checkin.object_id is None:
+        return
+    checkins = Counter()
+    if not created:
+        saved_status, saved_visibility = getattr(
+            checkin, "_saved_status", (checkin.status, checkin.visibility)
+        )
+        if saved_visibility == PUBLIC:
+            checkins[saved_status] -= 1
+    if checkin.visibility == PUBLIC:
+        checkins[checkin.status] += 1
+    users = get_moved_users(*refresh_latest_checkin(checkin))
+    update_counts(checkin.content_type_id, checkin.object_id, users, checkins)
+
+
+def record_deleted_checkin(checkin):
+    if checkin.object_id is None:
+        return
+    users = get_moved_users(*refresh_latest_checkin(checkin))
+    checkins = Counter({checkin.status: -1 if checkin.visibility == PUBLIC else 0})
+    update_counts(checkin.content_type_id, checkin.object_id, users, checkins)
+
+
+def remove_user_counts(user):
+    """Take a user who is about to be deleted out of the user counters."""
+    CheckInCount.objects.filter(
+        Exists(
+            LatestCheckIn.objects.filter(
+                user=user,
+                content_type=OuterRef("content_type"),
+                object_id=OuterRef("object_id"),
+                status=OuterRef("status"),
+                visibility=PUBLIC,
+            )
+        )
+    ).update(users=F("users") - 1)
+    # Their check-ins go away next, with nothing left to move
+    LatestCheckIn.objects.filter(user=user).delete()
+
+
+def rebuild_latest_checkins():
+    """Recompute every latest check-in. Returns the number of rows."""
+    LatestCheckIn.objects.all().delete()
+    total = 0
+    for model_label, domain in CHECKIN_MODELS.items():
+        checkins = (
+            apps.get_model(model_label)
+            .objects.filter(object_id__isnull=False)
+            .order_by("user_id", "content_type_id", "object_id", "-timestamp", "-id")
+            .values("user_id", "content_type_id", "object_id", *LATEST_FIELDS)
+        )
+        batch = []
+        previous = None
+        for checkin in checkins.iterator(chunk_size=BATCH_SIZE):
+            key = (checkin["user_id"], checkin["content_type_id"], checkin["object_id"])
+            if key == previous:
+                continue
+            previous = key
+            batch.append(
+                LatestCheckIn(
+                    user_id=checkin["user_id"],
+                    domain=domain,
+                    content_type_id=checkin["content_type_id"],
+                    object_id=checkin["object_id"],
+                    **get_latest_fields(checkin),
+                )
+            )
+            if len(batch) >= BATCH_SIZE:
+                LatestCheckIn.objects.bulk_create(batch)
+                total += len(batch)
+                batch = []
+        LatestCheckIn.objects.bulk_create(batch)
+        total += len(batch)
+    return total
+
+
+def get_visible_latest_checkins(
+    request_user, CheckInModel, content_type=None, object_id=None, checkin_user=None
+):
+    """
+    The latest check-ins that `request_user` can see, narrowed to an item,
+    a user or both as in `get_visible_checkins`.
+    """
+    latest = LatestCheckIn.objects.filter(
+        domain=CHECKIN_MODELS[CheckInModel._meta.label]
+    )
+    if checkin_user is not None:
+        latest = latest.filter(user=checkin_user)
+    if content_type is not None and object_id is not None:
+        latest = latest.filter(content_type=content_type, object_id=object_id)
+    return get_visible_checkins(
+        request_user, CheckInModel, content_type, object_id, checkin_user
+    ).filter(id__in=latest.values("checkin_id"))
+
+
+def count_checkins():
+    """
+    {(content_type_id, object_id, status): [users, check-ins]} of every item,
+    from its public check-ins.
+    """
+    counts = defaultdict(lambda: [0, 0])
+    users = (
+        LatestCheckIn.objects.filter(visibility=PUBLIC)
+        .values_list("content_type_id", "object_id", "status")
+        .annotate(total=Count("id"))
+    )
+    for content_type_id, object_id, status, total in users.order_by():
+        counts[content_type_id, object_id, status][0] = total
+    for model_label in CHECKIN_MODELS:
+        checkins = (
+            apps.get_model(model_label)
+            .objects.filter(object_id__isnull=False, visibility=PUBLIC)
+            .values_list("content_type_id", "object_id", "status")
+            .annotate(total=Count("id"))
+        )
+        for content_type_id, object_id, status, total in checkins.order_by():
+            counts[content_type_id, object_id, status][1] = total
+    return counts
+
+
+def reconcile_checkin_counts():
+    """
+    Recount every counter from the latest check-ins and the check-ins, and
+    fix the ones that drifted. Returns the number of counters fixed.
+    """
+    counts = count_checkins()
+    changed = []
+    removed = []
+    for counter in CheckInCount.objects.iterator(chunk_size=BATCH_SIZE):
+        key = (counter.content_type_id, counter.object_id, counter.status)
+        users, checkins = counts.pop(key, (0, 0))
+        if not (users or checkins):
+            removed.append(counter.pk)
+        elif (counter.users, counter.checkins) != (users, checkins):
+            counter.users, counter.checkins = users, checkins
+            changed.append(counter)
+    for start in range(0, len(removed), BATCH_SIZE):
+        CheckInCount.objects.filter(pk__in=removed[start : start + BATCH_SIZE]).delete()
+    CheckInCount.objects.bulk_update(
+        changed, ["users", "checkins"], batch_size=BATCH_SIZE
+    )
+    CheckInCount.objects.bulk_create(
+        [
+            CheckInCount(
+                content_type_id=content_type_id,
+                object_id=object_id,
+                status=status,
+                users=users,
+                checkins=checkins,
+            )
+            for (content_type_id, object_id, status), (
+                users,
+                checkins,
+            ) in counts.items()
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    return len(removed) + len(changed) + len(counts)
+
+
+def get_checkin_counts(request_user, CheckInModel, content_type, object_id):
+    """
+    The check-ins of an item that `request_user` can see: users per status,
+    as a Counter, and the totals of check-ins and of users. Public ones come
+    from the counters, the others from one more query for signed-in users.
+    """
+    users = Counter()
+    checkins = 0
+    counters = CheckInCount.objects.filter(
+        content_type=content_type, object_id=object_id
+    ).values_list("status", "users", "checkins")
+    for status, status_users, status_checkins in counters:
+        users[status] += status_users
+        checkins += status_checkins
+
+    if request_user.is_authenticated:
+        is_latest = Exists(
+            LatestCheckIn.objects.filter(
+                domain=CHECKIN_MODELS[CheckInModel._meta.label],
+                checkin_id=OuterRef("id"),
+            )
+        )
+        groups = (
+            get_visible_checkins(request_user, CheckInModel, content_type, object_id)
+            .exclude(visibility=PUBLIC)
+            .annotate(is_latest=is_latest)
+            .values_list("status", "is_latest")
+            .annotate(total=Count("id", distinct=True))
+            .order_by()
+        )
+        for status, latest, total in groups:
+            if latest:
+                users[status] += total
+            checkins += total
+    return {"users": users, "checkins": checkins, "unique_users": users.total()}
+
+
+def get_checkin_facets(checkins, year="", month=""):
+    """
+    The check-ins of `checkins` per status in the selected year and month,
+    as a Counter, and {year: [months]} of every check-in, in one query.
+    """
+    statuses = Counter()
+    months_by_year = defaultdict(set)
+    groups = (
+        checkins.annotate(
+            year=ExtractYear("timestamp"), month=ExtractMonth("timestamp")
+        )
+        .values_list("status", "year", "month")
+        .annotate(total=Count("id", distinct=True))
+        .order_by()
+    )
+    for status, checkin_year, checkin_month, total in groups:
+        months_by_year[checkin_year].add(checkin_month)
+        if year and str(checkin_year) != year:
+            continue
+        if month and str(checkin_month) != month:
+            continue
+        statuses[status] += total
+    return statuses, {
+        checkin_year: sorted(months)
+        for checkin_year, months in sorted(months_by_year.items())
+    }
+
+
+def attach_checkin_counts(request_user, checkin_user, checkins):
+    """
+    Set `checkin_count` on a page of latest check-ins of `checkin_user`: how
+    many more check-ins of the same item `request_user` can see.
+    """
+    if not checkins:
+        return
+    counts = {
+        (content_type_id, object_id): total
+        for content_type_id, object_id, total in get_visible_checkins(
+            request_user, type(checkins[0]), checkin_user=checkin_user
+        )
+        .filter(object_id__in={checkin.object_id for checkin in checkins})
+        .values_list("content_type_id", "object_id")
+        .annotate(total=Count("id", distinct=True))
+        .order_by()
+    }
+    for checkin in checkins:
+        key = (checkin.content_type_id, checkin.object_id)
+        checkin.checkin_count = counts.get(key, 1) - 1
@@ -0,0 +1,796 @@
+"""
+Synthetic datasets for measuring performance.
+
+Rows are written with `bulk_create`, so `save()` and its signals (activities,
+timelines, notifications, tags, history) do not run per row; the generator
+writes those rows itself. Activity is long-tailed: a few users follow,
+check in and post a lot, a few items get most of the attention.
+"""
+
+import random
+from collections import Counter, defaultdict
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import QuerySet
+from django.utils import timezone
+from django.utils.text import slugify
+
+from discover.models import Vote
+from entity.models import Company, Creator, Role
+from listen.models import ListenCheckIn, Podcast, Release, ReleaseRole
+from notify.models import Notification
+from play.models import Game, GameRole, PlayCheckIn
+from read.models import (
+    Book,
+    BookInstance,
+    BookRole,
+    Instance,
+    ReadCheckIn,
+    Work,
+    WorkRole,
+)
+from visit.models import Location, VisitCheckIn
+from watch.models import (
+    Episode,
+    Movie,
+    MovieReleaseDate,
+    MovieRole,
+    Season,
+    Series,
+    WatchCheckIn,
+)
+from write.models import Post, Repost, Say, Tag
+
+from .models import Activity, Block, Follow
+
+User = get_user_model()
+
+# Catalogue sizes at --scale 1
+DEFAULT_COUNTS = {
+    "users": 1000,
+    "creators": 2000,
+    "companies": 200,
+    "locations": 500,
+    "works": 2000,
+    "movies": 1000,
+    "series": 200,
+    "releases": 1000,
+    "podcasts": 100,
+    "games": 500,
+    "tags": 300,
+}
+
+# Mean number of things per user; the actual numbers are long-tailed
+PER_USER = {
+    "follows": 20,
+    "blocks": 0.2,
+    "checkin_items": 25,
+    "says": 15,
+    "posts": 2,
+    "reposts": 3,
+    "votes": 30,
+}
+
+# How far back the generated history goes
+HISTORY_DAYS = 3 * 365
+
+# Content is built and written this many users at a time, to bound memory
+USER_CHUNK = 500
+
+# (want to, in progress, done, given up) per check-in model
+STATUSES = {
+    ReadCheckIn: ("to_read", "reading", "finished_reading", "abandoned"),
+    WatchCheckIn: ("to_watch", "watching", "watched", "abandoned"),
+    ListenCheckIn: ("to_listen", "listening", "listened", "abandoned"),
+    PlayCheckIn: ("to_play", "playing", "played", "abandoned"),
+    VisitCheckIn: ("to_visit", "visiting", "visited", "visited"),
+}
+
+ACTIVITY_TYPES = {
+    Say: "say",
+    Post: "post",
+    Repost: "repost",
+    Follow: "follow",
+    ReadCheckIn: "read-check-in",
+    WatchCheckIn: "watch-check-in",
+    ListenCheckIn: "listen-check-in",
+    PlayCheckIn: "play-check-in",
+    VisitCheckIn: "visit-check-in",
+}
+
+WORDS = (
+    "quiet morning light river paper garden winter signal orbit harbor "
+    "lantern echo velvet atlas meadow static cinder tide violet engine"
+).split()
+
+
+###########
+# helpers #
+###########
+
+
+def long_tail(rng, mean, cap=50):
+    """A Pareto-distributed count with roughly the given mean."""
+    # Pareto(1.5) has a mean of 3
+    return int(min(mean * rng.paretovariate(1.5) / 3, mean * cap))
+
+
+class Popularity:
+    """Weighted picks from a population, following Zipf's law."""
+
+    def __init__(self, rng, population, exponent=1.1):
+        self.rng = rng
+        self.population = list(population)
+        rng.shuffle(self.population)
+        self.cum_weights = list(
+            accumulate(
+                1 / (rank + 1) ** exponent for rank in range(len(self.population))
+            )
+        )
+
+    def __bool__(self):
+        return bool(self.population)
+
+    def pick(self, count=1):
+        return self.rng.choices(self.population, cum_weights=self.cum_weights, k=count)
+
+    def sample(self, count):
+        """Up to `count` distinct picks."""
+        count = min(count, len(self.population))
+        picked = set()
+        for _ in range(count * 3):
+            picked.update(self.pick(count - len(picked)))
+            if len(picked) >= count:
+                break
+        return list(picked)
+
+
+class RawInsertQuerySet(QuerySet):
+    """
+    `bulk_create` that writes the values it is given, the way fixtures are
+    loaded: auto_now(_add) fields are not overwritten and unique slugs are
+    not looked up, one query per row.
+    """
+
+    def _insert(self, *args, **kwargs):
+        kwargs["raw"] = True
+        return super()._insert(*args, **kwargs)
+
+
+def get_timestamp_fields(model):
+    return [
+        field.attname
+        for field in model._meta.concrete_fields
+        if getattr(field, "auto_now", False) or getattr(field, "auto_now_add", False)
+    ]
+
+
+class DatasetGenerator:
+    """
+    Writes a reproducible dataset: the same counts and seed give the same
+    rows. `log` is called with a line of progress per step.
+    """
+
+    def __init__(
+        self, counts=None, per_user=None, scale=1.0, seed=0, batch_size=2000, log=None
+    ):
+        self.counts = {
+            key: max(1, round(value * scale)) for key, value in DEFAULT_COUNTS.items()
+        }
+        self.counts.update(counts or {})
+        self.per_user = {**PER_USER, **(per_user or {})}
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        self.log = log or (lambda message: None)
+        self.now = timezone.now()
+        self.created = Counter()
+        self.timestamp_fields = {}
+        self.content_types = {}
+
+    def content_type(self, model):
+        if model not in self.content_types:
+            self.content_types[model] = ContentType.objects.get_for_model(model)
+        return self.content_types[model]
+
+    def new(self, model, when=None, **fields):
+        obj = model(**fields)
+        if when is not None:
+            for attname in self.timestamp_fields[model]:
+                setattr(obj, attname, when)
+        return obj
+
+    def create(self, model, objects):
+        # Rows with generated timestamps keep them
+        queryset = (
+            RawInsertQuerySet(model)
+            if model in self.timestamp_fields
+            else model.objects.all()
+        )
+        objects = queryset.bulk_create(objects, batch_size=self.batch_size)
+        self.created[model._meta.label] += len(objects)
+        return objects
+
+    def link(self, field, pairs):
+        """Write the rows of a many-to-many `field` for (source, target) id pairs."""
+        through = field.remote_field.through
+        source = f"{field.m2m_field_name()}_id"
+        target = f"{field.m2m_reverse_field_name()}_id"
+        self.create(
+            through,
+            [through(**{source: a, target: b}) for a, b in set(pairs)],
+        )
+
+    def random_time(self, after=None):
+        start = after or self.now - timedelta(days=HISTORY_DAYS)
+        span = (self.now - start).total_seconds()
+        return start + timedelta(seconds=self.rng.random() * span)
+
+    def random_date(self, first_year=1900):
+        year = self.rng.randint(first_year, self.now.year)
+        return f"{year}.{self.rng.randint(1, 12):02}.{self.rng.randint(1, 28):02}"
+
+    def text(self, words=12, tag_chance=0.3):
+        text = " ".join(self.rng.choices(WORDS, k=words)).capitalize() + "."
+        if self.tags and self.rng.random() < tag_chance:
+            text += " " + " ".join(f"#{name}" for name in self.tags.pick(2))
+        return text
+
+    def run(self):
+        stamped = [Activity, Follow, Say, Post, Repost, Vote, Notification, *STATUSES]
+        self.timestamp_fields = {
+            model: get_timestamp_fields(model) for model in stamped
+        }
+        self.create_tags()
+        self.create_users()
+        self.create_follows_and_blocks()
+        self.create_entities()
+        self.create_read()
+        self.create_watch()
+        self.create_listen_and_play()
+        self.create_content()
+        self.create_reposts()
+        self.create_votes()
+        return self.created
+
+    # people
+
+    def create_tags(self):
+        names = [f"{self.rng.choice(WORDS)}{n}" for n in range(self.counts["tags"])]
+        Tag.objects.bulk_create(
+            [Tag(name=name) for name in names], ignore_conflicts=True
+        )
+        self.tag_ids = dict(
+            Tag.objects.filter(name__in=names).values_list("name", "id")
+        )
+        self.tags = Popularity(self.rng, names)
+        self.log(f"{len(names)} tags")
+
+    def create_users(self):
+        password = make_password("password")
+        first = User.objects.count()
+        users = [
+            self.new(
+                User,
+                username=f"user{first + n}",
+                password=password,
+                privacy_level=self.rng.choice(
+                    ["public", "public", "limited", "logged_in_only"]
+                ),
+                date_joined=self.random_time(),
+            )
+            for n in range(self.counts["users"])
+        ]
+        users = self.create(User, users)
+        self.joined = {user.id: user.date_joined for user in users}
+        self.usernames = {user.id: user.username for user in users}
+        self.user_ids = list(self.joined)
+        self.popular_users = Popularity(self.rng, self.user_ids)
+        self.log(f"{len(users)} users")
+
+    def create_follows_and_blocks(self):
+        follows, blocks = [], []
+        for user_id in self.user_ids:
+            followed = self.popular_users.sample(
+                long_tail(self.rng, self.per_user["follows"])
+            )
+            for followed_id in followed:
+                if followed_id != user_id:
+                    when = self.random_time(self.joined[user_id])
+                    follows.append(
+                        self.new(
+                            Follow, when, follower_id=user_id, followed_id=followed_id
+                        )
+                    )
+            if self.rng.random() < self.per_user["blocks"]:
+                blocked_id = self.rng.choice(self.user_ids)
+                if blocked_id != user_id and blocked_id not in followed:
+                    blocks.append(Block(blocker_id=user_id, blocked_id=blocked_id))
+        follows = self.create(Follow, follows)
+        self.create(Block, blocks)
+        self.add_activities(follows, user_attr="follower_id")
+        self.add_notifications(
+            (
+                follow.followed_id,
+                follow.follower_id,
+                "follow",
+                f'<a href="/@{self.usernames[follow.follower_id]}/">'
+                f"@{self.usernames[follow.follower_id]}</a> followed you.",
+                None,
+                follow.timestamp,
+            )
+            for follow in follows
+        )
+        self.log(f"{len(follows)} follows, {len(blocks)} blocks")
+
+    def create_entities(self):
+        self.creators = self.create(
+            Creator,
+            [
+                Creator(
+                    name=f"{self.rng.choice(WORDS).capitalize()} Creator {n}",
+                    creator_type="person",
+                    birth_date=self.random_date(1850),
+                )
+                for n in range(self.counts["creators"])
+            ],
+        )
+        self.popular_creators = Popularity(self.rng, [c.id for c in self.creators])
+        self.companies = self.create(
+            Company,
+            [Company(name=f"Company {n}") for n in range(self.counts["companies"])],
+        )
+        self.roles = {}
+        for name, domain in (
+            ("Author", "read"),
+            ("Director", "watch"),
+            ("Performer", "listen"),
+            ("Developer", "play"),
+        ):
+            self.roles[domain], _ = Role.objects.get_or_create(
+                name=name, domain=domain, category=None
+            )
+
+        # Continents, countries, regions and cities, each level ~4x the last
+        total = self.counts["locations"]
+        levels = [Location.LEVEL0, Location.LEVEL1, Location.LEVEL2, Location.LEVEL3]
+        sizes = [max(1, round(total * share)) for share in (0.01, 0.05, 0.2, 0.74)]
+        parents = [None]
+        self.location_ids = []
+        for level, size in zip(levels, sizes):
+            locations = []
+            for n in range(size):
+                name = f"{self.rng.choice(WORDS).capitalize()} {level[-1]}-{n}"
+                locations.append(
+                    Location(
+                        name=name,
+                        slug=slugify(name),
+                        level=level,
+                        level_name=Location.DEFAULT_LEVEL_NAMES[level],
+                        parent_id=self.rng.choice(parents),
+                    )
+                )
+            parents = [location.id for location in self.create(Location, locations)]
+            self.location_ids.extend(parents)
+        self.log(
+            f"{len(self.creators)} creators, {len(self.companies)} companies, "
+            f"{len(self.location_ids)} locations"
+        )
+
+    # media
+
+    def create_read(self):
+        works = self.create(
+            Work,
+            [
+                Work(title=f"Work {n}", publication_date=self.random_date())
+                for n in range(self.counts["works"])
+            ],
+        )
+        work_roles, instances = [], []
+        for work in works:
+            work_roles.append(
+                WorkRole(
+                    work=work,
+                    creator_id=self.popular_creators.pick()[0],
+                    role=self.roles["read"],
+                )
+            )
+            for edition in range(self.rng.choice([1, 1, 1, 2, 3])):
+                instances.append(
+                    Instance(
+                        title=work.title,
+                        work=work,
+                        publication_date=work.publication_date,
+                        edition=str(edition + 1),
+                    )
+                )
+        self.create(WorkRole, work_roles)
+        instances = self.create(Instance, instances)
+
+        author_ids = {role.work_id: role.creator_id for role in work_roles}
+        # (instance, book) of every book, from the instance it is generated from
+        editions = []
+        for instance in instances:
+            for _ in range(self.rng.choice([1, 1, 2])):
+                editions.append(
+                    (
+                        instance,
+                        Book(
+                            title=instance.title,
+                            publisher=self.rng.choice(self.companies),
+                            publication_date=instance.publication_date,
+                            isbn_13=f"978{self.rng.randrange(10**10):010}",
+                        ),
+                    )
+                )
+        books = self.create(Book, [book for _, book in editions])
+        book_instances, book_roles = [], []
+        for instance, book in editions:
+            book_instances.append(BookInstance(book=book, instance=instance))
+            book_roles.append(
+                BookRole(
+                    book=book,
+                    creator_id=author_ids[instance.work_id],
+                    role=self.roles["read"],
+                )
+            )
+        self.create(BookInstance, book_instances)
+        self.create(BookRole, book_roles)
+        self.media = {ReadCheckIn: [(Book, book.id) for book in books]}
+        self.log(f"{len(works)} works, {len(instances)} instances, {len(books)} books")
+
+    def create_watch(self):
+        movies = self.create(
+            Movie, [Movie(title=f"Movie {n}") for n in range(self.counts["movies"])]
+        )
+        self.create(
+            MovieRole,
+            [
+                MovieRole(
+                    movie=movie,
+                    creator_id=self.popular_creators.pick()[0],
+                    role=self.roles["watch"],
+                )
+                for movie in movies
+            ],
+        )
+        self.create(
+            MovieReleaseDate,
+            [
+                MovieReleaseDate(movie=movie, release_date=self.random_date())
+                for movie in movies
+            ],
+        )
+        series = self.create(
+            Series,
+            [
+                Series(title=f"Series {n}", release_date=self.random_date(1950))
+                for n in range(self.counts["series"])
+            ],
+        )
+        seasons = self.create(
+            Season,
+            [
+                Season(series=show, season_number=number, title=f"Season {number}")
+                for show in series
+                for number in range(1, self.rng.randint(1, 6) + 1)
+            ],
+        )
+        episodes = self.create(
+            Episode,
+            [
+                Episode(
+                    series_id=season.series_id,
+                    season=season,
+                    episode=number,
+                    title=f"Episode {number}",
+                )
+                for season in seasons
+                for number in range(1, self.rng.randint(6, 12) + 1)
+            ],
+        )
+        self.media[WatchCheckIn] = [(Movie, movie.id) for movie in movies] + [
+            (Series, show.id) for show in series
+        ]
+        self.log(
+            f"{len(movies)} movies, {len(series)} series, {len(seasons)} seasons, "
+            f"{len(episodes)} episodes"
+        )
+
+    def create_listen_and_play(self):
+        first = Podcast.objects.count()
+        releases = self.create(
+            Release,
+            [
+                Release(title=f"Release {n}", release_date=self.random_date(1950))
+                for n in range(self.counts["releases"])
+            ],
+        )
+        self.create(
+            ReleaseRole,
+            [
+                ReleaseRole(
+                    release=release,
+                    creator_id=self.popular_creators.pick()[0],
+                    role=self.roles["listen"],
+                )
+                for release in releases
+            ],
+        )
+        podcasts = self.create(
+            Podcast,
+            [
+                Podcast(
+                    title=f"Podcast {n}",
+                    rss_feed_url=f"https://podcasts.example.com/{first + n}.xml",
+                )
+                for n in range(self.counts["podcasts"])
+            ],
+        )
+        games = self.create(
+            Game, [Game(title=f"Game {n}") for n in range(self.counts["games"])]
+        )
+        self.create(
+            GameRole,
+            [
+                GameRole(
+                    game=game,
+                    creator_id=self.popular_creators.pick()[0],
+                    role=self.roles["play"],
+                )
+                for game in games
+            ],
+        )
+        self.media[ListenCheckIn] = [(Release, r.id) for r in releases] + [
+            (Podcast, p.id) for p in podcasts
+        ]
+        self.media[PlayCheckIn] = [(Game, game.id) for game in games]
+        self.media[VisitCheckIn] = [(Location, pk) for pk in self.location_ids]
+        self.log(
+            f"{len(releases)} releases, {len(podcasts)} podcasts, {len(games)} games"
+        )
+
+    # content
+
+    def status_history(self, model, start):
+        """(status, progress, timestamp) check-ins of one user on one item."""
+        want, doing, done, gave_up = STATUSES[model]
+        history = []
+        when = start
+        if self.rng.random() < 0.4:
+            history.append((want, None, when))
+            if self.rng.random() < 0.5:
+                return history
+        pages = self.rng.randint(150, 600)
+        for step in range(self.rng.randint(1, 5)):
+            when += timedelta(days=self.rng.expovariate(1 / 7))
+            progress = str(pages * (step + 1) // 6) if model is ReadCheckIn else None
+            history.append((doing, progress, when))
+        ending = self.rng.random()
+        when += timedelta(days=self.rng.expovariate(1 / 7))
+        if ending < 0.7:
+            history.append((done, None, when))
+        elif ending < 0.8:
+            history.append((gave_up, None, when))
+        return [entry for entry in history if entry[2] <= self.now]
+
+    def create_content(self):
+        self.says, self.votable = [], []
+        popular_media = {
+            model: Popularity(self.rng, media) for model, media in self.media.items()
+        }
+        for start in range(0, len(self.user_ids), USER_CHUNK):
+            user_ids = self.user_ids[start : start + USER_CHUNK]
+            checkins = defaultdict(list)
+            says, posts = [], []
+            for user_id in user_ids:
+                joined = self.joined[user_id]
+                items = long_tail(self.rng, self.per_user["checkin_items"])
+                for _ in range(items):
+                    model = self.rng.choice(list(popular_media))
+                    if not popular_media[model]:
+                        continue
+                    media_model, media_id = popular_media[model].pick()[0]
+                    for status, progress, when in self.status_history(
+                        model, self.random_time(joined)
+                    ):
+                        checkins[model].append(
+                            self.new(
+                                model,
+                                when,
+                                user_id=user_id,
+                                content_type=self.content_type(media_model),
+                                object_id=media_id,
+                                status=status,
+                                progress=progress,
+                                content=self.text() if self.rng.random() < 0.4 else "",
+                                share_to_feed=self.rng.random() < 0.8,
+                                visibility=self.visibility(),
+                            )
+                        )
+                for _ in range(long_tail(self.rng, self.per_user["says"])):
+                    says.append(
+                        self.new(
+                            Say,
+                            self.random_time(joined),
+                            user_id=user_id,
+                            content=self.text(),
+                            visibility=self.visibility(),
+                        )
+                    )
+                for n in range(long_tail(self.rng, self.per_user["posts"])):
+                    title = " ".join(self.rng.choices(WORDS, k=4)).capitalize()
+                    posts.append(
+                        self.new(
+                            Post,
+                            self.random_time(joined),
+                            user_id=user_id,
+                            title=title,
+                            slug=f"{slugify(title)[:30]}-{user_id}-{n}",
+                            content="\n\n".join(self.text(60) for _ in range(4)),
+                            share_to_feed=True,
+                            visibility=self.visibility(),
+                        )
+                    )
+
+            for model, objects in [*checkins.items(), (Say, says), (Post, posts)]:
+                objects = self.create(model, objects)
+                shared = [obj for obj in objects if getattr(obj, "share_to_feed", True)]
+                activities = self.add_activities(shared)
+                self.add_tags_and_audience(model, objects)
+                self.votable.extend(
+                    (model, obj.id, obj.user_id)
+                    for obj in objects
+                    if obj.visibility == "PU"
+                )
+                if model is Say:
+                    self.says.extend(
+                        (say.id, activity.id, say.user_id, say.timestamp)
+                        for say, activity in zip(shared, activities)
+                        if say.visibility == "PU"
+                    )
+            self.log(f"content of {start + len(user_ids)} users")
+
+    def visibility(self):
+        return "PR" if self.rng.random() < 0.05 else "PU"
+
+    def add_activities(self, objects, user_attr="user_id"):
+        if not objects:
+            return []
+        model = type(objects[0])
+        return self.create(
+            Activity,
+            [
+                self.new(
+                    Activity,
+                    obj.timestamp,
+                    user_id=getattr(obj, user_attr),
+                    activity_type=ACTIVITY_TYPES[model],
+                    content_type=self.content_type(model),
+                    object_id=obj.id,
+                    visibility=getattr(obj, "visibility", "PU"),
+                )
+                for obj in objects
+            ],
+        )
+
+    def add_tags_and_audience(self, model, objects):
+        tag_pairs = [
+            (obj.id, self.tag_ids[word[1:].rstrip(".")])
+            for obj in objects
+            for word in (obj.content or "").split()
+            if word.startswith("#") and word[1:].rstrip(".") in self.tag_ids
+        ]
+        self.link(model._meta.get_field("tags"), tag_pairs)
+        # Like `save()`, the author can always see their own content
+        self.link(
+            model._meta.get_field("visible_to"),
+            [(obj.id, obj.user_id) for obj in objects],
+        )
+
+    def create_reposts(self):
+        if not self.says:
+            return
+        popular_says = Popularity(self.rng, self.says)
+        reposts = []
+        for user_id in self.user_ids:
+            for say_id, activity_id, author_id, said in popular_says.sample(
+                long_tail(self.rng, self.per_user["reposts"])
+            ):
+                if author_id != user_id:
+                    reposts.append(
+                        self.new(
+                            Repost,
+                            self.random_time(max(said, self.joined[user_id])),
+                            user_id=user_id,
+                            content_type=self.content_type(Say),
+                            object_id=say_id,
+                            original_activity_id=activity_id,
+                            content=self.text(6) if self.rng.random() < 0.5 else "",
+                        )
+                    )
+        reposts = self.create(Repost, reposts)
+        self.add_activities(reposts)
+        self.link(
+            Repost._meta.get_field("tags"),
+            [
+                (repost.id, self.tag_ids[word[1:].rstrip(".")])
+                for repost in reposts
+                for word in repost.content.split()
+                if word[1:].rstrip(".") in self.tag_ids
+            ],
+        )
+        authors = {say_id: author_id for say_id, _, author_id, _ in self.says}
+        self.add_notifications(
+            (
+                authors[repost.object_id],
+                repost.user_id,
+                "repost",
+                f'<a href="/@{self.usernames[repost.user_id]}/">'
+                f"@{self.usernames[repost.user_id]}</a> reposted your Say.",
+                (Say, repost.object_id),
+                repost.timestamp,
+            )
+            for repost in reposts
+        )
+        self.log(f"{len(reposts)} reposts")
+
+    def create_votes(self):
+        if not self.votable:
+            return
+        popular_content = Popularity(self.rng, self.votable)
+        votes = []
+        for user_id in self.user_ids:
+            for model, object_id, author_id in popular_content.sample(
+                long_tail(self.rng, self.per_user["votes"])
+            ):
+                if author_id != user_id:
+                    votes.append(
+                        self.new(
+                            Vote,
+                            self.random_time(self.joined[user_id]),
+                            user_id=user_id,
+                            content_type=self.content_type(model),
+                            object_id=object_id,
+                            value=(
+                                Vote.UPVOTE
+                                if self.rng.random() < 0.95
+                                else Vote.DOWNVOTE
+                            ),
+                        )
+                    )
+            if len(votes) >= self.batch_size * 10:
+                self.create(Vote, votes)
+                votes = []
+        self.create(Vote, votes)
+        self.log(f"{self.created[Vote._meta.label]} votes")
+
+    def add_notifications(self, rows):
+        """Write (recipient, sender, type, message, subject, time) notifications."""
+        user_type = self.content_type(User)
+        notifications = []
+        for recipient_id, sender_id, kind, message, subject, when in rows:
+            subject_model, subject_id = subject or (None, None)
+            notifications.append(
+                self.new(
+                    Notification,
+                    when,
+                    recipient_id=recipient_id,
+                    sender_content_type=user_type,
+                    sender_object_id=sender_id,
+                    subject_content_type=(
+                        self.content_type(subject_model) if subject_model else None
+                    ),
+                    subject_object_id=subject_id,
+                    notification_type=kind,
+                    message=message,
+                    # Older notifications have mostly been seen
+                    read=when < self.now - timedelta(days=14)
+                    and self.rng.random() < 0.9,
+                )
+            )
+        self.create(Notification, notifications)
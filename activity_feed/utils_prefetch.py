@@ -0,0 +1,263 @@
+from collections import defaultdict
+
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.contenttypes.prefetch import GenericPrefetch
+from django.db.models import Prefetch, Q, prefetch_related_objects
+
+from discover.models import Vote
+from listen.models import Audiobook, ListenCheckIn, Podcast, Release
+from play.models import Game, PlayCheckIn
+from read.models import Book, Issue, ReadCheckIn
+from visit.models import Location, VisitCheckIn
+from watch.models import (
+    Episode,
+    EpisodeCast,
+    Movie,
+    MovieCast,
+    Season,
+    Series,
+    WatchCheckIn,
+)
+from write.models import Pin, Post, Repost, Say
+from write.utils_markdown import prefetch_rendered_markdown
+
+from .models import Activity, Follow
+
+CHECKIN_MODELS = (ReadCheckIn, WatchCheckIn, ListenCheckIn, PlayCheckIn, VisitCheckIn)
+
+
+###########
+# helpers #
+###########
+
+
+def get_media_querysets():
+    """
+    One queryset per media model a check-in can point to, pulling in the
+    relations `activity_item.html` renders for it.
+    """
+    return [
+        Book.objects.select_related("publisher").prefetch_related(
+            "bookrole_set__role",
+            "bookrole_set__creator",
+            "instances__work__genres",
+        ),
+        Issue.objects.select_related("periodical", "publisher"),
+        Movie.objects.prefetch_related(
+            "region_release_dates",
+            "movieroles__role",
+            "movieroles__creator",
+            "studios",
+            "genres",
+            Prefetch(
+                "moviecasts",
+                queryset=MovieCast.objects.filter(is_star=True)
+                .select_related("creator")
+                .order_by("order"),
+                to_attr="prefetched_stars",
+            ),
+        ),
+        Series.objects.prefetch_related(
+            "seriesroles__role", "seriesroles__creator", "studios", "genres"
+        ),
+        Season.objects.select_related("series").prefetch_related(
+            "seasonroles__role",
+            "seasonroles__creator",
+            "studios",
+            "genres",
+            Prefetch(
+                "episodes",
+                queryset=Episode.objects.prefetch_related(
+                    Prefetch(
+                        "episodecasts",
+                        queryset=EpisodeCast.objects.filter(
+                            is_star=True
+                        ).select_related("creator"),
+                        to_attr="prefetched_stars",
+                    )
+                ),
+            ),
+        ),
+        Release.objects.prefetch_related(
+            "releaserole_set__role",
+            "releaserole_set__creator",
+            "label",
+            "genres",
+            "tracks__genres",
+        ),
+        Audiobook.objects.select_related("publisher").prefetch_related(
+            "audiobookrole_set__role",
+            "audiobookrole_set__creator",
+            "instances__work__genres",
+        ),
+        Podcast.objects.prefetch_related("genres"),
+        Game.objects.prefetch_related(
+            "gameroles__role",
+            "gameroles__creator",
+            "developers",
+            "publishers",
+            "platforms",
+            "region_release_dates",
+        ),
+        Location.objects.select_related("parent"),
+    ]
+
+
+def get_checkin_querysets():
+    return [
+        model.objects.select_related("user", "content_type").prefetch_related(
+            GenericPrefetch("content_object", get_media_querysets())
+        )
+        for model in CHECKIN_MODELS
+    ]
+
+
+def prefetch_checkin_media(objects):
+    """
+    Load the authors, media and stored HTML of the check-ins among
+    `objects`, e.g. a page of mixed tag results, with one query per model.
+    """
+    checkins_by_model = defaultdict(list)
+    for obj in objects:
+        if isinstance(obj, CHECKIN_MODELS):
+            checkins_by_model[type(obj)].append(obj)
+    for checkins in checkins_by_model.values():
+        prefetch_related_objects(
+            checkins, "user", GenericPrefetch("content_object", get_media_querysets())
+        )
+        prefetch_rendered_markdown(checkins)
+
+
+def prefetch_checkin_page(page):
+    """
+    Load the authors, media and upvotes of the check-ins of a page. The
+    page's object list becomes a list, so every loop over it shares them.
+    """
+    page.object_list = list(page.object_list)
+    prefetch_checkin_media(page.object_list)
+    _attach_checkin_upvotes(page.object_list)
+    return page.object_list
+
+
+def get_content_querysets(resolve_reposts=True):
+    """
+    One queryset per model an activity can point to. Reposts also resolve
+    the activity they repost, one level deep, as the templates do.
+    """
+    querysets = [
+        Say.objects.select_related("user").prefetch_related("visible_to"),
+        Post.objects.select_related("user"),
+        Pin.objects.select_related("user"),
+        Follow.objects.select_related("follower", "followed"),
+        *get_checkin_querysets(),
+    ]
+    reposts = Repost.objects.select_related(
+        "user", "original_activity__user", "original_activity__content_type"
+    )
+    if resolve_reposts:
+        reposts = reposts.prefetch_related(
+            GenericPrefetch(
+                "original_activity__content_object",
+                get_content_querysets(resolve_reposts=False),
+            )
+        )
+    querysets.append(reposts)
+    return querysets
+
+
+def _group_by_content_type(objects):
+    """Map content type ids to the ids of the given model instances."""
+    ids_by_type = defaultdict(set)
+    for obj in objects:
+        content_type = ContentType.objects.get_for_model(obj)
+        ids_by_type[content_type.id].add(obj.id)
+    return ids_by_type
+
+
+def _generic_filter(ids_by_type):
+    query = Q()
+    for content_type_id, object_ids in ids_by_type.items():
+        query |= Q(content_type_id=content_type_id, object_id__in=object_ids)
+    return query
+
+
+def attach_activity_ids(objects):
+    """
+    Set what `get_activity_id` returns on a batch of says, posts, pins,
+    reposts or check-ins with one query. Returns the objects as a list.
+    """
+    objects = list(objects)
+    if not objects:
+        return objects
+    activity_ids = {
+        (content_type_id, object_id): activity_id
+        for content_type_id, object_id, activity_id in Activity.objects.filter(
+            _generic_filter(_group_by_content_type(objects))
+        ).values_list("content_type_id", "object_id", "id")
+    }
+    for obj in objects:
+        key = (ContentType.objects.get_for_model(obj).id, obj.id)
+        obj._activity_id = activity_ids.get(key)
+    return objects
+
+
+def _attach_checkin_upvotes(checkins):
+    """
+    Precompute `has_voted` (whether the author upvoted the checked-in item)
+    for a batch of check-ins.
+    """
+    checkins = [
+        checkin
+        for checkin in checkins
+        if hasattr(type(checkin), "has_voted") and checkin.content_object is not None
+    ]
+    if not checkins:
+        return
+
+    ids_by_type = _group_by_content_type(c.content_object for c in checkins)
+    upvoted = set(
+        Vote.objects.filter(
+            _generic_filter(ids_by_type),
+            user_id__in={checkin.user_id for checkin in checkins},
+            value=Vote.UPVOTE,
+        ).values_list("user_id", "content_type_id", "object_id")
+    )
+    for checkin in checkins:
+        checkin._has_voted = (
+            checkin.user_id,
+            checkin.content_type_id,
+            checkin.content_object.id,
+        ) in upvoted
+
+
+def prefetch_activities(activities):
+    """
+    Resolve the content objects of a page of activities in bulk: one query
+    per content type instead of one per activity, including the activity a
+    repost points to, the media behind check-ins and the stored HTML of
+    their text. Returns the activities for convenience.
+    """
+    activities = list(activities)
+    if not activities:
+        return activities
+
+    prefetch_related_objects(
+        activities,
+        "user",
+        "content_type",
+        GenericPrefetch("content_object", get_content_querysets()),
+    )
+
+    content_objects = [a.content_object for a in activities if a.content_object]
+    originals = [
+        obj.original_activity.content_object
+        for obj in content_objects
+        if isinstance(obj, Repost)
+        and obj.original_activity
+        and obj.original_activity.content_object
+    ]
+    prefetch_rendered_markdown(content_objects + originals)
+    _attach_checkin_upvotes(
+        [obj for obj in content_objects + originals if isinstance(obj, CHECKIN_MODELS)]
+    )
+    return activities
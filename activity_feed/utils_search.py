@@ -0,0 +1,447 @@
+"""
+Full-text search index.
+
+Every indexed object has one `SearchEntry`: its names go into `title`, its
+credits, identifiers and text into `body`, as listed in `SEARCH_FIELDS`.
+Matches are ranked by relevance, with title matches counting more:
+
+- PostgreSQL: a weighted `tsvector` with a GIN index, ranked by ts_rank.
+- SQLite: an FTS5 table, ranked by bm25.
+- Other databases: `contains` on the entries, most recent first.
+
+Entries and queries are folded and segmented alike (see `utils_text`), so
+accents, case and width don't matter and CJK names match in part. Every
+search term is matched as a word prefix; quoted terms as phrases.
+"""
+
+import re
+from collections import defaultdict
+from operator import attrgetter
+
+from django.apps import apps as django_apps
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import connection
+from django.db.models import Case, F, Q, QuerySet, Value, When, Window
+from django.db.models.functions import RowNumber
+
+from .models import SearchEntry
+from .utils_text import segment
+
+# (title lookups, body lookups) per indexed model
+SEARCH_FIELDS = {
+    "accounts.CustomUser": (("username", "display_name"), ("bio",)),
+    "entity.Creator": (("name", "other_names"), ()),
+    "entity.Company": (("name", "other_names"), ()),
+    "read.Work": (
+        ("title", "subtitle"),
+        (
+            "workrole__creator__name",
+            "workrole__creator__other_names",
+            "workrole__alt_name",
+            "publication_date",
+        ),
+    ),
+    "read.Instance": (
+        ("title", "subtitle"),
+        (
+            "instancerole__creator__name",
+            "instancerole__creator__other_names",
+            "instancerole__alt_name",
+            "publication_date",
+        ),
+    ),
+    "read.Book": (
+        ("title", "subtitle"),
+        (
+            "isbn_10",
+            "isbn_13",
+            "eisbn_13",
+            "asin",
+            "bookrole__creator__name",
+            "bookrole__creator__other_names",
+            "bookrole__alt_name",
+            "publication_date",
+            "publisher__name",
+        ),
+    ),
+    "read.Periodical": (("title",), ()),
+    "read.BookSeries": (("title",), ()),
+    "listen.Work": (
+        ("title", "other_titles"),
+        (
+            "workrole__creator__name",
+            "workrole__creator__other_names",
+            "workrole__alt_name",
+        ),
+    ),
+    "listen.Track": (
+        ("title", "other_titles"),
+        (
+            "trackrole__creator__name",
+            "trackrole__creator__other_names",
+            "trackrole__alt_name",
+        ),
+    ),
+    "listen.Release": (
+        ("title", "other_titles"),
+        (
+            "releaserole__creator__name",
+            "releaserole__creator__other_names",
+            "releaserole__alt_name",
+            "catalog_number",
+            "label__name",
+        ),
+    ),
+    "listen.Podcast": (("title",), ()),
+    "listen.Audiobook": (
+        ("title",),
+        (
+            "audiobookrole__creator__name",
+            "audiobookrole__creator__other_names",
+            "release_date",
+            "publisher__name",
+        ),
+    ),
+    "play.Work": (
+        ("title", "other_titles"),
+        (
+            "workrole__creator__name",
+            "workrole__creator__other_names",
+            "workrole__alt_name",
+            "first_release_date",
+        ),
+    ),
+    "play.Game": (
+        ("title", "other_titles"),
+        (
+            "developers__name",
+            "platforms__name",
+            "gameroles__creator__name",
+            "gameroles__creator__other_names",
+            "gameroles__alt_name",
+            "gamecasts__creator__name",
+            "gamecasts__creator__other_names",
+            "gamecasts__character_name",
+        ),
+    ),
+    "watch.Movie": (
+        ("title", "other_titles"),
+        (
+            "movieroles__creator__name",
+            "movieroles__creator__other_names",
+            "movieroles__alt_name",
+            "moviecasts__creator__name",
+            "moviecasts__creator__other_names",
+            "moviecasts__character_name",
+        ),
+    ),
+    "watch.Season": (
+        ("title", "other_titles"),
+        (
+            "seasonroles__creator__name",
+            "seasonroles__creator__other_names",
+            "seasonroles__alt_name",
+            "episodes__episodecasts__creator__name",
+            "episodes__episodecasts__creator__other_names",
+            "episodes__episodecasts__character_name",
+        ),
+    ),
+    "visit.Location": (("name", "other_names"), ()),
+    "write.Post": (("title",), ("content",)),
+    "write.Say": ((), ("content",)),
+    "write.Pin": (("title",), ("content", "url")),
+    "write.Repost": ((), ("content",)),
+    "write.LuvList": (("title",), ("notes",)),
+    "read.ReadCheckIn": ((), ("content",)),
+    "watch.WatchCheckIn": ((), ("content",)),
+    "listen.ListenCheckIn": ((), ("content",)),
+    "play.PlayCheckIn": ((), ("content",)),
+    "visit.VisitCheckIn": ((), ("content",)),
+}
+
+# Credits whose creator is part of another entry: (credited model, lookup
+# from the credit to the credited object's pk)
+CREDIT_MODELS = {
+    "read.WorkRole": ("read.Work", "work_id"),
+    "read.InstanceRole": ("read.Instance", "instance_id"),
+    "read.BookRole": ("read.Book", "book_id"),
+    "listen.WorkRole": ("listen.Work", "work_id"),
+    "listen.TrackRole": ("listen.Track", "track_id"),
+    "listen.ReleaseRole": ("listen.Release", "release_id"),
+    "listen.AudiobookRole": ("listen.Audiobook", "audiobook_id"),
+    "play.WorkRole": ("play.Work", "work_id"),
+    "play.GameRole": ("play.Game", "game_id"),
+    "play.GameCast": ("play.Game", "game_id"),
+    "watch.MovieRole": ("watch.Movie", "movie_id"),
+    "watch.MovieCast": ("watch.Movie", "movie_id"),
+    "watch.SeasonRole": ("watch.Season", "season_id"),
+    "watch.EpisodeCast": ("watch.Season", "episode__season_id"),
+}
+
+# Best matches returned per model
+SEARCH_LIMIT = 100
+
+# Title matches count this many times as much as body matches
+TITLE_WEIGHT = 10.0
+
+BATCH_SIZE = 1000
+
+FTS_TABLE = "activity_feed_searchentry_fts"
+
+VECTOR = SearchVector("title", weight="A", config="simple") + SearchVector(
+    "body", weight="B", config="simple"
+)
+
+
+###########
+# helpers #
+###########
+
+
+def build_entries(model, pks, apps=django_apps):
+    """Unsaved entries of the given objects, from one query per lookup."""
+    ContentType = apps.get_model("contenttypes", "ContentType")
+    SearchEntry = apps.get_model("activity_feed", "SearchEntry")
+    title_fields, body_fields = SEARCH_FIELDS[model._meta.label]
+    queryset = model._base_manager.filter(pk__in=pks)
+    documents = defaultdict(lambda: ({}, {}))
+    for part, fields in enumerate((title_fields, body_fields)):
+        for field in fields:
+            for pk, value in queryset.values_list("pk", field):
+                if value:
+                    # A dict keeps the order and drops duplicate credits
+                    documents[pk][part][str(value)] = None
+
+    content_type = ContentType.objects.get_for_model(model)
+    return [
+        SearchEntry(
+            content_type=content_type,
+            object_id=pk,
+            title=segment(" ".join(title)),
+            body=segment(" ".join(body)),
+        )
+        for pk, (title, body) in documents.items()
+    ]
+
+
+def index_objects(model, pks, apps=django_apps):
+    """
+    Rewrite the entries of the given objects of `model`. Also runs in
+    migrations, on the historical models of their `apps`.
+    """
+    ContentType = apps.get_model("contenttypes", "ContentType")
+    SearchEntry = apps.get_model("activity_feed", "SearchEntry")
+    content_type = ContentType.objects.get_for_model(model)
+    SearchEntry.objects.filter(content_type=content_type, object_id__in=pks).delete()
+    SearchEntry.objects.bulk_create(build_entries(model, pks, apps))
+    if connection.vendor == "postgresql":
+        SearchEntry.objects.filter(content_type=content_type, object_id__in=pks).update(
+            vector=VECTOR
+        )
+
+
+def reindex(model_label, pks):
+    pks = [pk for pk in pks if pk is not None]
+    if pks:
+        index_objects(django_apps.get_model(model_label), pks)
+
+
+def get_credited(credit):
+    """(model label, [pk]) of the object a credit belongs to."""
+    model_label, lookup = CREDIT_MODELS[credit._meta.label]
+    try:
+        return model_label, [attrgetter(lookup.replace("__", "."))(credit)]
+    except (AttributeError, ObjectDoesNotExist):
+        return model_label, []
+
+
+def reindex_credits(creator_id):
+    """Reindex everything a creator is credited on."""
+    credited = defaultdict(set)
+    for credit_label, (model_label, lookup) in CREDIT_MODELS.items():
+        credited[model_label].update(
+            django_apps.get_model(credit_label)
+            .objects.filter(creator_id=creator_id)
+            .values_list(lookup, flat=True)
+        )
+    for model_label, pks in credited.items():
+        reindex(model_label, list(pks))
+
+
+def rebuild_search_index(apps=django_apps):
+    """Recompute the whole search index. Returns the number of entries."""
+    SearchEntry = apps.get_model("activity_feed", "SearchEntry")
+    SearchEntry.objects.all().delete()
+    for model_label in SEARCH_FIELDS:
+        model = apps.get_model(model_label)
+        pks = model._base_manager.order_by("pk").values_list("pk", flat=True)
+        for start in range(0, len(pks), BATCH_SIZE):
+            index_objects(model, pks[start : start + BATCH_SIZE], apps)
+    return SearchEntry.objects.count()
+
+
+def get_search_words(term):
+    return re.findall(r"\w+", segment(term))
+
+
+def get_tsquery(search_terms):
+    # Every word is a prefix; the words of a term must follow each other
+    return " & ".join(
+        " <-> ".join(f"'{word}':*" for word in words)
+        for words in map(get_search_words, search_terms)
+        if words
+    )
+
+
+def get_fts5_query(search_terms):
+    return " ".join(
+        '"{}"*'.format(" ".join(words))
+        for words in map(get_search_words, search_terms)
+        if words
+    )
+
+
+def get_scope_filter(scopes):
+    """Entries of the `scopes` content types that their querysets let through."""
+    condition = Q()
+    for content_type_id, queryset in scopes.items():
+        scope = Q(content_type_id=content_type_id)
+        if queryset is not None:
+            scope &= Q(object_id__in=queryset.order_by().values("pk"))
+        condition |= scope
+    return condition
+
+
+def get_scope_sql(scopes):
+    """(WHERE clause, params) of `get_scope_filter`, for the FTS5 query."""
+    conditions, params = [], []
+    for content_type_id, queryset in scopes.items():
+        if queryset is None:
+            conditions.append("entry.content_type_id = %s")
+            params.append(content_type_id)
+        else:
+            sql, sql_params = queryset.order_by().values("pk").query.sql_with_params()
+            conditions.append(
+                f"(entry.content_type_id = %s AND entry.object_id IN ({sql}))"
+            )
+            params.extend([content_type_id, *sql_params])
+    return " OR ".join(conditions), params
+
+
+def search_postgresql(search_terms, scopes, limit):
+    query = SearchQuery(get_tsquery(search_terms), search_type="raw", config="simple")
+    rank = SearchRank(F("vector"), query)
+    return (
+        SearchEntry.objects.filter(get_scope_filter(scopes), vector=query)
+        .annotate(
+            position=Window(
+                RowNumber(), partition_by=F("content_type_id"), order_by=rank.desc()
+            )
+        )
+        .filter(position__lte=limit)
+        .order_by("content_type_id", "position")
+        .values_list("content_type_id", "object_id")
+    )
+
+
+def search_sqlite(search_terms, scopes, limit):
+    scope_sql, scope_params = get_scope_sql(scopes)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT content_type_id, object_id FROM (
+                SELECT
+                    entry.content_type_id,
+                    entry.object_id,
+                    ROW_NUMBER() OVER (
+                        PARTITION BY entry.content_type_id ORDER BY match.score
+                    ) AS position
+                FROM (
+                    SELECT rowid, bm25({FTS_TABLE}, %s, 1.0) AS score
+                    FROM {FTS_TABLE}
+                    WHERE {FTS_TABLE} MATCH %s
+                ) AS match
+                JOIN activity_feed_searchentry AS entry ON entry.id = match.rowid
+                WHERE {scope_sql}
+            )
+            WHERE position <= %s
+            ORDER BY content_type_id, position
+            """,
+            [TITLE_WEIGHT, get_fts5_query(search_terms), *scope_params, limit],
+        )
+        return cursor.fetchall()
+
+
+def search_fallback(search_terms, scopes, limit):
+    entries = SearchEntry.objects.filter(get_scope_filter(scopes))
+    for words in map(get_search_words, search_terms):
+        for word in words:
+            entries = entries.filter(Q(title__contains=word) | Q(body__contains=word))
+    return (
+        entries.annotate(
+            position=Window(
+                RowNumber(),
+                partition_by=F("content_type_id"),
+                order_by=F("object_id").desc(),
+            )
+        )
+        .filter(position__lte=limit)
+        .order_by("content_type_id", "position")
+        .values_list("content_type_id", "object_id")
+    )
+
+
+def search(search_terms, models, limit=SEARCH_LIMIT):
+    """
+    {model: [pk, ...]} of the best `limit` matches per model, best first.
+    Every model is a key, with an empty list if nothing matched.
+
+    A queryset may stand in for a model, to only rank the objects it lets
+    through, e.g. what the user may see: filtering afterwards would let hidden
+    top matches crowd out visible ones.
+    """
+    querysets = [
+        model if isinstance(model, QuerySet) else model._base_manager.all()
+        for model in models
+    ]
+    content_types = ContentType.objects.get_for_models(
+        *[queryset.model for queryset in querysets]
+    )
+    results = {queryset.model: [] for queryset in querysets}
+    if not any(map(get_search_words, search_terms)):
+        return results
+
+    # {content type id: queryset to restrict the matches to, or None}
+    scopes = {
+        content_types[queryset.model].id: queryset if queryset.query.where else None
+        for queryset in querysets
+    }
+    models_by_id = {
+        content_types[queryset.model].id: queryset.model for queryset in querysets
+    }
+    if connection.vendor == "postgresql":
+        matches = search_postgresql(search_terms, scopes, limit)
+    elif connection.vendor == "sqlite":
+        matches = search_sqlite(search_terms, scopes, limit)
+    else:
+        matches = search_fallback(search_terms, scopes, limit)
+    for content_type_id, object_id in matches:
+        results[models_by_id[content_type_id]].append(object_id)
+    return results
+
+
+def in_rank_order(queryset, pks):
+    """`queryset` restricted to `pks`, in their order."""
+    if not pks:
+        return queryset.none()
+    return (
+        queryset.filter(pk__in=pks)
+        .annotate(
+            search_position=Case(
+                *[When(pk=pk, then=Value(position)) for position, pk in enumerate(pks)]
+            )
+        )
+        .order_by("search_position")
+    )
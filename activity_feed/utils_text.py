@@ -0,0 +1,51 @@
+"""
+Search keys.
+
+Names are matched on a folded form, computed once when they are indexed and
+once per query, so that "Dvorak" finds "Dvořák", "ＡＢＣ" finds "ABC" and
+"strasse" finds "Straße" with a plain index lookup.
+"""
+
+import re
+import unicodedata
+
+# Letters that don't decompose into a base letter and a mark
+LETTERS = str.maketrans(
+    {
+        "æ": "ae",
+        "đ": "d",
+        "ð": "d",
+        "ħ": "h",
+        "ı": "i",
+        "ł": "l",
+        "ø": "o",
+        "œ": "oe",
+        "þ": "th",
+    }
+)
+
+# Kana voicing marks change the sound, not the accent, of a syllable
+KEPT_MARKS = {"\u3099", "\u309a"}
+
+# Scripts written without spaces between words: every character is a word
+CJK = re.compile(
+    "([\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\U00020000-\U0003134f])"
+)
+
+
+def fold(text):
+    """
+    Compatibility-normalized, casefolded form of `text`, without diacritics
+    and with runs of whitespace collapsed.
+    """
+    text = unicodedata.normalize("NFKD", str(text).casefold())
+    text = "".join(
+        char for char in text if not unicodedata.combining(char) or char in KEPT_MARKS
+    )
+    text = unicodedata.normalize("NFKC", text).translate(LETTERS)
+    return " ".join(text.split())
+
+
+def segment(text):
+    """Folded `text` with every CJK character as a word of its own."""
+    return " ".join(CJK.sub(r" \1 ", fold(text)).split())
@@ -0,0 +1,196 @@
+from django.contrib.auth import get_user_model
+from django.db.models import FilteredRelation, Q
+
+from .models import Activity, Block, Follow, TimelineEntry
+
+User = get_user_model()
+
+# Only these content models expose `visible_to` to the home feed for
+# "Mentioned" activities (see the GenericRelation `related_query_name`s).
+MENTION_VISIBILITY_MODELS = ("say", "post", "pin", "readcheckin")
+
+BATCH_SIZE = 1000
+
+
+###########
+# helpers #
+###########
+
+
+def get_visible_activities(user):
+    """
+    The reference visibility query for a user's home feed. The timeline
+    store must always agree with it; see `check_timeline`.
+    """
+    following_users = user.following.all().values_list("followed", flat=True)
+    blocked_users = user.blocking.values_list("blocked", flat=True)
+
+    return (
+        Activity.objects.filter(
+            Q(visibility=Activity.VISIBILITY_PUBLIC)
+            | Q(
+                visibility=Activity.VISIBILITY_MENTIONED,
+                say_activity__visible_to=user,
+            )
+            | Q(
+                visibility=Activity.VISIBILITY_MENTIONED,
+                post_activity__visible_to=user,
+            )
+            | Q(
+                visibility=Activity.VISIBILITY_MENTIONED,
+                pin_activity__visible_to=user,
+            )
+            | Q(
+                visibility=Activity.VISIBILITY_MENTIONED,
+                read_checkin_activity__visible_to=user,
+            )
+            | Q(visibility=Activity.VISIBILITY_FOLLOWERS, user__in=following_users)
+            | Q(visibility=Activity.VISIBILITY_PRIVATE, user=user)
+            | Q(user=user)  # Ensure the user sees their own activities
+        )
+        .exclude(user__in=blocked_users)
+        .distinct()
+    )
+
+
+def get_timeline_activities(user):
+    """
+    Activities in the user's precomputed home timeline, newest first. The
+    entry is exposed as `timeline_entry` so further filters on its timestamp
+    reuse the same join.
+    """
+    return (
+        Activity.objects.annotate(
+            timeline_entry=FilteredRelation(
+                "timeline_entries",
+                condition=Q(timeline_entries__recipient=user),
+            )
+        )
+        .filter(timeline_entry__isnull=False)
+        .order_by("-timeline_entry__timestamp", "-id")
+    )
+
+
+def get_activity_recipient_ids(activity):
+    if activity.visibility == Activity.VISIBILITY_PUBLIC:
+        recipient_ids = set(User.objects.values_list("id", flat=True))
+    elif activity.visibility == Activity.VISIBILITY_FOLLOWERS:
+        recipient_ids = set(
+            Follow.objects.filter(followed_id=activity.user_id).values_list(
+                "follower_id", flat=True
+            )
+        )
+    elif activity.visibility == Activity.VISIBILITY_MENTIONED:
+        recipient_ids = set()
+        content_object = activity.content_object
+        if (
+            activity.content_type.model in MENTION_VISIBILITY_MODELS
+            and content_object is not None
+        ):
+            recipient_ids.update(
+                content_object.visible_to.values_list("id", flat=True)
+            )
+    else:
+        recipient_ids = set()
+
+    # Authors always see their own activities
+    recipient_ids.add(activity.user_id)
+
+    recipient_ids.difference_update(
+        Block.objects.filter(blocked_id=activity.user_id).values_list(
+            "blocker_id", flat=True
+        )
+    )
+    return recipient_ids
+
+
+def _add_entries(pairs):
+    """Bulk insert (recipient_id, activity_id, timestamp) triples."""
+    entries = [
+        TimelineEntry(recipient_id=recipient_id, activity_id=activity_id, timestamp=ts)
+        for recipient_id, activity_id, ts in pairs
+    ]
+    TimelineEntry.objects.bulk_create(
+        entries, batch_size=BATCH_SIZE, ignore_conflicts=True
+    )
+
+
+###########
+# fan-out #
+###########
+
+
+def sync_activity_timeline(activity):
+    """Write (or rewrite) the timeline rows of a single activity."""
+    recipient_ids = get_activity_recipient_ids(activity)
+    existing_ids = set(
+        TimelineEntry.objects.filter(activity=activity).values_list(
+            "recipient_id", flat=True
+        )
+    )
+
+    stale_ids = existing_ids - recipient_ids
+    if stale_ids:
+        TimelineEntry.objects.filter(
+            activity=activity, recipient_id__in=stale_ids
+        ).delete()
+
+    _add_entries(
+        (recipient_id, activity.id, activity.timestamp)
+        for recipient_id in recipient_ids - existing_ids
+    )
+
+
+def sync_timeline_pair(recipient_id, author_id):
+    """
+    Reconcile the author's activities in the recipient's timeline, e.g.
+    after a follow, unfollow, block or unblock between the two.
+    """
+    recipient = User.objects.filter(pk=recipient_id).first()
+    if recipient is None or not User.objects.filter(pk=author_id).exists():
+        return
+
+    expected = dict(
+        get_visible_activities(recipient)
+        .filter(user_id=author_id)
+        .values_list("id", "timestamp")
+    )
+    existing_ids = set(
+        TimelineEntry.objects.filter(
+            recipient=recipient, activity__user_id=author_id
+        ).values_list("activity_id", flat=True)
+    )
+
+    stale_ids = existing_ids - expected.keys()
+    if stale_ids:
+        TimelineEntry.objects.filter(
+            recipient=recipient, activity_id__in=stale_ids
+        ).delete()
+
+    _add_entries(
+        (recipient.id, activity_id, expected[activity_id])
+        for activity_id in expected.keys() - existing_ids
+    )
+
+
+def rebuild_timeline(user):
+    """Recompute a user's whole timeline from the reference query."""
+    TimelineEntry.objects.filter(recipient=user).delete()
+    visible = get_visible_activities(user).values_list("id", "timestamp")
+    _add_entries(
+        (user.id, activity_id, timestamp) for activity_id, timestamp in list(visible)
+    )
+
+
+def check_timeline(user):
+    """
+    Compare the user's timeline with the reference query.
+    Returns a tuple of (missing activity ids, unexpected activity ids).
+    """
+    expected_ids = set(get_visible_activities(user).values_list("id", flat=True))
+    actual_ids = set(
+        TimelineEntry.objects.filter(recipient=user).values_list(
+            "activity_id", flat=True
+        )
+    )
+    return expected_ids - actual_ids, actual_ids - expected_ids
@@ -3,13 +3,14 @@ from calendar import Calendar
 from datetime import datetime
 
 import pytz
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.contenttypes.fields import GenericRelation
 from django.contrib.contenttypes.models import ContentType
-from django.db.models import Count, Min, Q
+from django.db.models import Count
 from django.http import Http404, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse, reverse_lazy
@@ -17,24 +18,30 @@ from django.utils import timezone
 from django.views.generic import DeleteView, ListView, View
 
 from accounts.models import WebAuthnCredential
-from entity.models import Creator
-from listen.models import Release
-from play.models import Game, GameReleaseDate
-from read.models import Book
-from watch.models import Movie, MovieReleaseDate, Series
 from write.forms import ActivityFeedSayForm
 from write.utils_formatting import check_required_js
 
 from .models import Activity, Block, Follow
+from .pagination import CursorPaginationMixin
+from .utils_anniversary import get_cached_on_this_day
+from .utils_timeline import get_timeline_activities, get_visible_activities
 
 User = get_user_model()
 
 
-class ActivityFeedView(LoginRequiredMixin, ListView):
+class ActivityFeedView(LoginRequiredMixin, CursorPaginationMixin, ListView):
     model = Activity
     template_name = "activity_feed/activity_feed.html"
     paginate_by = 20
 
+    def get_cursor_timestamp_field(self):
+        if settings.ACTIVITY_TIMELINE_ENABLED:
+            return "timeline_entry__timestamp"
+        return "timestamp"
+
+    def get_on_this_day_date(self, now):
+        return now.date()
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["say_form"] = ActivityFeedSayForm(user=self.request.user)
@@ -45,204 +52,13 @@ class ActivityFeedView(LoginRequiredMixin, ListView):
         now = timezone.localtime(
             timezone.now(), pytz.timezone(self.request.user.timezone)
         )  # Use user's timezone
-        current_month_day = now.strftime(".%m.%d")
         current_month_day_dash = now.strftime("-%m-%d")
 
         is_year_in_review_time = "-12-01" <= current_month_day_dash <= "-12-31"
         context["is_year_in_review_time"] = is_year_in_review_time
 
-        # Query for people born or died on this day
-        born_today = Creator.objects.filter(
-            Q(birth_date__contains=current_month_day)
-            | Q(birth_date__contains=current_month_day_dash),
-            creator_type="person",
-        ).order_by("birth_date")
-
-        died_today = Creator.objects.filter(
-            Q(death_date__contains=current_month_day)
-            | Q(death_date__contains=current_month_day_dash),
-            creator_type="person",
-        ).order_by("death_date")
-
-        # Query for groups formed or dissolved on this day
-        formed_today = Creator.objects.filter(
-            Q(birth_date__contains=current_month_day)
-            | Q(birth_date__contains=current_month_day_dash),
-            creator_type="group",
-        ).order_by("birth_date")
-
-        dissolved_today = Creator.objects.filter(
-            Q(death_date__contains=current_month_day)
-            | Q(death_date__contains=current_month_day_dash),
-            creator_type="group",
-        ).order_by("death_date")
-
-        # Calculate age at birth or death for persons
-        for creator in born_today:
-            year_part = creator.birth_date.split(
-                "-" if "-" in creator.birth_date else "."
-            )[0]
-            if "?" in year_part:  # Check if the year part is numeric
-                creator.since = "?"
-            else:
-                birth_year = int(year_part)
-                creator.since = now.year - birth_year
-
-        for creator in died_today:
-            death_year = int(
-                creator.death_date.split("-" if "-" in creator.death_date else ".")[0]
-            )
-            creator.since = now.year - death_year
-
-        # Calculate age at formation or dissolution for groups
-        for creator in formed_today:
-            formation_year = int(
-                creator.birth_date.split("-" if "-" in creator.birth_date else ".")[0]
-            )
-            creator.since = now.year - formation_year
-
-        for creator in dissolved_today:
-            dissolution_year = int(
-                creator.death_date.split("-" if "-" in creator.death_date else ".")[0]
-            )
-            creator.since = now.year - dissolution_year
-
-        context["born_today"] = born_today
-        context["died_today"] = died_today
-        context["formed_today"] = formed_today
-        context["dissolved_today"] = dissolved_today
-
-        # Query for books published on this day
-        books_published_today = Book.objects.filter(
-            Q(publication_date__contains=current_month_day)
-            | Q(publication_date__contains=current_month_day_dash)
-        ).order_by("publication_date")
-
-        # Calculate years since publication
-        for book in books_published_today:
-            publication_year = int(
-                book.publication_date.split(
-                    "-" if "-" in book.publication_date else "."
-                )[0]
-            )
-            book.since = now.year - publication_year
-            book.authors = book.bookrole_set.filter(role__name="Author").values(
-                "creator__name", "alt_name"
-            )
-
-        context["books_published_today"] = books_published_today
-
-        # Query for movies released on this day
-        movies_released_today = (
-            MovieReleaseDate.objects.values("movie")
-            .annotate(earliest_release=Min("release_date"))
-            .filter(
-                Q(earliest_release__contains=current_month_day)
-                | Q(earliest_release__contains=current_month_day_dash)
-            )
-            .order_by("earliest_release", "movie")
-        )
-
-        # Create a dictionary to hold the movies and their years since release
-        movies_dict = {}
-
-        # Calculate years since release
-        for release in movies_released_today:
-            release_year = int(
-                release["earliest_release"].split(
-                    "-" if "-" in release["earliest_release"] else "."
-                )[0]
-            )
-            since = now.year - release_year
-
-            # Retrieve the actual Movie object
-            movie = Movie.objects.get(pk=release["movie"])
-            movie.earliest_release = release["earliest_release"]
-
-            # Add or update the movie in the dictionary
-            if movie not in movies_dict:
-                movie.since = since
-                movies_dict[movie] = movie
-            else:
-                # Update the 'since' value if needed
-                if movies_dict[movie].since > since:
-                    movies_dict[movie].since = since
-
-        # Convert the dictionary values to a list
-        movies_released_today_list = list(movies_dict.values())
-
-        context["movies_released_today"] = movies_released_today_list
-
-        # Query for series released on this day
-        series_released_today = Series.objects.filter(
-            Q(release_date__contains=current_month_day)
-            | Q(release_date__contains=current_month_day_dash)
-        ).order_by("release_date")
-
-        # Calculate years since release
-        for serie in series_released_today:
-            release_year = int(
-                serie.release_date.split("-" if "-" in serie.release_date else ".")[0]
-            )
-            serie.since = now.year - release_year
-
-        context["series_released_today"] = series_released_today
-
-        # Query for music released on this day
-        music_released_today = Release.objects.filter(
-            Q(release_date__contains=current_month_day)
-            | Q(release_date__contains=current_month_day_dash)
-        ).order_by("release_date")
-
-        # Calculate years since release
-        for music in music_released_today:
-            release_year = int(
-                music.release_date.split("-" if "-" in music.release_date else ".")[0]
-            )
-            music.since = now.year - release_year
-
-        context["music_released_today"] = music_released_today
-
-        # Query for games with releases on this day
-        games_released_today = (
-            GameReleaseDate.objects.values("game")
-            .annotate(earliest_release=Min("release_date"))
-            .filter(
-                Q(earliest_release__contains=current_month_day)
-                | Q(earliest_release__contains=current_month_day_dash)
-            )
-            .order_by("earliest_release", "game")
-        )
-
-        # Create a dictionary to hold the games and their years since release
-        games_dict = {}
-
-        # Calculate years since release
-        for release in games_released_today:
-            release_year = int(
-                release["earliest_release"].split(
-                    "-" if "-" in release["earliest_release"] else "."
-                )[0]
-            )
-            since = now.year - release_year
-
-            # Retrieve the actual Game object
-            game = Game.objects.get(pk=release["game"])
-            game.earliest_release = release["earliest_release"]
-
-            # Add or update the game in the dictionary
-            if game not in games_dict:
-                game.since = since
-                games_dict[game] = game
-            else:
-                # Update the 'since' value if needed
-                if games_dict[game].since > since:
-                    games_dict[game].since = since
-
-        # Convert the dictionary values to a list
-        games_released_today_list = list(games_dict.values())
-
-        context["games_released_today"] = games_released_today_list
+        # Creators, books, movies, series, music and games on this day
+        context.update(get_cached_on_this_day(self.get_on_this_day_date(now), now))
 
         # Add calendar context
         cal = Calendar()
@@ -271,38 +87,14 @@ class ActivityFeedView(LoginRequiredMixin, ListView):
 
     def get_queryset(self):
         user = self.request.user
-        following_users = user.following.all().values_list("followed", flat=True)
-        blocked_users = user.blocking.values_list("blocked", flat=True)
 
         # Get filter from session
         selected_filter = self.request.session.get("selected_filter", "all")
 
-        visible_activities = (
-            Activity.objects.filter(
-                Q(visibility=Activity.VISIBILITY_PUBLIC)
-                | Q(
-                    visibility=Activity.VISIBILITY_MENTIONED,
-                    say_activity__visible_to=user,
-                )
-                | Q(
-                    visibility=Activity.VISIBILITY_MENTIONED,
-                    post_activity__visible_to=user,
-                )
-                | Q(
-                    visibility=Activity.VISIBILITY_MENTIONED,
-                    pin_activity__visible_to=user,
-                )
-                | Q(
-                    visibility=Activity.VISIBILITY_MENTIONED,
-                    read_checkin_activity__visible_to=user,
-                )
-                | Q(visibility=Activity.VISIBILITY_FOLLOWERS, user__in=following_users)
-                | Q(visibility=Activity.VISIBILITY_PRIVATE, user=user)
-                | Q(user=user)  # Ensure the user sees their own activities
-            )
-            .exclude(user__in=blocked_users)
-            .distinct()
-        )
+        if settings.ACTIVITY_TIMELINE_ENABLED:
+            visible_activities = get_timeline_activities(user)
+        else:
+            visible_activities = get_visible_activities(user).order_by("-timestamp")
 
         # Apply filter based on session value
         if selected_filter == "all":
@@ -324,7 +116,7 @@ class ActivityFeedView(LoginRequiredMixin, ListView):
                 activity_type__startswith=selected_filter
             )
 
-        return visible_activities.order_by("-timestamp")
+        return visible_activities
 
 
 class ActivityFeedDeleteView(LoginRequiredMixin, DeleteView):
@@ -430,6 +222,9 @@ def unblock_view(request, user_id):
 
 
 class CalendarActivityFeedView(ActivityFeedView):
+    def get_cursor_timestamp_field(self):
+        return "timestamp"
+
     def get_queryset(self):
         selected_date = self.kwargs.get("selected_date")
         try:
@@ -449,223 +244,16 @@ class CalendarActivityFeedView(ActivityFeedView):
             .order_by("-timestamp")
         )
 
+    def get_on_this_day_date(self, now):
+        try:
+            return timezone.datetime.strptime(
+                self.kwargs.get("selected_date"), "%Y-%m-%d"
+            ).date()
+        except ValueError:
+            return now.date()
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["say_form"] = ActivityFeedSayForm(user=self.request.user)
-        context["feed_type"] = "public"
-        context["no_citation_css"] = True
-        # Add date to the context
-        selected_date_str = self.kwargs.get("selected_date")
-
-        # Convert selected_date_str to a datetime object, using the user's timezone
-        selected_date = timezone.datetime.strptime(selected_date_str, "%Y-%m-%d").date()
-        selected_datetime = timezone.make_aware(
-            timezone.datetime.combine(selected_date, timezone.datetime.min.time())
-        )
-        selected_datetime = timezone.localtime(
-            selected_datetime, pytz.timezone(self.request.user.timezone)
-        )
-
-        # Get month and day of selected_date
-        selected_month_day = selected_datetime.strftime(".%m.%d")
-        selected_month_day_dash = selected_datetime.strftime("-%m-%d")
-
-        # Query for people born or died on this day
-        born_today = Creator.objects.filter(
-            Q(birth_date__contains=selected_month_day)
-            | Q(birth_date__contains=selected_month_day_dash),
-            creator_type="person",
-        ).order_by("birth_date")
-
-        died_today = Creator.objects.filter(
-            Q(death_date__contains=selected_month_day)
-            | Q(death_date__contains=selected_month_day_dash),
-            creator_type="person",
-        ).order_by("death_date")
-
-        # Query for groups formed or dissolved on this day
-        formed_today = Creator.objects.filter(
-            Q(birth_date__contains=selected_month_day)
-            | Q(birth_date__contains=selected_month_day_dash),
-            creator_type="group",
-        ).order_by("birth_date")
-
-        dissolved_today = Creator.objects.filter(
-            Q(death_date__contains=selected_month_day)
-            | Q(death_date__contains=selected_month_day_dash),
-            creator_type="group",
-        ).order_by("death_date")
-
-        # Calculate age at birth or death for persons
-        for creator in born_today:
-            year_part = creator.birth_date.split(
-                "-" if "-" in creator.birth_date else "."
-            )[0]
-            if "?" in year_part:  # Check if the year part is numeric
-                creator.since = "?"
-            else:
-                birth_year = int(year_part)
-                creator.since = selected_datetime.year - birth_year
-
-        for creator in died_today:
-            death_year = int(
-                creator.death_date.split("-" if "-" in creator.death_date else ".")[0]
-            )
-            creator.since = selected_datetime.year - death_year
-
-        # Calculate age at formation or dissolution for groups
-        for creator in formed_today:
-            formation_year = int(
-                creator.birth_date.split("-" if "-" in creator.birth_date else ".")[0]
-            )
-            creator.since = selected_datetime.year - formation_year
-
-        for creator in dissolved_today:
-            dissolution_year = int(
-                creator.death_date.split("-" if "-" in creator.death_date else ".")[0]
-            )
-            creator.since = selected_datetime.year - dissolution_year
-
-        context["born_today"] = born_today
-        context["died_today"] = died_today
-        context["formed_today"] = formed_today
-        context["dissolved_today"] = dissolved_today
-
-        # Query for books published on this day
-        books_published_today = Book.objects.filter(
-            Q(publication_date__contains=selected_month_day)
-            | Q(publication_date__contains=selected_month_day_dash)
-        ).order_by("publication_date")
-
-        # Calculate years since publication
-        for book in books_published_today:
-            publication_year = int(
-                book.publication_date.split(
-                    "-" if "-" in book.publication_date else "."
-                )[0]
-            )
-            book.since = selected_datetime.year - publication_year
-            book.authors = book.bookrole_set.filter(role__name="Author").values(
-                "creator__name", "alt_name"
-            )
-
-        context["books_published_today"] = books_published_today
-
-        movies_released_today = (
-            MovieReleaseDate.objects.values("movie")
-            .annotate(earliest_release=Min("release_date"))
-            .filter(
-                Q(earliest_release__contains=selected_month_day)
-                | Q(earliest_release__contains=selected_month_day_dash)
-            )
-            .order_by("earliest_release", "movie")
-        )
-
-        # Create a dictionary to hold the movies and their years since release
-        movies_dict = {}
-
-        # Calculate years since release
-        for release in movies_released_today:
-            release_year = int(
-                release["earliest_release"].split(
-                    "-" if "-" in release["earliest_release"] else "."
-                )[0]
-            )
-            since = selected_datetime.year - release_year
-
-            # Retrieve the actual Movie object
-            movie = Movie.objects.get(pk=release["movie"])
-            movie.earliest_release = release["earliest_release"]
-
-            # Add or update the movie in the dictionary
-            if movie not in movies_dict:
-                movie.since = since
-                movies_dict[movie] = movie
-            else:
-                # Update the 'since' value if needed
-                if movies_dict[movie].since > since:
-                    movies_dict[movie].since = since
-
-        # Convert the dictionary values to a list
-        movies_released_today_list = list(movies_dict.values())
-
-        context["movies_released_today"] = movies_released_today_list
-
-        # Query for series released on this day
-        series_released_today = Series.objects.filter(
-            Q(release_date__contains=selected_month_day)
-            | Q(release_date__contains=selected_month_day_dash)
-        ).order_by("release_date")
-
-        # Calculate years since release
-        for serie in series_released_today:
-            release_year = int(
-                serie.release_date.split("-" if "-" in serie.release_date else ".")[0]
-            )
-            serie.since = selected_datetime.year - release_year
-
-        context["series_released_today"] = series_released_today
-
-        # Query for music released on this day
-        music_released_today = Release.objects.filter(
-            Q(release_date__contains=selected_month_day)
-            | Q(release_date__contains=selected_month_day_dash)
-        ).order_by("release_date")
-
-        # Calculate years since release
-        for music in music_released_today:
-            release_year = int(
-                music.release_date.split("-" if "-" in music.release_date else ".")[0]
-            )
-            music.since = selected_datetime.year - release_year
-
-        context["music_released_today"] = music_released_today
-
-        # Query for games with releases on this day
-        games_released_today = (
-            GameReleaseDate.objects.values("game")
-            .annotate(earliest_release=Min("release_date"))
-            .filter(
-                Q(earliest_release__contains=selected_month_day)
-                | Q(earliest_release__contains=selected_month_day_dash)
-            )
-            .order_by("earliest_release", "game")
-        )
-
-        # Create a dictionary to hold the games and their years since release
-        games_dict = {}
-
-        # Calculate years since release
-        for release in games_released_today:
-            release_year = int(
-                release["earliest_release"].split(
-                    "-" if "-" in release["earliest_release"] else "."
-                )[0]
-            )
-            since = selected_date.year - release_year
-
-            # Retrieve the actual Game object
-            game = Game.objects.get(pk=release["game"])
-            game.earliest_release = release["earliest_release"]
-
-            # Add or update the game in the dictionary
-            if game not in games_dict:
-                game.since = since
-                games_dict[game] = game
-            else:
-                # Update the 'since' value if needed
-                if games_dict[game].since > since:
-                    games_dict[game].since = since
-
-        # Convert the dictionary values to a list
-        games_released_today_list = list(games_dict.values())
-
-        context["games_released_today"] = games_released_today_list
-
-        # Add calendar context
-        cal = Calendar()
-        today = timezone.localtime(timezone.now()).date()
-        context["calendar"] = cal.monthdayscalendar(today.year, today.month)
-        context["selected_date"] = selected_datetime.strftime("%Y-%m-%d")
+        context["selected_date"] = self.kwargs.get("selected_date")
 
         return context
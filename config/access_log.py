@@ -0,0 +1,134 @@
+"""
+Structured access log: one JSON object per line and request.
+
+    {"v": 1, "ts": "2024-06-10T12:00:00.000000+00:00", "ip": "1.2.3.4",
+     "method": "GET", "path": "/read/book/1/?page=2", "status": 200,
+     "duration_ms": 42.1, "size": 5120, "db_queries": 7,
+     "view": "read:book_detail", "user_id": 3, "user_agent": "...",
+     "sample_rate": 1.0}
+
+The keys are stable (new ones may be added, existing ones are not renamed;
+"v" changes otherwise), so a log can be replayed against a local instance,
+e.g. by `manage.py bench`. Records are written by a background thread, so
+request threads never wait on log I/O. "db_queries" is counted by
+`metrics.ServerTimingMiddleware`.
+"""
+
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from django.conf import settings
+
+FORMAT_VERSION = 1
+
+logger = logging.getLogger("config.access")
+
+
+###########
+# helpers #
+###########
+
+
+class JSONLinesFormatter(logging.Formatter):
+    def format(self, record):
+        return json.dumps(record.access, separators=(",", ":"), default=str)
+
+
+class AccessLogHandler(QueueHandler):
+    """
+    Queues records and writes them as JSON lines on a listener thread, to
+    `filename` if given, otherwise to `stream` (stdout by default).
+
+    Logging is configured in every process, including management commands
+    and the parent of forked workers, so the thread and the file are only
+    started by the first record.
+    """
+
+    def __init__(self, filename=None, stream=None):
+        super().__init__(queue.SimpleQueue())
+        if filename:
+            target = logging.FileHandler(filename, delay=True)
+        else:
+            target = logging.StreamHandler(stream or sys.stdout)
+        target.setFormatter(JSONLinesFormatter())
+        self.listener = QueueListener(self.queue, target)
+        self.started = False
+        self.start_lock = threading.Lock()
+
+    def start(self):
+        with self.start_lock:
+            if not self.started:
+                self.listener.start()
+                atexit.register(self.stop)
+                self.started = True
+
+    def stop(self):
+        # Writes out what is still queued
+        with self.start_lock:
+            if self.started:
+                self.listener.stop()
+                self.started = False
+
+    def enqueue(self, record):
+        if not self.started:
+            self.start()
+        super().enqueue(record)
+
+    def prepare(self, record):
+        # Formatting happens on the listener thread
+        return record
+
+
+def get_sample_rate(path):
+    """The share of requests to `path` that is logged, by longest prefix."""
+    sample_rates = getattr(settings, "ACCESS_LOG_SAMPLE_RATES", {})
+    prefixes = [prefix for prefix in sample_rates if path.startswith(prefix)]
+    if not prefixes:
+        return 1.0
+    return sample_rates[max(prefixes, key=len)]
+
+
+def get_response_size(response):
+    if response.streaming:
+        return (
+            int(response["Content-Length"])
+            if response.has_header("Content-Length")
+            else None
+        )
+    return len(response.content)
+
+
+def log_access(request, response, ip_address, duration, db_queries=None):
+    sample_rate = get_sample_rate(request.path)
+    if sample_rate < 1 and random.random() >= sample_rate:
+        return
+
+    user = getattr(request, "user", None)
+    resolver_match = getattr(request, "resolver_match", None)
+    logger.info(
+        "access",
+        extra={
+            "access": {
+                "v": FORMAT_VERSION,
+                "ts": datetime.now(timezone.utc).isoformat(),
+                "ip": ip_address,
+                "method": request.method,
+                "path": request.get_full_path(),
+                "status": response.status_code,
+                "duration_ms": round(duration * 1000, 1),
+                "size": get_response_size(response),
+                "db_queries": db_queries,
+                "view": resolver_match.view_name if resolver_match else None,
+                "user_id": user.id if user and user.is_authenticated else None,
+                "user_agent": request.META.get("HTTP_USER_AGENT", ""),
+                "sample_rate": sample_rate,
+            }
+        },
+    )
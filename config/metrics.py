@@ -0,0 +1,189 @@
+import threading
+import time
+from collections import defaultdict, deque
+from contextvars import ContextVar
+from functools import wraps
+
+from django.db import connection
+from django.template.backends.django import DjangoTemplates, Template
+
+# Requests kept per view for the rolling percentiles
+WINDOW = 1000
+
+_timings = ContextVar("request_timings", default=None)
+
+
+###########
+# helpers #
+###########
+
+
+class RequestTimings:
+    """Where the time of one request went, in milliseconds."""
+
+    def __init__(self):
+        self.db_ms = 0.0
+        self.db_queries = 0
+        self.template_ms = 0.0
+        self.context_processors_ms = 0.0
+        self.total_ms = 0.0
+        self.rendering = False
+
+    def __call__(self, execute, sql, params, many, context):
+        # Used as a `connection.execute_wrapper`
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_ms += (time.perf_counter() - started) * 1000
+            self.db_queries += 1
+
+    def server_timing(self):
+        # Queries run inside templates count towards both db and tpl
+        return ", ".join(
+            [
+                f'db;dur={self.db_ms:.1f};desc="{self.db_queries} queries"',
+                f'tpl;dur={self.template_ms:.1f};desc="templates"',
+                f'cp;dur={self.context_processors_ms:.1f};desc="context processors"',
+                f'total;dur={self.total_ms:.1f};desc="view"',
+            ]
+        )
+
+
+def _timed(attribute, function):
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        timings = _timings.get()
+        if timings is None:
+            return function(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            setattr(timings, attribute, getattr(timings, attribute) + elapsed)
+
+    return wrapper
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        timings = _timings.get()
+        # Templates rendered by this one, e.g. with render_to_string in a
+        # tag, are part of its time
+        if timings is None or timings.rendering:
+            return super().render(context, request)
+        timings.rendering = True
+        context_processors_ms = timings.context_processors_ms
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            timings.rendering = False
+            elapsed = (time.perf_counter() - started) * 1000
+            # The context processors run as the context is bound, they are
+            # reported apart
+            timings.template_ms += elapsed - (
+                timings.context_processors_ms - context_processors_ms
+            )
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """
+    The Django template backend, timing renders and context processors for
+    `ServerTimingMiddleware`. Only the engine of this backend is wrapped.
+    """
+
+    def __init__(self, params):
+        super().__init__(params)
+        self.engine.template_context_processors = tuple(
+            _timed("context_processors_ms", processor)
+            for processor in self.engine.template_context_processors
+        )
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
+
+
+def percentile(values, share):
+    """Nearest-rank percentile of a sorted list."""
+    if not values:
+        return None
+    index = max(0, min(len(values) - 1, round(share * len(values)) - 1))
+    return values[index]
+
+
+class ViewMetrics:
+    """Rolling per-view timings of this process."""
+
+    def __init__(self, window=WINDOW):
+        self.samples = defaultdict(lambda: deque(maxlen=window))
+        self.lock = threading.Lock()
+
+    def record(self, view_name, timings):
+        with self.lock:
+            self.samples[view_name].append(
+                (timings.total_ms, timings.db_ms, timings.db_queries)
+            )
+
+    def report(self):
+        """Per-view percentiles, slowest (by p95) first."""
+        with self.lock:
+            samples = {view: list(values) for view, values in self.samples.items()}
+        rows = []
+        for view_name, values in samples.items():
+            totals = sorted(total for total, _, _ in values)
+            rows.append(
+                {
+                    "view": view_name,
+                    "count": len(values),
+                    "p50": percentile(totals, 0.50),
+                    "p95": percentile(totals, 0.95),
+                    "p99": percentile(totals, 0.99),
+                    "db_ms": sum(db for _, db, _ in values) / len(values),
+                    "queries": sum(q for _, _, q in values) / len(values),
+                }
+            )
+        return sorted(rows, key=lambda row: row["p95"], reverse=True)
+
+    def clear(self):
+        with self.lock:
+            self.samples.clear()
+
+
+view_metrics = ViewMetrics()
+
+
+class ServerTimingMiddleware:
+    """
+    Measures DB, template and context-processor time of every request,
+    records it per URL name and, for staff, sends it as a Server-Timing
+    header. Templates are timed by the `TimedDjangoTemplates` backend.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        # Also read by LogIPMiddleware for the access log
+        request.timings = timings = RequestTimings()
+        token = _timings.set(timings)
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(timings):
+                response = self.get_response(request)
+        finally:
+            _timings.reset(token)
+        timings.total_ms = (time.perf_counter() - started) * 1000
+
+        resolver_match = getattr(request, "resolver_match", None)
+        if resolver_match is not None and resolver_match.view_name:
+            view_metrics.record(resolver_match.view_name, timings)
+
+        user = getattr(request, "user", None)
+        if user is not None and user.is_authenticated and user.is_staff:
+            response["Server-Timing"] = timings.server_timing()
+        return response
@@ -15,6 +15,9 @@ from django.utils import timezone
 from django_ratelimit.core import is_ratelimited
 
 from accounts.models import BlockedIP, CustomUser
+from accounts.utils_blocklist import blocked_ips
+
+from .access_log import log_access
 
 
 class TimezoneMiddleware:
@@ -35,6 +38,10 @@ class TimezoneMiddleware:
 logger = logging.getLogger("config")
 
 
+# Deprecated endpoint; any IP requesting it is added to the blocklist
+DEPRECATED_INBOX_PATTERN = re.compile(r"^/u/[^/]+/inbox/$")
+
+
 class LogIPMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
@@ -49,51 +56,56 @@ class LogIPMiddleware:
         else:
             ip_address = request.META.get("REMOTE_ADDR")
 
-        # Get additional information for logging
-        method = request.method  # GET, POST, etc.
-        path = request.get_full_path()  # The full URL path (including query parameters)
-        user_agent = request.META.get("HTTP_USER_AGENT", "")
-        # Process the request and get the response
-        response = self.get_response(request)
+        started = time.perf_counter()
 
-        # Allow access to robots.txt for all IPs, even blocked ones
-        if request.path == "/robots.txt":
-            logger.warning(
-                f"IP: {ip_address} | User-Agent: {user_agent} | Method: {method} | Path: {path} | Status: {response.status_code}"
-            )
-            return self.get_response(request)
-
-        # Check if the IP is blocked by querying the BlockedIP model
-        if BlockedIP.objects.filter(ip_address=ip_address).exists():
-            logger.warning(
-                f"Blocked malicious IP: {ip_address} tried to access {request.path}"
-            )
-            return HttpResponseForbidden("Forbidden: Your IP is blocked.")
-
-        # Handle deprecated endpointsq
-        if re.match(r"^/u/[^/]+/inbox/$", request.path):
-            # Add the IP to BlockedIP model if it tries to access this deprecated endpoint
-            BlockedIP.objects.get_or_create(
-                ip_address=ip_address,
-                defaults={"reason": "Attempted access to deprecated /inbox/ endpoint."},
-            )
-
-            # Introduce a delay to slow down bots
-            limited = is_ratelimited(
-                request, group="deprecated_inbox", key="ip", rate="1/d", increment=True
-            )
-            if limited:
-                logger.warning(f"Rate limited: {request.path} from IP: {ip_address}")
-                return HttpResponseGone("Too many requests.")
-            else:
+        # Reject blocked IPs and deprecated endpoints before the view runs.
+        # robots.txt stays accessible for all IPs, even blocked ones.
+        if request.path != "/robots.txt":
+            if ip_address in blocked_ips:
                 logger.warning(
-                    f"Deprecated endpoint accessed: {request.path} from IP: {ip_address}"
+                    f"Blocked malicious IP: {ip_address} tried to access {request.path}"
                 )
-            return HttpResponseGone("This endpoint is no longer available.")
+                response = HttpResponseForbidden("Forbidden: Your IP is blocked.")
+                log_access(request, response, ip_address, time.perf_counter() - started)
+                return response
+
+            if DEPRECATED_INBOX_PATTERN.match(request.path):
+                response = self.handle_deprecated_inbox(request, ip_address)
+                log_access(request, response, ip_address, time.perf_counter() - started)
+                return response
+
+        # Process the request and get the response
+        response = self.get_response(request)
 
-        # Log the IP address, request method, path, and status code for all requests
-        logger.warning(
-            f"IP: {ip_address} | User-Agent: {user_agent} | Method: {method} | Path: {path} | Status: {response.status_code}"
+        # Log every request as a structured access log record, with the
+        # queries counted by ServerTimingMiddleware
+        timings = getattr(request, "timings", None)
+        log_access(
+            request,
+            response,
+            ip_address,
+            time.perf_counter() - started,
+            db_queries=timings.db_queries if timings else None,
         )
 
         return response
+
+    def handle_deprecated_inbox(self, request, ip_address):
+        # Add the IP to BlockedIP model if it tries to access this deprecated endpoint
+        BlockedIP.objects.get_or_create(
+            ip_address=ip_address,
+            defaults={"reason": "Attempted access to deprecated /inbox/ endpoint."},
+        )
+
+        # Introduce a delay to slow down bots
+        limited = is_ratelimited(
+            request, group="deprecated_inbox", key="ip", rate="1/d", increment=True
+        )
+        if limited:
+            logger.warning(f"Rate limited: {request.path} from IP: {ip_address}")
+            return HttpResponseGone("Too many requests.")
+        else:
+            logger.warning(
+                f"Deprecated endpoint accessed: {request.path} from IP: {ip_address}"
+            )
+        return HttpResponseGone("This endpoint is no longer available.")
@@ -86,6 +86,7 @@ MIDDLEWARE = [
     "django.middleware.gzip.GZipMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "config.middleware.LogIPMiddleware",
+    "config.metrics.ServerTimingMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
@@ -103,7 +104,8 @@ ROOT_URLCONF = "config.urls"
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        # DjangoTemplates, timed for the Server-Timing header
+        "BACKEND": "config.metrics.TimedDjangoTemplates",
         "DIRS": [
             os.path.join(BASE_DIR, "templates"),
         ],
@@ -346,9 +348,19 @@ MARKDOWNIFY = {
                 "separator": "_",  # Separator of your choice
             },
         },
-    }
+    },
+    # RSS feeds: plain markdown, no sanitising
+    "feed": {
+        "BLEACH": False,
+        "MARKDOWN_EXTENSIONS": ["pymdownx.saneheaders"],
+    },
 }
 
+# Rendered markdown is stored per renderer version (see write/utils_markdown.py).
+# The MARKDOWNIFY settings are part of the version already; bump this when the
+# output of a custom extension changes, then run `manage.py render_markdown`.
+MARKDOWN_RENDERER_VERSION = "1"
+
 
 REST_FRAMEWORK = {
     "DEFAULT_VERSIONING_CLASS": "rest_framework.versioning.NamespaceVersioning",
@@ -362,6 +374,19 @@ DEFAULT_HOST = "root"
 
 DATA_UPLOAD_MAX_NUMBER_FIELDS = 5000
 
+# Serve the home feed from the precomputed timeline store. The store is always
+# kept up to date; run `manage.py rebuild_timeline` and `manage.py check_timeline`
+# before switching this on.
+ACTIVITY_TIMELINE_ENABLED = env.bool("ACTIVITY_TIMELINE_ENABLED", default=False)
+
+
+# Access log: stdout unless a file is given. Sample rates by path prefix
+# (the longest matching prefix wins) keep noisy paths from flooding it.
+ACCESS_LOG_FILE = env.str("ACCESS_LOG_FILE", default=None)
+ACCESS_LOG_SAMPLE_RATES = {
+    "/static/": 0.0,
+    "/media/": 0.0,
+}
 
 LOGGING = {
     "version": 1,
@@ -376,6 +401,11 @@ LOGGING = {
             "class": "logging.StreamHandler",
             "stream": "ext://sys.stdout",  # Log to stdout (captured by Fly.io)
         },
+        "access": {
+            # JSON lines, written on a background thread
+            "class": "config.access_log.AccessLogHandler",
+            "filename": ACCESS_LOG_FILE,
+        },
     },
     "loggers": {
         "django": {
@@ -388,5 +418,10 @@ LOGGING = {
             "level": "WARNING",
             "propagate": True,
         },
+        "config.access": {
+            "handlers": ["access"],
+            "level": "INFO",
+            "propagate": False,
+        },
     },
 }
@@ -0,0 +1,179 @@
+import time
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from accounts.models import CustomUser
+from activity_feed.models import Activity, Follow
+from discover.models import Vote
+from entity.models import Company, Creator, Role
+from read.models import Book, BookRole, ReadCheckIn
+from visit.models import Location, VisitCheckIn
+from write import utils_markdown, utils_mentions
+from write.models import Comment, LuvList, Pin, Post, Repost, Say
+
+# Wall-time ceiling per request; generous, it only catches pathological cases
+WALL_TIME_BUDGET = 2.0
+
+
+class QueryBudgetTest(TestCase):
+    """
+    Hot views must stay within a fixed number of queries, and that number
+    must not grow with the data shown: each view is requested, more of the
+    data it lists is added, and it is requested again.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = CustomUser.objects.create_user(username="viewer", password="pw")
+        cls.author = CustomUser.objects.create_user(
+            username="author", password="pw", privacy_level="public"
+        )
+        Follow.objects.create(follower=cls.viewer, followed=cls.author)
+        cls.author_role = Role.objects.create(name="Author", domain="read")
+        cls.publisher = Company.objects.create(name="Press")
+        cls.creator = Creator.objects.create(name="Writer")
+        cls.book = cls.add_book("Novel")
+        continent = Location.objects.create(name="Europe", level=Location.LEVEL0)
+        country = Location.objects.create(
+            name="France", level=Location.LEVEL1, parent=continent
+        )
+        cls.location = Location.objects.create(
+            name="Paris", level=Location.LEVEL3, parent=country
+        )
+
+    @classmethod
+    def add_book(cls, title):
+        book = Book(title=title, publisher=cls.publisher, publication_date="2020")
+        book.save()
+        BookRole.objects.create(book=book, creator=cls.creator, role=cls.author_role)
+        return book
+
+    def add_items(self, count=3):
+        # Run what waits for the commit too, e.g. search indexing
+        with self.captureOnCommitCallbacks(execute=True):
+            self._add_items(count)
+
+    def _add_items(self, count):
+        for i in range(count):
+            user = CustomUser.objects.create_user(username=f"user{time.time_ns()}")
+            Follow.objects.create(follower=self.viewer, followed=user)
+            book = self.add_book(f"Book {i}")
+            for content_object in (self.book, book):
+                checkin = ReadCheckIn.objects.create(
+                    user=user,
+                    content_object=content_object,
+                    status="reading",
+                    content="reading #novel",
+                    share_to_feed=True,
+                )
+                Vote.objects.create(
+                    user=self.viewer, content_object=checkin, value=Vote.UPVOTE
+                )
+            VisitCheckIn.objects.create(
+                user=user,
+                content_object=self.location,
+                status="visited",
+                content="been there #novel",
+                share_to_feed=True,
+            )
+            say = Say.objects.create(user=self.author, content=f"say {i} #novel")
+            Comment.objects.create(user=user, content_object=say, content="nice")
+            post = Post.objects.create(
+                user=self.author, title=f"Novel post {i}", content="post #novel"
+            )
+            Vote.objects.create(user=user, content_object=post, value=Vote.UPVOTE)
+            pin = Pin.objects.create(
+                user=user,
+                title=f"Novel pin {i}",
+                url=f"https://example.com/{i}",
+                content="pin #novel",
+            )
+            Vote.objects.create(user=user, content_object=pin, value=Vote.UPVOTE)
+            luvlist = LuvList.objects.create(
+                user=user, title=f"Novel list {i}", notes="list #novel"
+            )
+            Vote.objects.create(user=user, content_object=luvlist, value=Vote.UPVOTE)
+            Repost.objects.create(
+                user=user,
+                original_activity=Activity.objects.get(id=say.get_activity_id()),
+                content_object=say,
+                content="look #novel",
+            )
+
+    def get_client(self, login):
+        # A fresh client per request: search refuses back-to-back queries
+        client = self.client_class()
+        if login:
+            client.force_login(self.viewer)
+        return client
+
+    def clear_caches(self):
+        cache.clear()
+        utils_markdown._memo.clear()
+        utils_mentions._cache.clear()
+
+    def measure(self, url, login):
+        # A first request sets up what every process does once, e.g. loading
+        # the IP blocklist; caches are then emptied so what they hide counts
+        self.get_client(login).get(url)
+        self.clear_caches()
+        client = self.get_client(login)
+        started = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        elapsed = time.perf_counter() - started
+        self.assertEqual(response.status_code, 200, url)
+        return len(queries), elapsed
+
+    def assertQueryBudget(self, url, max_queries, login=True):
+        self.add_items(1)
+        baseline, _ = self.measure(url, login)
+        self.add_items(2)
+        queries, elapsed = self.measure(url, login)
+        self.assertEqual(queries, baseline, f"{url}: queries grow with the data")
+        self.assertLessEqual(queries, max_queries, f"{url}: over the query budget")
+        self.assertLess(elapsed, WALL_TIME_BUDGET, f"{url}: over the time budget")
+
+    def test_activity_feed(self):
+        self.assertQueryBudget(reverse("activity_feed:activity_feed"), 25)
+
+    def test_profile(self):
+        self.assertQueryBudget(reverse("accounts:detail", args=["author"]), 38)
+
+    def test_book_detail(self):
+        self.assertQueryBudget(reverse("read:book_detail", args=[self.book.id]), 32)
+
+    def test_creator_detail(self):
+        self.assertQueryBudget(
+            reverse("entity:creator_detail", args=[self.creator.id]), 50
+        )
+
+    def test_location_detail(self):
+        self.assertQueryBudget(
+            reverse("visit:location_detail", args=[self.location.id]), 28
+        )
+
+    def test_search(self):
+        self.assertQueryBudget(reverse("search") + "?q=novel", 19)
+
+    def test_discover(self):
+        self.assertQueryBudget(reverse("discover:all"), 37)
+        for name in ("discover:lists", "discover:posts", "discover:pins"):
+            self.assertQueryBudget(reverse(name), 9)
+
+    def test_tag_list(self):
+        self.assertQueryBudget(reverse("write:tag_list", args=["novel"]), 41)
+
+    def test_rss_feeds(self):
+        self.assertQueryBudget(
+            reverse("accounts:user_activity_feed", args=["author"]), 7, login=False
+        )
+        for name in ("write:user_say_feed", "write:user_post_feed"):
+            self.assertQueryBudget(reverse(name, args=["author"]), 6, login=False)
+        self.assertQueryBudget(
+            reverse("write:tag_list_feed", args=["novel"]), 15, login=False
+        )
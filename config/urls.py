@@ -6,6 +6,7 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
 from django.contrib.auth.decorators import login_required
+from django.contrib.auth.mixins import UserPassesTestMixin
 from django.contrib.auth.views import redirect_to_login
 from django.contrib.sitemaps.views import sitemap
 from django.http import Http404, HttpResponse, HttpResponseServerError
@@ -14,6 +15,7 @@ from django.template import loader
 from django.urls import include, path, re_path, reverse
 from django.utils.decorators import method_decorator
 from django.views import View
+from django.views.generic import TemplateView
 
 from accounts.views import (
     CustomLoginView,
@@ -26,11 +28,13 @@ from accounts.views import (
     generate_registration_view,
     get_followed_usernames,
     get_user_tags,
+    search_section_view,
     search_view,
     signup_passkey,
     verify_authentication_view,
     verify_registration_view,
 )
+from config.metrics import WINDOW, view_metrics
 from entity.sitemaps import PersonSiteMap
 from listen.sitemaps import ReleaseSiteMap
 from play.sitemaps import GameSiteMap
@@ -88,6 +92,19 @@ class RedirectToAccountUpdate(View):
         return redirect(reverse("accounts:update", kwargs={"username": username}))
 
 
+class PerformanceView(UserPassesTestMixin, TemplateView):
+    template_name = "performance.html"
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["views"] = view_metrics.report()
+        context["window"] = WINDOW
+        return context
+
+
 def site_manifest(request):
     data = {
         "name": "LʌvDB",
@@ -122,6 +139,7 @@ urlpatterns = [
     # admin
     path("admin/login/", custom_admin_login, name="custom_admin_login"),
     path("admin/", admin.site.urls),
+    path("staff/performance/", PerformanceView.as_view(), name="performance"),
     # robots.txt
     path("robots.txt", robots_txt),
     # accounts
@@ -208,6 +226,7 @@ urlpatterns = [
     path("", include("activity_feed.urls")),
     path("", include("write.urls")),
     path("search/", search_view, name="search"),
+    path("search/<str:section>/", search_section_view, name="search_section"),
     path("notify/", include("notify.urls")),
     path("api/", include("api.urls")),
     path("visit/", include("visit.urls")),
@@ -15,6 +15,7 @@ from django.utils.decorators import method_decorator
 from django.views.generic import ListView
 from django_ratelimit.decorators import ratelimit
 
+from activity_feed.utils_prefetch import CHECKIN_MODELS, prefetch_checkin_media
 from listen.models import ListenCheckIn
 from play.models import PlayCheckIn
 from read.models import ReadCheckIn
@@ -291,6 +292,12 @@ class DiscoverListAllView(LoginRequiredMixin, ListView):
                     "?"
                 )
 
+        # Checked-in media: one query per model, not per check-in
+        for model, model_name in models_list:
+            if model in CHECKIN_MODELS:
+                context[model_name] = list(context[model_name])
+                prefetch_checkin_media(context[model_name])
+
         context["order_by"] = order_by
         context["current_page"] = "All"
         return context
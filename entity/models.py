@@ -8,8 +8,8 @@ from django.conf import settings
 from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelation
 from django.contrib.contenttypes.models import ContentType
 from django.core.files.base import ContentFile
-from django.db import models
-from django.db.models.signals import post_delete
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 from django.urls import reverse
 from django.utils.text import slugify
@@ -306,6 +306,26 @@ class CompanyPastName(auto_prefetch.Model):
         return f"{self.company} < {self.name}"
 
 
+@receiver(pre_save, sender=CompanyPastName)
+def remember_past_name_company(sender, instance, raw=False, **kwargs):
+    # A past name moved to another company leaves the old one outdated too
+    if not raw and instance.pk is not None:
+        instance._saved_company_id = (
+            sender._base_manager.filter(pk=instance.pk)
+            .values_list("company_id", flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=CompanyPastName)
+@receiver(post_delete, sender=CompanyPastName)
+def invalidate_past_name_index(sender, instance, **kwargs):
+    from entity.utils import invalidate_past_names
+
+    company_ids = {instance.company_id, getattr(instance, "_saved_company_id", None)}
+    transaction.on_commit(lambda: invalidate_past_names(company_ids - {None}))
+
+
 def cover_upload_path(instance, filename):
     """
     Generates the upload path for additional cover images in CoverAlbum.
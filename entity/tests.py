@@ -1,3 +1,79 @@
+from django.core.cache import cache
 from django.test import TestCase
 
-# Create your tests here.
+from entity.models import Company, CompanyPastName
+from entity.utils import get_company_name, get_company_names
+
+
+class CompanyNameTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.company = Company.objects.create(name="Penguin Random House")
+        self.other = Company.objects.create(name="Faber and Faber")
+        for name, start_date, end_date in [
+            ("Penguin Books", "1935.07", "2013.06.30"),
+            ("Penguin Group", "1970", "2013.06.30"),  # Overlaps, entered later
+            ("Random House Penguin", "2013.07.01", "2013.07.01"),
+        ]:
+            CompanyPastName.objects.create(
+                company=self.company,
+                name=name,
+                start_date=start_date,
+                end_date=end_date,
+            )
+        CompanyPastName.objects.create(
+            company=self.other, name="Faber and Gwyer", end_date="1929"
+        )
+
+    def name_at(self, date_str):
+        return get_company_name([self.company], date_str)[0]["name"]
+
+    def test_names_at_dates(self):
+        self.assertEqual(self.name_at("1935.06.30"), "Penguin Random House")
+        self.assertEqual(self.name_at("1935.07.01"), "Penguin Books")
+        self.assertEqual(self.name_at("1980"), "Penguin Books")
+        self.assertEqual(self.name_at("2013.06.30"), "Penguin Books")
+        self.assertEqual(self.name_at("2013.07.01"), "Random House Penguin")
+        self.assertEqual(self.name_at("2013.07.02"), "Penguin Random House")
+        self.assertEqual(self.name_at(""), "Penguin Random House")
+        self.assertEqual(self.name_at("unknown"), "Penguin Random House")
+        self.assertEqual(get_company_name([None], "1980"), [{"id": None, "name": None}])
+
+    def test_bulk_and_cached(self):
+        pairs = [
+            (self.company, "1950"),
+            (self.other, "1925"),
+            (None, "1950"),
+            (self.other, "1930"),
+        ]
+        with self.assertNumQueries(1):
+            names = get_company_names(pairs)
+        self.assertEqual(
+            [name["name"] for name in names],
+            ["Penguin Books", "Faber and Gwyer", None, "Faber and Faber"],
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(get_company_names(pairs), names)
+
+    def test_invalidated_on_change(self):
+        self.assertEqual(self.name_at("2020"), "Penguin Random House")
+        with self.captureOnCommitCallbacks(execute=True):
+            past_name = CompanyPastName.objects.create(
+                company=self.company, name="PRH", start_date="2019"
+            )
+        self.assertEqual(self.name_at("2020"), "PRH")
+        with self.captureOnCommitCallbacks(execute=True):
+            past_name.delete()
+        self.assertEqual(self.name_at("2020"), "Penguin Random House")
+
+    def test_invalidated_on_move(self):
+        past_name = CompanyPastName.objects.get(name="Faber and Gwyer")
+        self.assertEqual(
+            get_company_name([self.other], "1925")[0]["name"], "Faber and Gwyer"
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            past_name.company = self.company
+            past_name.save()
+        self.assertEqual(
+            get_company_name([self.other], "1925")[0]["name"], "Faber and Faber"
+        )
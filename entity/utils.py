@@ -1,8 +1,18 @@
-from datetime import datetime
+import bisect
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+from django.core.cache import cache
 
 from entity.models import CompanyPastName
 
+# The cache is per process: a change is seen at once by the process making
+# it, by the others once their copy expires
+PAST_NAMES_CACHE_TIMEOUT = 60 * 5
+
 
+@lru_cache(maxsize=4096)
 def parse_date(date_str):
     # Handles different date formats and returns a date object
     formats = ["%Y.%m.%d", "%Y.%m", "%Y"]
@@ -14,31 +24,112 @@ def parse_date(date_str):
     return None
 
 
-def get_company_name(companies, date_str):
-    modified_names = []
-    target_date = parse_date(date_str) if date_str else None
+def build_past_name_index(past_names):
+    """
+    Index of the (name, start date, end date) past names of a company: the
+    dates at which the name in use changes, sorted for bisect, and from each
+    of them on, `(name,)` or None for the current name. Where ranges overlap,
+    the first past name entered wins.
+    """
+    ranges = []
+    for name, start_date, end_date in past_names:
+        start = parse_date(start_date or "0001.01.01")
+        end = parse_date(end_date or "9999.12.31")
+        if start is not None and end is not None:
+            ranges.append((start, end, name))
 
-    for company in companies:
+    boundaries = set()
+    for start, end, _ in ranges:
+        boundaries.add(start)
+        if end < date.max:
+            boundaries.add(end + timedelta(days=1))
 
-        try:
-            company_name = company.name  # Default to current name
-
-            if target_date:
-                past_names = CompanyPastName.objects.filter(company=company)
-                for past_name in past_names:
-                    start_date = parse_date(
-                        getattr(past_name, "start_date") or "0001.01.01"
-                    )
-                    end_date = parse_date(
-                        getattr(past_name, "end_date") or "9999.12.31"
-                    )
-
-                    if start_date <= target_date <= end_date:
-                        company_name = past_name.name
-                        break
-
-            modified_names.append({"id": company.id, "name": company_name})
-        except Exception as e:
-            modified_names.append({"id": None, "name": None})
+    starts, names = [], []
+    for boundary in sorted(boundaries):
+        name = next(
+            ((name,) for start, end, name in ranges if start <= boundary <= end),
+            None,
+        )
+        if not names or names[-1] != name:
+            starts.append(boundary)
+            names.append(name)
+    return starts, names
+
+
+def get_past_names_cache_key(company_id):
+    return f"company_past_names:{company_id}"
+
+
+def get_past_name_indexes(company_ids):
+    """
+    {company_id: index} of the given companies, from one cache call, and one
+    query for the companies not cached.
+    """
+    keys = {
+        get_past_names_cache_key(company_id): company_id for company_id in company_ids
+    }
+    cached = cache.get_many(list(keys))
+    indexes = {keys[key]: index for key, index in cached.items()}
+
+    missing = [company_id for key, company_id in keys.items() if key not in cached]
+    if missing:
+        past_names = defaultdict(list)
+        rows = (
+            CompanyPastName.objects.filter(company_id__in=missing)
+            .order_by("id")
+            .values_list("company_id", "name", "start_date", "end_date")
+        )
+        for company_id, *past_name in rows:
+            past_names[company_id].append(past_name)
+        for company_id in missing:
+            indexes[company_id] = build_past_name_index(past_names[company_id])
+        cache.set_many(
+            {
+                get_past_names_cache_key(company_id): indexes[company_id]
+                for company_id in missing
+            },
+            PAST_NAMES_CACHE_TIMEOUT,
+        )
+    return indexes
 
+
+def invalidate_past_names(company_ids):
+    cache.delete_many(
+        [get_past_names_cache_key(company_id) for company_id in company_ids]
+    )
+
+
+def get_company_names(pairs):
+    """
+    {"id", "name"} of every (company, date string) pair, with the name the
+    company went by at that date, for a whole page at once.
+    """
+    targets = [
+        (company, parse_date(date_str) if date_str else None)
+        for company, date_str in pairs
+    ]
+    indexes = get_past_name_indexes(
+        {
+            company.id
+            for company, target_date in targets
+            if company is not None and target_date
+        }
+    )
+
+    modified_names = []
+    for company, target_date in targets:
+        if company is None:
+            modified_names.append({"id": None, "name": None})
+            continue
+        company_name = company.name  # Default to current name
+        if target_date:
+            starts, names = indexes[company.id]
+            position = bisect.bisect_right(starts, target_date) - 1
+            if position >= 0 and names[position] is not None:
+                company_name = names[position][0]
+        modified_names.append({"id": company.id, "name": company_name})
     return modified_names
+
+
+def get_company_name(companies, date_str):
+    return get_company_names([(company, date_str) for company in companies])
@@ -4,7 +4,17 @@ from dal import autocomplete
 from django import forms
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.db import transaction
-from django.db.models import Count, F, Max, Min, OuterRef, Q, Subquery, Value
+from django.db.models import (
+    Count,
+    F,
+    Max,
+    Min,
+    OuterRef,
+    Prefetch,
+    Q,
+    Subquery,
+    Value,
+)
 from django.db.models.functions import Concat
 from django.http import HttpResponseForbidden
 from django.shortcuts import render
@@ -15,12 +25,13 @@ from django.views.generic.detail import DetailView
 from django.views.generic.edit import CreateView, UpdateView
 from django_ratelimit.decorators import ratelimit
 
+from activity_feed.utils_autocomplete import filter_autocomplete
 from listen.models import Audiobook, Release, ReleaseRole, Track, TrackRole
 from listen.models import Work as ListenWork
 from listen.models import WorkRole as ListenWorkRole
 from play.models import Game, GameRole
 from play.models import Work as PlayWork
-from read.models import Book, BookRole
+from read.models import Book, BookGroup, BookRole
 from read.models import Instance as ReadInstance
 from read.models import Work as ReadWork
 from scrape.wikipedia import scrape_company, scrape_creator
@@ -123,19 +134,26 @@ class CreatorDetailView(DetailView):
             processed_instances = set()
             processed_groups = set()
 
-            books = Book.objects.filter(
-                bookrole__role__name=role, bookrole__creator=creator
-            ).distinct()
+            books = (
+                Book.objects.filter(
+                    bookrole__role__name=role, bookrole__creator=creator
+                )
+                .distinct()
+                .prefetch_related(
+                    Prefetch("instances", queryset=ReadInstance.objects.order_by("id")),
+                    Prefetch("book_group", queryset=BookGroup.objects.order_by("id")),
+                )
+            )
 
             for book in books:
                 book_language = book.language or "Unknown"
-                instances = ReadInstance.objects.filter(books=book)
+                instances = book.instances.all()
 
-                if not instances.exists() or instances.count() > 1:
-                    if not book.book_group.exists():
+                if len(instances) != 1:
+                    if not book.book_group.all():
                         final_dict[book_language].append(book)
                     else:
-                        group = book.book_group.first()
+                        group = book.book_group.all()[0]
                         if group.id not in processed_groups:
                             processed_groups.add(group.id)
                             first_published_book = group.books.order_by(
@@ -143,7 +161,7 @@ class CreatorDetailView(DetailView):
                             ).first()
                             final_dict[book_language].append(first_published_book)
                 else:
-                    instance = instances.first()
+                    instance = instances[0]
                     if instance.id not in processed_instances:
                         processed_instances.add(instance.id)
                         final_dict[instance.language or "Unknown"].append(instance)
@@ -736,14 +754,8 @@ class RoleDetailView(LoginRequiredMixin, DetailView):
 
 class CreatorAutoComplete(LoginRequiredMixin, autocomplete.Select2QuerySetView):
     def get_queryset(self):
-        qs = Creator.objects.all()
-
         if self.q:
-            qs = qs.filter(
-                Q(name__icontains=self.q) | Q(other_names__icontains=self.q)
-            ).distinct()
-
-            return qs
+            return filter_autocomplete(Creator.objects.all(), self.q)
 
         return Creator.objects.none()
 
@@ -764,14 +776,10 @@ class CreatorAutoComplete(LoginRequiredMixin, autocomplete.Select2QuerySetView):
 
 class GroupAutoComplete(LoginRequiredMixin, autocomplete.Select2QuerySetView):
     def get_queryset(self):
-        qs = Creator.objects.exclude(creator_type="person")
-
         if self.q:
-            qs = qs.filter(
-                Q(name__icontains=self.q) | Q(other_names__icontains=self.q)
-            ).distinct()
-
-            return qs
+            return filter_autocomplete(
+                Creator.objects.exclude(creator_type="person"), self.q
+            )
 
         return Creator.objects.none()
 
@@ -798,7 +806,7 @@ class RoleAutocomplete(LoginRequiredMixin, autocomplete.Select2QuerySetView):
             qs = qs.filter(domain=domain)
 
         if self.q:
-            qs = qs.filter(name__icontains=self.q)
+            return filter_autocomplete(qs, self.q)
 
         return qs.order_by("name")
 
@@ -1039,13 +1047,11 @@ class CompanyAutocomplete(LoginRequiredMixin, autocomplete.Select2QuerySetView):
         if not self.request.user.is_authenticated:
             return Company.objects.none()
 
-        qs = Company.objects.all()
-
         if self.q:
-            qs = qs.filter(
-                Q(name__icontains=self.q) | Q(other_names__icontains=self.q)
-            ).order_by("name")
-            return qs
+            # The label shows the location
+            return filter_autocomplete(Company.objects.all(), self.q).select_related(
+                "location"
+            )
 
         return Company.objects.none()
 
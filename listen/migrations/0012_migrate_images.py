@@ -35,6 +35,7 @@ class Migration(migrations.Migration):
 
     dependencies = [
         ("listen", "0011_listencheckin_visibility_listencheckin_visible_to"),  # Replace with the last migration file
+        ("entity", "0013_coveralbum_coverimage"),
     ]
 
     operations = [
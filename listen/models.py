@@ -6,7 +6,6 @@ import auto_prefetch
 from django.conf import settings
 from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelation
 from django.contrib.contenttypes.models import ContentType
-from django.core.exceptions import ObjectDoesNotExist
 from django.core.files.base import ContentFile
 from django.db import models
 from django.urls import reverse
@@ -19,6 +18,8 @@ from discover.utils import user_has_upvoted
 from entity.models import Company, CoverAlbum, CoverImage, Creator, LanguageField, Role
 from read.models import Instance, standardize_date
 from write.models import (
+    ActivityIdMixin,
+    RequiredJSMixin,
     create_mentions_notifications,
     find_mentioned_users,
     handle_tags,
@@ -383,7 +384,7 @@ class ReleaseTrack(auto_prefetch.Model):
         return f"{self.release.title}, {self.track.title}"
 
 
-class ListenCheckIn(auto_prefetch.Model):
+class ListenCheckIn(ActivityIdMixin, RequiredJSMixin):
     content_type = auto_prefetch.ForeignKey(
         ContentType, on_delete=models.CASCADE, null=True
     )
@@ -450,20 +451,13 @@ class ListenCheckIn(auto_prefetch.Model):
             kwargs={"pk": self.pk, "username": self.user.username},
         )
 
-    def get_activity_id(self):
-        try:
-            activity = Activity.objects.get(
-                content_type__model="listencheckin", object_id=self.id
-            )
-            return activity.id
-        except ObjectDoesNotExist:
-            return None
-
     def get_votes(self):
         return self.votes.aggregate(models.Sum("value"))["value__sum"] or 0
 
     @property
     def has_voted(self):
+        if hasattr(self, "_has_voted"):
+            return self._has_voted
         return user_has_upvoted(self.user, self.content_object)
 
     def model_name(self):
@@ -12,7 +12,7 @@ from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib.contenttypes.models import ContentType
 from django.core.files.uploadedfile import InMemoryUploadedFile
 from django.db import DatabaseError, connections, transaction
-from django.db.models import Count, F, Max, OuterRef, Q, Subquery
+from django.db.models import Count, F, Max, Prefetch, Q
 from django.db.models.functions import Length
 from django.db.utils import OperationalError
 from django.forms import inlineformset_factory
@@ -34,10 +34,18 @@ from django_ratelimit.decorators import ratelimit
 from PIL import Image
 
 from activity_feed.models import Block
+from activity_feed.utils_autocomplete import filter_autocomplete
+from activity_feed.utils_checkin import (
+    attach_checkin_counts,
+    get_checkin_counts,
+    get_checkin_facets,
+    get_visible_latest_checkins,
+)
+from activity_feed.utils_prefetch import prefetch_checkin_page
 from discover.utils import user_has_upvoted
 from entity.forms import CoverImageFormSet
-from entity.models import CoverAlbum, CoverImage, Creator, Role
-from entity.utils import get_company_name
+from entity.models import CoverAlbum, CoverImage, Role
+from entity.utils import get_company_name, get_company_names
 from entity.views import HistoryViewMixin, get_contributors
 from scrape.wikipedia import scrape_release
 from write.forms import CommentForm, RepostForm
@@ -76,6 +84,7 @@ from .models import (
     Release,
     ReleaseGroup,
     ReleaseInGroup,
+    ReleaseRole,
     Track,
     Work,
 )
@@ -306,24 +315,9 @@ class WorkAutocomplete(LoginRequiredMixin, autocomplete.Select2QuerySetView):
         if not self.request.user.is_authenticated:
             return Work.objects.none()
 
-        qs = Work.objects.all()
-
         if self.q:
-            # get all the authors whose name starts with query
-            creators = Creator.objects.filter(name__icontains=self.q)
-
-            # get the author role
-            singer_role = Role.objects.filter(name="Singer").first()
-
-            # get all the works which are associated with these authors
-            qs = qs.filter(
-                Q(workrole__role=singer_role, workrole__creator__in=creators)
-                | Q(title__icontains=self.q)
-                | Q(other_titles__icontains=self.q)
-                | Q(release_date__icontains=self.q)
-            ).distinct()
-
-            return qs
+            # Singers are matched by name too
+            return filter_autocomplete(Work.objects.all(), self.q)
 
         return Work.objects.none()  # If no query is provided, return no objects
 
@@ -581,24 +575,9 @@ class TrackAutocomplete(LoginRequiredMixin, autocomplete.Select2QuerySetView):
         if not self.request.user.is_authenticated:
             return Track.objects.none()
 
-        qs = Track.objects.all()
-
         if self.q:
-            # get all the authors whose name starts with query
-            creators = Creator.objects.filter(name__icontains=self.q)
-
-            # get the author role
-            singer_role = Role.objects.filter(name__in=["Performer", "Singer"]).first()
-
-            # get all the instances which are associated with these authors
-            qs = qs.filter(
-                Q(trackrole__role=singer_role, trackrole__creator__in=creators)
-                | Q(title__icontains=self.q)
-                | Q(other_titles__icontains=self.q)
-                | Q(release_date__icontains=self.q)
-            ).distinct()
-
-            return qs
+            # Singers are matched by name too
+            return filter_autocomplete(Track.objects.all(), self.q)
 
         return Track.objects.none()  # If no query is provided, return no objects
 
@@ -887,21 +866,8 @@ class ReleaseDetailView(DetailView):
         )
 
         # Fetch the latest check-in from each user.
-        latest_checkin_subquery = (
-            get_visible_checkins(
-                self.request.user, ListenCheckIn, content_type, self.object.id
-            )
-            .filter(user=OuterRef("user"))
-            .order_by("-timestamp")
-        )
-        checkins = (
-            get_visible_checkins(
-                self.request.user, ListenCheckIn, content_type, self.object.id
-            )
-            .annotate(
-                latest_checkin=Subquery(latest_checkin_subquery.values("timestamp")[:1])
-            )
-            .filter(timestamp=F("latest_checkin"))
+        checkins = get_visible_latest_checkins(
+            self.request.user, ListenCheckIn, content_type, self.object.id
         ).order_by("-timestamp")[:5]
 
         context["checkins"] = checkins
@@ -928,41 +894,13 @@ class ReleaseDetailView(DetailView):
             )
 
         # Release check-in status counts, considering only latest check-in per user
-        latest_checkin_status_subquery = (
-            get_visible_checkins(
-                self.request.user,
-                ListenCheckIn,
-                content_type,
-                self.object.id,
-                checkin_user=OuterRef("user"),
-            )
-            .order_by("-timestamp")
-            .values("status")[:1]
-        )
-        latest_checkins = (
-            ListenCheckIn.objects.filter(
-                content_type=content_type.id, object_id=self.object.id
-            )
-            .annotate(latest_checkin_status=Subquery(latest_checkin_status_subquery))
-            .values("user", "latest_checkin_status")
-            .distinct()
+        counts = get_checkin_counts(
+            self.request.user, ListenCheckIn, content_type, self.object.id
         )
 
-        to_listen_count = sum(
-            1
-            for item in latest_checkins
-            if item["latest_checkin_status"] == "to_listen"
-        )
-        listening_count = sum(
-            1
-            for item in latest_checkins
-            if item["latest_checkin_status"] in ["looping", "relistening"]
-        )
-        listened_count = sum(
-            1
-            for item in latest_checkins
-            if item["latest_checkin_status"] in ["listened", "relistened"]
-        )
+        to_listen_count = counts["users"]["to_listen"]
+        listening_count = counts["users"]["looping"] + counts["users"]["relistening"]
+        listened_count = counts["users"]["listened"] + counts["users"]["relistened"]
 
         # Add status counts to context
         context.update(
@@ -970,6 +908,7 @@ class ReleaseDetailView(DetailView):
                 "to_listen_count": to_listen_count,
                 "listening_count": listening_count,
                 "listened_count": listened_count,
+                "checkin_counts": counts,
             }
         )
 
@@ -1156,35 +1095,25 @@ class ReleaseAutocomplete(LoginRequiredMixin, autocomplete.Select2QuerySetView):
         if not self.request.user.is_authenticated:
             return Release.objects.none()
 
-        qs = Release.objects.all()
-
         if self.q:
-            # get all the authors whose name starts with query
-            creators = Creator.objects.filter(name__icontains=self.q)
-
-            # get the author role
-            performer_role = Role.objects.filter(name="Performer").first()
-
-            # get all the instances which are associated with these authors
-            qs = qs.filter(
-                Q(releaserole__role=performer_role, releaserole__creator__in=creators)
-                | Q(title__icontains=self.q)
-                | Q(other_titles__icontains=self.q)
-                | Q(release_date__icontains=self.q)
-            ).distinct()
-
-            return qs
+            # Performers are matched by name too, and shown in the label
+            return filter_autocomplete(Release.objects.all(), self.q).prefetch_related(
+                Prefetch(
+                    "releaserole_set",
+                    queryset=ReleaseRole.objects.filter(role__name="Performer")
+                    .select_related("creator")
+                    .order_by("id"),
+                    to_attr="performer_roles",
+                )
+            )
 
         return Release.objects.none()  # If no query is provided, return no objects
 
     def get_result_label(self, item):
-        # Get the role objects for 'Performer'
-        performer_role = Role.objects.filter(name="Performer").first()
-
-        # Fetch the release_role for 'Performer'
-        performer_release_role = item.releaserole_set.filter(
-            role=performer_role
-        ).first()
+        # The release_role for 'Performer', from `get_queryset`
+        performer_release_role = (
+            item.performer_roles[0] if item.performer_roles else None
+        )
 
         # Check if performer_release_role exists and a creator is associated
         if performer_release_role:
@@ -1552,29 +1481,10 @@ class GenericCheckInUserListView(ListView):
     def get_queryset(self):
         profile_user = get_object_or_404(User, username=self.kwargs["username"])
 
-        latest_checkin_subquery = get_visible_checkins(
-            self.request.user,
-            ListenCheckIn,
-            OuterRef("content_type"),
-            OuterRef("object_id"),
-            checkin_user=profile_user,
-        ).order_by("-timestamp")
-
-        checkins = (
-            ListenCheckIn.objects.filter(user=profile_user)
-            .annotate(
-                latest_checkin=Subquery(latest_checkin_subquery.values("timestamp")[:1])
-            )
-            .filter(timestamp=F("latest_checkin"))
+        checkins = get_visible_latest_checkins(
+            self.request.user, ListenCheckIn, checkin_user=profile_user
         )
 
-        if self.request.user.is_authenticated:
-            checkins = checkins.filter(
-                Q(visibility="PU") | Q(visible_to=self.request.user)
-            )
-        else:
-            checkins = checkins.filter(visibility="PU")
-
         order = self.request.GET.get("order", "-timestamp")  # Default is '-timestamp'
         if order == "timestamp":
             checkins = checkins.order_by("timestamp")
@@ -1585,14 +1495,6 @@ class GenericCheckInUserListView(ListView):
         if status:
             checkins = checkins.filter(status=status)
 
-        # Filtering by year
-        year = self.request.GET.get("year", "")
-        month = self.request.GET.get("month", "")
-        if year:
-            checkins = checkins.filter(timestamp__year=year)
-        if month:
-            checkins = checkins.filter(timestamp__month=month)
-
         # Filtering by type (Release, Podcast, Audiobook or All)
         checkin_type = self.request.GET.get("type", "").lower()
         if checkin_type:
@@ -1607,52 +1509,28 @@ class GenericCheckInUserListView(ListView):
             elif checkin_type == "audiobook":
                 checkins = checkins.filter(content_type=audiobook_content_type)
 
-        # Adding count of check-ins for each book or issue
-        user_checkin_counts = (
-            ListenCheckIn.objects.filter(user=profile_user)
-            .values("content_type", "object_id")
-            .annotate(total_checkins=Count("id") - 1)
-        )
-
-        # Convert to a dictionary for easier lookup
-        user_checkin_count_dict = {
-            (item["content_type"], item["object_id"]): item["total_checkins"]
-            for item in user_checkin_counts
-        }
-
-        # Annotate the checkins queryset with total_checkins for each content-object
-        for checkin in checkins:
-            checkin.checkin_count = user_checkin_count_dict.get(
-                (checkin.content_type_id, checkin.object_id), 0
-            )
-            if checkin.content_type.model == "release":
-                checkin.labels = get_company_name(
-                    checkin.content_object.label.all(),
-                    checkin.content_object.release_date,
-                )
+        # Check-ins per status, and the years and months to pick from
+        year = self.request.GET.get("year", "")
+        month = self.request.GET.get("month", "")
+        statuses, self.months_by_year = get_checkin_facets(checkins, year, month)
 
-        # Statistics for books per status
+        # Statistics per status
         status_order = ["listened", "listening", "looping", "to_listen", "subscribed", "unsubscribed", "sampled", "paused", "abandoned"]
         status_display_map = dict(ListenCheckIn.STATUS_CHOICES)
 
-        status_counts = (
-            checkins.values("status")
-            .annotate(
-                book_count=Count("object_id", distinct=True)  # Count unique books
-            )
-            .order_by("status")
-        )
-
-        # Convert status_counts into a dictionary for easier lookup
-        status_count_dict = {item["status"]: item["book_count"] for item in status_counts}
-
         # Build a dictionary with display names as keys, ordered by status_order
         self.status_stats = {
-            status_display_map[status]: status_count_dict.get(status, 0)
+            status_display_map[status]: statuses[status]
             for status in status_order
-            if status_count_dict.get(status, 0) > 0  # Include only non-zero counts
+            if statuses[status] > 0  # Include only non-zero counts
         }
 
+        # Filtering by year
+        if year:
+            checkins = checkins.filter(timestamp__year=year)
+        if month:
+            checkins = checkins.filter(timestamp__month=month)
+
         return checkins
 
     def get_context_data(self, **kwargs):
@@ -1668,37 +1546,25 @@ class GenericCheckInUserListView(ListView):
         context["month"] = self.request.GET.get("month", "")
         context["type"] = self.request.GET.get("type", "")
 
-        # Extracting the list of years and months
-        checkin_queryset = ListenCheckIn.objects.filter(user=profile_user).distinct()
-
-        # Apply the status filter if it's set
-        if status:
-            if status == "watched_rewatched":
-                checkin_queryset = checkin_queryset.filter(
-                    Q(status="watched") | Q(status="rewachted")
-                )
-            elif status == "watching_rewatching":
-                checkin_queryset = checkin_queryset.filter(
-                    Q(status="watching") | Q(status="rewatching")
-                )
-            else:
-                checkin_queryset = checkin_queryset.filter(status=status)
-
-        years = checkin_queryset.dates("timestamp", "year")
-        # Create a dictionary to store months for each year
-        months_by_year = {}
-        for year in years:
-            months = checkin_queryset.filter(timestamp__year=year.year).dates(
-                "timestamp", "month"
-            )
-            months_by_year[year.year] = [month.month for month in months]
-
-        context["years"] = [year.year for year in years]
-        context["months_by_year"] = months_by_year
+        context["years"] = list(self.months_by_year)
+        context["months_by_year"] = self.months_by_year
 
         context["status_stats"] = self.status_stats
 
-
+        # Media and check-in counts of this page only
+        checkins = context["checkins"] = prefetch_checkin_page(context["page_obj"])
+        attach_checkin_counts(self.request.user, profile_user, checkins)
+        releases = [
+            checkin for checkin in checkins if checkin.content_type.model == "release"
+        ]
+        labels = get_company_names(
+            (label, checkin.content_object.release_date)
+            for checkin in releases
+            for label in checkin.content_object.label.all()
+        )
+        for checkin in releases:
+            label_count = len(checkin.content_object.label.all())
+            checkin.labels, labels = labels[:label_count], labels[label_count:]
 
         # check required js
         include_mathjax, include_mermaid = check_required_js(context["page_obj"])
@@ -1984,22 +1850,8 @@ class PodcastDetailView(DetailView):
             }
         )
 
-        latest_checkin_subquery = (
-            get_visible_checkins(
-                self.request.user, ListenCheckIn, content_type, self.object.id
-            )
-            .filter(user=OuterRef("user"))
-            .order_by("-timestamp")
-        )
-
-        checkins = (
-            get_visible_checkins(
-                self.request.user, ListenCheckIn, content_type, self.object.id
-            )
-            .annotate(
-                latest_checkin=Subquery(latest_checkin_subquery.values("timestamp")[:1])
-            )
-            .filter(timestamp=F("latest_checkin"))
+        checkins = get_visible_latest_checkins(
+            self.request.user, ListenCheckIn, content_type, self.object.id
         ).order_by("-timestamp")[:5]
 
         context["checkins"] = checkins
@@ -2025,41 +1877,13 @@ class PodcastDetailView(DetailView):
                 checkin.user.username, 0
             )
 
-        latest_checkin_status_subquery = (
-            get_visible_checkins(
-                self.request.user,
-                ListenCheckIn,
-                content_type,
-                self.object.id,
-                checkin_user=OuterRef("user"),
-            )
-            .order_by("-timestamp")
-            .values("status")[:1]
-        )
-        latest_checkins = (
-            ListenCheckIn.objects.filter(
-                content_type=content_type.id, object_id=self.object.id
-            )
-            .annotate(latest_checkin_status=Subquery(latest_checkin_status_subquery))
-            .values("user", "latest_checkin_status")
-            .distinct()
+        counts = get_checkin_counts(
+            self.request.user, ListenCheckIn, content_type, self.object.id
         )
 
-        to_listen_count = sum(
-            1
-            for item in latest_checkins
-            if item["latest_checkin_status"] == "to_listen"
-        )
-        listening_count = sum(
-            1
-            for item in latest_checkins
-            if item["latest_checkin_status"] in ["looping", "relistening"]
-        )
-        listened_count = sum(
-            1
-            for item in latest_checkins
-            if item["latest_checkin_status"] in ["listened", "relistened"]
-        )
+        to_listen_count = counts["users"]["to_listen"]
+        listening_count = counts["users"]["looping"] + counts["users"]["relistening"]
+        listened_count = counts["users"]["listened"] + counts["users"]["relistened"]
 
         # Add status counts to context
         context.update(
@@ -2067,6 +1891,7 @@ class PodcastDetailView(DetailView):
                 "to_listen_count": to_listen_count,
                 "listening_count": listening_count,
                 "listened_count": listened_count,
+                "checkin_counts": counts,
             }
         )
 
@@ -2322,22 +2147,8 @@ class GenericCheckInAllListView(ListView):
         content_type = ContentType.objects.get_for_model(model)
         object_id = self.kwargs["object_id"]  # Get object id from url param
 
-        latest_checkin_subquery = (
-            get_visible_checkins(
-                self.request.user, ListenCheckIn, content_type, object_id
-            )
-            .filter(user=OuterRef("user"))
-            .order_by("-timestamp")
-        )
-
-        checkins = (
-            get_visible_checkins(
-                self.request.user, ListenCheckIn, content_type, object_id
-            )
-            .annotate(
-                latest_checkin=Subquery(latest_checkin_subquery.values("timestamp")[:1])
-            )
-            .filter(timestamp=F("latest_checkin"))
+        checkins = get_visible_latest_checkins(
+            self.request.user, ListenCheckIn, content_type, object_id
         )
 
         order = self.request.GET.get("order", "-timestamp")  # Default is '-timestamp'
@@ -2641,21 +2452,8 @@ class AudiobookDetailView(DetailView):
         )
 
         # Fetch the latest check-in from each user.
-        latest_checkin_subquery = (
-            get_visible_checkins(
-                self.request.user, ListenCheckIn, content_type, self.object.id
-            )
-            .filter(user=OuterRef("user"))
-            .order_by("-timestamp")
-        )
-        checkins = (
-            get_visible_checkins(
-                self.request.user, ListenCheckIn, content_type, self.object.id
-            )
-            .annotate(
-                latest_checkin=Subquery(latest_checkin_subquery.values("timestamp")[:1])
-            )
-            .filter(timestamp=F("latest_checkin"))
+        checkins = get_visible_latest_checkins(
+            self.request.user, ListenCheckIn, content_type, self.object.id
         ).order_by("-timestamp")[:5]
 
         context["checkins"] = checkins
@@ -2682,41 +2480,13 @@ class AudiobookDetailView(DetailView):
             )
 
         # Release check-in status counts, considering only latest check-in per user
-        latest_checkin_status_subquery = (
-            get_visible_checkins(
-                self.request.user,
-                ListenCheckIn,
-                content_type,
-                self.object.id,
-                checkin_user=OuterRef("user"),
-            )
-            .order_by("-timestamp")
-            .values("status")[:1]
-        )
-        latest_checkins = (
-            ListenCheckIn.objects.filter(
-                content_type=content_type.id, object_id=self.object.id
-            )
-            .annotate(latest_checkin_status=Subquery(latest_checkin_status_subquery))
-            .values("user", "latest_checkin_status")
-            .distinct()
+        counts = get_checkin_counts(
+            self.request.user, ListenCheckIn, content_type, self.object.id
         )
 
-        to_listen_count = sum(
-            1
-            for item in latest_checkins
-            if item["latest_checkin_status"] == "to_listen"
-        )
-        listening_count = sum(
-            1
-            for item in latest_checkins
-            if item["latest_checkin_status"] in ["looping", "relistening"]
-        )
-        listened_count = sum(
-            1
-            for item in latest_checkins
-            if item["latest_checkin_status"] in ["listened", "relistened"]
-        )
+        to_listen_count = counts["users"]["to_listen"]
+        listening_count = counts["users"]["looping"] + counts["users"]["relistening"]
+        listened_count = counts["users"]["listened"] + counts["users"]["relistened"]
 
         # Add status counts to context
         context.update(
@@ -2724,6 +2494,7 @@ class AudiobookDetailView(DetailView):
                 "to_listen_count": to_listen_count,
                 "listening_count": listening_count,
                 "listened_count": listened_count,
+                "checkin_counts": counts,
             }
         )
 
@@ -1,14 +1,21 @@
+from django.utils.functional import SimpleLazyObject
+
 from .models import Notification
+from .utils import get_unread_count
 
 
 def notifications(request):
     if request.user.is_authenticated:
-        new_notifications = Notification.objects.filter(
-            recipient=request.user, read=False
-        ).count()
-        recent_notifications = Notification.objects.filter(
-            recipient=request.user
-        ).order_by("-timestamp")[:5]
+        user_id = request.user.id
+        # Both are only queried if the template actually uses them
+        new_notifications = SimpleLazyObject(lambda: get_unread_count(user_id))
+        recent_notifications = SimpleLazyObject(
+            lambda: list(
+                Notification.objects.filter(recipient_id=user_id).order_by(
+                    "-timestamp"
+                )[:5]
+            )
+        )
         return {
             "new_notifications": new_notifications,
             "recent_notifications": recent_notifications,
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from notify.utils import rebuild_unread_counts
+
+
+class Command(BaseCommand):
+    help = "Recompute every user's unread notification counter from scratch."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            total = rebuild_unread_counts()
+        self.stdout.write(self.style.SUCCESS(f"{total} counters rebuilt."))
@@ -2,6 +2,7 @@ from django.shortcuts import get_object_or_404
 from django.utils.deprecation import MiddlewareMixin
 
 from .models import Notification
+from .utils import mark_notification_read
 
 
 class MarkNotificationReadMiddleware(MiddlewareMixin):
@@ -12,5 +13,4 @@ class MarkNotificationReadMiddleware(MiddlewareMixin):
                 notification = get_object_or_404(Notification, pk=notification_id)
                 # Only mark as read if the request user is the recipient
                 if notification.recipient_id == request.user.id:
-                    notification.read = True
-                    notification.save()
+                    mark_notification_read(notification.pk, request.user.id)
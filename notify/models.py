@@ -14,6 +14,10 @@ class Notification(auto_prefetch.Model):
         ("delete", "Delete"),
     )
 
+    # Stored messages link with this placeholder in `?mark_read=`, so the
+    # id doesn't have to be written back after the notification is created
+    MARK_READ_PLACEHOLDER = "{mark_read}"
+
     recipient = auto_prefetch.ForeignKey(
         settings.AUTH_USER_MODEL, related_name="notifications", on_delete=models.CASCADE
     )
@@ -44,6 +48,9 @@ class Notification(auto_prefetch.Model):
     def __str__(self):
         return f"Notification for {self.recipient.username} at {self.timestamp}"
 
+    def get_message(self):
+        return self.message.replace(self.MARK_READ_PLACEHOLDER, str(self.pk))
+
     def is_delete(self):
         return (
             self.notification_type == "comment_on_deleted"
@@ -59,3 +66,21 @@ class MutedNotification(auto_prefetch.Model):
 
     class Meta(auto_prefetch.Model.Meta):
         unique_together = ("user", "content_type", "object_id")
+
+
+class NotificationCounter(auto_prefetch.Model):
+    """
+    Denormalized number of unread notifications of a user. Rows are created
+    on first read and kept up to date by `notify.utils`.
+    """
+
+    user = auto_prefetch.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        primary_key=True,
+        related_name="notification_counter",
+        on_delete=models.CASCADE,
+    )
+    unread = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.unread} unread"
@@ -1,3 +1,166 @@
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 
-# Create your tests here.
+from accounts.models import CustomUser
+from activity_feed.models import Block
+from write import utils_markdown
+from write.models import Comment, Say
+
+from .models import MutedNotification, Notification, NotificationCounter
+from .utils import NotificationBuilder, get_unread_count, rebuild_unread_counts
+
+
+class NotificationBuilderTest(TestCase):
+    def setUp(self):
+        self.author = CustomUser.objects.create_user(username="ivy", password="pw")
+        self.users = [
+            CustomUser.objects.create_user(username=f"user{i}") for i in range(30)
+        ]
+        self.say = Say.objects.create(user=self.author, content="hello")
+
+    def test_mentions_cost_a_fixed_number_of_queries(self):
+        text = " ".join(f"@{user.username}" for user in self.users)
+        builder = NotificationBuilder(self.author)
+        # Resolve usernames, check mutes and blocks, insert, count
+        with self.assertNumQueries(4):
+            builder.add_mentions(text, self.say)
+            notifications = builder.save()
+        self.assertEqual(len(notifications), 30)
+
+    def test_mutes_and_blocks_are_respected(self):
+        muter, blocker, other = self.users[:3]
+        MutedNotification.objects.create(
+            user=muter,
+            content_type=ContentType.objects.get_for_model(self.say),
+            object_id=self.say.id,
+        )
+        Block.objects.create(blocker=blocker, blocked=self.author)
+        builder = NotificationBuilder(self.author)
+        builder.add_mentions(f"@{muter.username} @{blocker.username} @ivy", self.say)
+        builder.add(other.id, "mention", "hi", self.say)
+        builder.save()
+        self.assertEqual(
+            list(Notification.objects.values_list("recipient", flat=True)), [other.id]
+        )
+
+    def test_comment_links_mark_read_by_id(self):
+        Comment.objects.create(
+            user=self.users[0], content_object=self.say, content="nice"
+        )
+        notification = Notification.objects.get(recipient=self.author)
+        self.assertEqual(notification.notification_type, "comment")
+        self.assertIn(f"?mark_read={notification.id}", notification.get_message())
+
+    def test_one_notice_per_type(self):
+        # The author of the say is told of the comment and of the mention
+        Comment.objects.create(
+            user=self.users[0], content_object=self.say, content="hi @ivy @ivy"
+        )
+        self.assertEqual(
+            sorted(
+                Notification.objects.filter(recipient=self.author).values_list(
+                    "notification_type", flat=True
+                )
+            ),
+            ["comment", "mention"],
+        )
+
+    def test_deletion_notices_ignore_blocks(self):
+        commenter = self.users[0]
+        for content in ("first", "second"):
+            Comment.objects.create(
+                user=commenter, content_object=self.say, content=content
+            )
+        Block.objects.create(blocker=commenter, blocked=self.author)
+        self.say.delete()
+        self.assertEqual(
+            Notification.objects.filter(
+                recipient=commenter, notification_type="comment_on_deleted"
+            ).count(),
+            2,
+        )
+
+
+class NotificationCounterTest(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="jun", password="pw")
+        self.other = CustomUser.objects.create_user(username="kai", password="pw")
+        self.client.force_login(self.user)
+        self.assertEqual(get_unread_count(self.user.id), 0)
+
+    def notify(self, count):
+        say = Say.objects.create(user=self.other, content="hi")
+        for i in range(count):
+            builder = NotificationBuilder(self.other)
+            builder.add(self.user.id, "mention", f"hi {i}", say)
+            builder.save()
+        return list(Notification.objects.filter(recipient=self.user))
+
+    def test_counter_follows_notifications(self):
+        notifications = self.notify(3)
+        self.assertEqual(get_unread_count(self.user.id), 3)
+
+        self.client.post(reverse("notify:mark_as_read", args=[notifications[0].pk]))
+        self.client.post(reverse("notify:mark_as_read", args=[notifications[0].pk]))
+        self.assertEqual(get_unread_count(self.user.id), 2)
+
+        self.client.post(reverse("notify:delete", args=[notifications[1].pk]))
+        self.assertEqual(get_unread_count(self.user.id), 1)
+
+        self.client.post(reverse("notify:mark_all_as_read"))
+        self.assertEqual(get_unread_count(self.user.id), 0)
+
+    def test_rebuild(self):
+        self.notify(2)
+        NotificationCounter.objects.update(unread=7)
+        rebuild_unread_counts()
+        self.assertEqual(get_unread_count(self.user.id), 2)
+        self.assertEqual(get_unread_count(self.other.id), 0)
+
+    def test_navbar_count_is_read_from_the_counter(self):
+        self.notify(2)
+        response = self.client.get(reverse("notify:notification_list"))
+        self.assertEqual(response.context["new_notifications"], 2)
+
+
+class NotificationListTest(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="lee", password="pw")
+        self.other = CustomUser.objects.create_user(username="mo", password="pw")
+        self.say = Say.objects.create(user=self.user, content="hi")
+        self.client.force_login(self.user)
+
+    def notify(self, count):
+        for i in range(count):
+            builder = NotificationBuilder(self.other)
+            builder.add(self.user.id, "comment", f"comment {i}", self.say)
+            builder.save()
+
+    def count_queries(self):
+        utils_markdown._memo.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("notify:notification_list"))
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_muted_state_is_annotated(self):
+        self.notify(1)
+        MutedNotification.objects.create(
+            user=self.user,
+            content_type=ContentType.objects.get_for_model(self.say),
+            object_id=self.say.id,
+        )
+        _, response = self.count_queries()
+        self.assertTrue(response.context["page_obj"][0].is_muted)
+
+    def test_query_count_does_not_grow_with_notifications(self):
+        self.notify(3)
+        self.count_queries()  # creates the unread counter
+        baseline, _ = self.count_queries()
+        self.notify(60)
+        queries, response = self.count_queries()
+        self.assertEqual(len(response.context["page_obj"]), 50)
+        self.assertEqual(queries, baseline)
@@ -0,0 +1,185 @@
+from collections import Counter
+
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Count, F, IntegerField, Q, Value
+from django.db.models.functions import Greatest
+from django.urls import reverse
+
+from activity_feed.models import Block
+from write.utils_mentions import resolve_mentions
+
+from .models import MutedNotification, Notification, NotificationCounter
+
+###########
+# helpers #
+###########
+
+
+def get_unread_count(user_id):
+    unread = (
+        NotificationCounter.objects.filter(user_id=user_id)
+        .values_list("unread", flat=True)
+        .first()
+    )
+    if unread is None:
+        # First read: count from scratch, later changes are applied as deltas
+        unread = Notification.objects.filter(recipient_id=user_id, read=False).count()
+        NotificationCounter.objects.bulk_create(
+            [NotificationCounter(user_id=user_id, unread=unread)],
+            ignore_conflicts=True,
+        )
+    return unread
+
+
+def adjust_unread_counts(deltas):
+    """Apply {user id: change} to the counters, one UPDATE per distinct change."""
+    user_ids_by_delta = {}
+    for user_id, delta in deltas.items():
+        if delta:
+            user_ids_by_delta.setdefault(delta, []).append(user_id)
+    for delta, user_ids in user_ids_by_delta.items():
+        NotificationCounter.objects.filter(user_id__in=user_ids).update(
+            unread=Greatest(F("unread") + delta, 0)
+        )
+
+
+def reset_unread_count(user_id):
+    NotificationCounter.objects.filter(user_id=user_id).update(unread=0)
+
+
+def mark_notification_read(notification_id, recipient_id):
+    """Mark one notification read. Returns whether it was unread."""
+    marked = Notification.objects.filter(
+        pk=notification_id, recipient_id=recipient_id, read=False
+    ).update(read=True)
+    adjust_unread_counts({recipient_id: -marked})
+    return bool(marked)
+
+
+def rebuild_unread_counts():
+    """Recompute every counter from the notifications. Returns the row count."""
+    counts = dict(
+        Notification.objects.filter(read=False)
+        .values("recipient")
+        .annotate(unread=Count("id"))
+        .values_list("recipient", "unread")
+    )
+    NotificationCounter.objects.exclude(user_id__in=counts).update(unread=0)
+    NotificationCounter.objects.bulk_create(
+        [
+            NotificationCounter(user_id=user_id, unread=unread)
+            for user_id, unread in counts.items()
+        ],
+        update_conflicts=True,
+        unique_fields=["user"],
+        update_fields=["unread"],
+    )
+    return NotificationCounter.objects.count()
+
+
+def mark_read_url(url):
+    """A link that marks the notification read once it is shown and followed."""
+    return f"{url}?mark_read={Notification.MARK_READ_PLACEHOLDER}"
+
+
+def get_content_name(content_object):
+    content_name = content_object.__class__.__name__.capitalize()
+    if "checkin" in content_name:
+        content_name = f"{content_name[:-7]} Check-in"
+    return content_name
+
+
+class NotificationBuilder:
+    """
+    Collects the notifications caused by one event, e.g. a comment that also
+    mentions people, and writes them together: one query drops recipients
+    who muted the subject or blocked the sender, one `bulk_create` writes
+    the rest. Notices about the recipient's own content, e.g. that it was
+    deleted, pass `check_blocks=False`: they are sent despite blocks.
+    """
+
+    def __init__(self, sender, check_blocks=True):
+        self.sender = sender
+        self.check_blocks = check_blocks
+        self.pending = []
+        self.recipient_ids = set()
+        self.added = set()
+
+    def add(self, recipient_id, notification_type, message, subject=None):
+        # Nobody is notified of their own actions, or twice of the same thing
+        if recipient_id is None or recipient_id == self.sender.id:
+            return
+        if (recipient_id, notification_type, message) in self.added:
+            return
+        self.added.add((recipient_id, notification_type, message))
+        self.recipient_ids.add(recipient_id)
+        subject_content_type = (
+            ContentType.objects.get_for_model(subject) if subject else None
+        )
+        self.pending.append(
+            Notification(
+                recipient_id=recipient_id,
+                sender_content_type=ContentType.objects.get_for_model(self.sender),
+                sender_object_id=self.sender.id,
+                subject_content_type=subject_content_type,
+                subject_object_id=subject.id if subject else None,
+                notification_type=notification_type,
+                message=message,
+            )
+        )
+
+    def add_mentions(self, text, content_object):
+        user_url = reverse("accounts:detail", args=[self.sender.username])
+        user_name = self.sender.display_name or self.sender.username
+        content_url = mark_read_url(content_object.get_absolute_url())
+        message = f'<a href="{user_url}">@{user_name}</a> mentioned you in a <a href="{content_url}">{get_content_name(content_object)}</a>.'
+        for mentioned_user_id in resolve_mentions(text).values():
+            self.add(mentioned_user_id, "mention", message, content_object)
+
+    def get_excluded(self):
+        """(user id, content type id, object id) rows for mutes and blocks."""
+        subjects = Q()
+        for notification in self.pending:
+            if notification.subject_content_type is not None:
+                subjects |= Q(
+                    user_id=notification.recipient_id,
+                    content_type=notification.subject_content_type,
+                    object_id=notification.subject_object_id,
+                )
+        blockers = self.recipient_ids if self.check_blocks else ()
+        blocks = (
+            Block.objects.filter(blocker_id__in=blockers, blocked_id=self.sender.id)
+            .annotate(
+                content_type_id=Value(None, IntegerField()),
+                object_id=Value(None, IntegerField()),
+            )
+            .values_list("blocker_id", "content_type_id", "object_id")
+        )
+        if not subjects:
+            return set(blocks)
+        mutes = MutedNotification.objects.filter(subjects).values_list(
+            "user_id", "content_type_id", "object_id"
+        )
+        return set(mutes.union(blocks, all=True))
+
+    def save(self):
+        """Write the collected notifications. Returns the ones created."""
+        if not self.pending:
+            return []
+        excluded = self.get_excluded()
+        blocked_ids = {user_id for user_id, _, object_id in excluded if not object_id}
+        notifications = [
+            notification
+            for notification in self.pending
+            if notification.recipient_id not in blocked_ids
+            and (
+                notification.recipient_id,
+                notification.subject_content_type_id,
+                notification.subject_object_id,
+            )
+            not in excluded
+        ]
+        self.pending = []
+        notifications = Notification.objects.bulk_create(notifications)
+        adjust_unread_counts(Counter(n.recipient_id for n in notifications))
+        return notifications
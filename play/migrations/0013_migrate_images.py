@@ -35,6 +35,7 @@ class Migration(migrations.Migration):
 
     dependencies = [
         ("play", "0012_remove_historicalgame_work"),  # Replace with the last migration file
+        ("entity", "0013_coveralbum_coverimage"),
     ]
 
     operations = [
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:20
+
+from django.db import migrations, models
+
+from write.utils_formatting import backfill_required_js_flags
+
+
+def fill_required_js_flags(apps, schema_editor):
+    backfill_required_js_flags(apps.get_model("play", "PlayCheckIn"), apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("play", "0013_migrate_images"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="playcheckin",
+            name="needs_mathjax",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name="playcheckin",
+            name="needs_mermaid",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(fill_required_js_flags, migrations.RunPython.noop),
+    ]
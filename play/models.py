@@ -6,7 +6,7 @@ import auto_prefetch
 from django.conf import settings
 from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelation
 from django.contrib.contenttypes.models import ContentType
-from django.core.exceptions import ObjectDoesNotExist, ValidationError
+from django.core.exceptions import ValidationError
 from django.core.files.base import ContentFile
 from django.db import models
 from django.urls import reverse
@@ -20,6 +20,8 @@ from entity.models import Company, CoverAlbum, CoverImage, Creator, Entity, Role
 from visit.models import Location
 from visit.utils import get_location_hierarchy_ids
 from write.models import (
+    ActivityIdMixin,
+    RequiredJSMixin,
     create_mentions_notifications,
     find_mentioned_users,
     handle_tags,
@@ -452,7 +454,7 @@ class GameCast(auto_prefetch.Model):
         return f"{self.game} - {self.creator} - {self.role}"
 
 
-class PlayCheckIn(auto_prefetch.Model):
+class PlayCheckIn(ActivityIdMixin, RequiredJSMixin):
     content_type = auto_prefetch.ForeignKey(
         ContentType, on_delete=models.CASCADE, null=True
     )
@@ -510,20 +512,13 @@ class PlayCheckIn(auto_prefetch.Model):
             kwargs={"pk": self.pk, "username": self.user.username},
         )
 
-    def get_activity_id(self):
-        try:
-            activity = Activity.objects.get(
-                content_type__model="playcheckin", object_id=self.id
-            )
-            return activity.id
-        except ObjectDoesNotExist:
-            return None
-
     def get_votes(self):
         return self.votes.aggregate(models.Sum("value"))["value__sum"] or 0
 
     @property
     def has_voted(self):
+        if hasattr(self, "_has_voted"):
+            return self._has_voted
         return user_has_upvoted(self.user, self.content_object)
 
     def model_name(self):
@@ -8,7 +8,7 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib.contenttypes.models import ContentType
 from django.db import transaction
-from django.db.models import Count, F, Max, Min, OuterRef, Q, Subquery
+from django.db.models import Count, Max, Min, Q
 from django.forms import inlineformset_factory
 from django.http import Http404, HttpResponseForbidden, HttpResponseRedirect
 from django.shortcuts import get_object_or_404, redirect
@@ -26,6 +26,14 @@ from django.views.generic import (
 from django_ratelimit.decorators import ratelimit
 
 from activity_feed.models import Block
+from activity_feed.utils_autocomplete import filter_autocomplete
+from activity_feed.utils_checkin import (
+    attach_checkin_counts,
+    get_checkin_counts,
+    get_checkin_facets,
+    get_visible_latest_checkins,
+)
+from activity_feed.utils_prefetch import prefetch_checkin_page
 from discover.utils import user_has_upvoted
 from entity.forms import CoverImageFormSet
 from entity.models import CoverAlbum, CoverImage
@@ -362,21 +370,8 @@ class GameDetailView(DetailView):
         )
 
         # Fetch the latest check-in from each user.
-        latest_checkin_subquery = (
-            get_visible_checkins(
-                self.request.user, PlayCheckIn, content_type, self.object.id
-            )
-            .filter(user=OuterRef("user"))
-            .order_by("-timestamp")
-        )
-        checkins = (
-            get_visible_checkins(
-                self.request.user, PlayCheckIn, content_type, self.object.id
-            )
-            .annotate(
-                latest_checkin=Subquery(latest_checkin_subquery.values("timestamp")[:1])
-            )
-            .filter(timestamp=F("latest_checkin"))
+        checkins = get_visible_latest_checkins(
+            self.request.user, PlayCheckIn, content_type, self.object.id
         ).order_by("-timestamp")[:5]
 
         context["checkins"] = checkins
@@ -403,39 +398,13 @@ class GameDetailView(DetailView):
             )
 
         # Game check-in status counts, considering only latest check-in per user
-        latest_checkin_status_subquery = (
-            get_visible_checkins(
-                self.request.user,
-                PlayCheckIn,
-                content_type,
-                self.object.id,
-                checkin_user=OuterRef("user"),
-            )
-            .order_by("-timestamp")
-            .values("status")[:1]
-        )
-        latest_checkins = (
-            PlayCheckIn.objects.filter(
-                content_type=content_type.id, object_id=self.object.id
-            )
-            .annotate(latest_checkin_status=Subquery(latest_checkin_status_subquery))
-            .values("user", "latest_checkin_status")
-            .distinct()
+        counts = get_checkin_counts(
+            self.request.user, PlayCheckIn, content_type, self.object.id
         )
 
-        to_play_count = sum(
-            1 for item in latest_checkins if item["latest_checkin_status"] == "to_play"
-        )
-        playing_count = sum(
-            1
-            for item in latest_checkins
-            if item["latest_checkin_status"] in ["playing", "replaying"]
-        )
-        played_count = sum(
-            1
-            for item in latest_checkins
-            if item["latest_checkin_status"] in ["played", "replayed"]
-        )
+        to_play_count = counts["users"]["to_play"]
+        playing_count = counts["users"]["playing"] + counts["users"]["replaying"]
+        played_count = counts["users"]["played"] + counts["users"]["replayed"]
 
         # Add status counts to context
         context.update(
@@ -443,6 +412,7 @@ class GameDetailView(DetailView):
                 "to_play_count": to_play_count,
                 "playing_count": playing_count,
                 "played_count": played_count,
+                "checkin_counts": counts,
                 "checkins": checkins,
             }
         )
@@ -772,13 +742,8 @@ class WorkAutocomplete(LoginRequiredMixin, autocomplete.Select2QuerySetView):
         if not self.request.user.is_authenticated:
             return Work.objects.none()
 
-        qs = Work.objects.all()
-
         if self.q:
-            qs = qs.filter(
-                Q(title__icontains=self.q) | Q(other_titles__icontains=self.q)
-            )
-            return qs
+            return filter_autocomplete(Work.objects.all(), self.q)
 
         return Work.objects.none()
 
@@ -799,13 +764,8 @@ class GameAutocomplete(LoginRequiredMixin, autocomplete.Select2QuerySetView):
         if not self.request.user.is_authenticated:
             return Game.objects.none()
 
-        qs = Game.objects.all()
-
         if self.q:
-            qs = qs.filter(
-                Q(title__icontains=self.q) | Q(other_titles__icontains=self.q)
-            )
-            return qs
+            return filter_autocomplete(Game.objects.all(), self.q)
 
         return Game.objects.none()
 
@@ -1050,22 +1010,8 @@ class PlayCheckInAllListView(ListView):
         # Fetch the latest check-in from each user.
         content_type = ContentType.objects.get_for_model(Game)
         object_id = self.kwargs["object_id"]
-        latest_checkin_subquery = (
-            get_visible_checkins(
-                self.request.user, PlayCheckIn, content_type, object_id
-            )
-            .filter(user=OuterRef("user"))
-            .order_by("-timestamp")
-        )
-
-        checkins = (
-            get_visible_checkins(
-                self.request.user, PlayCheckIn, content_type, object_id
-            )
-            .annotate(
-                latest_checkin=Subquery(latest_checkin_subquery.values("timestamp")[:1])
-            )
-            .filter(timestamp=F("latest_checkin"))
+        checkins = get_visible_latest_checkins(
+            self.request.user, PlayCheckIn, content_type, object_id
         )
 
         order = self.request.GET.get("order", "-timestamp")  # Default is '-timestamp'
@@ -1147,20 +1093,8 @@ class PlayCheckInUserListView(ListView):
     def get_queryset(self):
         profile_user = get_object_or_404(User, username=self.kwargs["username"])
 
-        latest_checkin_subquery = get_visible_checkins(
-            self.request.user,
-            PlayCheckIn,
-            OuterRef("content_type"),
-            OuterRef("object_id"),
-            checkin_user=profile_user,
-        ).order_by("-timestamp")
-
-        checkins = (
-            PlayCheckIn.objects.filter(user=profile_user)
-            .annotate(
-                latest_checkin=Subquery(latest_checkin_subquery.values("timestamp")[:1])
-            )
-            .filter(timestamp=F("latest_checkin"))
+        checkins = get_visible_latest_checkins(
+            self.request.user, PlayCheckIn, checkin_user=profile_user
         )
 
         order = self.request.GET.get("order", "-timestamp")  # Default is '-timestamp'
@@ -1178,60 +1112,28 @@ class PlayCheckInUserListView(ListView):
             else:
                 checkins = checkins.filter(status=status)
 
-        # Filtering by year
+        # Check-ins per status, and the years and months to pick from
         year = self.request.GET.get("year", "")
         month = self.request.GET.get("month", "")
-        if year:
-            checkins = checkins.filter(timestamp__year=year)
-        if month:
-            checkins = checkins.filter(timestamp__month=month)
-
-
-        # Count the check-ins for each game for this user
-        user_checkin_counts = (
-            get_visible_checkins(
-                self.request.user,
-                PlayCheckIn,
-                checkin_user=profile_user,
-            )
-            .values("content_type", "object_id")
-            .annotate(total_checkins=Count("id") - 1)
-        )
+        statuses, self.months_by_year = get_checkin_facets(checkins, year, month)
 
-        # Convert to a dictionary for easier lookup
-        user_checkin_count_dict = {
-            (item["content_type"], item["object_id"]): item["total_checkins"]
-            for item in user_checkin_counts
-        }
-
-        # Annotate the checkins queryset with checkin_count for each game
-        for checkin in checkins:
-            checkin.checkin_count = user_checkin_count_dict.get(
-                (checkin.content_type_id, checkin.object_id), 0
-            )
-
-        # Statistics for books per status
+        # Statistics per status
         status_order = ["played", "replayed", "playing", "replayting", "to_play", "paused", "abandoned"]
         status_display_map = dict(PlayCheckIn.STATUS_CHOICES)
 
-        status_counts = (
-            checkins.values("status")
-            .annotate(
-                book_count=Count("object_id", distinct=True)  # Count unique books
-            )
-            .order_by("status")
-        )
-
-        # Convert status_counts into a dictionary for easier lookup
-        status_count_dict = {item["status"]: item["book_count"] for item in status_counts}
-
         # Build a dictionary with display names as keys, ordered by status_order
         self.status_stats = {
-            status_display_map[status]: status_count_dict.get(status, 0)
+            status_display_map[status]: statuses[status]
             for status in status_order
-            if status_count_dict.get(status, 0) > 0  # Include only non-zero counts
+            if statuses[status] > 0  # Include only non-zero counts
         }
 
+        # Filtering by year
+        if year:
+            checkins = checkins.filter(timestamp__year=year)
+        if month:
+            checkins = checkins.filter(timestamp__month=month)
+
         return checkins
 
     def get_context_data(self, **kwargs):
@@ -1245,36 +1147,14 @@ class PlayCheckInUserListView(ListView):
         context["status"] = status = self.request.GET.get("status", "")
         context["year"] = self.request.GET.get("year", "")
 
-        # Extracting the list of years and months
-        checkin_queryset = PlayCheckIn.objects.filter(user=profile_user).distinct()
-
-        # Apply the status filter if it's set
-        if status:
-            if status == "played_replayed":
-                checkin_queryset = checkin_queryset.filter(
-                    Q(status="played") | Q(status="replayed")
-                )
-            elif status == "playing_replaying":
-                checkin_queryset = checkin_queryset.filter(
-                    Q(status="playing") | Q(status="replaying")
-                )
-            else:
-                checkin_queryset = checkin_queryset.filter(status=status)
-
-        years = checkin_queryset.dates("timestamp", "year")
-        # Create a dictionary to store months for each year
-        months_by_year = {}
-        for year in years:
-            months = checkin_queryset.filter(timestamp__year=year.year).dates(
-                "timestamp", "month"
-            )
-            months_by_year[year.year] = [month.month for month in months]
-
-        context["years"] = [year.year for year in years]
-        context["months_by_year"] = months_by_year
+        context["years"] = list(self.months_by_year)
+        context["months_by_year"] = self.months_by_year
 
         context["status_stats"] = self.status_stats
 
+        # Media and check-in counts of this page only
+        checkins = context["checkins"] = prefetch_checkin_page(context["page_obj"])
+        attach_checkin_counts(self.request.user, profile_user, checkins)
 
         include_mathjax, include_mermaid = check_required_js(context["page_obj"])
         context["include_mathjax"] = include_mathjax
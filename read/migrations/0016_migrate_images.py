@@ -35,6 +35,7 @@ class Migration(migrations.Migration):
 
     dependencies = [
         ("read", "0015_historicalissuerole_issuerole_issue_creators"),  # Replace with the last migration file
+        ("entity", "0013_coveralbum_coverimage"),
     ]
 
     operations = [
@@ -7,7 +7,7 @@ import auto_prefetch
 from django.conf import settings
 from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelation
 from django.contrib.contenttypes.models import ContentType
-from django.core.exceptions import ObjectDoesNotExist, ValidationError
+from django.core.exceptions import ValidationError
 from django.core.files.base import ContentFile
 from django.db import models
 from django.db.models import signals
@@ -23,6 +23,8 @@ from entity.models import Company, CoverAlbum, CoverImage, Creator, LanguageFiel
 from visit.models import Location
 from visit.utils import get_location_hierarchy_ids
 from write.models import (
+    ActivityIdMixin,
+    RequiredJSMixin,
     create_mentions_notifications,
     find_mentioned_users,
     handle_tags,
@@ -667,7 +669,7 @@ def auto_delete_file_on_delete(sender, instance, **kwargs):
         instance.cover.delete(save=False)
 
 
-class ReadCheckIn(auto_prefetch.Model):
+class ReadCheckIn(ActivityIdMixin, RequiredJSMixin):
     content_type = auto_prefetch.ForeignKey(
         ContentType, on_delete=models.CASCADE, null=True
     )
@@ -730,20 +732,14 @@ class ReadCheckIn(auto_prefetch.Model):
             kwargs={"pk": self.pk, "username": self.user.username},
         )
 
-    def get_activity_id(self):
-        try:
-            activity = Activity.objects.get(
-                content_type__model="readcheckin", object_id=self.id
-            )
-            return activity.id
-        except ObjectDoesNotExist:
-            return None
-
     def get_votes(self):
         return self.votes.aggregate(models.Sum("value"))["value__sum"] or 0
 
     @property
     def has_voted(self):
+        # Precomputed for a whole page by `prefetch_activities`
+        if hasattr(self, "_has_voted"):
+            return self._has_voted
         return user_has_upvoted(self.user, self.content_object)
 
     def model_name(self):
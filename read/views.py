@@ -9,13 +9,11 @@ from django.db import transaction
 from django.db.models import (
     Case,
     Count,
-    F,
     IntegerField,
     Max,
     Min,
-    OuterRef,
+    Prefetch,
     Q,
-    Subquery,
     Value,
     When,
 )
@@ -37,10 +35,18 @@ from django.views.generic import (
 from django_ratelimit.decorators import ratelimit
 
 from activity_feed.models import Block
+from activity_feed.utils_autocomplete import filter_autocomplete
+from activity_feed.utils_checkin import (
+    attach_checkin_counts,
+    get_checkin_counts,
+    get_checkin_facets,
+    get_visible_latest_checkins,
+)
+from activity_feed.utils_prefetch import attach_activity_ids, prefetch_checkin_page
 from discover.utils import user_has_upvoted
 from entity.forms import CoverImageFormSet
 from entity.models import CoverAlbum, CoverImage, LanguageField
-from entity.utils import get_company_name
+from entity.utils import get_company_name, get_company_names
 from entity.views import HistoryViewMixin, get_contributors
 from listen.models import Release, Track
 from listen.models import Work as MusicWork
@@ -95,8 +101,8 @@ from .models import (
     Issue,
     Periodical,
     ReadCheckIn,
-    Role,
     Work,
+    WorkRole,
 )
 
 User = get_user_model()
@@ -847,24 +853,12 @@ class BookDetailView(DetailView):
         )
 
         # Fetch the latest check-in from each user.
-        latest_checkin_subquery = (
-            get_visible_checkins(
-                self.request.user, ReadCheckIn, content_type, self.object.id
-            )
-            .filter(user=OuterRef("user"))
-            .order_by("-timestamp")
-        )
-
-        checkins = (
-            get_visible_checkins(
-                self.request.user, ReadCheckIn, content_type, self.object.id
-            )
-            .annotate(
-                latest_checkin=Subquery(latest_checkin_subquery.values("timestamp")[:1])
-            )
-            .filter(timestamp=F("latest_checkin"))
-            .order_by("-timestamp")
-        )
+        checkins = get_visible_latest_checkins(
+            self.request.user, ReadCheckIn, content_type, self.object.id
+        ).order_by("-timestamp")
+        checkins = attach_activity_ids(checkins)
+        for checkin in checkins:
+            checkin.content_object = self.object
         context["checkins"] = context["page_obj"] = checkins
 
         user_checkin_counts = (
@@ -888,39 +882,13 @@ class BookDetailView(DetailView):
             )
 
         # Book check-in status counts, considering only latest check-in per user
-        latest_checkin_status_subquery = (
-            get_visible_checkins(
-                self.request.user,
-                ReadCheckIn,
-                content_type,
-                self.object.id,
-                checkin_user=OuterRef("user"),
-            )
-            .order_by("-timestamp")
-            .values("status")[:1]
-        )
-        latest_checkins = (
-            ReadCheckIn.objects.filter(
-                content_type=content_type.id, object_id=self.object.id
-            )
-            .annotate(latest_checkin_status=Subquery(latest_checkin_status_subquery))
-            .values("user", "latest_checkin_status")
-            .distinct()
+        counts = get_checkin_counts(
+            self.request.user, ReadCheckIn, content_type, self.object.id
         )
 
-        to_read_count = sum(
-            1 for item in latest_checkins if item["latest_checkin_status"] == "to_read"
-        )
-        reading_count = sum(
-            1
-            for item in latest_checkins
-            if item["latest_checkin_status"] in ["reading", "rereading"]
-        )
-        read_count = sum(
-            1
-            for item in latest_checkins
-            if item["latest_checkin_status"] in ["finished_reading", "reread"]
-        )
+        to_read_count = counts["users"]["to_read"]
+        reading_count = counts["users"]["reading"] + counts["users"]["rereading"]
+        read_count = counts["users"]["finished_reading"] + counts["users"]["reread"]
 
         # Add status counts to context
         context.update(
@@ -928,6 +896,7 @@ class BookDetailView(DetailView):
                 "to_read_count": to_read_count,
                 "reading_count": reading_count,
                 "read_count": read_count,
+                "checkin_counts": counts,
                 "checkins": checkins,
             }
         )
@@ -1483,21 +1452,8 @@ class IssueDetailView(DetailView):
         )
 
         # Fetch the latest check-in from each user.
-        latest_checkin_subquery = (
-            get_visible_checkins(
-                self.request.user, ReadCheckIn, content_type, self.object.id
-            )
-            .filter(user=OuterRef("user"))
-            .order_by("-timestamp")
-        )
-        checkins = (
-            get_visible_checkins(
-                self.request.user, ReadCheckIn, content_type, self.object.id
-            )
-            .annotate(
-                latest_checkin=Subquery(latest_checkin_subquery.values("timestamp")[:1])
-            )
-            .filter(timestamp=F("latest_checkin"))
+        checkins = get_visible_latest_checkins(
+            self.request.user, ReadCheckIn, content_type, self.object.id
         ).order_by("-timestamp")[:5]
 
         # Get the count of check-ins for each user for this issue
@@ -1522,39 +1478,13 @@ class IssueDetailView(DetailView):
             )
 
         # Issue check-in status counts, considering only latest check-in per user
-        latest_checkin_status_subquery = (
-            get_visible_checkins(
-                self.request.user,
-                ReadCheckIn,
-                content_type,
-                self.object.id,
-                checkin_user=OuterRef("user"),
-            )
-            .order_by("-timestamp")
-            .values("status")[:1]
-        )
-        latest_checkins = (
-            ReadCheckIn.objects.filter(
-                content_type=content_type.id, object_id=self.object.id
-            )
-            .annotate(latest_checkin_status=Subquery(latest_checkin_status_subquery))
-            .values("user", "latest_checkin_status")
-            .distinct()
+        counts = get_checkin_counts(
+            self.request.user, ReadCheckIn, content_type, self.object.id
         )
 
-        to_read_count = sum(
-            1 for item in latest_checkins if item["latest_checkin_status"] == "to_read"
-        )
-        reading_count = sum(
-            1
-            for item in latest_checkins
-            if item["latest_checkin_status"] in ["reading", "rereading"]
-        )
-        read_count = sum(
-            1
-            for item in latest_checkins
-            if item["latest_checkin_status"] in ["finished_reading", "reread"]
-        )
+        to_read_count = counts["users"]["to_read"]
+        reading_count = counts["users"]["reading"] + counts["users"]["rereading"]
+        read_count = counts["users"]["finished_reading"] + counts["users"]["reread"]
 
         # Add status counts to context
         context.update(
@@ -1562,6 +1492,7 @@ class IssueDetailView(DetailView):
                 "to_read_count": to_read_count,
                 "reading_count": reading_count,
                 "read_count": read_count,
+                "checkin_counts": counts,
                 "checkins": checkins,
             }
         )
@@ -1782,32 +1713,23 @@ class WorkAutocomplete(LoginRequiredMixin, autocomplete.Select2QuerySetView):
         if not self.request.user.is_authenticated:
             return Work.objects.none()
 
-        qs = Work.objects.all()
-
         if self.q:
-            # get all the authors whose name starts with query
-            authors = Creator.objects.filter(name__icontains=self.q)
-
-            # get the author role
-            author_role = Role.objects.filter(name="Author").first()
-
-            # get all the works which are associated with these authors
-            qs = qs.filter(
-                Q(workrole__role=author_role, workrole__creator__in=authors)
-                | Q(title__icontains=self.q)
-                | Q(publication_date__icontains=self.q)
-            ).distinct()
-
-            return qs
+            # Authors are matched by name too, and shown in the label
+            return filter_autocomplete(Work.objects.all(), self.q).prefetch_related(
+                Prefetch(
+                    "workrole_set",
+                    queryset=WorkRole.objects.filter(role__name="Author")
+                    .select_related("creator")
+                    .order_by("id"),
+                    to_attr="author_roles",
+                )
+            )
 
         return Work.objects.none()
 
     def get_result_label(self, item):
-        # Get the first person with a role of 'Author' for the book
-        author_role = Role.objects.filter(
-            name="Author"
-        ).first()  # Adjust 'Author' to match your data
-        work_role = item.workrole_set.filter(role=author_role).first()
+        # The first person with a role of 'Author', from `get_queryset`
+        work_role = item.author_roles[0] if item.author_roles else None
 
         author_name = None
         if work_role:
@@ -1832,33 +1754,23 @@ class InstanceAutocomplete(LoginRequiredMixin, autocomplete.Select2QuerySetView)
         if not self.request.user.is_authenticated:
             return Instance.objects.none()
 
-        qs = Instance.objects.all()
-
         if self.q:
-            # get all the authors whose name starts with query
-            authors = Creator.objects.filter(name__icontains=self.q)
-
-            # get the author role
-            author_role = Role.objects.filter(name="Author").first()
-
-            # get all the instances which are associated with these authors
-            qs = qs.filter(
-                Q(instancerole__role=author_role, instancerole__creator__in=authors)
-                | Q(title__icontains=self.q)
-                | Q(publication_date__icontains=self.q)
-            ).distinct()
-
-            return qs
+            # Authors are matched by name too, and shown in the label
+            return filter_autocomplete(Instance.objects.all(), self.q).prefetch_related(
+                Prefetch(
+                    "instancerole_set",
+                    queryset=InstanceRole.objects.filter(role__name="Author")
+                    .select_related("creator")
+                    .order_by("id"),
+                    to_attr="author_roles",
+                )
+            )
 
         return Instance.objects.none()
 
     def get_result_label(self, item):
-        # Get the first person with a role of 'Author' for the book
-        author_role = Role.objects.filter(
-            name="Author"
-        ).first()  # Adjust 'Author' to match your data
-
-        instance_role = item.instancerole_set.filter(role=author_role).first()
+        # The first person with a role of 'Author', from `get_queryset`
+        instance_role = item.author_roles[0] if item.author_roles else None
 
         author_name = None
         if instance_role:
@@ -1883,33 +1795,23 @@ class BookAutoComplete(LoginRequiredMixin, autocomplete.Select2QuerySetView):
         if not self.request.user.is_authenticated:
             return Book.objects.none()
 
-        qs = Book.objects.all()
-
         if self.q:
-            # get all the authors whose name starts with query
-            authors = Creator.objects.filter(name__icontains=self.q)
-
-            # get the author role
-            author_role = Role.objects.filter(name="Author").first()
-
-            # get all the instances which are associated with these authors
-            qs = qs.filter(
-                Q(bookrole__role=author_role, bookrole__creator__in=authors)
-                | Q(title__icontains=self.q)
-                | Q(publication_date__icontains=self.q)
-            ).distinct()
-
-            return qs
+            # Authors are matched by name too, and shown in the label
+            return filter_autocomplete(Book.objects.all(), self.q).prefetch_related(
+                Prefetch(
+                    "bookrole_set",
+                    queryset=BookRole.objects.filter(role__name="Author")
+                    .select_related("creator")
+                    .order_by("id"),
+                    to_attr="author_roles",
+                )
+            )
 
         return Instance.objects.none()
 
     def get_result_label(self, item):
-        # Get the first person with a role of 'Author' for the book
-        author_role = Role.objects.filter(
-            name="Author"
-        ).first()  # Adjust 'Author' to match your data
-
-        book_role = item.bookrole_set.filter(role=author_role).first()
+        # The first person with a role of 'Author', from `get_queryset`
+        book_role = item.author_roles[0] if item.author_roles else None
 
         author_name = None
         if book_role:
@@ -2354,22 +2256,8 @@ class GenericCheckInAllListView(ListView):
         content_type = ContentType.objects.get_for_model(model)
         object_id = self.kwargs["object_id"]  # Get object id from url param
 
-        latest_checkin_subquery = (
-            get_visible_checkins(
-                self.request.user, ReadCheckIn, content_type, object_id
-            )
-            .filter(user=OuterRef("user"))
-            .order_by("-timestamp")
-        )
-
-        checkins = (
-            get_visible_checkins(
-                self.request.user, ReadCheckIn, content_type, object_id
-            )
-            .annotate(
-                latest_checkin=Subquery(latest_checkin_subquery.values("timestamp")[:1])
-            )
-            .filter(timestamp=F("latest_checkin"))
+        checkins = get_visible_latest_checkins(
+            self.request.user, ReadCheckIn, content_type, object_id
         )
 
         order = self.request.GET.get("order", "-timestamp")  # Default is '-timestamp'
@@ -2466,29 +2354,10 @@ class GenericCheckInUserListView(ListView):
     def get_queryset(self):
         profile_user = get_object_or_404(User, username=self.kwargs["username"])
 
-        latest_checkin_subquery = get_visible_checkins(
-            self.request.user,
-            ReadCheckIn,
-            OuterRef("content_type"),
-            OuterRef("object_id"),
-            checkin_user=profile_user,
-        ).order_by("-timestamp")
-
-        checkins = (
-            ReadCheckIn.objects.filter(user=profile_user)
-            .annotate(
-                latest_checkin=Subquery(latest_checkin_subquery.values("timestamp")[:1])
-            )
-            .filter(timestamp=F("latest_checkin"))
+        checkins = get_visible_latest_checkins(
+            self.request.user, ReadCheckIn, checkin_user=profile_user
         )
 
-        if self.request.user.is_authenticated:
-            checkins = checkins.filter(
-                Q(visibility="PU") | Q(visible_to=self.request.user)
-            )
-        else:
-            checkins = checkins.filter(visibility="PU")
-
         order = self.request.GET.get("order", "-timestamp")  # Default is '-timestamp'
         if order == "timestamp":
             checkins = checkins.order_by("timestamp")
@@ -2506,14 +2375,6 @@ class GenericCheckInUserListView(ListView):
             else:
                 checkins = checkins.filter(status=status)
 
-        # Filtering by year
-        year = self.request.GET.get("year", "")
-        month = self.request.GET.get("month", "")
-        if year:
-            checkins = checkins.filter(timestamp__year=year)
-        if month:
-            checkins = checkins.filter(timestamp__month=month)
-
        # Filtering by type (Book, Issue, or All)
         checkin_type = self.request.GET.get("type", "").lower()
         if checkin_type:
@@ -2525,55 +2386,28 @@ class GenericCheckInUserListView(ListView):
             elif checkin_type == "issue":
                 checkins = checkins.filter(content_type=issue_content_type)
 
-        # Adding count of check-ins for each book or issue
-        user_checkin_counts = (
-            get_visible_checkins(
-                self.request.user,
-                ReadCheckIn,
-                checkin_user=profile_user,
-            )
-            .values("content_type", "object_id")
-            .annotate(total_checkins=Count("id") - 1)
-        )
-
-        # Convert to a dictionary for easier lookup
-        user_checkin_count_dict = {
-            (item["content_type"], item["object_id"]): item["total_checkins"]
-            for item in user_checkin_counts
-        }
-
-        # Annotate the checkins queryset with total_checkins for each content-object
-        for checkin in checkins:
-            checkin.checkin_count = user_checkin_count_dict.get(
-                (checkin.content_type_id, checkin.object_id), 0
-            )
-            checkin.publisher = get_company_name(
-                [checkin.content_object.publisher],
-                checkin.content_object.publication_date,
-            )[0]
+        # Check-ins per status, and the years and months to pick from
+        year = self.request.GET.get("year", "")
+        month = self.request.GET.get("month", "")
+        statuses, self.months_by_year = get_checkin_facets(checkins, year, month)
 
         # Statistics for books per status
         status_order = ["finished_reading", "reread", "sampled", "reading", "rereading", "to_read", "paused", "abandoned"]
         status_display_map = dict(ReadCheckIn.STATUS_CHOICES)
 
-        status_counts = (
-            checkins.values("status")
-            .annotate(
-                book_count=Count("object_id", distinct=True)  # Count unique books
-            )
-            .order_by("status")
-        )
-
-        # Convert status_counts into a dictionary for easier lookup
-        status_count_dict = {item["status"]: item["book_count"] for item in status_counts}
-
         # Build a dictionary with display names as keys, ordered by status_order
         self.status_stats = {
-            status_display_map[status]: status_count_dict.get(status, 0)
+            status_display_map[status]: statuses[status]
             for status in status_order
-            if status_count_dict.get(status, 0) > 0  # Include only non-zero counts
+            if statuses[status] > 0  # Include only non-zero counts
         }
 
+        # Filtering by year
+        if year:
+            checkins = checkins.filter(timestamp__year=year)
+        if month:
+            checkins = checkins.filter(timestamp__month=month)
+
         return checkins
 
     def get_context_data(self, **kwargs):
@@ -2589,38 +2423,21 @@ class GenericCheckInUserListView(ListView):
         context["month"] = self.request.GET.get("month", "")
         context["type"] = self.request.GET.get("type", "")
 
-        # Extracting the list of years and months
-        checkin_queryset = ReadCheckIn.objects.filter(user=profile_user).distinct()
-
-        # Apply the status filter if it's set
-        status = context["status"]
-        if status:
-            if status == "read_reread":
-                checkin_queryset = checkin_queryset.filter(
-                    Q(status="finished_reading") | Q(status="rereading")
-                )
-            elif status == "reading_rereading":
-                checkin_queryset = checkin_queryset.filter(
-                    Q(status="reading") | Q(status="rereading")
-                )
-            else:
-                checkin_queryset = checkin_queryset.filter(status=status)
-
-        years = checkin_queryset.dates("timestamp", "year")
-
-        # Create a dictionary to store months for each year
-        months_by_year = {}
-        for year in years:
-            months = checkin_queryset.filter(timestamp__year=year.year).dates(
-                "timestamp", "month"
-            )
-            months_by_year[year.year] = [month.month for month in months]
-
-        context["years"] = [year.year for year in years]
-        context["months_by_year"] = months_by_year
+        context["years"] = list(self.months_by_year)
+        context["months_by_year"] = self.months_by_year
 
         context["status_stats"] = self.status_stats
 
+        # Media, check-in counts and publishers of this page only
+        checkins = context["checkins"] = prefetch_checkin_page(context["page_obj"])
+        attach_checkin_counts(self.request.user, profile_user, checkins)
+        publishers = get_company_names(
+            (checkin.content_object.publisher, checkin.content_object.publication_date)
+            for checkin in checkins
+        )
+        for checkin, publisher in zip(checkins, publishers):
+            checkin.publisher = publisher
+
         include_mathjax, include_mermaid = check_required_js(context["page_obj"])
         context["include_mathjax"] = include_mathjax
         context["include_mermaid"] = include_mermaid
@@ -2914,10 +2731,12 @@ class BookGroupDetailView(DetailView):
             ),
         )
 
-        for book_in_group in books:
-            book_in_group.publisher = get_company_name(
-                [book_in_group.book.publisher], book_in_group.book.publication_date
-            )[0]
+        publishers = get_company_names(
+            (book_in_group.book.publisher, book_in_group.book.publication_date)
+            for book_in_group in books
+        )
+        for book_in_group, publisher in zip(books, publishers):
+            book_in_group.publisher = publisher
 
         # Update the context with the sorted book
         context["sorted_books"] = books
@@ -2,7 +2,7 @@ import auto_prefetch
 from django.conf import settings
 from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelation
 from django.contrib.contenttypes.models import ContentType
-from django.core.exceptions import ObjectDoesNotExist, ValidationError
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.urls import reverse
 from django.utils.text import slugify
@@ -10,6 +10,8 @@ from simple_history.models import HistoricalRecords
 
 from activity_feed.models import Activity
 from write.models import (
+    ActivityIdMixin,
+    RequiredJSMixin,
     create_mentions_notifications,
     find_mentioned_users,
     handle_tags,
@@ -147,7 +149,7 @@ class Location(models.Model):
     #         return ""
 
 
-class VisitCheckIn(auto_prefetch.Model):
+class VisitCheckIn(ActivityIdMixin, RequiredJSMixin):
     content_type = auto_prefetch.ForeignKey(
         ContentType, on_delete=models.CASCADE, null=True
     )
@@ -205,15 +207,6 @@ class VisitCheckIn(auto_prefetch.Model):
             kwargs={"pk": self.pk, "username": self.user.username},
         )
 
-    def get_activity_id(self):
-        try:
-            activity = Activity.objects.get(
-                content_type__model="visitcheckin", object_id=self.id
-            )
-            return activity.id
-        except ObjectDoesNotExist:
-            return None
-
     def get_votes(self):
         return self.votes.aggregate(models.Sum("value"))["value__sum"] or 0
 
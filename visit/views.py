@@ -11,10 +11,7 @@ from django.db.models import (
     Case,
     CharField,
     Count,
-    F,
-    OuterRef,
     Q,
-    Subquery,
     Value,
     When,
 )
@@ -32,6 +29,14 @@ from django.views.generic import (
 from django_ratelimit.decorators import ratelimit
 
 from activity_feed.models import Block
+from activity_feed.utils_autocomplete import filter_autocomplete
+from activity_feed.utils_checkin import (
+    attach_checkin_counts,
+    get_checkin_counts,
+    get_checkin_facets,
+    get_visible_latest_checkins,
+)
+from activity_feed.utils_prefetch import attach_activity_ids, prefetch_checkin_page
 from discover.utils import user_has_upvoted
 from entity.models import Company, Creator
 from entity.views import HistoryViewMixin, get_contributors
@@ -230,22 +235,12 @@ class LocationDetailView(DetailView):
         )
 
         # Fetch the latest check-in from each user.
-        latest_checkin_subquery = (
-            get_visible_checkins(
-                self.request.user, VisitCheckIn, content_type, self.object.id
-            )
-            .filter(user=OuterRef("user"))
-            .order_by("-timestamp")
-        )
-        checkins = (
-            get_visible_checkins(
-                self.request.user, VisitCheckIn, content_type, self.object.id
-            )
-            .annotate(
-                latest_checkin=Subquery(latest_checkin_subquery.values("timestamp")[:1])
-            )
-            .filter(timestamp=F("latest_checkin"))
+        checkins = get_visible_latest_checkins(
+            self.request.user, VisitCheckIn, content_type, self.object.id
         ).order_by("-timestamp")[:5]
+        checkins = attach_activity_ids(checkins)
+        for checkin in checkins:
+            checkin.content_object = self.object
 
         context["checkins"] = checkins
 
@@ -271,39 +266,13 @@ class LocationDetailView(DetailView):
             )
 
         # Watch check-in status counts, considering only latest check-in per user
-        latest_checkin_status_subquery = (
-            get_visible_checkins(
-                self.request.user,
-                VisitCheckIn,
-                content_type,
-                self.object.id,
-                checkin_user=OuterRef("user"),
-            )
-            .order_by("-timestamp")
-            .values("status")[:1]
-        )
-        latest_checkins = (
-            VisitCheckIn.objects.filter(
-                content_type=content_type.id, object_id=self.object.id
-            )
-            .annotate(latest_checkin_status=Subquery(latest_checkin_status_subquery))
-            .values("user", "latest_checkin_status")
-            .distinct()
+        counts = get_checkin_counts(
+            self.request.user, VisitCheckIn, content_type, self.object.id
         )
 
-        to_visit_count = sum(
-            1 for item in latest_checkins if item["latest_checkin_status"] == "to_visit"
-        )
-        visiting_count = sum(
-            1
-            for item in latest_checkins
-            if item["latest_checkin_status"] in ["visiting", "revisiting"]
-        )
-        visited_count = sum(
-            1
-            for item in latest_checkins
-            if item["latest_checkin_status"] in ["visited", "revisited"]
-        )
+        to_visit_count = counts["users"]["to_visit"]
+        visiting_count = counts["users"]["visiting"] + counts["users"]["revisiting"]
+        visited_count = counts["users"]["visited"] + counts["users"]["revisited"]
         
 
         # Add status counts to context
@@ -312,6 +281,7 @@ class LocationDetailView(DetailView):
                 "to_visit_count": to_visit_count,
                 "visiting_count": visiting_count,
                 "visited_count": visited_count,
+                "checkin_counts": counts,
                 "checkins": checkins,
             }
         )
@@ -440,11 +410,7 @@ class LocationAutoComplete(LoginRequiredMixin, autocomplete.Select2QuerySetView)
         qs = Location.objects.all()
 
         if self.q:
-            qs = qs.filter(
-                Q(name__icontains=self.q) | Q(other_names__icontains=self.q)
-            ).distinct()
-
-            return qs
+            return filter_autocomplete(qs, self.q)
 
         return Location.objects.none()
 
@@ -684,22 +650,8 @@ class VisitCheckInAllListView(ListView):
         # Fetch the latest check-in from each user.
         content_type = ContentType.objects.get_for_model(Location)
         object_id = self.kwargs["object_id"]
-        latest_checkin_subquery = (
-            get_visible_checkins(
-                self.request.user, VisitCheckIn, content_type, object_id
-            )
-            .filter(user=OuterRef("user"))
-            .order_by("-timestamp")
-        )
-
-        checkins = (
-            get_visible_checkins(
-                self.request.user, VisitCheckIn, content_type, object_id
-            )
-            .annotate(
-                latest_checkin=Subquery(latest_checkin_subquery.values("timestamp")[:1])
-            )
-            .filter(timestamp=F("latest_checkin"))
+        checkins = get_visible_latest_checkins(
+            self.request.user, VisitCheckIn, content_type, object_id
         )
 
         order = self.request.GET.get("order", "-timestamp")  # Default is '-timestamp'
@@ -770,29 +722,10 @@ class VisitCheckInUserListView(ListView):
     def get_queryset(self):
         profile_user = get_object_or_404(User, username=self.kwargs["username"])
 
-        latest_checkin_subquery = get_visible_checkins(
-            self.request.user,
-            VisitCheckIn,
-            OuterRef("content_type"),
-            OuterRef("object_id"),
-            checkin_user=profile_user,
-        ).order_by("-timestamp")
-
-        checkins = (
-            VisitCheckIn.objects.filter(user=profile_user)
-            .annotate(
-                latest_checkin=Subquery(latest_checkin_subquery.values("timestamp")[:1])
-            )
-            .filter(timestamp=F("latest_checkin"))
+        checkins = get_visible_latest_checkins(
+            self.request.user, VisitCheckIn, checkin_user=profile_user
         )
 
-        if self.request.user.is_authenticated:
-            checkins = checkins.filter(
-                Q(visibility="PU") | Q(visible_to=self.request.user)
-            )
-        else:
-            checkins = checkins.filter(visibility="PU")
-
         order = self.request.GET.get("order", "-timestamp")  # Default is '-timestamp'
         if order == "timestamp":
             checkins = checkins.order_by("timestamp")
@@ -811,56 +744,27 @@ class VisitCheckInUserListView(ListView):
                 checkins = checkins.filter(status=status)
 
 
-        # Filtering by year
+        # Check-ins per status, and the years and months to pick from
         year = self.request.GET.get("year", "")
         month = self.request.GET.get("month", "")
-        if year:
-            checkins = checkins.filter(timestamp__year=year)
-        if month:
-            checkins = checkins.filter(timestamp__month=month)
-
+        statuses, self.months_by_year = get_checkin_facets(checkins, year, month)
 
-        # Count the check-ins for each game for this user
-        user_checkin_counts = (
-            VisitCheckIn.objects.filter(user=profile_user)
-            .values("content_type", "object_id")
-            .annotate(total_checkins=Count("id") - 1)
-        )
-
-        # Convert to a dictionary for easier lookup
-        user_checkin_count_dict = {
-            (item["content_type"], item["object_id"]): item["total_checkins"]
-            for item in user_checkin_counts
-        }
-
-        # Annotate the checkins queryset with checkin_count for each game
-        for checkin in checkins:
-            checkin.checkin_count = user_checkin_count_dict.get(
-                (checkin.content_type_id, checkin.object_id), 0
-            )
-
-        # Statistics for books per status
+        # Statistics per status
         status_order = ["visited", "revisited", "visiting", "revisitting", "to_visit", "paused", "abandoned"]
         status_display_map = dict(VisitCheckIn.STATUS_CHOICES)
 
-        status_counts = (
-            checkins.values("status")
-            .annotate(
-                book_count=Count("object_id", distinct=True)  # Count unique books
-            )
-            .order_by("status")
-        )
-
-        # Convert status_counts into a dictionary for easier lookup
-        status_count_dict = {item["status"]: item["book_count"] for item in status_counts}
-
         # Build a dictionary with display names as keys, ordered by status_order
         self.status_stats = {
-            status_display_map[status]: status_count_dict.get(status, 0)
+            status_display_map[status]: statuses[status]
             for status in status_order
-            if status_count_dict.get(status, 0) > 0  # Include only non-zero counts
+            if statuses[status] > 0  # Include only non-zero counts
         }
 
+        # Filtering by year
+        if year:
+            checkins = checkins.filter(timestamp__year=year)
+        if month:
+            checkins = checkins.filter(timestamp__month=month)
 
         return checkins
 
@@ -875,36 +779,15 @@ class VisitCheckInUserListView(ListView):
 
         context["status"] = status = self.request.GET.get("status", "")
         context["year"] = self.request.GET.get("year", "")
-        # Extracting the list of years and months
-        checkin_queryset = VisitCheckIn.objects.filter(user=profile_user).distinct()
-
-        # Apply the status filter if it's set
-        if status:
-            if status == "visited_revisited":
-                checkin_queryset = checkin_queryset.filter(
-                    Q(status="visited") | Q(status="revisited")
-                )
-            elif status == "visiting_revisiting":
-                checkin_queryset = checkin_queryset.filter(
-                    Q(status="visiting") | Q(status="revisiting")
-                )
-            else:
-                checkin_queryset = checkin_queryset.filter(status=status)
-
-        years = checkin_queryset.dates("timestamp", "year")
-        # Create a dictionary to store months for each year
-        months_by_year = {}
-        for year in years:
-            months = checkin_queryset.filter(timestamp__year=year.year).dates(
-                "timestamp", "month"
-            )
-            months_by_year[year.year] = [month.month for month in months]
-
-        context["years"] = [year.year for year in years]
-        context["months_by_year"] = months_by_year
+        context["years"] = list(self.months_by_year)
+        context["months_by_year"] = self.months_by_year
 
         context["status_stats"] = self.status_stats
 
+        # Media and check-in counts of this page only
+        checkins = context["checkins"] = prefetch_checkin_page(context["page_obj"])
+        attach_checkin_counts(self.request.user, profile_user, checkins)
+
         include_mathjax, include_mermaid = check_required_js(context["page_obj"])
         context["include_mathjax"] = include_mathjax
         context["include_mermaid"] = include_mermaid
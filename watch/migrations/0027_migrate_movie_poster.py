@@ -35,6 +35,7 @@ class Migration(migrations.Migration):
 
     dependencies = [
         ("watch", "0026_episodecast_is_star_episodecast_order_and_more"),  # Replace with the last migration file
+        ("entity", "0013_coveralbum_coverimage"),
     ]
 
     operations = [
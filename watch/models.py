@@ -7,7 +7,7 @@ import auto_prefetch
 from django.conf import settings
 from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelation
 from django.contrib.contenttypes.models import ContentType
-from django.core.exceptions import ObjectDoesNotExist, ValidationError
+from django.core.exceptions import ValidationError
 from django.core.files.base import ContentFile
 from django.db import models
 from django.db.models import Min
@@ -22,6 +22,8 @@ from entity.models import Company, CoverAlbum, CoverImage, Creator, LanguageFiel
 from visit.models import Location
 from visit.utils import get_location_hierarchy_ids
 from write.models import (
+    ActivityIdMixin,
+    RequiredJSMixin,
     create_mentions_notifications,
     find_mentioned_users,
     handle_tags,
@@ -270,6 +272,8 @@ class Movie(auto_prefetch.Model):
 
     @property
     def movie_stars(self):
+        if hasattr(self, "prefetched_stars"):
+            return self.prefetched_stars
         return self.moviecasts.filter(is_star=True).order_by("order")
 
     def get_votes(self):
@@ -621,7 +625,10 @@ class Season(auto_prefetch.Model):
         # Iterate over all episodes related to this season
         for episode in self.episodes.all():
             # Filter stars in each episode and gather information
-            for star_cast in episode.episodecasts.filter(is_star=True):
+            star_casts = getattr(episode, "prefetched_stars", None)
+            if star_casts is None:
+                star_casts = episode.episodecasts.filter(is_star=True)
+            for star_cast in star_casts:
                 creator = star_cast.creator
                 alt_name = star_cast.alt_name
 
@@ -891,7 +898,7 @@ class EpisodeCast(auto_prefetch.Model):
         return f"{self.episode} - {self.creator} - {self.role}"
 
 
-class WatchCheckIn(auto_prefetch.Model):
+class WatchCheckIn(ActivityIdMixin, RequiredJSMixin):
     content_type = auto_prefetch.ForeignKey(
         ContentType, on_delete=models.CASCADE, null=True
     )
@@ -950,20 +957,13 @@ class WatchCheckIn(auto_prefetch.Model):
             kwargs={"pk": self.pk, "username": self.user.username},
         )
 
-    def get_activity_id(self):
-        try:
-            activity = Activity.objects.get(
-                content_type__model="watchcheckin", object_id=self.id
-            )
-            return activity.id
-        except ObjectDoesNotExist:
-            return None
-
     def get_votes(self):
         return self.votes.aggregate(models.Sum("value"))["value__sum"] or 0
 
     @property
     def has_voted(self):
+        if hasattr(self, "_has_voted"):
+            return self._has_voted
         return user_has_upvoted(self.user, self.content_object)
 
     def model_name(self):
@@ -9,7 +9,7 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib.contenttypes.models import ContentType
 from django.db import transaction
-from django.db.models import Count, F, Max, Min, OuterRef, Q, Subquery
+from django.db.models import Count, Max, Min, Prefetch, Q
 from django.forms.models import inlineformset_factory
 from django.http import Http404, HttpResponseForbidden, HttpResponseRedirect
 from django.shortcuts import get_object_or_404, redirect
@@ -27,6 +27,14 @@ from django.views.generic import (
 from django_ratelimit.decorators import ratelimit
 
 from activity_feed.models import Block
+from activity_feed.utils_autocomplete import filter_autocomplete
+from activity_feed.utils_checkin import (
+    attach_checkin_counts,
+    get_checkin_counts,
+    get_checkin_facets,
+    get_visible_latest_checkins,
+)
+from activity_feed.utils_prefetch import prefetch_checkin_page
 from discover.utils import user_has_upvoted
 from entity.forms import CoverImageFormSet
 from entity.models import CoverAlbum, CoverImage
@@ -68,6 +76,7 @@ from .models import (
     EpisodeRole,
     Genre,
     Movie,
+    MovieReleaseDate,
     Season,
     Series,
     WatchCheckIn,
@@ -185,21 +194,8 @@ class MovieDetailView(DetailView):
         )
 
         # Fetch the latest check-in from each user.
-        latest_checkin_subquery = (
-            get_visible_checkins(
-                self.request.user, WatchCheckIn, content_type, self.object.id
-            )
-            .filter(user=OuterRef("user"))
-            .order_by("-timestamp")
-        )
-        checkins = (
-            get_visible_checkins(
-                self.request.user, WatchCheckIn, content_type, self.object.id
-            )
-            .annotate(
-                latest_checkin=Subquery(latest_checkin_subquery.values("timestamp")[:1])
-            )
-            .filter(timestamp=F("latest_checkin"))
+        checkins = get_visible_latest_checkins(
+            self.request.user, WatchCheckIn, content_type, self.object.id
         ).order_by("-timestamp")[:5]
 
         context["checkins"] = checkins
@@ -226,39 +222,13 @@ class MovieDetailView(DetailView):
             )
 
         # Watch check-in status counts, considering only latest check-in per user
-        latest_checkin_status_subquery = (
-            get_visible_checkins(
-                self.request.user,
-                WatchCheckIn,
-                content_type,
-                self.object.id,
-                checkin_user=OuterRef("user"),
-            )
-            .order_by("-timestamp")
-            .values("status")[:1]
-        )
-        latest_checkins = (
-            WatchCheckIn.objects.filter(
-                content_type=content_type.id, object_id=self.object.id
-            )
-            .annotate(latest_checkin_status=Subquery(latest_checkin_status_subquery))
-            .values("user", "latest_checkin_status")
-            .distinct()
+        counts = get_checkin_counts(
+            self.request.user, WatchCheckIn, content_type, self.object.id
         )
 
-        to_watch_count = sum(
-            1 for item in latest_checkins if item["latest_checkin_status"] == "to_watch"
-        )
-        watching_count = sum(
-            1
-            for item in latest_checkins
-            if item["latest_checkin_status"] in ["watching", "rewatching"]
-        )
-        watched_count = sum(
-            1
-            for item in latest_checkins
-            if item["latest_checkin_status"] in ["watched", "rewatched"]
-        )
+        to_watch_count = counts["users"]["to_watch"]
+        watching_count = counts["users"]["watching"] + counts["users"]["rewatching"]
+        watched_count = counts["users"]["watched"] + counts["users"]["rewatched"]
 
         # Add status counts to context
         context.update(
@@ -266,6 +236,7 @@ class MovieDetailView(DetailView):
                 "to_watch_count": to_watch_count,
                 "watching_count": watching_count,
                 "watched_count": watched_count,
+                "checkin_counts": counts,
                 "checkins": checkins,
             }
         )
@@ -1128,27 +1099,11 @@ class SeasonDetailView(DetailView):
         )
 
         # Fetch the latest check-in from each user.
-        latest_checkin_subquery = (
-            get_visible_checkins(
-                self.request.user,
-                WatchCheckIn,
-                content_type,
-                self.object.id,
-            )
-            .filter(user=OuterRef("user"))
-            .order_by("-timestamp")
-        )
-        checkins = (
-            get_visible_checkins(
-                self.request.user,
-                WatchCheckIn,
-                content_type,
-                self.object.id,
-            )
-            .annotate(
-                latest_checkin=Subquery(latest_checkin_subquery.values("timestamp")[:1])
-            )
-            .filter(timestamp=F("latest_checkin"))
+        checkins = get_visible_latest_checkins(
+            self.request.user,
+            WatchCheckIn,
+            content_type,
+            self.object.id,
         ).order_by("-timestamp")[:5]
 
         context["checkins"] = checkins
@@ -1178,39 +1133,13 @@ class SeasonDetailView(DetailView):
             )
 
         # Watch check-in status counts, considering only latest check-in per user
-        latest_checkin_status_subquery = (
-            get_visible_checkins(
-                self.request.user,
-                WatchCheckIn,
-                content_type,
-                self.object.id,
-                checkin_user=OuterRef("user"),
-            )
-            .order_by("-timestamp")
-            .values("status")[:1]
-        )
-        latest_checkins = (
-            WatchCheckIn.objects.filter(
-                content_type=content_type.id, object_id=self.object.id
-            )
-            .annotate(latest_checkin_status=Subquery(latest_checkin_status_subquery))
-            .values("user", "latest_checkin_status")
-            .distinct()
+        counts = get_checkin_counts(
+            self.request.user, WatchCheckIn, content_type, self.object.id
         )
 
-        to_watch_count = sum(
-            1 for item in latest_checkins if item["latest_checkin_status"] == "to_watch"
-        )
-        watching_count = sum(
-            1
-            for item in latest_checkins
-            if item["latest_checkin_status"] in ["watching", "rewatching"]
-        )
-        watched_count = sum(
-            1
-            for item in latest_checkins
-            if item["latest_checkin_status"] in ["watched", "rewatched"]
-        )
+        to_watch_count = counts["users"]["to_watch"]
+        watching_count = counts["users"]["watching"] + counts["users"]["rewatching"]
+        watched_count = counts["users"]["watched"] + counts["users"]["rewatched"]
 
         # Add status counts to context
         context.update(
@@ -1218,6 +1147,7 @@ class SeasonDetailView(DetailView):
                 "to_watch_count": to_watch_count,
                 "watching_count": watching_count,
                 "watched_count": watched_count,
+                "checkin_counts": counts,
                 "checkins": checkins,
             }
         )
@@ -2224,22 +2154,8 @@ class GenericCheckInAllListView(ListView):
         else:
             object_id = self.kwargs["object_id"]  # Get object id from url param
 
-        latest_checkin_subquery = (
-            get_visible_checkins(
-                self.request.user, WatchCheckIn, content_type, object_id
-            )
-            .filter(user=OuterRef("user"))
-            .order_by("-timestamp")
-        )
-
-        checkins = (
-            get_visible_checkins(
-                self.request.user, WatchCheckIn, content_type, object_id
-            )
-            .annotate(
-                latest_checkin=Subquery(latest_checkin_subquery.values("timestamp")[:1])
-            )
-            .filter(timestamp=F("latest_checkin"))
+        checkins = get_visible_latest_checkins(
+            self.request.user, WatchCheckIn, content_type, object_id
         )
 
         order = self.request.GET.get("order", "-timestamp")  # Default is '-timestamp'
@@ -2356,29 +2272,10 @@ class GenericCheckInUserListView(ListView):
     def get_queryset(self):
         profile_user = get_object_or_404(User, username=self.kwargs["username"])
 
-        latest_checkin_subquery = get_visible_checkins(
-            self.request.user,
-            WatchCheckIn,
-            OuterRef("content_type"),
-            OuterRef("object_id"),
-            checkin_user=profile_user,
-        ).order_by("-timestamp")
-
-        checkins = (
-            WatchCheckIn.objects.filter(user=profile_user)
-            .annotate(
-                latest_checkin=Subquery(latest_checkin_subquery.values("timestamp")[:1])
-            )
-            .filter(timestamp=F("latest_checkin"))
+        checkins = get_visible_latest_checkins(
+            self.request.user, WatchCheckIn, checkin_user=profile_user
         )
 
-        if self.request.user.is_authenticated:
-            checkins = checkins.filter(
-                Q(visibility="PU") | Q(visible_to=self.request.user)
-            )
-        else:
-            checkins = checkins.filter(visibility="PU")
-
         order = self.request.GET.get("order", "-timestamp")  # Default is '-timestamp'
         if order == "timestamp":
             checkins = checkins.order_by("timestamp")
@@ -2396,15 +2293,6 @@ class GenericCheckInUserListView(ListView):
             else:
                 checkins = checkins.filter(status=status)
 
-        # Filtering by year
-        year = self.request.GET.get("year", "")
-        month = self.request.GET.get("month", "")
-        if year:
-            checkins = checkins.filter(timestamp__year=year)
-        if month:
-            checkins = checkins.filter(timestamp__month=month)
-
-
         # Filtering by type (Movie, Season, or All)
         checkin_type = self.request.GET.get("type", "").lower()
         if checkin_type:
@@ -2416,51 +2304,28 @@ class GenericCheckInUserListView(ListView):
             elif checkin_type == "season":
                 checkins = checkins.filter(content_type=season_content_type)
 
-        # Adding count of check-ins for each movie or series 
-        user_checkin_counts = (
-            get_visible_checkins(
-                self.request.user,
-                WatchCheckIn,
-                checkin_user=profile_user,
-            )
-            .values("content_type", "object_id")
-            .annotate(total_checkins=Count("id") - 1)
-        )
-
-        # Convert to a dictionary for easier lookup
-        user_checkin_count_dict = {
-            (item["content_type"], item["object_id"]): item["total_checkins"]
-            for item in user_checkin_counts
-        }
+        # Check-ins per status, and the years and months to pick from
+        year = self.request.GET.get("year", "")
+        month = self.request.GET.get("month", "")
+        statuses, self.months_by_year = get_checkin_facets(checkins, year, month)
 
-        # Annotate the checkins queryset with total_checkins for each content-object
-        for checkin in checkins:
-            checkin.checkin_count = user_checkin_count_dict.get(
-                (checkin.content_type_id, checkin.object_id), 0
-            )
-        
-        # Statistics for books per status
+        # Statistics per status
         status_order = ["watched", "rewatched", "watching", "rewatchting", "to_watch", "paused", "abandoned"]
         status_display_map = dict(WatchCheckIn.STATUS_CHOICES)
 
-        status_counts = (
-            checkins.values("status")
-            .annotate(
-                book_count=Count("object_id", distinct=True)  # Count unique books
-            )
-            .order_by("status")
-        )
-
-        # Convert status_counts into a dictionary for easier lookup
-        status_count_dict = {item["status"]: item["book_count"] for item in status_counts}
-
         # Build a dictionary with display names as keys, ordered by status_order
         self.status_stats = {
-            status_display_map[status]: status_count_dict.get(status, 0)
+            status_display_map[status]: statuses[status]
             for status in status_order
-            if status_count_dict.get(status, 0) > 0  # Include only non-zero counts
+            if statuses[status] > 0  # Include only non-zero counts
         }
 
+        # Filtering by year
+        if year:
+            checkins = checkins.filter(timestamp__year=year)
+        if month:
+            checkins = checkins.filter(timestamp__month=month)
+
         return checkins
 
     def get_context_data(self, **kwargs):
@@ -2476,36 +2341,14 @@ class GenericCheckInUserListView(ListView):
         context["month"] = self.request.GET.get("month", "")
         context["type"] = self.request.GET.get("type", "")
 
-        # Extracting the list of years and months
-        checkin_queryset = WatchCheckIn.objects.filter(user=profile_user).distinct()
-
-        # Apply the status filter if it's set
-        if status:
-            if status == "watched_rewatched":
-                checkin_queryset = checkin_queryset.filter(
-                    Q(status="watched") | Q(status="rewatched")
-                )
-            elif status == "watching_rewatching":
-                checkin_queryset = checkin_queryset.filter(
-                    Q(status="watching") | Q(status="rewatching")
-                )
-            else:
-                checkin_queryset = checkin_queryset.filter(status=status)
-
-        years = checkin_queryset.dates("timestamp", "year")
-        # Create a dictionary to store months for each year
-        months_by_year = {}
-        for year in years:
-            months = checkin_queryset.filter(timestamp__year=year.year).dates(
-                "timestamp", "month"
-            )
-            months_by_year[year.year] = [month.month for month in months]
-
-        context["years"] = [year.year for year in years]
-        context["months_by_year"] = months_by_year
+        context["years"] = list(self.months_by_year)
+        context["months_by_year"] = self.months_by_year
 
         context["status_stats"] = self.status_stats
 
+        # Media and check-in counts of this page only
+        checkins = context["checkins"] = prefetch_checkin_page(context["page_obj"])
+        attach_checkin_counts(self.request.user, profile_user, checkins)
 
         include_mathjax, include_mermaid = check_required_js(context["page_obj"])
         context["include_mathjax"] = include_mathjax
@@ -2762,15 +2605,19 @@ class MovieAutocomplete(LoginRequiredMixin, autocomplete.Select2QuerySetView):
         qs = Movie.objects.all()
 
         if self.q:
-            qs = qs.filter(title__icontains=self.q)
+            return filter_autocomplete(qs, self.q).prefetch_related(
+                Prefetch(
+                    "region_release_dates",
+                    queryset=MovieReleaseDate.objects.order_by("release_date"),
+                    to_attr="release_dates",
+                )
+            )
 
         return qs.order_by("title")
 
     def get_result_label(self, item):
-        # Fetch the earliest release date for the movie
-        earliest_release_date = item.region_release_dates.order_by(
-            "release_date"
-        ).first()
+        # The earliest release date for the movie, from `get_queryset`
+        earliest_release_date = item.release_dates[0] if item.release_dates else None
         # Format the label as {title} (release_date)
         release_date_str = (
             earliest_release_date.release_date if earliest_release_date else "No Date"
@@ -2786,6 +2633,6 @@ class SeriesAutocomplete(LoginRequiredMixin, autocomplete.Select2QuerySetView):
         qs = Series.objects.all()
 
         if self.q:
-            qs = qs.filter(title__icontains=self.q)
+            return filter_autocomplete(qs, self.q)
 
         return qs.order_by("title")
@@ -14,6 +14,7 @@ from read.models import ReadCheckIn
 from watch.models import WatchCheckIn
 
 from .models import Pin, Post, Repost, Say
+from .utils_markdown import render_markdown
 
 User = get_user_model()
 
@@ -43,9 +44,7 @@ class UserSayFeed(Feed):
         )[:25]
 
     def item_title(self, say):
-        return mark_safe(
-            markdown.markdown(say.content, extensions=["pymdownx.saneheaders"])
-        )
+        return render_markdown(say.content, "feed")
 
     def item_description(self, say):
         return None
@@ -83,9 +82,7 @@ class UserPostFeed(Feed):
         return mark_safe(markdown.markdown(post.title))
 
     def item_description(self, post):
-        return mark_safe(
-            markdown.markdown(post.content, extensions=["pymdownx.saneheaders"])
-        )
+        return render_markdown(post.content, "feed")
 
     def item_link(self, post):
         return reverse(
@@ -133,9 +130,7 @@ class UserPostProjectFeed(Feed):
         return mark_safe(markdown.markdown(post.title))
 
     def item_description(self, post):
-        return mark_safe(
-            markdown.markdown(post.content, extensions=["pymdownx.saneheaders"])
-        )
+        return render_markdown(post.content, "feed")
 
     def item_link(self, post):
         return reverse(
@@ -236,9 +231,7 @@ class TagListFeed(Feed):
     def item_title(self, item):
         model_name = item.__class__.__name__.lower()
         if model_name == "say":
-            return mark_safe(
-                markdown.markdown(item.content, extensions=["pymdownx.saneheaders"])
-            )
+            return render_markdown(item.content, "feed")
         elif model_name == "post":
             return f'{item.user.username} posted "{item.title}"'
         elif model_name == "pin":
@@ -258,9 +251,7 @@ class TagListFeed(Feed):
         if model_name == "say":
             return None
         if hasattr(item, "content"):
-            return mark_safe(
-                markdown.markdown(item.content, extensions=["pymdownx.saneheaders"])
-            )
+            return render_markdown(item.content, "feed")
         elif model_name == "follow":
             return f"{item.follower.username} followed {item.followed.username}"
         else:
@@ -351,9 +342,7 @@ class TagUserListFeed(Feed):
     def item_title(self, item):
         model_name = item.__class__.__name__.lower()
         if model_name == "say":
-            return mark_safe(
-                markdown.markdown(item.content, extensions=["pymdownx.saneheaders"])
-            )
+            return render_markdown(item.content, "feed")
         elif model_name == "post":
             return f'{item.user.username} posted "{item.title}"'
         elif model_name == "pin":
@@ -373,9 +362,7 @@ class TagUserListFeed(Feed):
         if model_name == "say":
             return None
         if hasattr(item, "content"):
-            return mark_safe(
-                markdown.markdown(item.content, extensions=["pymdownx.saneheaders"])
-            )
+            return render_markdown(item.content, "feed")
         elif model_name == "follow":
             return f"{item.follower.username} followed {item.followed.username}"
         else:
@@ -0,0 +1,37 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from write.utils_formatting import backfill_required_js_flags
+
+CONTENT_MODELS = (
+    "write.Say",
+    "write.Post",
+    "write.Pin",
+    "write.Repost",
+    "read.ReadCheckIn",
+    "watch.WatchCheckIn",
+    "listen.ListenCheckIn",
+    "play.PlayCheckIn",
+    "visit.VisitCheckIn",
+)
+
+
+class Command(BaseCommand):
+    help = "Recompute the stored needs_mathjax and needs_mermaid flags of all content."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of rows loaded and updated at a time.",
+        )
+
+    def handle(self, *args, **options):
+        for model_label in CONTENT_MODELS:
+            updated = backfill_required_js_flags(
+                apps.get_model(model_label), batch_size=options["batch_size"]
+            )
+            self.stdout.write(f"{model_label}: {updated} updated")
+
+        self.stdout.write(self.style.SUCCESS("Flags backfilled."))
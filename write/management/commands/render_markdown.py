@@ -0,0 +1,49 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from write.utils_markdown import (
+    get_renderer_version,
+    prune_rendered_markdown,
+    store_rendered_contents,
+)
+
+CONTENT_MODELS = (
+    "write.Say",
+    "write.Post",
+    "write.Pin",
+    "write.Repost",
+    "write.Comment",
+    "read.ReadCheckIn",
+    "watch.WatchCheckIn",
+    "listen.ListenCheckIn",
+    "play.PlayCheckIn",
+    "visit.VisitCheckIn",
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Render the markdown of all user-written content and store the HTML, "
+        "dropping HTML stored by older renderer versions or for deleted content."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--keep-stale",
+            action="store_true",
+            help="Do not delete HTML rendered by other renderer versions.",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Renderer version {get_renderer_version()}")
+        models = [apps.get_model(model_label) for model_label in CONTENT_MODELS]
+        if not options["keep_stale"]:
+            deleted = prune_rendered_markdown(models)
+            self.stdout.write(f"Dropped {deleted} stale renderings")
+
+        for model in models:
+            contents = model.objects.values_list("pk", "content").iterator()
+            rendered = store_rendered_contents(model, contents)
+            self.stdout.write(f"{model._meta.label}: {rendered} rendered")
+
+        self.stdout.write(self.style.SUCCESS("Markdown rendered."))
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:20
+
+from django.db import migrations, models
+
+from write.utils_formatting import backfill_required_js_flags
+
+
+def fill_required_js_flags(apps, schema_editor):
+    for model_name in ("Say", "Post", "Pin", "Repost"):
+        backfill_required_js_flags(apps.get_model("write", model_name), apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("activity_feed", "0003_alter_activity_visibility"),
+        ("contenttypes", "0002_remove_content_type_name"),
+        ("write", "0020_renderedmarkdown"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="pin",
+            name="needs_mathjax",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name="pin",
+            name="needs_mermaid",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name="post",
+            name="needs_mathjax",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name="post",
+            name="needs_mermaid",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name="repost",
+            name="needs_mathjax",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name="repost",
+            name="needs_mermaid",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name="say",
+            name="needs_mathjax",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name="say",
+            name="needs_mermaid",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(fill_required_js_flags, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+import auto_prefetch
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def drop_rendered_markdown(apps, schema_editor):
+    # Rows were keyed by text alone; `manage.py render_markdown` refills them
+    apps.get_model("write", "RenderedMarkdown").objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("contenttypes", "0002_remove_content_type_name"),
+        ("write", "0021_required_js_flags"),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_rendered_markdown, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="renderedmarkdown",
+            name="digest",
+            field=models.CharField(db_index=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name="renderedmarkdown",
+            name="content_type",
+            field=auto_prefetch.ForeignKey(
+                default=1,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="contenttypes.contenttype",
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="renderedmarkdown",
+            name="object_id",
+            field=models.PositiveIntegerField(default=0),
+            preserve_default=False,
+        ),
+        migrations.AlterUniqueTogether(
+            name="renderedmarkdown",
+            unique_together={("content_type", "object_id")},
+        ),
+    ]
@@ -18,7 +18,13 @@ from django.core.exceptions import ObjectDoesNotExist, PermissionDenied, Validat
 from django.core.files.base import ContentFile
 from django.db import models, transaction
 from django.db.models import Q
-from django.db.models.signals import m2m_changed, post_delete, pre_delete
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
 from django.dispatch import receiver
 from django.urls import reverse
 from django.utils import timezone
@@ -27,9 +33,13 @@ from PIL import Image
 
 from activity_feed.models import Activity, Block
 from discover.models import Vote
-from notify.models import MutedNotification, Notification
+from notify.utils import NotificationBuilder, get_content_name, mark_read_url
 from notify.views import create_mentions_notifications
 
+from .utils_formatting import set_required_js_flags
+from .utils_mdx import CARD_DEPENDENCIES, CARD_MODELS, invalidate_media_card
+from .utils_mentions import forget_user, get_mentioned_users
+
 User = get_user_model()
 
 
@@ -42,8 +52,7 @@ def handle_tags(instance, content):
 
 
 def find_mentioned_users(content):
-    usernames = re.findall(r"@(\w+)", content)
-    return User.objects.filter(username__in=usernames)
+    return get_mentioned_users(content)
 
 
 def custom_slugify(value, allow_unicode=True):
@@ -71,6 +80,28 @@ class Tag(auto_prefetch.Model):
         return "Tag"
 
 
+class RenderedMarkdown(auto_prefetch.Model):
+    """
+    Sanitised HTML of the `content` of one object, with a hash of the text
+    and of the renderer settings it was rendered from. See
+    `write.utils_markdown`.
+    """
+
+    content_type = auto_prefetch.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    content_object = GenericForeignKey("content_type", "object_id")
+    digest = models.CharField(max_length=64, db_index=True)
+    renderer_version = models.CharField(max_length=16, db_index=True)
+    html = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta(auto_prefetch.Model.Meta):
+        unique_together = ("content_type", "object_id")
+
+    def __str__(self):
+        return self.digest
+
+
 class Project(auto_prefetch.Model):
     name = models.CharField(max_length=50)
     slug = AutoSlugField(
@@ -137,6 +168,38 @@ class Project(auto_prefetch.Model):
         self.visible_to.set(visible_to_users)
 
 
+class ActivityIdMixin:
+    """
+    `get_activity_id` of content shown in feeds: the id of its activity,
+    precomputed for a whole page by `attach_activity_ids`, or looked up.
+    """
+
+    def get_activity_id(self):
+        if hasattr(self, "_activity_id"):
+            return self._activity_id
+        try:
+            activity = Activity.objects.get(
+                content_type__model=self._meta.model_name, object_id=self.id
+            )
+            return activity.id
+        except ObjectDoesNotExist:
+            return None
+
+
+class RequiredJSMixin(auto_prefetch.Model):
+    """
+    Content whose text may need MathJax or Mermaid. The flags are set on save
+    (see `store_required_js_flags`), so a page can tell which scripts to load
+    without parsing its texts.
+    """
+
+    needs_mathjax = models.BooleanField(default=False)
+    needs_mermaid = models.BooleanField(default=False)
+
+    class Meta(auto_prefetch.Model.Meta):
+        abstract = True
+
+
 class Comment(auto_prefetch.Model):
     content = models.TextField()
     user = auto_prefetch.ForeignKey(User, on_delete=models.CASCADE)
@@ -198,41 +261,20 @@ class Comment(auto_prefetch.Model):
         if is_blocked:
             raise PermissionDenied("You are blocked by the user and cannot comment.")
 
-        has_muted = MutedNotification.objects.filter(
-            user=self.content_object.user,
-            content_type=ContentType.objects.get_for_model(self.content_object),
-            object_id=self.content_object.id,
-        ).exists()
-
-        if is_new and not has_muted and self.user != self.content_object.user:
+        builder = NotificationBuilder(self.user)
+        if is_new:
             user_url = reverse("accounts:detail", args=[self.user.username])
             user_name = (
                 self.user.display_name if self.user.display_name else self.user.username
             )
-            content_url = self.content_object.get_absolute_url()
-            content_name = self.content_object.__class__.__name__.capitalize()
-            if "checkin" in content_name:
-                content_name = f"{content_name[:-7]} Check-in"
+            content_url = mark_read_url(self.content_object.get_absolute_url())
+            content_name = get_content_name(self.content_object)
             message = f'<a href="{user_url}">@{user_name}</a> commented on your <a href="{content_url}">{content_name}</a>.'
-
-            notification = Notification.objects.create(
-                recipient=self.content_object.user,
-                sender_content_type=ContentType.objects.get_for_model(self.user),
-                sender_object_id=self.user.id,
-                subject_content_type=ContentType.objects.get_for_model(
-                    self.content_object
-                ),
-                subject_object_id=self.content_object.id,
-                notification_type="comment",
-                message=message,
+            builder.add(
+                self.content_object.user_id, "comment", message, self.content_object
             )
-            notification.save()
-            content_url_with_read_marker = f"{content_url}?mark_read={notification.id}"
-            # Update the message with the new URL containing the marker
-            notification.message = f'<a href="{user_url}">@{user_name}</a> commented on your <a href="{content_url_with_read_marker}">{content_name}</a>.'
-            notification.save()
-
-        create_mentions_notifications(self.user, self.content, self)
+        builder.add_mentions(self.content, self)
+        builder.save()
 
     def generate_unique_anchor(self):
         existing_anchors = set(
@@ -247,7 +289,7 @@ class Comment(auto_prefetch.Model):
                 return anchor
 
 
-class Repost(auto_prefetch.Model):
+class Repost(ActivityIdMixin, RequiredJSMixin):
     original_activity = auto_prefetch.ForeignKey(
         Activity, on_delete=models.SET_NULL, related_name="reposts", null=True
     )
@@ -275,15 +317,6 @@ class Repost(auto_prefetch.Model):
             kwargs={"pk": self.id, "username": self.user.username},
         )
 
-    def get_activity_id(self):
-        try:
-            activity = Activity.objects.get(
-                content_type__model="repost", object_id=self.id
-            )
-            return activity.id
-        except ObjectDoesNotExist:
-            return None
-
     def get_reposts(self):
         return Repost.objects.filter(original_repost=self).exclude(id=self.id)
 
@@ -326,63 +359,32 @@ class Repost(auto_prefetch.Model):
             except Activity.DoesNotExist:
                 pass  # Handle the case where the Activity object does not exist
 
+        original_object = (
+            self.original_activity.content_object
+            if self.original_activity
+            else self.original_repost.content_object
+        )
         original_activity_user = (
             self.original_activity.user
             if self.original_activity
             else self.original_repost.user
         )
 
-        # Check if user has muted notifications for the original activity
-        has_muted = MutedNotification.objects.filter(
-            user=original_activity_user,
-            content_type=ContentType.objects.get_for_model(
-                self.original_activity.content_object
-                if self.original_activity
-                else self.original_repost.content_object
-            ),
-            object_id=(
-                self.original_activity.content_object.id
-                if self.original_activity
-                else self.original_repost.content_object.id
-            ),
-        ).exists()
-
         # Create notification for repost
-        if not has_muted and self.user != original_activity_user:
-            user_url = reverse("accounts:detail", args=[self.user.username])
-            content_url = self.original_activity.content_object.get_absolute_url()
-            content_name = (
-                self.original_activity.content_object.__class__.__name__.capitalize()
-            )
-            if "checkin" in content_name:
-                content_name = f"{content_name[:-7]} Check-in"
-
-            repost_url = self.get_absolute_url()
-            message = f'<a href="{user_url}">@{self.user.username}</a> reposted your <a href="{content_url}">{content_name}</a>. See the <a href="{repost_url}">Repost</a>.'
-
-            notification = Notification.objects.create(
-                recipient=self.original_activity.user,
-                sender_content_type=ContentType.objects.get_for_model(self.user),
-                sender_object_id=self.user.id,
-                subject_content_type=ContentType.objects.get_for_model(
-                    self.original_activity.content_object
-                ),
-                subject_object_id=self.original_activity.content_object.id,
-                notification_type="repost",
-                message=message,
-            )
-            notification.save()
-            repost_url_with_read_marker = f"{repost_url}?mark_read={notification.id}"
-            # Update the message with the new URL containing the marker
-            notification.message = f'<a href="{user_url}">@{self.user.username}</a> reposted your <a href="{content_url}">{content_name}</a>. See the <a href="{repost_url_with_read_marker}">Repost</a>.'
-            notification.save()
+        builder = NotificationBuilder(self.user)
+        user_url = reverse("accounts:detail", args=[self.user.username])
+        content_url = original_object.get_absolute_url()
+        repost_url = mark_read_url(self.get_absolute_url())
+        message = f'<a href="{user_url}">@{self.user.username}</a> reposted your <a href="{content_url}">{get_content_name(original_object)}</a>. See the <a href="{repost_url}">Repost</a>.'
+        builder.add(original_activity_user.id, "repost", message, original_object)
 
         # Handle tags
         handle_tags(self, self.content)
-        create_mentions_notifications(self.user, self.content, self)
+        builder.add_mentions(self.content, self)
+        builder.save()
 
 
-class Post(auto_prefetch.Model):
+class Post(ActivityIdMixin, RequiredJSMixin):
     title = models.CharField(max_length=200)
     content = models.TextField()
     user = auto_prefetch.ForeignKey(User, on_delete=models.CASCADE)
@@ -419,15 +421,6 @@ class Post(auto_prefetch.Model):
             kwargs={"slug": self.slug, "username": self.user.username},
         )
 
-    def get_activity_id(self):
-        try:
-            activity = Activity.objects.get(
-                content_type__model="post", object_id=self.id
-            )
-            return activity.id
-        except ObjectDoesNotExist:
-            return None
-
     def get_votes(self):
         return self.votes.aggregate(models.Sum("value"))["value__sum"] or 0
 
@@ -496,7 +489,7 @@ class Post(auto_prefetch.Model):
         create_mentions_notifications(self.user, self.content, self)
 
 
-class Say(auto_prefetch.Model):
+class Say(ActivityIdMixin, RequiredJSMixin):
     content = models.TextField()
     user = auto_prefetch.ForeignKey(User, on_delete=models.CASCADE)
     timestamp = models.DateTimeField(auto_now_add=True)
@@ -525,15 +518,6 @@ class Say(auto_prefetch.Model):
             "write:say_detail", kwargs={"pk": self.id, "username": self.user.username}
         )
 
-    def get_activity_id(self):
-        try:
-            activity = Activity.objects.get(
-                content_type__model="say", object_id=self.id
-            )
-            return activity.id
-        except ObjectDoesNotExist:
-            return None
-
     def get_votes(self):
         return self.votes.aggregate(models.Sum("value"))["value__sum"] or 0
 
@@ -592,7 +576,7 @@ class Say(auto_prefetch.Model):
         create_mentions_notifications(self.user, self.content, self)
 
 
-class Pin(auto_prefetch.Model):
+class Pin(ActivityIdMixin, RequiredJSMixin):
     title = models.TextField()
     url = models.URLField()
     content = models.TextField(null=True, blank=True)
@@ -622,15 +606,6 @@ class Pin(auto_prefetch.Model):
             "write:pin_detail", kwargs={"pk": self.id, "username": self.user.username}
         )
 
-    def get_activity_id(self):
-        try:
-            activity = Activity.objects.get(
-                content_type__model="pin", object_id=self.id
-            )
-            return activity.id
-        except ObjectDoesNotExist:
-            return None
-
     def get_votes(self):
         return self.votes.aggregate(models.Sum("value"))["value__sum"] or 0
 
@@ -732,24 +707,13 @@ def notify_comment_users(sender, instance, **kwargs):
     # Get all the comments on the object being deleted
     comments = instance.comments.all()
 
-    # For each comment, create a notification for the user
+    # For each comment, notify its user, unless they wrote the object
+    builder = NotificationBuilder(instance.user, check_blocks=False)
     for comment in comments:
-        # Check if the user of the comment is the same as the user of the object
-        if comment.user == instance.user:
-            # If they are the same, return early and do not create a notification
-            continue
-
         # Create a message for the notification
         message = f"A {sender.__name__} your commented was deleted, thus your comment was also deleted: <br><blockquote>{comment.content}</blockquote>"
-
-        # Create the notification
-        Notification.objects.create(
-            recipient=comment.user,
-            sender_content_type=ContentType.objects.get_for_model(instance.user),
-            sender_object_id=instance.user.id,
-            notification_type="comment_on_deleted",
-            message=message,
-        )
+        builder.add(comment.user_id, "comment_on_deleted", message)
+    builder.save()
 
 
 # notify comment user when comment is deleted by parent user
@@ -769,15 +733,11 @@ def notify_comment_user_on_deletion(sender, instance, **kwargs):
                 message = f"Your comment on a <a href={content_url}>{instance.content_object.__class__.__name__}</a> was deleted by the user: <br><blockquote>{instance.content}</blockquote>"
 
                 # Create the notification
-                Notification.objects.create(
-                    recipient=instance.user,
-                    sender_content_type=ContentType.objects.get_for_model(
-                        instance.content_object.user
-                    ),
-                    sender_object_id=instance.content_object.user.id,
-                    notification_type="comment_deleted_by_user",
-                    message=message,
+                builder = NotificationBuilder(
+                    instance.content_object.user, check_blocks=False
                 )
+                builder.add(instance.user_id, "comment_deleted_by_user", message)
+                builder.save()
 
     transaction.on_commit(_notify_comment_user_on_deletion)
 
@@ -1200,3 +1160,94 @@ def delete_album_photos(sender, instance, **kwargs):
     )
     if os.path.exists(album_path) and not os.listdir(album_path):
         os.rmdir(album_path)
+
+
+@receiver(post_save, sender="write.Say")
+@receiver(post_save, sender="write.Post")
+@receiver(post_save, sender="write.Pin")
+@receiver(post_save, sender="write.Repost")
+@receiver(post_save, sender="write.Comment")
+@receiver(post_save, sender="read.ReadCheckIn")
+@receiver(post_save, sender="watch.WatchCheckIn")
+@receiver(post_save, sender="listen.ListenCheckIn")
+@receiver(post_save, sender="play.PlayCheckIn")
+@receiver(post_save, sender="visit.VisitCheckIn")
+def render_content_markdown(sender, instance, **kwargs):
+    """Render the edited text once, instead of on the next page view."""
+    if kwargs.get("raw", False):
+        return
+    from .utils_markdown import store_rendered_content
+
+    transaction.on_commit(lambda: store_rendered_content(instance))
+
+
+@receiver(post_delete, sender="write.Say")
+@receiver(post_delete, sender="write.Post")
+@receiver(post_delete, sender="write.Pin")
+@receiver(post_delete, sender="write.Repost")
+@receiver(post_delete, sender="write.Comment")
+@receiver(post_delete, sender="read.ReadCheckIn")
+@receiver(post_delete, sender="watch.WatchCheckIn")
+@receiver(post_delete, sender="listen.ListenCheckIn")
+@receiver(post_delete, sender="play.PlayCheckIn")
+@receiver(post_delete, sender="visit.VisitCheckIn")
+def delete_content_markdown(sender, instance, **kwargs):
+    from .utils_markdown import delete_rendered_content
+
+    delete_rendered_content(instance)
+
+
+@receiver(pre_save, sender="write.Say")
+@receiver(pre_save, sender="write.Post")
+@receiver(pre_save, sender="write.Pin")
+@receiver(pre_save, sender="write.Repost")
+@receiver(pre_save, sender="read.ReadCheckIn")
+@receiver(pre_save, sender="watch.WatchCheckIn")
+@receiver(pre_save, sender="listen.ListenCheckIn")
+@receiver(pre_save, sender="play.PlayCheckIn")
+@receiver(pre_save, sender="visit.VisitCheckIn")
+def store_required_js_flags(sender, instance, raw=False, **kwargs):
+    if not raw:
+        set_required_js_flags(instance)
+
+
+@receiver(post_save, sender="write.Say")
+@receiver(post_save, sender="write.Post")
+@receiver(post_save, sender="write.Pin")
+@receiver(post_save, sender="read.ReadCheckIn")
+@receiver(post_save, sender="watch.WatchCheckIn")
+@receiver(post_save, sender="listen.ListenCheckIn")
+@receiver(post_save, sender="play.PlayCheckIn")
+@receiver(post_save, sender="visit.VisitCheckIn")
+def update_repost_required_js_flags(sender, instance, created, raw=False, **kwargs):
+    """Reposts show the reposted content, so they share its flags."""
+    if created or raw:
+        return
+    reposts = list(
+        Repost.objects.filter(
+            original_activity__content_type=ContentType.objects.get_for_model(instance),
+            original_activity__object_id=instance.pk,
+        )
+    )
+    for repost in reposts:
+        set_required_js_flags(repost, original=instance)
+    Repost.objects.bulk_update(reposts, ["needs_mathjax", "needs_mermaid"])
+
+
+def invalidate_media_card_cache(sender, instance, raw=False, **kwargs):
+    """Drop the cached ```card``` fragment showing this entity."""
+    if raw:
+        return
+    transaction.on_commit(lambda: invalidate_media_card(instance))
+
+
+for model_label in [*CARD_MODELS.values(), *CARD_DEPENDENCIES]:
+    post_save.connect(invalidate_media_card_cache, sender=model_label)
+    post_delete.connect(invalidate_media_card_cache, sender=model_label)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def forget_mentioned_user(sender, instance, **kwargs):
+    # Renamed or deactivated users must stop resolving under the old state
+    forget_user(instance)
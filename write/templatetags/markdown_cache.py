@@ -0,0 +1,11 @@
+from django import template
+
+from write.utils_markdown import render_markdown
+
+register = template.Library()
+
+
+@register.filter
+def markdownify(text, custom_settings="default"):
+    # Drop-in for django-markdownify's filter, served from the stored HTML
+    return render_markdown(text, custom_settings)
@@ -1,3 +1,260 @@
+from importlib import import_module
+from io import StringIO
+
+import markdown
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.template import Context, Template
 from django.test import TestCase
 
-# Create your tests here.
+from accounts.models import CustomUser
+from activity_feed.models import Activity
+from activity_feed.utils_prefetch import prefetch_activities
+from entity.models import Company, Creator, Role
+from read.models import Book
+from watch.models import Movie, MovieReleaseDate, MovieRole
+
+from notify.models import Notification
+
+from . import utils_markdown, utils_mentions
+from .models import RenderedMarkdown, Repost, Say
+from .templatetags.linkify import linkify_tags
+from .utils_formatting import backfill_required_js_flags, check_required_js
+from .utils_markdown import (
+    get_digest,
+    prefetch_rendered_markdown,
+    prune_rendered_markdown,
+    render_markdown,
+)
+from .utils_mdx import MentionExtension, get_card_cache_key
+from .utils_mentions import resolve_usernames
+
+
+class RenderedMarkdownTest(TestCase):
+    def setUp(self):
+        utils_markdown._memo.clear()
+        self.user = CustomUser.objects.create_user(username="gina", password="pw")
+
+    def say(self, content):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Say.objects.create(user=self.user, content=content)
+
+    def test_rendered_once_and_reused(self):
+        with self.assertNumQueries(0):
+            html = render_markdown("**bold**")
+        self.assertIn("<strong>bold</strong>", html)
+        self.assertFalse(RenderedMarkdown.objects.exists())
+
+        with self.assertNumQueries(0):
+            self.assertEqual(render_markdown("**bold**"), html)
+
+    def test_page_loads_stored_html(self):
+        says = [self.say(f"hello #{n}") for n in range(3)]
+        RenderedMarkdown.objects.update(html="<p>stored</p>")
+        utils_markdown._memo.clear()
+        with self.assertNumQueries(1):
+            prefetch_rendered_markdown(says)
+        template = Template(
+            "{% load linkify markdown_cache %}"
+            "{% for say in says %}{{ say.content|linkify_tags|markdownify }}{% endfor %}"
+        )
+        with self.assertNumQueries(0):
+            html = template.render(Context({"says": says}))
+        self.assertEqual(html, "<p>stored</p>" * 3)
+
+    def test_stored_per_object(self):
+        say = self.say("hello #world")
+        stored = RenderedMarkdown.objects.get()
+        self.assertEqual(stored.content_object, say)
+        self.assertEqual(stored.digest, get_digest(linkify_tags("hello #world")))
+
+        # Edits replace the row, texts with mentions are not stored
+        with self.captureOnCommitCallbacks(execute=True):
+            say.content = "hello again"
+            say.save()
+        self.assertEqual(
+            RenderedMarkdown.objects.get().digest, get_digest("hello again")
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            say.content = "hello @gina"
+            say.save()
+        self.assertFalse(RenderedMarkdown.objects.exists())
+
+        self.say("bye")
+        Say.objects.get(content="bye").delete()
+        self.assertFalse(RenderedMarkdown.objects.exists())
+
+    def test_prune_drops_other_versions_and_orphans(self):
+        self.say("kept")
+        self.say("old")
+        RenderedMarkdown.objects.filter(digest=get_digest("old")).update(
+            renderer_version="old"
+        )
+        # Left behind by a delete that sent no signals
+        RenderedMarkdown.objects.create(
+            content_type=ContentType.objects.get_for_model(Say),
+            object_id=0,
+            digest=get_digest("gone"),
+            renderer_version=utils_markdown.get_renderer_version(),
+            html="<p>gone</p>",
+        )
+        self.assertEqual(prune_rendered_markdown([Say]), 2)
+        self.assertEqual(RenderedMarkdown.objects.get().digest, get_digest("kept"))
+
+        stdout = StringIO()
+        call_command("render_markdown", stdout=stdout)
+        self.assertIn("write.Say: 1 rendered", stdout.getvalue())
+
+
+class MediaCardTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.director = Role.objects.create(name="Director", domain="watch")
+        self.movies = []
+        for i in range(3):
+            movie = Movie(title=f"Film {i}")
+            movie.save()
+            MovieRole.objects.create(
+                movie=movie,
+                creator=Creator.objects.create(name=f"Director {i}"),
+                role=self.director,
+            )
+            MovieReleaseDate.objects.create(movie=movie, release_date=f"200{i}-01-01")
+            self.movies.append(movie)
+        self.book = Book(title="Novel", publisher=Company.objects.create(name="Press"))
+        self.book.save()
+
+    def card(self, path):
+        return f"```card\nhttps://luvdb.com/{path}/\n```\n\n"
+
+    def text(self):
+        return "".join(
+            [self.card(f"watch/movie/{movie.id}") for movie in self.movies]
+            + [self.card(f"read/book/{self.book.id}")]
+        )
+
+    def test_cards_are_loaded_in_bulk(self):
+        with self.assertNumQueries(11):
+            html = render_markdown(self.text())
+        for i in range(3):
+            self.assertIn(f"Film {i}", html)
+            self.assertIn(f"Director {i}", html)
+        self.assertIn("Novel", html)
+        self.assertFalse(RenderedMarkdown.objects.exists())
+
+        with self.assertNumQueries(0):
+            self.assertEqual(render_markdown(self.text()), html)
+
+    def test_saving_role_invalidates_card(self):
+        render_markdown(self.text())
+        movie = self.movies[0]
+        self.assertIsNotNone(cache.get(get_card_cache_key("movie", movie.id)))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            MovieRole.objects.create(
+                movie=movie,
+                creator=Creator.objects.create(name="Star"),
+                role=Role.objects.create(name="Actor", domain="watch"),
+            )
+        self.assertIsNone(cache.get(get_card_cache_key("movie", movie.id)))
+        self.assertIn("Star", render_markdown(self.text()))
+
+
+class MentionTest(TestCase):
+    def setUp(self):
+        utils_mentions._cache.clear()
+        self.alice = CustomUser.objects.create_user(username="alice", password="pw")
+        self.bob = CustomUser.objects.create_user(username="bob", password="pw")
+
+    def render(self, text):
+        return markdown.markdown(text, extensions=[MentionExtension()])
+
+    def test_mentions_resolved_in_one_query(self):
+        text = "@alice @bob @alice and @nobody"
+        with self.assertNumQueries(1):
+            html = self.render(text)
+        self.assertIn('<a href="/@alice/">@alice</a>', html)
+        self.assertIn("<span>@nobody</span>", html)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.render(text), html)
+
+    def test_rename_and_deactivation_are_picked_up(self):
+        self.assertEqual(resolve_usernames(["alice"]), {"alice": self.alice.id})
+        self.alice.username = "alicia"
+        self.alice.save()
+        self.assertEqual(
+            resolve_usernames(["alice", "alicia"]),
+            {"alice": None, "alicia": self.alice.id},
+        )
+
+        self.bob.is_active = False
+        self.bob.save()
+        self.assertEqual(resolve_usernames(["bob"]), {"bob": None})
+
+    def test_repeated_mention_notifies_once(self):
+        Say.objects.create(user=self.alice, content="@bob hi @bob @alice")
+        self.assertEqual(
+            Notification.objects.filter(notification_type="mention").count(), 1
+        )
+        self.assertEqual(
+            Notification.objects.get(notification_type="mention").recipient, self.bob
+        )
+
+
+class RequiredJsTest(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="hana", password="pw")
+        self.math = Say.objects.create(user=self.user, content="```math\nx^2\n```")
+        self.plain = Say.objects.create(user=self.user, content="plain")
+        self.repost = Repost.objects.create(
+            user=self.user,
+            original_activity=Activity.objects.get(id=self.plain.get_activity_id()),
+            content_object=self.plain,
+            content="look",
+        )
+
+    def test_flags_are_stored_on_save(self):
+        self.assertTrue(self.math.needs_mathjax)
+        self.assertFalse(self.math.needs_mermaid)
+        self.assertFalse(self.repost.needs_mermaid)
+
+        self.plain.content = "```mermaid\ngraph TD\n```"
+        self.plain.save()
+        self.repost.refresh_from_db()
+        self.assertTrue(self.repost.needs_mermaid)
+
+    def test_page_flags_are_combined_in_the_database(self):
+        activities = list(Activity.objects.all())
+        # One query per content type: says and reposts
+        with self.assertNumQueries(2):
+            self.assertEqual(check_required_js(activities), (True, False))
+
+        activities = prefetch_activities(Activity.objects.all())
+        with self.assertNumQueries(0):
+            self.assertEqual(check_required_js(activities), (True, False))
+
+    def test_backfill(self):
+        Say.objects.update(needs_mathjax=False)
+        self.assertEqual(backfill_required_js_flags(Say, batch_size=1), 1)
+        self.math.refresh_from_db()
+        self.assertTrue(self.math.needs_mathjax)
+
+    def test_migration_fills_flags(self):
+        Say.objects.filter(pk=self.plain.pk).update(content="```mermaid\nA\n```")
+        Say.objects.update(needs_mathjax=False, needs_mermaid=False)
+        Repost.objects.update(needs_mermaid=False)
+        migration = import_module("write.migrations.0021_required_js_flags")
+        executor = MigrationExecutor(connection)
+        state = executor.loader.project_state(("write", "0021_required_js_flags"))
+        migration.fill_required_js_flags(state.apps, None)
+
+        self.assertEqual(
+            list(Say.objects.order_by("pk").values_list("needs_mathjax", flat=True)),
+            [True, False],
+        )
+        self.repost.refresh_from_db()
+        self.assertTrue(self.repost.needs_mermaid)
@@ -1,4 +1,9 @@
 import re
+from collections import defaultdict
+
+from django.apps import apps as django_apps
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Q
 
 
 def needs_mathjax(value):
@@ -11,33 +16,130 @@ def needs_mermaid(value):
     return re.search(MERMAID_MD_PATTERN, value, re.DOTALL | re.IGNORECASE) is not None
 
 
+def _required_js_flags(obj):
+    """(needs MathJax, needs Mermaid) for an object, or None if unknown."""
+    if hasattr(obj, "needs_mathjax"):
+        return obj.needs_mathjax, obj.needs_mermaid
+    content = getattr(obj, "content", None)
+    if content is None:
+        return None
+    return needs_mathjax(content), needs_mermaid(content)
+
+
 def check_required_js(objects):
+    """
+    Whether a page needs MathJax and Mermaid, from the flags stored on its
+    content objects. Activities whose content object isn't loaded yet are
+    combined in the database, with one query per content type.
+    """
     # Initialize flags
     include_mathjax = False
     include_mermaid = False
+    pending = defaultdict(set)
 
-    # Check each activity item for both MathJax and Mermaid requirements
     for obj in objects:
-        try:
-            content = obj.content
-        except:
-            try:
-                content = obj.content_object.content
-            except:
-                continue
-        try:
-            if obj.model_name == "Repost":
-                content += obj.original_activity.content_object.content
-        except:
-            pass
-
-        if not include_mathjax and needs_mathjax(content):
-            include_mathjax = True
-        if not include_mermaid and needs_mermaid(content):
-            include_mermaid = True
+        flags = _required_js_flags(obj)
+        if flags is None and hasattr(obj, "content_type_id"):
+            if obj._meta.get_field("content_object").is_cached(obj):
+                if obj.content_object is not None:
+                    flags = _required_js_flags(obj.content_object)
+            else:
+                pending[obj.content_type_id].add(obj.object_id)
+        if flags is not None:
+            include_mathjax = include_mathjax or flags[0]
+            include_mermaid = include_mermaid or flags[1]
 
+    for content_type_id, object_ids in pending.items():
         # Break the loop if both flags are set
         if include_mathjax and include_mermaid:
             break
+        model = ContentType.objects.get_for_id(content_type_id).model_class()
+        if model is None or not hasattr(model, "needs_mathjax"):
+            continue
+        flagged = (
+            model.objects.filter(pk__in=object_ids)
+            .filter(Q(needs_mathjax=True) | Q(needs_mermaid=True))
+            .values_list("needs_mathjax", "needs_mermaid")
+        )
+        for mathjax, mermaid in flagged:
+            include_mathjax = include_mathjax or mathjax
+            include_mermaid = include_mermaid or mermaid
 
     return include_mathjax, include_mermaid
+
+
+def set_required_js_flags(instance, original=None):
+    """
+    Store on a content object whether it needs MathJax and Mermaid. Reposts
+    also need them when the item they repost does.
+    """
+    content = instance.content or ""
+    if original is None and getattr(instance, "original_activity_id", None):
+        original = instance.original_activity.content_object
+    if original is not None:
+        content += getattr(original, "content", None) or ""
+    instance.needs_mathjax = needs_mathjax(content)
+    instance.needs_mermaid = needs_mermaid(content)
+
+
+def get_activity_contents(activity_ids, apps=django_apps):
+    """{activity_id: content} of the content objects of some activities."""
+    Activity = apps.get_model("activity_feed", "Activity")
+    ContentType = apps.get_model("contenttypes", "ContentType")
+    targets = defaultdict(lambda: defaultdict(list))
+    activities = Activity.objects.filter(id__in=activity_ids).values_list(
+        "id", "content_type_id", "object_id"
+    )
+    for activity_id, content_type_id, object_id in activities:
+        targets[content_type_id][object_id].append(activity_id)
+
+    contents = {}
+    for content_type in ContentType.objects.filter(id__in=targets):
+        try:
+            model = apps.get_model(content_type.app_label, content_type.model)
+        except LookupError:
+            continue
+        if not any(field.name == "content" for field in model._meta.fields):
+            continue
+        activities = targets[content_type.id]
+        rows = model.objects.filter(pk__in=activities).values_list("pk", "content")
+        for object_id, content in rows:
+            for activity_id in activities[object_id]:
+                contents[activity_id] = content or ""
+    return contents
+
+
+def update_required_js_flags(model, objects, apps=django_apps):
+    """Store the flags of a batch of rows. Returns the number that changed."""
+    originals = {}
+    if hasattr(model, "original_activity"):
+        originals = get_activity_contents(
+            {obj.original_activity_id for obj in objects if obj.original_activity_id},
+            apps,
+        )
+    changed = []
+    for obj in objects:
+        content = obj.content or ""
+        content += originals.get(getattr(obj, "original_activity_id", None), "")
+        flags = (needs_mathjax(content), needs_mermaid(content))
+        if (obj.needs_mathjax, obj.needs_mermaid) != flags:
+            obj.needs_mathjax, obj.needs_mermaid = flags
+            changed.append(obj)
+    model.objects.bulk_update(changed, ["needs_mathjax", "needs_mermaid"])
+    return len(changed)
+
+
+def backfill_required_js_flags(model, batch_size=1000, apps=django_apps):
+    """
+    Recompute the stored flags of every row of a content model in batches.
+    Also runs in migrations, on the historical models of their `apps`.
+    Returns the number of rows whose flags changed.
+    """
+    updated = 0
+    batch = []
+    for obj in model.objects.order_by("pk").iterator(chunk_size=batch_size):
+        batch.append(obj)
+        if len(batch) >= batch_size:
+            updated += update_required_js_flags(model, batch, apps)
+            batch = []
+    return updated + update_required_js_flags(model, batch, apps)
@@ -0,0 +1,201 @@
+import hashlib
+import json
+from collections import OrderedDict
+from functools import lru_cache
+from itertools import islice
+
+import bleach
+import markdown
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.utils.safestring import mark_safe
+from markdownify.templatetags.markdownify import markdownify as render_markdownify
+
+from .models import RenderedMarkdown
+from .templatetags.linkify import linkify_tags
+from .utils_mdx import has_media_cards, prefetched_media_cards
+from .utils_mentions import find_mentions
+
+# Recently used HTML kept in process, so hot texts skip the database too
+MEMO_SIZE = 2048
+BATCH_SIZE = 500
+
+_memo = OrderedDict()
+
+
+###########
+# helpers #
+###########
+
+
+def _fingerprint(value):
+    """A stable, JSON-serialisable stand-in for a settings value."""
+    if isinstance(value, dict):
+        return {str(key): _fingerprint(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple, set)):
+        return [_fingerprint(item) for item in value]
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if callable(value) and hasattr(value, "__qualname__"):
+        return f"{value.__module__}.{value.__qualname__}"
+    # Extension instances: their class and configuration
+    cls = type(value)
+    config = getattr(value, "config", None)
+    return [f"{cls.__module__}.{cls.__qualname__}", _fingerprint(config)]
+
+
+@lru_cache(maxsize=None)
+def get_renderer_version():
+    """
+    Hash of everything that shapes the rendered HTML: the MARKDOWNIFY
+    settings, the markdown and bleach versions and MARKDOWN_RENDERER_VERSION.
+    """
+    payload = json.dumps(
+        [
+            _fingerprint(getattr(settings, "MARKDOWNIFY", {})),
+            markdown.__version__,
+            bleach.__version__,
+            getattr(settings, "MARKDOWN_RENDERER_VERSION", ""),
+        ],
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def get_digest(text, custom_settings="default"):
+    payload = f"{get_renderer_version()}\0{custom_settings}\0{text}"
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _remember(digest, html):
+    _memo[digest] = html
+    _memo.move_to_end(digest)
+    while len(_memo) > MEMO_SIZE:
+        _memo.popitem(last=False)
+
+
+def is_storable(text):
+    """
+    Whether the HTML of a text depends on the text alone: media cards,
+    @mentions and uploaded photos render from other rows.
+    """
+    return not (has_media_cards(text) or find_mentions(text) or "luvbild_" in text)
+
+
+def render_markdown(text, custom_settings="default"):
+    """
+    `markdownify`, but texts whose HTML depends on the text alone are kept
+    in process once rendered, or loaded for a whole page beforehand by
+    `prefetch_rendered_markdown`. Never queries or writes the database.
+
+    Texts with media cards depend on the entities they show; their cards are
+    loaded in bulk and cached per entity.
+    """
+    text = str(text or "")
+    if has_media_cards(text):
+        with prefetched_media_cards(text):
+            return mark_safe(str(render_markdownify(text, custom_settings)))
+
+    digest = get_digest(text, custom_settings)
+    html = _memo.get(digest)
+    if html is None:
+        html = str(render_markdownify(text, custom_settings))
+        if is_storable(text):
+            _remember(digest, html)
+    return mark_safe(html)
+
+
+def get_content_text(content):
+    """The text the `content|linkify_tags|markdownify` pipeline renders."""
+    return str(linkify_tags(content)) if content else ""
+
+
+def prefetch_rendered_markdown(objects):
+    """
+    Load the stored HTML of the `content` of a page of objects in one query,
+    so that rendering them in the template needs none.
+    """
+    texts = {}
+    for obj in objects:
+        text = get_content_text(getattr(obj, "content", None))
+        if text and is_storable(text):
+            digest = get_digest(text)
+            if digest not in _memo:
+                texts[digest] = text
+    if texts:
+        stored = RenderedMarkdown.objects.filter(digest__in=list(texts))
+        for digest, html in stored.values_list("digest", "html"):
+            _remember(digest, html)
+
+
+def store_rendered_contents(model, objects):
+    """
+    Store the HTML of the `content` of many (pk, content) of `model`,
+    replacing the HTML of previous texts and dropping it for texts that are
+    not storable. Returns the number of texts that had to be rendered.
+    """
+    content_type = ContentType.objects.get_for_model(model)
+    objects = iter(objects)
+    rendered = 0
+    while batch := list(islice(objects, BATCH_SIZE)):
+        texts = {pk: get_content_text(content) for pk, content in batch}
+        stored = RenderedMarkdown.objects.filter(
+            content_type=content_type, object_id__in=list(texts)
+        )
+        current = dict(stored.values_list("object_id", "digest"))
+        stale = []
+        renderings = []
+        for pk, text in texts.items():
+            digest = get_digest(text) if text and is_storable(text) else None
+            if current.get(pk) == digest:
+                continue
+            if pk in current:
+                stale.append(pk)
+            if digest is not None:
+                renderings.append(
+                    RenderedMarkdown(
+                        content_type=content_type,
+                        object_id=pk,
+                        digest=digest,
+                        renderer_version=get_renderer_version(),
+                        html=str(render_markdownify(text)),
+                    )
+                )
+        stored.filter(object_id__in=stale).delete()
+        RenderedMarkdown.objects.bulk_create(renderings, ignore_conflicts=True)
+        rendered += len(renderings)
+    return rendered
+
+
+def store_rendered_content(instance):
+    """Store the HTML of the `content` of a saved object."""
+    store_rendered_contents(type(instance), [(instance.pk, instance.content)])
+
+
+def delete_rendered_content(instance):
+    RenderedMarkdown.objects.filter(
+        content_type=ContentType.objects.get_for_model(instance),
+        object_id=instance.pk,
+    ).delete()
+
+
+def prune_rendered_markdown(models=()):
+    """
+    Delete HTML rendered by other renderer versions, and the HTML of objects
+    of `models` that no longer exist.
+    """
+    _memo.clear()
+    deleted, _ = RenderedMarkdown.objects.exclude(
+        renderer_version=get_renderer_version()
+    ).delete()
+    for model in models:
+        orphans, _ = (
+            RenderedMarkdown.objects.filter(
+                content_type=ContentType.objects.get_for_model(model)
+            )
+            .exclude(object_id__in=model._base_manager.values("pk"))
+            .delete()
+        )
+        deleted += orphans
+    return deleted
@@ -1,13 +1,88 @@
 import re
+import threading
 import xml.etree.ElementTree as etree
+from collections import defaultdict
+from contextlib import contextmanager
 from itertools import groupby
 from operator import attrgetter
 
 import markdown
+from django.apps import apps
 from django.conf import settings
-from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.urls import reverse
 from markdown.inlinepatterns import InlineProcessor
+from markdown.preprocessors import Preprocessor
+
+from .utils_mentions import MENTION_PATTERN, resolve_mentions, resolve_usernames
+
+# Card kind -> entity model, and the relations its card renders
+CARD_MODELS = {
+    "book": "read.Book",
+    "audiobook": "listen.Audiobook",
+    "movie": "watch.Movie",
+    "series": "watch.Series",
+    "release": "listen.Release",
+    "podcast": "listen.Podcast",
+    "game": "play.Game",
+}
+CARD_SELECT_RELATED = {
+    "book": ("publisher",),
+    "audiobook": ("publisher",),
+}
+CARD_PREFETCH_RELATED = {
+    "book": ("bookrole_set__role", "bookrole_set__creator", "instances__work__genres"),
+    "audiobook": (
+        "audiobookrole_set__role",
+        "audiobookrole_set__creator",
+        "instances__work__genres",
+    ),
+    "movie": (
+        "movieroles__role",
+        "movieroles__creator",
+        "studios",
+        "distributors",
+        "genres",
+        "region_release_dates",
+    ),
+    "series": (
+        "seriesroles__role",
+        "seriesroles__creator",
+        "studios",
+        "distributors",
+        "genres",
+    ),
+    "release": (
+        "releaserole_set__role",
+        "releaserole_set__creator",
+        "label",
+        "tracks__genres",
+    ),
+    "game": (
+        "gameroles__role",
+        "gameroles__creator",
+        "developers",
+        "publishers",
+        "region_release_dates",
+    ),
+}
+# Models whose changes show up on the card of a related entity
+CARD_DEPENDENCIES = {
+    "read.BookRole": ("book", "book_id"),
+    "listen.AudiobookRole": ("audiobook", "audiobook_id"),
+    "watch.MovieRole": ("movie", "movie_id"),
+    "watch.MovieReleaseDate": ("movie", "movie_id"),
+    "watch.SeriesRole": ("series", "series_id"),
+    "listen.ReleaseRole": ("release", "release_id"),
+    "play.GameRole": ("game", "game_id"),
+    "play.GameReleaseDate": ("game", "game_id"),
+}
+CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+CARD_FENCE_PATTERN = re.compile(r"^[ \t]*```card[^\n]*\n(.*?)\n[ \t]*```", re.M | re.S)
+
+# Entities and cached fragments loaded by `prefetched_media_cards`
+_prefetched = threading.local()
 
 
 # media card in markdown blockquote ```card```
@@ -17,42 +92,137 @@ def media_card(source, language, css_class, options, md, **kwargs):
     if len(parts) < 3:
         return '<div class="error">Invalid media URL format</div>'
 
-    media_type = parts[-4]
+    kind = get_card_kind(source)
+    if kind is None:
+        return '<div class="p-3 error">Unsupported media type</div>'
+
+    cache_key = get_card_cache_key(kind, parts[-2])
+    html = getattr(_prefetched, "fragments", {}).get(cache_key)
+    if html is None:
+        html = cache.get(cache_key)
+    if html is None:
+        # Call the appropriate function based on the media type
+        html = CARD_RENDERERS[kind](source, language, css_class, options, md, **kwargs)
+        cache.set(cache_key, html, CARD_CACHE_TIMEOUT)
+    return html
+
 
-    # Call the appropriate function based on the media type
+def get_card_kind(source):
+    """The entity kind a card URL points to, e.g. "movie", or None."""
+    parts = source.strip().split("/")
+    media_type = parts[-4] if len(parts) >= 4 else None
     if media_type == "read":
         if "book" in source:
-            return book_card(source, language, css_class, options, md, **kwargs)
+            return "book"
     elif media_type == "watch":
         # Further determine if it's a movie or a series
         if "movie" in source:
-            return movie_card(source, language, css_class, options, md, **kwargs)
+            return "movie"
         elif "series" in source:
-            return series_card(source, language, css_class, options, md, **kwargs)
+            return "series"
     elif media_type == "listen":
         if "release" in source:
-            return release_card(source, language, css_class, options, md, **kwargs)
+            return "release"
         elif "audiobook" in source:
-            return audiobook_card(source, language, css_class, options, md, **kwargs)
+            return "audiobook"
         elif "podcast" in source:
-            return podcast_card(source, language, css_class, options, md, **kwargs)
+            return "podcast"
     elif media_type == "play":
         if "game" in source:
-            return game_card(source, language, css_class, options, md, **kwargs)
-    else:
-        return '<div class="p-3 error">Unsupported media type</div>'
+            return "game"
+    return None
 
 
-def book_card(source, language, css_class, options, md, **kwargs):
-    from read.models import Book
+def get_card_cache_key(kind, object_id):
+    return f"media_card:{kind}:{object_id}"
+
+
+def get_card_queryset(kind):
+    model = apps.get_model(CARD_MODELS[kind])
+    return model.objects.select_related(
+        *CARD_SELECT_RELATED.get(kind, ())
+    ).prefetch_related(*CARD_PREFETCH_RELATED.get(kind, ()))
+
+
+def get_card_entity(kind, object_id):
+    """The entity behind a card, from the pre-pass if it was loaded there."""
+    entities = getattr(_prefetched, "entities", {})
+    if (kind, object_id) in entities:
+        return entities[(kind, object_id)]
+    return get_card_queryset(kind).filter(id=object_id).first()
+
+
+def has_media_cards(text):
+    return bool(text) and CARD_FENCE_PATTERN.search(text) is not None
 
+
+@contextmanager
+def prefetched_media_cards(text):
+    """
+    Pre-pass over a markdown document: load the cached fragment of every
+    card in one cache call, and the entities of the uncached ones with one
+    query per kind, so rendering the cards needs no further queries.
+    """
+    ids_by_key = {}
+    for source in CARD_FENCE_PATTERN.findall(text or ""):
+        kind = get_card_kind(source)
+        if kind is not None:
+            object_id = source.strip().split("/")[-2]
+            ids_by_key[get_card_cache_key(kind, object_id)] = (kind, object_id)
+
+    fragments = cache.get_many(list(ids_by_key))
+    missing = defaultdict(set)
+    for cache_key, (kind, object_id) in ids_by_key.items():
+        if cache_key not in fragments and object_id.isdigit():
+            missing[kind].add(object_id)
+
+    entities = {}
+    for kind, object_ids in missing.items():
+        found = get_card_queryset(kind).in_bulk([int(pk) for pk in object_ids])
+        for object_id in object_ids:
+            entities[(kind, object_id)] = found.get(int(object_id))
+
+    _prefetched.fragments = fragments
+    _prefetched.entities = entities
+    try:
+        yield
+    finally:
+        del _prefetched.fragments
+        del _prefetched.entities
+
+
+def invalidate_media_card(instance):
+    """Drop the cached card of an entity, or of the entity a role belongs to."""
+    model_label = instance._meta.label
+    for kind, card_model_label in CARD_MODELS.items():
+        if model_label == card_model_label:
+            cache.delete(get_card_cache_key(kind, instance.pk))
+    if model_label in CARD_DEPENDENCIES:
+        kind, field_name = CARD_DEPENDENCIES[model_label]
+        cache.delete(get_card_cache_key(kind, getattr(instance, field_name)))
+
+
+def _sorted_by_role_name(roles):
+    return sorted(roles, key=lambda r: (r.role is None, r.role.name if r.role else ""))
+
+
+def _earliest_release_html(region_release_dates):
+    region_release_dates = sorted(
+        region_release_dates, key=lambda d: d.release_date or ""
+    )
+    if not region_release_dates:
+        return ""
+    earliest_release = region_release_dates[0]
+    return f'<div><span class="text-muted">Date:</span> {earliest_release.release_date} ({earliest_release.region})</div>'
+
+
+def book_card(source, language, css_class, options, md, **kwargs):
     # Extract book_id from the source
     book_id = source.strip().split("/")[-2]
 
     # Fetch the Book instance
-    try:
-        book = Book.objects.get(id=book_id)
-    except Book.DoesNotExist:
+    book = get_card_entity("book", book_id)
+    if book is None:
         return '<div class="error">Book not found</div>'
 
     # Format the Book data into HTML
@@ -112,15 +282,12 @@ def book_card(source, language, css_class, options, md, **kwargs):
 
 
 def audiobook_card(source, language, css_class, options, md, **kwargs):
-    from listen.models import Audiobook
-
     # Extract audiobook_id from the source
     audiobook_id = source.strip().split("/")[-2]
 
     # Fetch the Book instance
-    try:
-        audiobook = Audiobook.objects.get(id=audiobook_id)
-    except Audiobook.DoesNotExist:
+    audiobook = get_card_entity("audiobook", audiobook_id)
+    if audiobook is None:
         return '<div class="error">Book not found</div>'
 
     # Format the Book data into HTML
@@ -182,15 +349,12 @@ def audiobook_card(source, language, css_class, options, md, **kwargs):
 
 
 def movie_card(source, language, css_class, options, md, **kwargs):
-    from watch.models import Movie
-
     # Extract movie_id from the source
     movie_id = source.strip().split("/")[-2]
 
     # Fetch the Movie instance
-    try:
-        movie = Movie.objects.get(id=movie_id)
-    except Movie.DoesNotExist:
+    movie = get_card_entity("movie", movie_id)
+    if movie is None:
         return '<div class="error">Movie not found</div>'
 
     # Format the Movie data into HTML
@@ -203,7 +367,7 @@ def movie_card(source, language, css_class, options, md, **kwargs):
 
     # Handling movie roles
     roles_html = ""
-    movie_roles = movie.movieroles.all().order_by("role__name")
+    movie_roles = _sorted_by_role_name(movie.movieroles.all())
     for role_name, roles in groupby(movie_roles, key=attrgetter("role.name")):
         role_html_parts = [
             f'<a href="/entity/creator/{mr.creator.id}">{mr.alt_name or mr.creator.name}</a>'
@@ -242,12 +406,7 @@ def movie_card(source, language, css_class, options, md, **kwargs):
         print("Error in book_card() function")
 
     # Release Date
-    region_release_dates = movie.region_release_dates.all().order_by("release_date")
-    if region_release_dates.exists():
-        earliest_release = region_release_dates.first()
-        release_date_html = f'<div><span class="text-muted">Date:</span> {earliest_release.release_date} ({earliest_release.region})</div>'
-    else:
-        release_date_html = ""
+    release_date_html = _earliest_release_html(movie.region_release_dates.all())
 
     return f"""<div class="media-card d-flex flex-row p-3 mb-2">
                     <div class="mt-1 mb-3 mb-md-0 flex-shrink-0 checkin-cover">
@@ -269,10 +428,11 @@ def movie_card(source, language, css_class, options, md, **kwargs):
 
 
 def _generate_entity_html(entities, label, url_namespace):
-    if not entities.exists():
+    entities = list(entities)
+    if not entities:
         return ""
 
-    plural_suffix = "s" if entities.count() > 1 else ""
+    plural_suffix = "s" if len(entities) > 1 else ""
     entity_links = " / ".join(
         [
             f'<a href="/entity/{url_namespace}/{entity.id}">{entity.name}</a>'
@@ -283,15 +443,12 @@ def _generate_entity_html(entities, label, url_namespace):
 
 
 def series_card(source, language, css_class, options, md, **kwargs):
-    from watch.models import Series
-
     # Extract series_id from the source
     series_id = source.strip().split("/")[-2]
 
     # Fetch the Movie instance
-    try:
-        series = Series.objects.get(id=series_id)
-    except Series.DoesNotExist:
+    series = get_card_entity("series", series_id)
+    if series is None:
         return '<div class="error">Series not found</div>'
 
     # Format the Movie data into HTML
@@ -304,7 +461,7 @@ def series_card(source, language, css_class, options, md, **kwargs):
 
     # Handling movie roles
     roles_html = ""
-    series_roles = series.seriesroles.all().order_by("role__name")
+    series_roles = _sorted_by_role_name(series.seriesroles.all())
     for role_name, roles in groupby(series_roles, key=attrgetter("role.name")):
         role_html_parts = [
             f'<a href="/entity/creator/{mr.creator.id}">{mr.alt_name or mr.creator.name}</a>'
@@ -368,15 +525,12 @@ def series_card(source, language, css_class, options, md, **kwargs):
 
 
 def release_card(source, language, css_class, options, md, **kwargs):
-    from listen.models import Release
-
     # Extract release_id from the source
     release_id = source.strip().split("/")[-2]
 
     # Fetch the Movie instance
-    try:
-        release = Release.objects.get(id=release_id)
-    except Release.DoesNotExist:
+    release = get_card_entity("release", release_id)
+    if release is None:
         return '<div class="error">Release not found</div>'
 
     # Format the Movie data into HTML
@@ -444,15 +598,12 @@ def release_card(source, language, css_class, options, md, **kwargs):
 
 
 def podcast_card(source, language, css_class, options, md, **kwargs):
-    from listen.models import Podcast
-
     # Extract podcast_id from the source
     podcast_id = source.strip().split("/")[-2]
 
     # Fetch the Movie instance
-    try:
-        podcast = Podcast.objects.get(id=podcast_id)
-    except Podcast.DoesNotExist:
+    podcast = get_card_entity("podcast", podcast_id)
+    if podcast is None:
         return '<div class="error">Podcast not found</div>'
 
     # Format the Movie data into HTML
@@ -478,15 +629,12 @@ def podcast_card(source, language, css_class, options, md, **kwargs):
 
 
 def game_card(source, language, css_class, options, md, **kwargs):
-    from play.models import Game
-
     # Extract game_id from the source
     game_id = source.strip().split("/")[-2]
 
     # Fetch the Game instance
-    try:
-        game = Game.objects.get(id=game_id)
-    except Game.DoesNotExist:
+    game = get_card_entity("game", game_id)
+    if game is None:
         return '<div class="error">Game not found</div>'
 
     # Format the Game data into HTML
@@ -499,7 +647,7 @@ def game_card(source, language, css_class, options, md, **kwargs):
 
     # # Handling game roles
     roles_html = ""
-    game_roles = game.gameroles.all().order_by("role__name")
+    game_roles = _sorted_by_role_name(game.gameroles.all())
     for role_name, roles in groupby(game_roles, key=attrgetter("role.name")):
         role_html_parts = [
             f'<a href="/entity/creator/{mr.creator.id}">{mr.alt_name or mr.creator.name}</a>'
@@ -539,12 +687,7 @@ def game_card(source, language, css_class, options, md, **kwargs):
                 </div>
             """
     # Release Date
-    region_release_dates = game.region_release_dates.all().order_by("release_date")
-    if region_release_dates.exists():
-        earliest_release = region_release_dates.first()
-        release_date_html = f'<div><span class="text-muted">Date:</span> {earliest_release.release_date} ({earliest_release.region})</div>'
-    else:
-        release_date_html = ""
+    release_date_html = _earliest_release_html(game.region_release_dates.all())
 
     return f"""<div class="media-card d-flex flex-row p-3 mb-2">
             <div class="mt-1 mb-3 mb-md-0 flex-shrink-0 checkin-cover">
@@ -565,17 +708,37 @@ def game_card(source, language, css_class, options, md, **kwargs):
     """
 
 
+CARD_RENDERERS = {
+    "book": book_card,
+    "audiobook": audiobook_card,
+    "movie": movie_card,
+    "series": series_card,
+    "release": release_card,
+    "podcast": podcast_card,
+    "game": game_card,
+}
+
+
+class MentionPreprocessor(Preprocessor):
+    def run(self, lines):
+        # Resolve every @mention in the document with one lookup
+        self.md.mentioned_user_ids = resolve_mentions("\n".join(lines))
+        return lines
+
+
 class MentionPattern(InlineProcessor):
     def handleMatch(self, m, data):
         username = m.group(1)
-        try:
-            user = get_user_model().objects.get(username=username)
+        user_ids = getattr(self.md, "mentioned_user_ids", {})
+        if username not in user_ids:
+            user_ids = resolve_usernames([username])
+        if user_ids[username] is not None:
             url = reverse("accounts:detail", args=[username])
             a = etree.Element("a")
             a.text = f"@{username}"
             a.set("href", url)
             return a, m.start(0), m.end(0)
-        except get_user_model().DoesNotExist:
+        else:
             span = etree.Element("span")
             span.text = f"@{username}"
             return span, m.start(0), m.end(0)
@@ -583,8 +746,7 @@ class MentionPattern(InlineProcessor):
 
 class MentionExtension(markdown.Extension):
     def extendMarkdown(self, md):
-        # Allow dots inside the username, but not at the end
-        MENTION_PATTERN = r"(?<![:/])@([\w]+(?:\.[\w]+)*)"
+        md.preprocessors.register(MentionPreprocessor(md), "mention", 10)
         mentionPattern = MentionPattern(MENTION_PATTERN, md)
         md.inlinePatterns.register(mentionPattern, "mention", 175)
 
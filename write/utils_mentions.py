@@ -0,0 +1,78 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from django.contrib.auth import get_user_model
+
+# Allow dots inside the username, but not at the end
+MENTION_PATTERN = r"(?<![:/])@([\w]+(?:\.[\w]+)*)"
+
+# Usernames resolved recently, known (user id) and unknown (None) alike.
+# Renames and deactivations evict entries in the process that saved the
+# user; other processes pick them up once the entry expires.
+CACHE_SIZE = 4096
+CACHE_TTL = 300
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+###########
+# helpers #
+###########
+
+
+def find_mentions(text):
+    """The distinct usernames @mentioned in a text, in order of appearance."""
+    return list(dict.fromkeys(re.findall(MENTION_PATTERN, text or "")))
+
+
+def resolve_usernames(usernames):
+    """
+    Map each username to the id of its active user, or None if there is
+    none. Usernames missing from the cache are looked up in one query.
+    """
+    now = time.monotonic()
+    resolved = {}
+    missing = []
+    with _lock:
+        for username in usernames:
+            entry = _cache.get(username)
+            if entry is not None and entry[1] > now:
+                _cache.move_to_end(username)
+                resolved[username] = entry[0]
+            else:
+                missing.append(username)
+
+    if missing:
+        found = dict(
+            get_user_model()
+            .objects.filter(username__in=missing, is_active=True)
+            .values_list("username", "id")
+        )
+        with _lock:
+            for username in missing:
+                resolved[username] = found.get(username)
+                _cache[username] = (resolved[username], now + CACHE_TTL)
+                _cache.move_to_end(username)
+            while len(_cache) > CACHE_SIZE:
+                _cache.popitem(last=False)
+    return resolved
+
+
+def resolve_mentions(text):
+    return resolve_usernames(find_mentions(text))
+
+
+def get_mentioned_users(text):
+    user_ids = [user_id for user_id in resolve_mentions(text).values() if user_id]
+    return get_user_model().objects.filter(id__in=user_ids)
+
+
+def forget_user(user):
+    """Evict a user's old and current username, e.g. after a rename."""
+    with _lock:
+        for username, (user_id, _) in list(_cache.items()):
+            if user_id == user.pk or username == user.username:
+                del _cache[username]
@@ -40,6 +40,7 @@ from django.views.generic.edit import FormMixin
 from django_ratelimit.decorators import ratelimit
 
 from activity_feed.models import Activity, Block
+from activity_feed.utils_prefetch import prefetch_checkin_media
 from discover.utils import user_has_upvoted
 from listen.models import ListenCheckIn
 from play.models import PlayCheckIn
@@ -81,6 +82,7 @@ from .models import (
     VisibilityChoices,
 )
 from .utils import get_visible_comments
+from .utils_markdown import prefetch_rendered_markdown
 
 User = get_user_model()
 
@@ -934,6 +936,8 @@ class TagListView(ListView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        prefetch_checkin_media(context["page_obj"])
+        prefetch_rendered_markdown(context["page_obj"])
         tag = self.kwargs["tag"]
         context["tag"] = tag
         context["users"] = User.objects.filter(